@@ -22,6 +22,7 @@ import json
 import webbrowser
 import requests
 import uuid
+import multiprocessing
 from datetime import date, datetime, timedelta
 import logging
 from tkinter import filedialog, messagebox, TclError # Import TclError để xử lý icon khay hệ thống
@@ -29,53 +30,34 @@ from unidecode import unidecode
 from PIL import Image
 from packaging import version # Để so sánh phiên bản
 from pathlib import Path # Để xử lý đường dẫn một cách mạnh mẽ
-# Thêm các import cần thiết cho tính năng Dubbing từ DubApp
-from mutagen.mp3 import MP3
-from mutagen.wave import WAVE
-from mutagen.flac import FLAC
-from mutagen.oggopus import OggOpus
-from mutagen.aac import AAC
-from gtts import gTTS
-from gtts.tts import gTTSError
+# Thư viện nặng (torch, whisper, selenium, pysubs2, gTTS...) được import lười khi dùng lần đầu,
+# để màn hình chờ hiện ngay. Đo bằng: python -m utils.lazy_import Piu
+from utils.lazy_import import lazy_import, is_module_available, preload_modules
 import base64
-import pysubs2 #(cần cài đặt: pip install pysubs2)
+pysubs2 = lazy_import("pysubs2") #(cần cài đặt: pip install pysubs2)
 from tkinter import colorchooser
 import tkinter as tk
 from tkinter import font as tkfont # Import cụ thể để dễ dùng
-from matplotlib import font_manager
 from logging.handlers import RotatingFileHandler
 import csv
-import torch
-import torchaudio
 from contextlib import contextmanager
-from selenium.common.exceptions import NoSuchElementException
 
 # Import helper utilities
 from utils.helpers import get_default_downloads_folder, safe_int, parse_timecode, ms_to_tc, open_file_with_default_app, resource_path, create_safe_filename, remove_vietnamese_diacritics, strip_series_chapter_prefix, get_dpi_scaling_factor, get_work_area, sanitize_youtube_text, play_sound_async, parse_color_string_to_tuple, format_timestamp, normalize_string_for_comparison, get_identifier_from_source, parse_ai_response, validate_volume_input, sanitize_script_for_ai
-from utils.ffmpeg_utils import find_ffmpeg, find_ffprobe, create_ffmpeg_concat_file_list, ffmpeg_split_media, get_video_duration_s
+from utils.ffmpeg_utils import find_ffmpeg, find_ffprobe, create_ffmpeg_concat_file_list, ffmpeg_split_media
 from utils.file_utils import prepare_batch_queue
 from utils.keep_awake import KeepAwakeManager
 from utils.system_utils import run_system_command, shutdown_system, cancel_shutdown_system, is_cuda_available, cleanup_stale_chrome_processes, normalize_hwid_string, is_plausible_hwid, ensure_single_instance, release_mutex
 from utils.srt_utils import parse_srt_for_slideshow_timing, format_srt_data_to_string, extract_dialogue_from_srt_string, write_srt, write_vtt
 from exceptions.app_exceptions import SingleInstanceException
-from config.settings import get_config_path, get_font_cache_path, get_google_voices_cache_path, load_config, save_config
+from config.settings import get_config_path, get_font_cache_path, get_google_voices_cache_path, get_transcribe_checkpoint_dir, load_config, save_config
 from config.ui_constants import get_theme_colors
 from ui.widgets.tooltip import Tooltip
 from ui.widgets.menu_utils import textbox_right_click_menu, clear_all_links
 from ui.widgets.splash_screen import SplashScreen
 from ui.widgets.custom_font_dropdown import CustomFontDropdown
 from ui.widgets.custom_voice_dropdown import CustomVoiceDropdown
-from ui.popups.api_settings import APISettingsWindow
-from ui.popups.branding_settings import BrandingSettingsWindow
-from ui.popups.imagen_settings import ImagenSettingsWindow
-from ui.popups.dalle_settings import DalleSettingsWindow
-from ui.popups.metadata_manager import MetadataManagerWindow
-from ui.popups.subtitle_style_settings import SubtitleStyleSettingsWindow
-from ui.tabs.ai_editor_tab import AIEditorTab
-from ui.tabs.download_tab import DownloadTab
-from ui.tabs.subtitle_tab import SubtitleTab
-from ui.tabs.dubbing_tab import DubbingTab
-from ui.tabs.youtube_upload_tab import YouTubeUploadTab
+# Popup (ui.popups.*) được import khi mở lần đầu; các tab (ui.tabs.*) được import trong init_ui
 from utils.logging_utils import setup_logging, log_failed_task
 from ui.utils.ui_helpers import is_ui_alive, safe_after, update_path_label, norm_no_diacritics, is_readyish, locked_msg_for_view, ready_msg_for_view, setup_popup_window, center_popup_on_master
 from services.youtube_upload_service import upload_youtube_thumbnail, get_playlist_id_by_name, add_video_to_playlist
@@ -84,13 +66,32 @@ from services.youtube_browser_upload_service import click_with_fallback, init_ch
 from services.google_api_service import get_google_api_service
 from services.licensing_service import verify_status as licensing_verify_status, activate as licensing_activate, start_trial as licensing_start_trial
 from services.ffmpeg_service import run_ffmpeg_command as ffmpeg_run_command
+from services.media_probe_service import get_media_probe, get_video_duration_s
 from services.download_service import stream_process_output as ytdlp_stream_output
 from services.update_service import is_newer as is_newer_version
 from services.ai_service import AIService
 from services.image_service import ImageService
 from services.model_service import ModelService
+from services.whisper_backends import create_whisper_backend, BACKEND_OPENAI_WHISPER
+from services.vad_service import VADService
+from application.app_state import StateManager, MODEL_STATUS_LOADING, MODEL_STATUS_WARMING, MODEL_STATUS_READY, MODEL_STATUS_ERROR
 from services.metadata_service import MetadataService
 from services.youtube_service import YouTubeService
+from services.google_client_pool import get_google_translate_client, get_google_tts_client
+from services.translation_cache import get_translation_memory, translate_with_memory
+from services.transcription_cache import get_transcription_cache
+from services.tts_cache import get_tts_cache
+from services.dub_scheduler import create_dub_scheduler, STAGE_CPU, STAGE_NETWORK
+from models.task_models import DubTaskContext
+from services.translation_service import get_engine_key as translation_get_engine_key, translate_subtitle_content as translation_translate_subtitle_content
+from services.subtitle_pipeline import StreamingTranslationWorker
+from services.audio_decode_service import decode_audio_once, release_decoded_audio
+from services.parallel_transcription import (
+    compute_worker_count as parallel_compute_worker_count,
+    plan_split_points as parallel_plan_split_points,
+    chunk_offsets_s as parallel_chunk_offsets_s,
+    transcribe_chunks_parallel
+)
 
 # --- Thêm các import cho Google Sheets API ---
 # Note: os.path is already available via 'import os' at top
@@ -152,12 +153,10 @@ except ImportError:
     APIStatusError = None
     APITimeoutError = None
     
-# import whisper
-try:
-    import whisper
-    HAS_WHISPER = True
-except ImportError:
-    HAS_WHISPER = False
+# import whisper (lazy: kéo theo torch, chỉ import khi tải model / giải mã audio)
+HAS_WHISPER = is_module_available("whisper")
+whisper = lazy_import("whisper") if HAS_WHISPER else None
+if not HAS_WHISPER:
     logging.error("Thư viện 'whisper' chưa được cài đặt. Chức năng tạo sub sẽ không hoạt động.")
 
 # import UNDERTHESEA
@@ -198,31 +197,12 @@ else:
     PYWIN32_AVAILABLE = False # Đặt là False nếu không phải Windows
 
 
-# --- Thêm các import cho Selenium ---
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from selenium.webdriver.common.keys import Keys
-    from selenium.webdriver.common.action_chains import ActionChains
-    from webdriver_manager.chrome import ChromeDriverManager
-
-    # Exceptions: gộp đủ các loại bạn đang dùng trong code
-    from selenium.common.exceptions import (
-        TimeoutException,
-        ElementClickInterceptedException,
-        StaleElementReferenceException,
-        NoSuchWindowException,      # <<< BỔ SUNG (đã gây NameError)
-        WebDriverException,         # <<< Khuyến nghị thêm
-        NoSuchElementException,     # <<< Bạn đã dùng ở chỗ alt popup
-    )
-
-    HAS_SELENIUM = True
-    logging.info("Thư viện Selenium và các Exception đã được import thành công.")
-except ImportError:
-    HAS_SELENIUM = False
+# --- Selenium (lazy): chỉ import khi bắt đầu upload bằng trình duyệt ---
+# Exception trong 'except' dùng selenium_exceptions.<Tên>.
+from services.youtube_browser_upload_service import (
+    HAS_SELENIUM, webdriver, selenium_exceptions, By, Keys, ActionChains, WebDriverWait, EC, Service, ChromeDriverManager
+)
+if not HAS_SELENIUM:
     logging.warning("Thư viện Selenium chưa được cài đặt. Chức năng upload sẽ không hoạt động.")
 
 
@@ -265,9 +245,16 @@ from config.constants import (
     LANGUAGE_MAP_VI,
     SCOPES,
     WHISPER_VRAM_REQ_MB,
+    WHISPER_MODEL_CACHE_DEFAULT_MB,
+    PARALLEL_TRANSCRIBE_MIN_SECONDS,
     YOUTUBE_CATEGORIES,
     YOUTUBE_CATEGORY_NAVIGATION_ORDER,
-    API_PRICING_USD
+    API_PRICING_USD,
+    OPENAI_TRANSLATE_DEFAULT_MAX_WORKERS,
+    OPENAI_TRANSLATE_DEFAULT_RPM,
+    OPENAI_TRANSLATE_DEFAULT_TPM,
+    OPENAI_TRANSLATE_DEFAULT_BATCH_SIZE,
+    OPENAI_TRANSLATE_DEFAULT_BATCH_MAX_CHARS
 )
 
 # SingleInstanceException - MOVED to exceptions/app_exceptions.py - imported above
@@ -504,7 +491,7 @@ class SubtitleApp(ctk.CTk):
         self._dub_trigger_initiated_for_current_batch = False 
         self.processing_thread = None
         self.current_process = None # Lưu tiến trình con
-        self.dub_current_ffmpeg_process = None
+        self._dub_ffmpeg_processes = {} # Tiến trình FFmpeg dub theo luồng (xem dub_current_ffmpeg_process)
         # download_thread, download_urls_list, current_download_url đã được di chuyển sang DownloadTab
         self.is_performing_single_task = False # Cờ chung reset Tab Swicher
         self.is_manual_update_checking = False # Cờ mới cho kiểm tra cập nhật thủ công
@@ -514,10 +501,29 @@ class SubtitleApp(ctk.CTk):
         self.cfg = load_config()
         
         # --- Services ---
+        # Cache dịch dùng chung (SQLite) cho Google Cloud Translate và OpenAI
+        self.translation_memory = get_translation_memory(self.cfg)
         # Khởi tạo AI Service
-        self.ai_service = AIService(logger=self.logger)
+        self.ai_service = AIService(logger=self.logger, translation_memory=self.translation_memory)
         self.image_service = ImageService(logger=self.logger)
-        self.model_service = ModelService(logger=self.logger)
+        # Giữ nhiều model Whisper trong RAM (LRU) theo ngân sách cấu hình, 0 = tự động
+        self.model_service = ModelService(
+            logger=self.logger,
+            cache_budget_mb=safe_int(self.cfg.get("whisper_model_cache_mb"), WHISPER_MODEL_CACHE_DEFAULT_MB),
+            # Cache kết quả transcribe (SQLite) theo nội dung media + model + ngôn ngữ + tùy chọn giải mã
+            transcription_cache=get_transcription_cache(self.cfg),
+            # "openai-whisper" (mặc định) hoặc "faster-whisper" (CTranslate2, int8 nhanh hơn nhiều trên CPU)
+            backend=create_whisper_backend(
+                self.cfg.get("whisper_backend"), self.cfg.get("whisper_compute_type"), logger=self.logger
+            )
+        )
+        # Silero VAD load một lần (offline nếu có bản cục bộ), dùng chung cho mọi luồng
+        self.vad_service = VADService(logger=self.logger, model_path=self.cfg.get("silero_vad_path"))
+        # Trạng thái sẵn sàng của model Whisper (tải trước + warm-up sau màn hình chờ)
+        self.state_manager = StateManager(cfg=self.cfg)
+        self._pending_model_ready_listener = None
+        # Cache audio TTS (SQLite) theo engine + giọng + tốc độ/cao độ + SSML + text đã chuẩn hóa
+        self.tts_cache = get_tts_cache(self.cfg)
         self.metadata_service = MetadataService(logger=self.logger)
         self.youtube_service = YouTubeService(logger=self.logger)
 
@@ -890,6 +896,11 @@ class SubtitleApp(ctk.CTk):
 
         # ID của tác vụ đang được xử lý từ hàng chờ (sẽ dùng để theo dõi)
         self.dub_currently_processing_task_id = None
+        # Các tác vụ chạy song song (DubTaskScheduler): ID đã bắt đầu nhưng chưa xử lý xong kết quả
+        self.dub_scheduler = None
+        self.dub_started_task_ids = set()
+        self._dub_completions_waiting = [] # Kết quả chờ xử lý trong lúc đang branding video khác
+        self._dub_branding_in_progress = False
         # =================================================
 
         # Cờ reset lỗi api
@@ -1192,6 +1203,7 @@ class SubtitleApp(ctk.CTk):
         self.dub_DEFAULT_WAV_CODEC = "pcm_s16le" # Codec cho các file WAV trung gian (lossless, 16-bit signed little-endian)
         self.dub_TARGET_AUDIO_PROCESSING_SAMPLE_RATE = 44100 # Tần số lấy mẫu mục tiêu cho xử lý audio
         self.dub_TARGET_AUDIO_PROCESSING_CHANNELS = 2      # Số kênh audio mục tiêu (1 = mono)
+        self.dub_FFMPEG_MIX_MAX_INPUTS = 64 # Số file input tối đa mỗi lệnh amix khi dựng track bằng FFmpeg
 
         # [Tùy chọn Slideshow từ Thư mục Ảnh]
         self.dub_use_image_folder_var = ctk.BooleanVar(value=self.cfg.get("dub_use_image_folder", False))
@@ -1670,7 +1682,12 @@ class SubtitleApp(ctk.CTk):
         self.main_content_frame = ctk.CTkFrame(self, fg_color="transparent")
         self.main_content_frame.pack(expand=True, fill="both", padx=10, pady=(0, 10))
 
-        # Khai báo các frame cho từng tab
+        # Khai báo các frame cho từng tab (import tại đây, sau khi màn hình chờ đã hiện)
+        from ui.tabs.ai_editor_tab import AIEditorTab
+        from ui.tabs.download_tab import DownloadTab
+        from ui.tabs.subtitle_tab import SubtitleTab
+        from ui.tabs.dubbing_tab import DubbingTab
+        from ui.tabs.youtube_upload_tab import YouTubeUploadTab
         self.subtitle_view_frame = SubtitleTab(master=self.main_content_frame, master_app=self)
         self.download_view_frame = DownloadTab(master=self.main_content_frame, master_app=self)
         self.dubbing_view_frame = DubbingTab(master=self.main_content_frame, master_app=self)
@@ -2801,11 +2818,11 @@ class SubtitleApp(ctk.CTk):
                         self._handle_youtube_upload_completion(True, None, "Phát hiện popup upload nhỏ, coi như thành công.", False)
                         return
 
-                    except NoSuchElementException: # Bây giờ Python đã biết NoSuchElementException là gì
+                    except selenium_exceptions.NoSuchElementException: # Bây giờ Python đã biết NoSuchElementException là gì
                         logging.info(f"{worker_log_prefix} ✅ Đã xác nhận giao diện upload đầy đủ. Tiếp tục quy trình...")
                         self._log_youtube_upload("Gặp giao diện upload đầy đủ, tiếp tục điền thông tin.")
 
-                except TimeoutException:
+                except selenium_exceptions.TimeoutException:
                     error_msg_no_ui = "Sau khi gửi file, không có giao diện upload nào của YouTube xuất hiện."
                     logging.error(f"{worker_log_prefix} {error_msg_no_ui}")
                     self._handle_youtube_upload_completion(False, None, error_msg_no_ui, False)
@@ -3496,16 +3513,16 @@ class SubtitleApp(ctk.CTk):
                                 logging.info(f"{worker_log_prefix} ✅ Popup 'Tải lên' đã biến mất. Upload thành công!")
                                 self._handle_youtube_upload_completion(True, uploaded_video_id, None, False)
                                 return
-                            except TimeoutException:
+                            except selenium_exceptions.TimeoutException:
                                 continue
 
-                    except TimeoutException:
+                    except selenium_exceptions.TimeoutException:
                         # 2) Không thấy popup trong 7s → video ngắn/redirect nhanh → coi như OK
                         logging.info(f"{worker_log_prefix} ✅ Không thấy popup 'Tải lên' sau 7s. Giả định upload đã hoàn tất.")
                         self._handle_youtube_upload_completion(True, uploaded_video_id, None, False)
                         return
 
-                except (StaleElementReferenceException, NoSuchWindowException, WebDriverException) as e:
+                except (selenium_exceptions.StaleElementReferenceException, selenium_exceptions.NoSuchWindowException, selenium_exceptions.WebDriverException) as e:
                     logging.info(f"{worker_log_prefix} ✅ UI đổi/đóng trong khi chờ ({type(e).__name__}). Giả định đã hoàn tất.")
                     self._handle_youtube_upload_completion(True, uploaded_video_id, None, False)
                     return        
@@ -3822,6 +3839,7 @@ class SubtitleApp(ctk.CTk):
             self._metadata_manager_win.focus()
             return
         
+        from ui.popups.metadata_manager import MetadataManagerWindow
         self._metadata_manager_win = MetadataManagerWindow(master_app=self) 
 
 
@@ -4075,6 +4093,7 @@ class SubtitleApp(ctk.CTk):
         
         # 4. Đặt một thông báo cảnh báo trên thanh trạng thái
         self.update_status("⚠️ Khởi động bị bỏ qua, một số chức năng có thể chưa sẵn sàng.")
+        self.after(1500, self._start_model_preload) # Vẫn tải trước model Whisper trong nền
         
         # Lưu ý: Các luồng kiểm tra (bản quyền, cập nhật) đã được khởi chạy trong nền sẽ
         # tiếp tục chạy và tự hoàn thành. Khi chúng xong, chúng có thể sẽ cập nhật lại
@@ -6577,6 +6596,7 @@ class SubtitleApp(ctk.CTk):
             logging.info("Cửa sổ cài đặt DALL-E đã được mở, đang focus.")
             return
         
+        from ui.popups.dalle_settings import DalleSettingsWindow
         self._dalle_settings_win = DalleSettingsWindow(master_app=self)
 
 
@@ -6829,6 +6849,7 @@ class SubtitleApp(ctk.CTk):
         # Lấy SRT string từ payload
         script_for_slideshow_timing_str = payload.get("original_full_srt_for_hardsub", "")
         original_plain_text_for_dub_str = payload.get("original_plain_text_for_dub", "")
+        from ui.popups.imagen_settings import ImagenSettingsWindow
         
         thread = threading.Thread(
             target=self._execute_imagen_chain_generation_iterative,
@@ -7569,6 +7590,7 @@ class SubtitleApp(ctk.CTk):
             
             # Truy cập từ điển style từ lớp ImagenSettingsWindow
             # Vì IMAGEN_ART_STYLES là một thuộc tính của lớp, chúng ta có thể truy cập trực tiếp
+            from ui.popups.imagen_settings import ImagenSettingsWindow
             if hasattr(ImagenSettingsWindow, 'IMAGEN_ART_STYLES'):
                  style_prompt_fragment = ImagenSettingsWindow.IMAGEN_ART_STYLES.get(saved_style_name, "")
                  if style_prompt_fragment:
@@ -7847,6 +7869,7 @@ class SubtitleApp(ctk.CTk):
             self._imagen_settings_win.focus()
             return
         
+        from ui.popups.imagen_settings import ImagenSettingsWindow
         self._imagen_settings_win = ImagenSettingsWindow(master_app=self)
 
 
@@ -7881,6 +7904,7 @@ class SubtitleApp(ctk.CTk):
         enhanced_prompt = None
         error_message = None
 
+        from ui.popups.imagen_settings import ImagenSettingsWindow
         style_prompt_fragment = ImagenSettingsWindow.IMAGEN_ART_STYLES.get(selected_style_name, "")
 
         character_instruction_block = ""
@@ -8385,59 +8409,22 @@ class SubtitleApp(ctk.CTk):
 # Hàm kiểm tra Audio cho tiến trình Sub
     def check_for_audio_stream(self, filepath):
         """
-        Kiểm tra xem file media có chứa ít nhất một luồng âm thanh hay không bằng ffprobe.
+        Kiểm tra xem file media có chứa ít nhất một luồng âm thanh hay không (qua cache probe).
         Trả về True nếu có audio, False nếu không có hoặc có lỗi.
         """
-        ffprobe_exec = find_ffprobe() # Sử dụng hàm find_ffprobe() bạn đã có
-        if not ffprobe_exec:
+        if not find_ffprobe() and os.path.splitext(filepath)[1].lower() not in (".wav", ".mp3"):
             logging.error("[AudioCheck] ffprobe không tìm thấy, không thể kiểm tra luồng âm thanh.")
-            # Trong trường hợp ffprobe thiếu, bạn có thể quyết định trả về True (để thử xử lý)
-            # hoặc False (để báo lỗi). An toàn hơn là báo lỗi hoặc True để giữ hành vi cũ.
-            # Tạm thời, nếu không có ffprobe, chúng ta không thể chắc chắn, nên có thể cho qua.
-            # Tuy nhiên, một ứng dụng hoàn chỉnh nên yêu cầu ffprobe.
-            # self.after(0, lambda: messagebox.showwarning("Thiếu công cụ", "Không tìm thấy ffprobe. Không thể kiểm tra âm thanh của file.", parent=self))
             return True # Giả định là có audio nếu không kiểm tra được, để tránh dừng cả quá trình nếu ffprobe thiếu.
 
-        command = [
-            ffprobe_exec,
-            "-v", "error",              # Chỉ hiển thị lỗi
-            "-select_streams", "a",     # Chỉ chọn các luồng âm thanh
-            "-show_entries", "stream=codec_type", # Yêu cầu thông tin codec (nếu có luồng audio, sẽ có output)
-            "-of", "csv=p=0",           # Định dạng output đơn giản
-            os.path.abspath(filepath)
-        ]
-        logging.debug(f"[AudioCheck] Lệnh kiểm tra audio: {' '.join(command)}")
-        try:
-            startupinfo = None
-            creationflags = 0
-            if sys.platform == "win32": # Ẩn cửa sổ console trên Windows
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                startupinfo.wShowWindow = subprocess.SW_HIDE
-                creationflags = subprocess.CREATE_NO_WINDOW
-
-            result = subprocess.run(command, capture_output=True, text=True, check=False, timeout=15, # Timeout 15 giây
-                                   startupinfo=startupinfo, creationflags=creationflags)
-
-            if result.returncode == 0 and result.stdout.strip():
-                # Nếu lệnh chạy thành công và có output (tức là có thông tin codec của ít nhất 1 luồng audio)
-                logging.info(f"[AudioCheck] File '{os.path.basename(filepath)}' có (các) luồng âm thanh: {result.stdout.strip()}")
-                return True
-            else:
-                # Lệnh chạy thành công nhưng không có output (không có audio stream) hoặc lệnh lỗi
-                log_msg = f"[AudioCheck] File '{os.path.basename(filepath)}' KHÔNG có luồng âm thanh."
-                if result.returncode != 0:
-                    log_msg += f" Mã lỗi ffprobe: {result.returncode}."
-                if result.stderr.strip():
-                    log_msg += f" FFprobe stderr: {result.stderr.strip()}"
-                logging.warning(log_msg)
-                return False
-        except subprocess.TimeoutExpired:
-            logging.error(f"[AudioCheck] Timeout khi kiểm tra luồng âm thanh cho file '{os.path.basename(filepath)}'.")
-            return False # Coi như lỗi, không có audio
-        except Exception as e:
-            logging.error(f"[AudioCheck] Lỗi không mong muốn khi kiểm tra luồng âm thanh cho '{os.path.basename(filepath)}': {e}", exc_info=True)
-            return False # Coi như lỗi, không có audio
+        media_info = get_media_probe().probe(filepath)
+        if media_info is None:
+            logging.error(f"[AudioCheck] Không probe được file '{os.path.basename(filepath)}'. Coi như không có audio.")
+            return False
+        if media_info.has_audio:
+            logging.info(f"[AudioCheck] File '{os.path.basename(filepath)}' có (các) luồng âm thanh: {', '.join(st.get('codec_name', '?') for st in media_info.audio_streams)}")
+            return True
+        logging.warning(f"[AudioCheck] File '{os.path.basename(filepath)}' KHÔNG có luồng âm thanh.")
+        return False
 
 
 
@@ -9449,6 +9436,47 @@ class SubtitleApp(ctk.CTk):
             self._update_dub_start_batch_button_state()
 
 
+# Tiến trình FFmpeg của dub được theo dõi theo luồng: các tác vụ dub chạy song song (DubTaskScheduler)
+# mỗi tác vụ có tiến trình riêng, nên các hàm FFmpeg vẫn gán/xóa self.dub_current_ffmpeg_process như cũ.
+    @property
+    def dub_current_ffmpeg_process(self):
+        """Tiến trình FFmpeg dub của luồng hiện tại; luồng không có tiến trình (vd: UI) nhận một tiến trình bất kỳ đang chạy."""
+        processes = self.__dict__.get('_dub_ffmpeg_processes') or {}
+        return processes.get(threading.get_ident()) or next(iter(list(processes.values())), None)
+
+    @dub_current_ffmpeg_process.setter
+    def dub_current_ffmpeg_process(self, process):
+        processes = self.__dict__.setdefault('_dub_ffmpeg_processes', {})
+        if process is None:
+            processes.pop(threading.get_ident(), None)
+        else:
+            processes[threading.get_ident()] = process
+
+    def _dub_terminate_ffmpeg_processes(self, log_prefix):
+        """
+        Dừng mọi tiến trình FFmpeg dub đang chạy (của tất cả tác vụ).
+
+        Returns:
+            Số tiến trình đã yêu cầu dừng
+        """
+        processes_to_stop = [p for p in list(self._dub_ffmpeg_processes.values()) if p and p.poll() is None]
+        for proc_to_stop in processes_to_stop:
+            logging.info(f"{log_prefix}   -> Đang cố gắng dừng tiến trình FFmpeg (PID: {proc_to_stop.pid})...")
+            try:
+                proc_to_stop.terminate()
+                proc_to_stop.wait(timeout=1.5)
+                if proc_to_stop.poll() is not None:
+                    logging.info(f"{log_prefix}   -> Tiến trình FFmpeg đã dừng (terminate/wait).")
+                else:
+                    logging.warning(f"{log_prefix}   -> Tiến trình FFmpeg không phản hồi terminate, buộc dừng (kill)...")
+                    proc_to_stop.kill()
+                    proc_to_stop.wait(timeout=0.5)
+                    logging.info(f"{log_prefix}   -> Đã kill tiến trình FFmpeg.")
+            except Exception as term_err:
+                logging.warning(f"{log_prefix}   -> Lỗi khi dừng tiến trình FFmpeg (PID: {proc_to_stop.pid}): {term_err}")
+        self._dub_ffmpeg_processes.clear()
+        return len(processes_to_stop)
+
 # Trong lớp SubtitleApp
     def dub_stop_processing(self):
         """
@@ -9473,26 +9501,8 @@ class SubtitleApp(ctk.CTk):
         if hasattr(self, 'dub_stop_button') and self.dub_stop_button.winfo_exists():
             self.dub_stop_button.configure(state=ctk.DISABLED)
 
-        # 4. Cố gắng dừng tiến trình FFmpeg con hiện tại (logic này giữ nguyên)
-        proc_to_stop = self.dub_current_ffmpeg_process
-        if proc_to_stop and proc_to_stop.poll() is None:
-            logging.info(f"{log_prefix_stop}   -> Đang cố gắng dừng tiến trình FFmpeg (PID: {proc_to_stop.pid})...")
-            try:
-                proc_to_stop.terminate()
-                proc_to_stop.wait(timeout=1.5)
-                if proc_to_stop.poll() is not None:
-                    logging.info(f"{log_prefix_stop}   -> Tiến trình FFmpeg đã dừng (terminate/wait).")
-                else:
-                    logging.warning(f"{log_prefix_stop}   -> Tiến trình FFmpeg không phản hồi terminate, buộc dừng (kill)...")
-                    proc_to_stop.kill()
-                    proc_to_stop.wait(timeout=0.5)
-                    logging.info(f"{log_prefix_stop}   -> Đã kill tiến trình FFmpeg.")
-            except Exception as term_err:
-                logging.warning(f"{log_prefix_stop}   -> Lỗi khi dừng tiến trình FFmpeg (PID: {proc_to_stop.pid}): {term_err}")
-            finally:
-                self.dub_current_ffmpeg_process = None
-                logging.debug(f"{log_prefix_stop} Đã reset self.dub_current_ffmpeg_process.")
-        else:
+        # 4. Cố gắng dừng các tiến trình FFmpeg con đang chạy (mỗi tác vụ dub song song có thể có một tiến trình)
+        if not self._dub_terminate_ffmpeg_processes(log_prefix_stop):
             logging.info(f"{log_prefix_stop} Không có tiến trình FFmpeg con nào đang chạy để dừng trực tiếp.")
             
         # 5. LOẠI BỎ TOÀN BỘ PHẦN CẬP NHẬT UI CUỐI CÙNG Ở ĐÂY
@@ -11801,6 +11811,8 @@ class SubtitleApp(ctk.CTk):
              self.load_whisper_model_if_needed() # Thử tải
              return
         if self.is_loading_model:
+             if self._defer_until_model_ready(self.auto_sub_all):
+                 return
              messagebox.showwarning("Đang tải Model", "Mô hình Whisper đang được tải. Vui lòng đợi.")
              return
 
@@ -12235,55 +12247,23 @@ class SubtitleApp(ctk.CTk):
 
 # =================================================================
 # HÀM TÌM GIỌNG NÓI (PHIÊN BẢN HOÀN CHỈNH)
-    def _find_first_speech_timestamp_vad(self, audio_path):
+    def _find_first_speech_timestamp_vad(self, audio_path, audio=None):
         """
-        (ĐÃ SỬA LỖI NONETYPE)
-        Sử dụng Silero VAD để tìm thời điểm bắt đầu của đoạn nói ĐẦU TIÊN trong file audio.
-        Đã thêm xử lý chuyển hướng stdout/stderr để tránh lỗi 'NoneType' trong GUI.
+        Sử dụng Silero VAD (VADService, model load một lần và dùng chung) để tìm thời điểm
+        bắt đầu của đoạn nói ĐẦU TIÊN trong file audio.
+        Chỉ phân tích đoạn đầu của audio trước, nới rộng dần nếu chưa thấy giọng nói.
+        audio: mảng float32 16 kHz mono đã giải mã sẵn (decode_audio_once); nếu có thì không đọc lại file.
         """
-        from contextlib import redirect_stdout, redirect_stderr # Thêm import cần thiết
-
-        worker_log_prefix = f"[{threading.current_thread().name}_VAD_v2_Fixed]"
+        worker_log_prefix = f"[{threading.current_thread().name}_VAD]"
         logging.info(f"{worker_log_prefix} Bắt đầu phân tích VAD cho: {os.path.basename(audio_path)}")
 
         try:
-            # --- BẮT ĐẦU KHỐI SỬA LỖI 'NONETYPE' ---
-            # Mở một "hố đen" để chứa các output không mong muốn
-            with open(os.devnull, "w", encoding="utf-8") as fnull:
-                # Lưu lại stderr gốc
-                _orig_stderr = sys.stderr
-                _patched_stderr = False
-                # Nếu stderr là None (thường gặp trong GUI), tạm thời trỏ nó vào "hố đen"
-                if _orig_stderr is None:
-                    sys.stderr = fnull
-                    _patched_stderr = True
-                
-                try:
-                    # Chạy lệnh có thể gây lỗi bên trong khối redirect
-                    with redirect_stdout(fnull), redirect_stderr(fnull):
-                        logging.debug(f"{worker_log_prefix} Đang gọi torch.hub.load() bên trong khối redirect...")
-                        model, utils = torch.hub.load(repo_or_dir='snakers4/silero-vad',
-                                                      model='silero_vad',
-                                                      force_reload=False,
-                                                      trust_repo=True)
-                finally:
-                    # Luôn khôi phục lại stderr gốc sau khi xong
-                    if _patched_stderr:
-                        sys.stderr = _orig_stderr
-            # --- KẾT THÚC KHỐI SỬA LỖI ---
-
-            (get_speech_timestamps, _, read_audio, *_) = utils
-            
-            SAMPLING_RATE = 16000
-            wav_tensor = read_audio(audio_path, sampling_rate=SAMPLING_RATE)
-
-            speech_timestamps = get_speech_timestamps(wav_tensor, model, 
-                                                      sampling_rate=SAMPLING_RATE, 
-                                                      min_speech_duration_ms=250)
-
-            if speech_timestamps:
-                first_speech_start_sample = speech_timestamps[0]['start']
-                first_speech_start_seconds = first_speech_start_sample / SAMPLING_RATE
+            if audio is None:
+                audio = self.vad_service.read_audio(audio_path)
+
+            first_speech_start_seconds = self.vad_service.find_first_speech(audio)
+
+            if first_speech_start_seconds is not None:
                 logging.info(f"{worker_log_prefix} Tìm thấy giọng nói đầu tiên lúc: {first_speech_start_seconds:.3f} giây")
                 return first_speech_start_seconds
             else:
@@ -12323,6 +12303,8 @@ class SubtitleApp(ctk.CTk):
 
         cfg_snapshot = cfg_snapshot_from_caller
         out_dir = cfg_snapshot.get("output_path") or os.path.dirname(input_file)
+        # Thư mục tạm của tác vụ chứa audio đã giải mã dùng chung (.npy)
+        task_audio_dir = os.path.join(self.temp_folder, f"decoded_audio_{uuid.uuid4().hex[:8]}")
 
         # --- Định nghĩa các hàm helper nội bộ ---
         def _update_status(msg):
@@ -12411,62 +12393,78 @@ class SubtitleApp(ctk.CTk):
                 start_time_offset = 0.0 
                 video_path_for_whisper = input_file 
                 temp_files_for_vad = []
+                decoded_audio = None
+
+                # Giải mã audio MỘT lần (16 kHz mono float32, mmap .npy) dùng chung cho VAD và Whisper
+                try:
+                    decoded_audio = decode_audio_once(input_file, task_audio_dir, stop_event=lambda: self.stop_event.is_set())
+                except InterruptedError:
+                    raise
+                except Exception as e_decode:
+                    _log_thread(logging.WARNING, f"Không giải mã được audio dùng chung: {e_decode}. VAD/Whisper sẽ tự giải mã.")
+                    decoded_audio = None
 
                 _log_thread(logging.INFO, "Bắt đầu bước tiền xử lý VAD...")
                 try:
-                    # 1a. Trích xuất audio ra file WAV tạm thời
-                    ffmpeg_executable_vad = find_ffmpeg()
-                    if not ffmpeg_executable_vad:
-                        raise RuntimeError("Không tìm thấy FFmpeg để trích xuất audio cho VAD.")
+                    if decoded_audio is not None:
+                        detected_start_time = self._find_first_speech_timestamp_vad(input_file, audio=decoded_audio.audio)
+                    else:
+                        # 1a. Trích xuất audio ra file WAV tạm thời
+                        ffmpeg_executable_vad = find_ffmpeg()
+                        if not ffmpeg_executable_vad:
+                            raise RuntimeError("Không tìm thấy FFmpeg để trích xuất audio cho VAD.")
 
-                    temp_audio_for_vad = os.path.join(self.temp_folder, f"vad_audio_{uuid.uuid4().hex[:8]}.wav")
-                    temp_files_for_vad.append(temp_audio_for_vad)
+                        temp_audio_for_vad = os.path.join(self.temp_folder, f"vad_audio_{uuid.uuid4().hex[:8]}.wav")
+                        temp_files_for_vad.append(temp_audio_for_vad)
                     
-                    cmd_extract_audio_params = [
-                        "-y", "-i", os.path.abspath(input_file),
-                        "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
-                        os.path.abspath(temp_audio_for_vad)
-                    ]
-                    ffmpeg_run_command(
-                        cmd_extract_audio_params,
-                        process_name=f"{threading.current_thread().name}_VAD_ExtractAudio",
-                        stop_event=self.stop_event if hasattr(self, 'stop_event') else None,
-                        set_current_process=lambda p: setattr(self, 'current_process', p),
-                        clear_current_process=lambda: setattr(self, 'current_process', None),
-                        timeout_seconds=120,
-                    )
-
-                    # 1b. Chạy VAD trên file audio tạm
-                    detected_start_time = self._find_first_speech_timestamp_vad(temp_audio_for_vad)
-
-                    # 1c. Nếu tìm thấy khoảng lặng đáng kể, tạo video tạm đã cắt
-                    if detected_start_time is not None and detected_start_time > 0.5:
-                        start_time_offset = detected_start_time
-                        _log_thread(logging.INFO, f"VAD phát hiện giọng nói bắt đầu từ {start_time_offset:.3f}s. Sẽ cắt video.")
-                        
-                        cut_video_path = os.path.join(self.temp_folder, f"cut_video_{uuid.uuid4().hex[:8]}.mp4")
-                        temp_files_for_vad.append(cut_video_path)
-                        
-                        cmd_cut_video_params = [
-                            "-y", "-ss", str(start_time_offset),
-                            "-i", os.path.abspath(input_file),
-                            "-c", "copy",
-                            os.path.abspath(cut_video_path)
+                        cmd_extract_audio_params = [
+                            "-y", "-i", os.path.abspath(input_file),
+                            "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
+                            os.path.abspath(temp_audio_for_vad)
                         ]
                         ffmpeg_run_command(
-                            cmd_cut_video_params,
-                            process_name=f"{threading.current_thread().name}_VAD_CutVideo",
+                            cmd_extract_audio_params,
+                            process_name=f"{threading.current_thread().name}_VAD_ExtractAudio",
                             stop_event=self.stop_event if hasattr(self, 'stop_event') else None,
                             set_current_process=lambda p: setattr(self, 'current_process', p),
                             clear_current_process=lambda: setattr(self, 'current_process', None),
-                            timeout_seconds=180,
+                            timeout_seconds=120,
                         )
-                        
-                        if os.path.exists(cut_video_path):
-                            video_path_for_whisper = cut_video_path
+
+                        # 1b. Chạy VAD trên file audio tạm
+                        detected_start_time = self._find_first_speech_timestamp_vad(temp_audio_for_vad)
+
+                    # 1c. Nếu tìm thấy khoảng lặng đáng kể: bỏ qua đoạn đầu (cắt mảng audio hoặc tạo video tạm đã cắt)
+                    if detected_start_time is not None and detected_start_time > 0.5:
+                        start_time_offset = detected_start_time
+                        if decoded_audio is not None:
+                            _log_thread(logging.INFO, f"VAD phát hiện giọng nói bắt đầu từ {start_time_offset:.3f}s. Whisper sẽ bắt đầu từ mẫu tương ứng.")
                         else:
-                            _log_thread(logging.WARNING, "Cắt video bằng FFmpeg thất bại. Sẽ dùng video gốc.")
-                            start_time_offset = 0.0
+                            _log_thread(logging.INFO, f"VAD phát hiện giọng nói bắt đầu từ {start_time_offset:.3f}s. Sẽ cắt video.")
+                            
+                            cut_video_path = os.path.join(self.temp_folder, f"cut_video_{uuid.uuid4().hex[:8]}.mp4")
+                            temp_files_for_vad.append(cut_video_path)
+                        
+                            cmd_cut_video_params = [
+                                "-y", "-ss", str(start_time_offset),
+                                "-i", os.path.abspath(input_file),
+                                "-c", "copy",
+                                os.path.abspath(cut_video_path)
+                            ]
+                            ffmpeg_run_command(
+                                cmd_cut_video_params,
+                                process_name=f"{threading.current_thread().name}_VAD_CutVideo",
+                                stop_event=self.stop_event if hasattr(self, 'stop_event') else None,
+                                set_current_process=lambda p: setattr(self, 'current_process', p),
+                                clear_current_process=lambda: setattr(self, 'current_process', None),
+                                timeout_seconds=180,
+                            )
+                        
+                            if os.path.exists(cut_video_path):
+                                video_path_for_whisper = cut_video_path
+                            else:
+                                _log_thread(logging.WARNING, "Cắt video bằng FFmpeg thất bại. Sẽ dùng video gốc.")
+                                start_time_offset = 0.0
                     else:
                         _log_thread(logging.INFO, "VAD không phát hiện khoảng lặng đáng kể ở đầu hoặc có lỗi. Dùng video gốc.")
                 except Exception as e_vad_prep:
@@ -12477,9 +12475,52 @@ class SubtitleApp(ctk.CTk):
                 # === BƯỚC 2: CHẠY WHISPER TRÊN FILE ĐÃ CHUẨN BỊ ===
                 if self.stop_event.is_set(): raise InterruptedError("Đã dừng trước khi bắt đầu Whisper")
 
+                selected_engine = cfg_snapshot.get("translation_engine", "Không dịch")
+                target_lang_code = cfg_snapshot.get('target_lang', 'vi')
+                bilingual_flag = cfg_snapshot.get('bilingual', False)
+
+                # Dịch song song với Whisper: segment mới -> hàng đợi -> worker dịch theo micro-batch
+                streaming_worker = None
+                pretranslated_lines = None
+                streaming_engine_key = translation_get_engine_key(selected_engine)
+                if (streaming_engine_key and cfg_snapshot.get('format', 'srt') in ('srt', 'vtt')
+                        and self.cfg.get("streaming_translation_enabled", True)
+                        and self._can_stream_translation(selected_engine)):
+                    streaming_worker = StreamingTranslationWorker(
+                        self._make_translate_batch_fn(selected_engine, target_lang_code),
+                        streaming_engine_key,
+                        stop_check=lambda: self.stop_event.is_set(),
+                        logger=self.logger
+                    )
+                    streaming_worker.start()
+
+                # Lọc VAD (tùy chọn): chỉ transcribe các vùng có giọng nói, bỏ qua nhạc nền/khoảng lặng dài
+                speech_regions = None
+                if self.cfg.get("vad_gated_transcription", False) and decoded_audio is not None:
+                    try:
+                        speech_regions = self.vad_service.get_speech_regions(decoded_audio.slice_seconds(start_time_offset))
+                        _log_thread(logging.INFO, f"VAD: {len(speech_regions)} vùng có giọng nói sẽ được transcribe.")
+                    except Exception as e_vad_regions:
+                        _log_thread(logging.WARNING, f"Không lấy được vùng giọng nói (VAD): {e_vad_regions}. Transcribe toàn bộ audio.")
+                        speech_regions = None
+
                 _update_status(f"⏳ Bắt đầu Sub (Whisper): {os.path.basename(video_path_for_whisper)}")
                 _log_thread(logging.INFO, f"Chạy Whisper trên file: {os.path.basename(video_path_for_whisper)}")
-                temp_sub_path = self.run_whisper_engine(video_path_for_whisper, cfg_snapshot.get('model', 'medium'), cfg_snapshot.get('format', 'srt'), cfg_snapshot.get('language', 'auto'), self.temp_folder)
+                try:
+                    temp_sub_path = self.run_whisper_engine(
+                        video_path_for_whisper, cfg_snapshot.get('model', 'medium'), cfg_snapshot.get('format', 'srt'),
+                        cfg_snapshot.get('language', 'auto'), self.temp_folder,
+                        on_segments=streaming_worker.submit if streaming_worker else None,
+                        decoded_audio=decoded_audio,
+                        start_offset_s=start_time_offset if decoded_audio is not None else 0.0,
+                        speech_regions=speech_regions
+                    )
+                except BaseException:
+                    if streaming_worker:
+                        streaming_worker.finish(cancel=True)
+                    raise
+                if streaming_worker:
+                    pretranslated_lines = streaming_worker.finish()
                 
                 if not temp_sub_path or not os.path.exists(temp_sub_path):
                     raise FileNotFoundError(f"Whisper không tạo được file phụ đề từ '{os.path.basename(video_path_for_whisper)}'.")
@@ -12497,16 +12538,14 @@ class SubtitleApp(ctk.CTk):
                         _log_thread(logging.ERROR, f"Lỗi khi dịch chuyển timing SRT: {e_shift}", exc_info=True)
 
                 if self.stop_event.is_set(): raise InterruptedError("Đã dừng trước khi bắt đầu bước dịch")
-                selected_engine = cfg_snapshot.get("translation_engine", "Không dịch")
-                target_lang_code = cfg_snapshot.get('target_lang', 'vi')
-                bilingual_flag = cfg_snapshot.get('bilingual', False)
                 if selected_engine != "Không dịch" and temp_sub_path and os.path.exists(temp_sub_path):
                     target_lang_name = LANGUAGE_MAP_VI.get(target_lang_code, target_lang_code)
                     _update_status(f"🌐 Đang dịch sang {target_lang_name}: {os.path.basename(input_file)}")
                     _log_thread(logging.INFO, f"Chuẩn bị dịch file '{os.path.basename(temp_sub_path)}' bằng engine '{selected_engine}'...")
                     translated_temp_path = temp_sub_path + ".translated"
                     try:
-                        self.translate_subtitle_file(temp_sub_path, translated_temp_path, target_lang_code, bilingual_flag)
+                        self.translate_subtitle_file(temp_sub_path, translated_temp_path, target_lang_code, bilingual_flag,
+                                                     pretranslated=pretranslated_lines)
                         if os.path.exists(translated_temp_path):
                             shutil.move(translated_temp_path, temp_sub_path)
                             _log_thread(logging.INFO, f"Dịch bằng {selected_engine} thành công. Đã cập nhật file sub tạm: {temp_sub_path}")
@@ -12768,6 +12807,8 @@ class SubtitleApp(ctk.CTk):
                             except Exception as e_del:
                                 _log_thread(logging.warning, f"Lỗi khi xóa file tạm VAD '{os.path.basename(temp_file)}': {e_del}")
                 # === KẾT THÚC BƯỚC DỌN DẸP ===
+                decoded_audio = None
+                release_decoded_audio(task_audio_dir)
                 
                 _log_thread(logging.DEBUG, f"Vào khối finally của tác vụ cho {os.path.basename(input_file)}")
 
@@ -12971,6 +13012,7 @@ class SubtitleApp(ctk.CTk):
             try:
                 import google.generativeai as genai
                 from google.api_core import exceptions as google_api_exceptions
+                from ui.tabs.ai_editor_tab import AIEditorTab
 
                 editing_prompt = AIEditorTab.DEFAULT_AI_EDITOR_PROMPT
                 genai.configure(api_key=self.gemini_key_var.get())
@@ -13278,9 +13320,11 @@ class SubtitleApp(ctk.CTk):
 
 # HÀM MỚI 2: Ghép nhiều file SRT lại thành một, điều chỉnh timing chính xác
 
-    def _merge_srt_files(self, list_of_srt_paths, list_of_media_part_paths, final_merged_srt_path):
+    def _merge_srt_files(self, list_of_srt_paths, list_of_media_part_paths, final_merged_srt_path, offsets_seconds=None):
         """
         Ghép nhiều file SRT lại thành một, điều chỉnh timing chính xác.
+        offsets_seconds: thời điểm bắt đầu chính xác của từng phần (nếu đã biết, ví dụ từ header WAV);
+        nếu None thì đo thời lượng từng file media bằng ffprobe.
         """
         log_prefix = f"[{threading.current_thread().name}_MergeSRTs]"
         if not list_of_srt_paths:
@@ -13288,6 +13332,20 @@ class SubtitleApp(ctk.CTk):
             return False
             
         try:
+            if offsets_seconds is not None:
+                final_subs = pysubs2.SSAFile()
+                for srt_path, offset in zip(list_of_srt_paths, offsets_seconds):
+                    # Phần không có lời thoại cho ra file SRT rỗng
+                    if not srt_path or not os.path.exists(srt_path) or os.path.getsize(srt_path) == 0:
+                        continue
+                    subs_to_append = pysubs2.load(srt_path, encoding="utf-8", format_="srt")
+                    subs_to_append.shift(s=offset)
+                    final_subs.extend(subs_to_append)
+                final_subs.sort()
+                final_subs.save(final_merged_srt_path, encoding="utf-8", format_="srt")
+                logging.info(f"{log_prefix} Đã ghép {len(list_of_srt_paths)} file SRT (offset chính xác) -> {os.path.basename(final_merged_srt_path)}")
+                return True
+
             # Tải file SRT đầu tiên làm file cơ sở
             final_subs = pysubs2.load(list_of_srt_paths[0])
             
@@ -13323,10 +13381,16 @@ class SubtitleApp(ctk.CTk):
 # --------------------
 
     # Hàm logic: Chạy model Whisper để tạo phụ đề từ file media    
-    def run_whisper_engine(self, input_file, model_name, fmt, lang, output_dir):
+    def run_whisper_engine(self, input_file, model_name, fmt, lang, output_dir, on_segments=None,
+                           decoded_audio=None, start_offset_s=0.0, speech_regions=None):
         """
         [REFACTORED] Chạy Whisper transcription bằng model đã được load.
         Sử dụng ModelService để xử lý business logic, chỉ xử lý UI/logging ở đây.
+        Nếu có on_segments: transcribe theo từng cửa sổ và chuyển segment mới cho callback
+        (dùng để dịch song song trong lúc Whisper còn chạy).
+        Nếu có decoded_audio (DecodedAudio): Whisper dùng thẳng mảng đã giải mã, bắt đầu từ
+        start_offset_s (timing trong file phụ đề tính từ start_offset_s, như khi cắt video).
+        Nếu có speech_regions (VAD, tính từ start_offset_s): chỉ transcribe các vùng có giọng nói.
         """
         # Kiểm tra các điều kiện cần thiết
         if not self.model_service.is_model_loaded():
@@ -13338,42 +13402,174 @@ class SubtitleApp(ctk.CTk):
         self.whisper_model = self.model_service.current_model
         self.loaded_model_name = self.model_service.model_name
         self.loaded_model_device = self.model_service.device
-            
-        # Ghi log chi tiết về tác vụ sắp thực hiện
-        use_fp16 = (self.loaded_model_device == 'cuda')
-        logging.info(
-            f"[{threading.current_thread().name}] "
-            f"Đang chạy Whisper transcribe (Model: '{self.loaded_model_name}' "
-            f"trên Device: {self.loaded_model_device}, "
-            f"fp16: {use_fp16}, lang: {lang}) "
-            f"trên file: {os.path.basename(input_file)}"
-        )
-        
-        # Định dạng và lưu file output
-        base_name = os.path.splitext(os.path.basename(input_file))[0]
-        sub_name = f"{base_name}.{fmt}"
-        sub_path = os.path.join(output_dir, sub_name)
         
+        # Ghim model trong suốt tác vụ: tải model khác (vd. tải trước) không được loại model đang dùng
+        pinned_model = (self.loaded_model_name, self.loaded_model_device)
+        self.model_service.pin_model(*pinned_model)
         try:
-            # Gọi ModelService để transcribe và save
-            saved_path = self.model_service.transcribe_and_save(
-                audio_path=input_file,
-                output_path=sub_path,
-                output_format=fmt,
-                language=lang if lang != "auto" else None,
-                fp16=use_fp16,
-                patience=2.0,
-                beam_size=5,
-                no_speech_threshold=0.45,
-                logprob_threshold=-0.8
+            # Máy chỉ có CPU + file dài: chia theo điểm lặng và transcribe song song nhiều tiến trình
+            # (Lọc VAD đã bỏ phần lớn audio không có lời nên không chia song song)
+            # (Chỉ với openai-whisper: faster-whisper đã tự dùng nhiều luồng CPU)
+            if (fmt == 'srt' and self.loaded_model_device == 'cpu' and speech_regions is None
+                    and self.model_service.backend.name == BACKEND_OPENAI_WHISPER
+                    and self.cfg.get("parallel_cpu_transcription", True)):
+                parallel_sub_path = self._run_whisper_parallel_cpu(
+                    input_file, lang, output_dir, on_segments,
+                    decoded_audio=decoded_audio, start_offset_s=start_offset_s
+                )
+                if parallel_sub_path:
+                    return parallel_sub_path
+            
+            # Ghi log chi tiết về tác vụ sắp thực hiện
+            use_fp16 = (self.loaded_model_device == 'cuda')
+            logging.info(
+                f"[{threading.current_thread().name}] "
+                f"Đang chạy Whisper transcribe (Model: '{self.loaded_model_name}' "
+                f"trên Device: {self.loaded_model_device}, "
+                f"fp16: {use_fp16}, lang: {lang}) "
+                f"trên file: {os.path.basename(input_file)}"
             )
+        
+            # Định dạng và lưu file output
+            base_name = os.path.splitext(os.path.basename(input_file))[0]
+            sub_name = f"{base_name}.{fmt}"
+            sub_path = os.path.join(output_dir, sub_name)
+        
+            # Ghi phụ đề dần ra đĩa (fsync định kỳ) và lưu checkpoint để tiếp tục nếu bị gián đoạn
+            incremental = self.cfg.get("incremental_transcription", True)
+            def _status_segment_callback(segments):
+                if segments:
+                    progress_msg = (f"⏳ Whisper: đã nhận dạng tới {format_timestamp(segments[-1]['end'], separator=',')[:8]} "
+                                    f"- {os.path.basename(input_file)}")
+                    self.after(0, lambda m=progress_msg: self.update_status(m))
+                if on_segments:
+                    on_segments(segments)
             
-            logging.info(f"[{threading.current_thread().name}] Đã ghi file phụ đề: {saved_path}")
-            return saved_path
+            # Ghi dần: báo tiến độ lên thanh trạng thái rồi chuyển tiếp cho on_segments
+            segment_callback = _status_segment_callback if incremental else on_segments
+        
+            try:
+                # Gọi ModelService để transcribe và save
+                saved_path = self.model_service.transcribe_and_save(
+                    audio_path=input_file,
+                    output_path=sub_path,
+                    output_format=fmt,
+                    language=lang if lang != "auto" else None,
+                    fp16=use_fp16,
+                    patience=2.0,
+                    beam_size=5,
+                    no_speech_threshold=0.45,
+                    logprob_threshold=-0.8,
+                    on_segments=segment_callback,
+                    stop_event=(lambda: self.stop_event.is_set()) if (on_segments or incremental) else None,
+                    audio=decoded_audio.slice_seconds(start_offset_s) if decoded_audio is not None else None,
+                    speech_regions=speech_regions,
+                    incremental=incremental,
+                    checkpoint_dir=get_transcribe_checkpoint_dir() if incremental else None
+                )
             
-        except Exception as e:
-            logging.error(f"[{threading.current_thread().name}] Lỗi trong quá trình transcribe/ghi file: {e}", exc_info=True)
-            raise
+                logging.info(f"[{threading.current_thread().name}] Đã ghi file phụ đề: {saved_path}")
+                return saved_path
+            
+            except Exception as e:
+                logging.error(f"[{threading.current_thread().name}] Lỗi trong quá trình transcribe/ghi file: {e}", exc_info=True)
+                raise
+        finally:
+            self.model_service.unpin_model(*pinned_model)
+
+
+    # Hàm logic: Transcribe song song trên CPU (chia theo điểm lặng, mỗi tiến trình giữ một model)
+    def _run_whisper_parallel_cpu(self, input_file, lang, output_dir, on_segments=None,
+                                  decoded_audio=None, start_offset_s=0.0):
+        """
+        Transcribe file dài trên CPU bằng nhiều tiến trình.
+        Audio được chia tại các điểm lặng, mỗi phần được transcribe trong một tiến trình riêng,
+        rồi ghép bằng _merge_srt_files với offset chính xác.
+        Có decoded_audio: mỗi tiến trình mmap đúng khoảng mẫu của mình trong file .npy dùng chung
+        (tính từ start_offset_s); không có: chia file bằng ffmpeg_split_media (WAV 16 kHz).
+        Trả về đường dẫn SRT, hoặc None nếu không đáng/không thể chạy song song (dùng cách thường).
+        """
+        log_prefix = f"[{threading.current_thread().name}_ParallelWhisper]"
+        model_name = self.loaded_model_name
+        workers, torch_threads = parallel_compute_worker_count(model_name)
+        if workers < 2:
+            logging.debug(f"{log_prefix} Không đủ CPU/RAM cho nhiều worker. Dùng transcribe thường.")
+            return None
+        if decoded_audio is not None:
+            duration_s = decoded_audio.duration_s - start_offset_s
+        else:
+            duration_s = get_video_duration_s(input_file)
+        if duration_s < PARALLEL_TRANSCRIBE_MIN_SECONDS:
+            return None
+
+        options = dict(patience=2.0, beam_size=5, no_speech_threshold=0.45, logprob_threshold=-0.8)
+        cache_language = lang if lang and lang != "auto" else None
+        cache_audio = decoded_audio.slice_seconds(start_offset_s) if decoded_audio is not None else None
+        if self.model_service.get_cached_transcription(input_file, cache_language, audio=cache_audio, **options) is not None:
+            # Kết quả đã có trong cache: transcribe_and_save trả về ngay, không cần chia file
+            return None
+
+        temp_split_folder = os.path.join(self.temp_folder, f"parallel_whisper_{uuid.uuid4().hex[:8]}")
+        try:
+            if decoded_audio is not None:
+                audio = decoded_audio.slice_seconds(start_offset_s)
+                base_sample = len(decoded_audio.audio) - len(audio)
+            else:
+                audio = whisper.load_audio(input_file)
+                base_sample = 0
+            split_points = parallel_plan_split_points(len(audio) / 16000, audio, workers)
+            total_samples = len(audio)
+            del audio
+            if not split_points:
+                return None
+
+            os.makedirs(temp_split_folder, exist_ok=True)
+            if decoded_audio is not None:
+                # Không cần chia file: mỗi phần là một khoảng mẫu của buffer đã giải mã
+                bounds = [0] + [int(round(point * 16000)) for point in split_points] + [total_samples]
+                media_parts = [
+                    (decoded_audio.npy_path, base_sample + bounds[i], base_sample + bounds[i + 1])
+                    for i in range(len(bounds) - 1)
+                ]
+                offsets = [bounds[i] / 16000 for i in range(len(bounds) - 1)]
+            else:
+                media_parts = ffmpeg_split_media(input_file, temp_split_folder, split_points=split_points, audio_only=True)
+                if not media_parts:
+                    logging.warning(f"{log_prefix} Không chia được file. Dùng transcribe thường.")
+                    return None
+                offsets = parallel_chunk_offsets_s(media_parts)
+
+            all_segments = []
+
+            def _forward_segments(chunk_index, segments):
+                offset = offsets[chunk_index]
+                shifted = [{**seg, 'start': seg['start'] + offset, 'end': seg['end'] + offset} for seg in segments]
+                all_segments.extend(shifted)
+                if on_segments and shifted:
+                    on_segments(shifted)
+
+            worker_options = dict(options)
+            if cache_language:
+                worker_options['language'] = cache_language
+            srt_parts = transcribe_chunks_parallel(
+                media_parts, temp_split_folder, model_name, workers, torch_threads, worker_options,
+                stop_event=lambda: self.stop_event.is_set(),
+                on_chunk_done=_forward_segments,
+                logger=self.logger
+            )
+
+            base_name = os.path.splitext(os.path.basename(input_file))[0]
+            sub_path = os.path.join(output_dir, f"{base_name}.srt")
+            if not self._merge_srt_files(srt_parts, media_parts, sub_path, offsets_seconds=offsets):
+                raise RuntimeError("Không thể ghép các file phụ đề con (transcribe song song).")
+            logging.info(f"{log_prefix} Đã ghi file phụ đề: {sub_path}")
+            self.model_service.store_transcription(
+                input_file, {'segments': all_segments, 'language': cache_language},
+                cache_language, audio=cache_audio, **options
+            )
+            return sub_path
+        finally:
+            shutil.rmtree(temp_split_folder, ignore_errors=True)
 
 
 #--------------------------
@@ -13956,38 +14152,44 @@ class SubtitleApp(ctk.CTk):
             return None # Trả về None để hàm gọi biết là lỗi
 
         try:
-            # Load credentials từ file JSON đã cấu hình
-            credentials = service_account.Credentials.from_service_account_file(key_path)
-            # Khởi tạo Google Translate client
-            translate_client = google_translate.Client(credentials=credentials)
+            # Lấy client dùng chung từ pool (không parse lại file key / tạo TLS session mới mỗi lần gọi)
+            translate_client = get_google_translate_client(key_path)
+
+            def _call_google_api(texts_to_send):
+                # Ghi log về yêu cầu dịch
+                logging.info(f"Đang gửi {len(texts_to_send)} dòng tới Google Cloud API để dịch sang '{target_lang_code}'...")
+                if source_lang_code:
+                    logging.info(f"  (Ngôn ngữ nguồn được chỉ định: '{source_lang_code}')")
+                else:
+                    logging.info("  (Ngôn ngữ nguồn: Tự động phát hiện)")
 
-            # Ghi log về yêu cầu dịch
-            logging.info(f"Đang gửi {len(text_list)} dòng tới Google Cloud API để dịch sang '{target_lang_code}'...")
-            if source_lang_code:
-                logging.info(f"  (Ngôn ngữ nguồn được chỉ định: '{source_lang_code}')")
-            else:
-                logging.info("  (Ngôn ngữ nguồn: Tự động phát hiện)")
+                results = translate_client.translate(
+                    values=texts_to_send, # Tham số values thay vì text_list ở một số phiên bản
+                    target_language=target_lang_code,
+                    source_language=source_lang_code if source_lang_code and source_lang_code != 'auto' else None
+                )
 
-            results = translate_client.translate(
-                values=text_list, # Tham số values thay vì text_list ở một số phiên bản
-                target_language=target_lang_code,
-                source_language=source_lang_code if source_lang_code and source_lang_code != 'auto' else None
+                # Trích xuất kết quả
+                translated_texts = [result['translatedText'] for result in results]
+                logging.info(f"Google Cloud API đã dịch thành công {len(translated_texts)} dòng.")
+                # Chỉ tính phí các ký tự thực sự gửi đi (không tính dòng lấy từ cache)
+                total_chars_translated = sum(len(text) for text in texts_to_send)
+                self._track_api_call(service_name="google_translate_chars", units=total_chars_translated)
+
+                # Kiểm tra xem số lượng kết quả có khớp không (phòng trường hợp lạ)
+                if len(translated_texts) != len(texts_to_send):
+                     logging.warning(f"Số lượng dòng trả về ({len(translated_texts)}) từ Google Cloud không khớp với số lượng gửi đi ({len(texts_to_send)})!")
+                     return None
+                return translated_texts
+
+            # Tra cache dịch (translation memory) trước, chỉ gửi các dòng chưa có lên API
+            return translate_with_memory(
+                self.translation_memory, text_list, _call_google_api,
+                engine="google_cloud", model="v2",
+                target_lang=target_lang_code,
+                source_lang=source_lang_code if source_lang_code and source_lang_code != 'auto' else None
             )
 
-            # Trích xuất kết quả
-            translated_texts = [result['translatedText'] for result in results]
-            logging.info(f"Google Cloud API đã dịch thành công {len(translated_texts)} dòng.")
-            # <-- BẮT ĐẦU THÊM MỚI -->
-            total_chars_translated = sum(len(text) for text in text_list)
-            self._track_api_call(service_name="google_translate_chars", units=total_chars_translated)
-
-            # Kiểm tra xem số lượng kết quả có khớp không (phòng trường hợp lạ)
-            if len(translated_texts) != len(text_list):
-                 logging.warning(f"Số lượng dòng trả về ({len(translated_texts)}) từ Google Cloud không khớp với số lượng gửi đi ({len(text_list)})!")
-                 return None
-
-            return translated_texts # Trả về danh sách các dòng đã dịch
-
         except Exception as e:
             # Xử lý các lỗi có thể xảy ra khi gọi API
             logging.error(f"Lỗi khi gọi Google Cloud Translate API: {e}", exc_info=True)
@@ -14002,7 +14204,7 @@ class SubtitleApp(ctk.CTk):
             elif is_batch_subbing: # Nếu đang xử lý batch sub
                 if not self.translate_batch_first_api_error_msg_shown:
                     self.translate_batch_first_api_error_msg_shown = True
-                    self.translate_batch_accumulated_api_error_details = error_text
+                    self.translate_batch_accumulated_api_error_details = str(e)
                     should_show_translate_popup_now = True
                 else:
                     logging.warning(f"Lỗi API Google Translate tiếp theo, popup đã bị chặn cho batch này: {e}")
@@ -14068,7 +14270,14 @@ class SubtitleApp(ctk.CTk):
                 source_lang=source_lang,
                 translation_style=selected_style,
                 model_name="gpt-3.5-turbo",
-                stop_event=lambda: self.stop_event.is_set()
+                stop_event=lambda: self.stop_event.is_set(),
+                # Gửi song song, giới hạn theo RPM/TPM của tài khoản (cấu hình trong config.json)
+                max_workers=safe_int(self.cfg.get("openai_translate_max_workers"), OPENAI_TRANSLATE_DEFAULT_MAX_WORKERS),
+                requests_per_minute=safe_int(self.cfg.get("openai_translate_rpm"), OPENAI_TRANSLATE_DEFAULT_RPM),
+                tokens_per_minute=safe_int(self.cfg.get("openai_translate_tpm"), OPENAI_TRANSLATE_DEFAULT_TPM),
+                # Gom nhiều dòng vào một prompt (1 = tắt, mỗi dòng một yêu cầu)
+                batch_size=safe_int(self.cfg.get("openai_translate_batch_size"), OPENAI_TRANSLATE_DEFAULT_BATCH_SIZE),
+                batch_max_chars=safe_int(self.cfg.get("openai_translate_batch_max_chars"), OPENAI_TRANSLATE_DEFAULT_BATCH_MAX_CHARS)
             )
             
             if error_message:
@@ -14099,10 +14308,12 @@ class SubtitleApp(ctk.CTk):
 
 
 # Hàm logic: Dịch một file phụ đề (SRT/VTT)
-    def translate_subtitle_file(self, input_srt, output_srt, target_lang="vi", bilingual=False):
+    def translate_subtitle_file(self, input_srt, output_srt, target_lang="vi", bilingual=False, pretranslated=None):
         """
         Dịch file phụ đề sử dụng engine được chọn, bao gồm kiểm tra điều kiện.
         Hàm này sẽ raise ValueError nếu engine được chọn không sẵn sàng.
+        pretranslated: dict {dòng gốc: bản dịch} đã dịch trước (bởi StreamingTranslationWorker),
+        chỉ các dòng còn thiếu mới được gửi tới engine.
         """
         selected_engine = self.translation_engine_var.get()
         base_input_name = os.path.basename(input_srt) # Lấy tên file để log
@@ -14153,50 +14364,27 @@ class SubtitleApp(ctk.CTk):
         logging.info(f"Bắt đầu đọc và xử lý file '{base_input_name}'...")
         try:
             with open(input_srt, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-            logging.debug(f"Đã đọc {len(lines)} dòng từ file input.")
+                content = f.read()
+            logging.debug(f"Đã đọc {len(content)} ký tự từ file input.")
         except Exception as e:
             logging.error(f"Lỗi đọc file phụ đề để dịch '{input_srt}': {e}", exc_info=True)
             # Ném lại lỗi để luồng cha xử lý
             raise IOError(f"Lỗi đọc file phụ đề để dịch: {e}")
 
-        output_lines = []
-        block = []
-        processed_blocks = 0
-        # Lặp qua các dòng để xử lý từng khối
-        for line in lines:
-            # Kiểm tra dừng giữa các khối
-            if self.stop_event.is_set():
-                logging.warning("Yêu cầu dừng trong quá trình xử lý khối phụ đề.")
-                raise InterruptedError("Dừng bởi người dùng khi đang dịch file.")
-
-            if line.strip() == "": # Kết thúc một khối
-                if block:
-                    # Gọi _translate_block đã sửa (không cần truyền translator nữa)
-                    translated_block_lines = self._translate_block(block, target_lang, bilingual)
-                    output_lines.extend(translated_block_lines)
-                    processed_blocks += 1
-                    logging.debug(f"Đã xử lý xong khối {processed_blocks}")
-                # output_lines.append("\n") # Không cần thêm dòng trống ở đây vì _translate_block đã xử lý
-                block = [] # Bắt đầu khối mới
-            else:
-                block.append(line.strip() + "\n") # Thêm lại ký tự xuống dòng chuẩn
-
-        # Xử lý khối cuối cùng nếu file không kết thúc bằng dòng trống
-        if block:
-            logging.debug("Đang xử lý khối cuối cùng...")
-            translated_block_lines = self._translate_block(block, target_lang, bilingual)
-            output_lines.extend(translated_block_lines)
-            processed_blocks += 1
-            logging.debug(f"Đã xử lý xong khối cuối cùng (Tổng cộng: {processed_blocks}).")
+        # Dịch cả file theo batch (thay vì gọi API cho từng khối)
+        engine_key = translation_get_engine_key(selected_engine)
+        final_output_content = translation_translate_subtitle_content(
+            content,
+            translate_batch_fn=self._make_translate_batch_fn(selected_engine, target_lang),
+            engine_key=engine_key,
+            bilingual=bilingual,
+            stop_check=lambda: self.stop_event.is_set(),
+            progress_callback=lambda done, total: logging.debug(f"Đã dịch xong batch {done}/{total}"),
+            pretranslated=pretranslated
+        )
 
         # --- Ghi kết quả ra file output ---
         try:
-            # Đảm bảo file output kết thúc bằng một dòng trống (theo chuẩn SRT/VTT)
-            final_output_content = "".join(output_lines)
-            # Xóa các dòng trống thừa ở cuối và đảm bảo có 1 dòng trống cuối
-            final_output_content = final_output_content.rstrip() + "\n\n"
-
             with open(output_srt, "w", encoding="utf-8") as f:
                 f.write(final_output_content)
             logging.info(f"Đã lưu phụ đề đã dịch thành công vào: {output_srt}")
@@ -14206,97 +14394,42 @@ class SubtitleApp(ctk.CTk):
             raise IOError(f"Lỗi ghi file phụ đề đã dịch: {e}")
 
 
-# Hàm hỗ trợ nội bộ: Dịch các dòng text trong một khối phụ đề
-    def _translate_block(self, block_lines, target_lang, bilingual):
+# Hàm hỗ trợ nội bộ: Kiểm tra engine dịch có dịch song song với Whisper được không
+    def _can_stream_translation(self, selected_engine):
         """
-        Hàm hỗ trợ dịch các dòng text trong một khối phụ đề,
-        sử dụng engine dịch được chọn trong self.translation_engine_var.
+        Kiểm tra nhanh (không hiện popup) engine dịch có sẵn sàng để dịch song song với Whisper không.
+        Nếu không, bước dịch sau Whisper sẽ tự báo lỗi như bình thường.
         """
-        out = []
-        # Đảm bảo khối có đủ dòng tối thiểu (index, timecode, text)
-        if len(block_lines) < 3:
-            logging.warning("Khối phụ đề không hợp lệ, bỏ qua dịch.")
-            return block_lines # Trả về khối gốc nếu không hợp lệ
-
-        # Giữ lại dòng index và timecode
-        out.append(block_lines[0])
-        out.append(block_lines[1])
-
-        # Trích xuất các dòng văn bản cần dịch
-        text_lines = [line.strip() for line in block_lines[2:] if line.strip()]
-
-        # Nếu không có dòng text nào thì trả về luôn
-        if not text_lines:
-            # Thêm dòng trống cuối nếu khối gốc có (để giữ định dạng)
-            if len(block_lines) > 2 and not block_lines[-1].strip():
-                 out.append("\n")
-            return out
-
-        translated_lines_texts = None # Khởi tạo là None
-        selected_engine = self.translation_engine_var.get() # Lấy engine người dùng chọn
+        if "Google Cloud API" in selected_engine:
+            key_path = self.google_key_path_var.get()
+            return HAS_GOOGLE_CLOUD_TRANSLATE and bool(key_path) and os.path.exists(key_path)
+        if "ChatGPT API" in selected_engine:
+            return HAS_OPENAI and bool(self.openai_key_var.get())
+        return False
 
-        logging.debug(f"Đang xử lý khối sub bằng engine: {selected_engine}")
+# Hàm hỗ trợ nội bộ: Tạo hàm dịch một batch dòng văn bản theo engine được chọn
+    def _make_translate_batch_fn(self, selected_engine, target_lang):
+        """
+        Trả về hàm nhận một list dòng văn bản và trả về list đã dịch (hoặc None nếu lỗi),
+        dùng cho TranslationService khi dịch cả file theo batch.
+        """
+        source_lang_whisper = self.source_lang_var.get()
 
         if "Google Cloud API" in selected_engine:
-            # Gọi hàm đã viết ở Bước 6
-            # Xác định source_lang nếu có thể (ví dụ từ lựa chọn Whisper)
-            source_lang_whisper = self.source_lang_var.get()
             source_param = source_lang_whisper if source_lang_whisper != 'auto' else None
-            translated_lines_texts = self.translate_google_cloud(text_lines,
-                                                                 target_lang_code=target_lang,
-                                                                 source_lang_code=source_param)
-            # Hàm này trả về None nếu lỗi nghiêm trọng
+            return lambda batch: self.translate_google_cloud(batch,
+                                                             target_lang_code=target_lang,
+                                                             source_lang_code=source_param)
 
-        elif "ChatGPT API" in selected_engine:
-            # Gọi hàm đã viết ở Bước 7
-            # Xác định source_lang nếu có thể
-            source_lang_whisper = self.source_lang_var.get()
+        if "ChatGPT API" in selected_engine:
             source_param_name = LANGUAGE_MAP_VI.get(source_lang_whisper, source_lang_whisper) # Lấy tên đầy đủ cho prompt
             target_lang_name = LANGUAGE_MAP_VI.get(target_lang, target_lang) # Lấy tên đầy đủ
-            translated_lines_texts = self.translate_openai(text_lines,
-                                                           target_lang=target_lang_name,
-                                                           source_lang=source_param_name if source_lang_whisper != 'auto' else None)
-            # Hàm này trả về list (có thể chứa dòng gốc nếu lỗi dòng đó) hoặc None nếu lỗi nghiêm trọng
-
-        # --- Xử lý kết quả và ghép khối ---
-        final_translated_lines = []
-        use_original_text = False
-
-        if translated_lines_texts is None:
-            # Lỗi nghiêm trọng xảy ra trong quá trình gọi API (ví dụ: thiếu key)
-            if selected_engine != "Không dịch":
-                 logging.error(f"Dịch bằng {selected_engine} thất bại hoàn toàn cho khối. Sử dụng văn bản gốc.")
-            use_original_text = True
-        elif len(translated_lines_texts) != len(text_lines):
-            # Số lượng dòng trả về không khớp (lỗi không mong muốn)
-            logging.error(f"Số dòng dịch trả về ({len(translated_lines_texts)}) không khớp số dòng gốc ({len(text_lines)}) cho engine {selected_engine}. Sử dụng văn bản gốc.")
-            use_original_text = True
-        else:
-            # Dịch thành công (hoặc có lỗi từng dòng đã được xử lý bên trong hàm API)
-            final_translated_lines = translated_lines_texts
-
-        # Ghép các dòng text vào khối output
-        for i, original_line in enumerate(text_lines):
-            translated_line = original_line if use_original_text else final_translated_lines[i]
-
-            if bilingual:
-                # Đảm bảo không có dòng trống thừa khi ghép song ngữ
-                out_line = f"{original_line.strip()}\n{translated_line.strip()}\n"
-                out.append(out_line)
-            else:
-                out_line = f"{translated_line.strip()}\n"
-                out.append(out_line)
-
-        # Đảm bảo có dòng trống cuối cùng nếu khối gốc có (quan trọng cho định dạng SRT/VTT)
-        if len(block_lines) > 2 and not block_lines[-1].strip() and (not out or out[-1].strip()):
-             out.append("\n")
-        # Hoặc xóa bớt dòng trống nếu output thừa ra
-        elif out and not out[-1].strip() and (len(block_lines) <=2 or block_lines[-1].strip()):
-             while out and not out[-1].strip(): out.pop()
-             if out: out[-1] = out[-1].strip() + "\n\n" # Đảm bảo có 2 dòng trống cuối nếu nó là khối cuối
-
-        return out
+            return lambda batch: self.translate_openai(batch,
+                                                       target_lang=target_lang_name,
+                                                       source_lang=source_param_name if source_lang_whisper != 'auto' else None)
 
+        logging.error(f"Engine dịch không hỗ trợ dịch theo batch: '{selected_engine}'.")
+        return lambda batch: None
 
 
 # Hàm logic: Gắn cứng (hardsub) phụ đề vào video bằng FFmpeg
@@ -14317,27 +14450,11 @@ class SubtitleApp(ctk.CTk):
             # --- Lấy thông tin kích thước video cho PlayRes và tính toán font ---
             video_width_for_ass = 1920  # Mặc định
             video_height_for_ass = 1080 # Mặc định
-            ffprobe_exec_ass = find_ffprobe() # Hàm find_ffprobe() của bạn
-            if ffprobe_exec_ass:
-                try:
-                    cmd_probe_res_ass = [ffprobe_exec_ass, "-v", "error", "-select_streams", "v:0",
-                                         "-show_entries", "stream=width,height", "-of", "csv=s=x:p=0",
-                                         os.path.abspath(input_video)]
-                    startupinfo_probe = None; creationflags_probe = 0
-                    if sys.platform == "win32":
-                        startupinfo_probe = subprocess.STARTUPINFO(); startupinfo_probe.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                        startupinfo_probe.wShowWindow = subprocess.SW_HIDE; creationflags_probe = subprocess.CREATE_NO_WINDOW
-                    probe_res_ass = subprocess.run(cmd_probe_res_ass, capture_output=True, text=True, timeout=10,
-                                                   startupinfo=startupinfo_probe, creationflags=creationflags_probe, check=False)
-                    if probe_res_ass.returncode == 0 and probe_res_ass.stdout.strip():
-                        w_h_ass = probe_res_ass.stdout.strip().split('x')
-                        if len(w_h_ass) == 2 and w_h_ass[0].isdigit() and w_h_ass[1].isdigit():
-                            video_width_for_ass = int(w_h_ass[0]); video_height_for_ass = int(w_h_ass[1])
-                            logging.info(f"[HardsubASSInfo] Lấy được kích thước video cho PlayRes: {video_width_for_ass}x{video_height_for_ass}")
-                        else: logging.warning(f"[HardsubASSInfo] ffprobe trả về định dạng không mong muốn: '{probe_res_ass.stdout.strip()}'.")
-                    else: logging.warning(f"[HardsubASSInfo] ffprobe không lấy được kích thước (Code: {probe_res_ass.returncode}).")
-                except Exception as e_probe_ass: logging.warning(f"[HardsubASSInfo] Lỗi ffprobe: {e_probe_ass}.")
-            else: logging.warning("[HardsubASSInfo] Không tìm thấy ffprobe cho PlayRes.")
+            media_info_ass = get_media_probe().probe(input_video)
+            if media_info_ass is not None and media_info_ass.video_size:
+                video_width_for_ass, video_height_for_ass = media_info_ass.video_size
+                logging.info(f"[HardsubASSInfo] Lấy được kích thước video cho PlayRes: {video_width_for_ass}x{video_height_for_ass}")
+            else: logging.warning("[HardsubASSInfo] Không lấy được kích thước video cho PlayRes. Dùng mặc định 1920x1080.")
 
             # --- Tính toán scaled_font_size ---
             config_font_size = float(config_source.get("sub_style_font_size", 60))
@@ -14569,10 +14686,11 @@ class SubtitleApp(ctk.CTk):
     
 
 # Hàm Tải model Whisper nếu cần, dựa trên tên model VÀ thiết bị đích. ---
-    def load_whisper_model_if_needed(self, force_reload=False, callback=None):
+    def load_whisper_model_if_needed(self, force_reload=False, callback=None, background=False):
         """
         Tải model Whisper nếu cần, dựa trên tên model VÀ thiết bị đích.
         PHIÊN BẢN HOÀN CHỈNH: Tích hợp với chuỗi khởi động tuần tự và có thông báo chi tiết.
+        background=True (tải trước): không khóa nút Sub, tác vụ bấm trong lúc tải sẽ tự chạy khi model sẵn sàng.
         """
         if not HAS_WHISPER:
             logging.error("Không thể tải model Whisper: thư viện whisper chưa được cài đặt.")
@@ -14632,7 +14750,7 @@ class SubtitleApp(ctk.CTk):
             self.after(1000, self.update_time_realtime)
 
             sub_button = getattr(self.subtitle_view_frame, 'sub_button', None) if hasattr(self, 'subtitle_view_frame') else None
-            if sub_button and sub_button.winfo_exists():
+            if sub_button and sub_button.winfo_exists() and not background:
                 try:
                     sub_button.configure(state="disabled", text=f"Đang tải {target_model}...")
                 except Exception as e:
@@ -14665,6 +14783,7 @@ class SubtitleApp(ctk.CTk):
                 self.after(0, lambda tm=target_model, td=target_device:
                            self.update_status(f"⏳ Đang tải/nạp model: {tm} ({td})... (Có thể mất vài phút)"))
                 logging.info(f"[LoadModelThread] Bắt đầu tải/nạp model Whisper: {target_model} lên device {target_device}")
+                self.state_manager.set_model_status(MODEL_STATUS_LOADING, target_model, target_device)
 
                 # Gọi ModelService để load model
                 loaded_model, loaded_model_name, actual_device, error_message = self.model_service.load_model(
@@ -14678,6 +14797,11 @@ class SubtitleApp(ctk.CTk):
                 if loaded_model:
                     target_device = actual_device  # Update với device thực tế đã dùng
                     logging.info(f"[LoadModelThread] Model '{loaded_model_name}' loaded on '{actual_device}' successfully.")
+                    # Warm-up: giải mã 1s im lặng để khởi tạo kernel CUDA/CPU ngay bây giờ, không phải ở tác vụ đầu tiên
+                    if self.cfg.get("whisper_warmup", True) and not self.stop_event.is_set():
+                        self.state_manager.set_model_status(MODEL_STATUS_WARMING, loaded_model_name, actual_device)
+                        self.after(0, lambda tm=loaded_model_name: self.update_status(f"🔥 Đang khởi động model: {tm}..."))
+                        self.model_service.warm_up()
                 
                 # Cập nhật về luồng chính
                 self.after(0, self._update_loaded_model, loaded_model, loaded_model_name, actual_device, callback)
@@ -14725,6 +14849,8 @@ class SubtitleApp(ctk.CTk):
             logging.info(f"Đã tải thành công model Whisper '{model_name}' lên device '{loaded_device}'.")
             self.update_status(f"✅ Model '{model_name}' ({loaded_device}) đã sẵn sàng.")
             self.mark_startup_task_done('model')
+            self.state_manager.set_model(model_object, loaded_device)
+            self.state_manager.set_model_status(MODEL_STATUS_READY, model_name, loaded_device)
         else:
             # Xử lý khi load lỗi
             logging.warning("Model Whisper chưa được tải hoặc có lỗi.")
@@ -14732,6 +14858,8 @@ class SubtitleApp(ctk.CTk):
             self.whisper_model = None
             self.loaded_model_name = None
             self.loaded_model_device = None
+            self.state_manager.unload_model()
+            self.state_manager.set_model_status(MODEL_STATUS_ERROR, error="Model Whisper chưa được tải hoặc có lỗi.")
 
         # --- THAY ĐỔI QUAN TRỌNG NHẤT ---
         # Thay vì gọi _reset_model_loading_ui, gọi hàm quản lý UI chính của tab
@@ -14750,6 +14878,70 @@ class SubtitleApp(ctk.CTk):
             callback()
 
 
+# Hàm khởi động: Tải trước model Whisper (theo model_var và device đã chọn) trong nền sau màn hình chờ
+    def _start_model_preload(self):
+        """
+        Tải trước model Whisper đã cấu hình và warm-up ngay sau khi khởi động xong,
+        để tác vụ Sub đầu tiên bắt đầu transcribe ngay thay vì chờ tải model.
+        Tắt bằng cfg 'preload_whisper_model' = False.
+        """
+        if not self.cfg.get("preload_whisper_model", True):
+            logging.info("[ModelPreload] Tải trước model Whisper đang tắt trong cấu hình.")
+            return
+        if self.is_subbing or self.is_loading_model or self.whisper_model is not None:
+            logging.debug("[ModelPreload] Model đã có/đang tải hoặc đang xử lý phụ đề. Bỏ qua tải trước.")
+            return
+        if self.stop_event.is_set():
+            return
+
+        logging.info(f"[ModelPreload] Bắt đầu tải trước model '{self.model_var.get()}' trong nền...")
+
+        # torch/whisper được import lười: import trong luồng nền trước, để việc chọn device
+        # (torch.cuda) trên luồng chính không làm đứng giao diện
+        def _import_then_load():
+            if self.model_service.backend.name == BACKEND_OPENAI_WHISPER:
+                preload_modules(["torch", "whisper"])
+            else:
+                preload_modules(["faster_whisper"])
+            self.after(0, lambda: self.load_whisper_model_if_needed(background=True))
+
+        threading.Thread(target=_import_then_load, daemon=True, name="WhisperPreloadImports").start()
+
+
+# Hàm tiện ích: Hoãn một hành động cho tới khi model Whisper tải + warm-up xong
+    def _defer_until_model_ready(self, action):
+        """
+        Nếu model đang được tải/warm-up, chạy action (trên luồng chính) ngay khi model sẵn sàng.
+
+        Args:
+            action: Hàm không tham số, ví dụ self.auto_sub_all
+
+        Returns:
+            True nếu đã hoãn action, False nếu model không ở trạng thái đang tải.
+        """
+        if not self.state_manager.is_model_busy():
+            return False
+
+        # Chỉ giữ hành động được yêu cầu sau cùng
+        if self._pending_model_ready_listener:
+            self.state_manager.remove_model_status_listener(self._pending_model_ready_listener)
+
+        def _on_model_status(status):
+            if status not in (MODEL_STATUS_READY, MODEL_STATUS_ERROR):
+                return
+            self.state_manager.remove_model_status_listener(_on_model_status)
+            self._pending_model_ready_listener = None
+            if status == MODEL_STATUS_READY:
+                # Chạy sau khi _update_loaded_model đã khôi phục UI tab Sub (after 50ms)
+                self.after(200, action)
+
+        self._pending_model_ready_listener = _on_model_status
+        self.state_manager.add_model_status_listener(_on_model_status)
+        logging.info(f"[ModelPreload] Model đang được tải, '{getattr(action, '__name__', action)}' sẽ chạy khi model sẵn sàng.")
+        self.update_status("⏳ Model đang được tải trước, tác vụ sẽ tự bắt đầu khi model sẵn sàng...")
+        return True
+
+
 
 # Hàm Sub & Dub Bắt đầu quy trình Tạo Phụ đề và sau đó tự động Thuyết minh.
     def start_sub_and_dub_process(self):
@@ -14775,6 +14967,8 @@ class SubtitleApp(ctk.CTk):
                 self.load_whisper_model_if_needed()
                 return
             if self.is_loading_model:
+                if self._defer_until_model_ready(self.start_sub_and_dub_process):
+                    return
                 messagebox.showwarning("Đang tải Model", "Mô hình Whisper đang được tải. Vui lòng đợi.", parent=self)
                 return
 
@@ -16492,6 +16686,7 @@ class SubtitleApp(ctk.CTk):
         logging.info(">>> ỨNG DỤNG ĐÃ KHỞI ĐỘNG HOÀN TẤT <<<")
 
         self.after(1000, self._maybe_refresh_google_voices_cache) # Tải giọng Google sau 1 giây
+        self.after(1500, self._start_model_preload) # Tải trước + warm-up model Whisper trong nền
         # 8. Bắt đầu các tác vụ chạy nền định kỳ SAU KHI app đã chạy ổn định
         self.after(10000, self._maybe_trigger_auto_update_check)
         self.after(20000, self._maybe_trigger_periodic_license_revalidation)
@@ -16638,6 +16833,7 @@ class SubtitleApp(ctk.CTk):
 
         # --- Tab AI Biên Tập (Sửa lại để thay đổi cả text) ---
         ai_editor_tab = getattr(self, 'ai_editor_view_frame', None)
+        from ui.tabs.ai_editor_tab import AIEditorTab
         if ai_editor_tab and isinstance(ai_editor_tab, AIEditorTab):
             logging.info("Khóa giao diện cho Tab AI Biên Tập...")
             
@@ -16717,6 +16913,7 @@ class SubtitleApp(ctk.CTk):
 
         # --- Tab AI Biên Tập (Bổ sung) ---
         ai_editor_tab = getattr(self, 'ai_editor_view_frame', None)
+        from ui.tabs.ai_editor_tab import AIEditorTab
         if ai_editor_tab and isinstance(ai_editor_tab, AIEditorTab):
             logging.info("Mở khóa giao diện cho Tab AI Biên Tập...")
             ai_editor_tab.start_button.configure(state=activated_state, text="🚀 Bắt đầu Biên tập Hàng loạt")
@@ -17402,6 +17599,7 @@ class SubtitleApp(ctk.CTk):
 
         logging.info("Mở cửa sổ cài đặt API Keys...")
         # Tạo cửa sổ mới, truyền vào cửa sổ chính (self) và các biến StringVar cần thiết
+        from ui.popups.api_settings import APISettingsWindow
         self._api_settings_win = APISettingsWindow(self, self.openai_key_var, self.google_key_path_var, self.gemini_key_var)
         # (Không cần gọi mainloop ở đây)
 
@@ -18578,6 +18776,7 @@ class SubtitleApp(ctk.CTk):
                         pass
 
                 # Model theo preset (nếu có các biến model cho từng engine)
+                from ui.tabs.ai_editor_tab import AIEditorTab
                 if hasattr(aie, 'gpt_model_var'):
                     aie.gpt_model_var.set(
                         new_cfg.get("gpt_model_for_aie", AIEditorTab.AVAILABLE_GPT_MODELS_FOR_SCRIPT_EDITING[0])
@@ -18799,8 +18998,10 @@ class SubtitleApp(ctk.CTk):
              self.download_view_frame.set_download_ui_state(downloading=False) # Reset UI Download
              return
         if self.is_loading_model:
-             messagebox.showwarning("Model đang tải", "Whisper model đang được tải. Quá trình sub sẽ cần được bắt đầu thủ công sau khi model tải xong.", parent=self)
              self.download_view_frame.set_download_ui_state(downloading=False) # Reset UI Download
+             if self._defer_until_model_ready(self.auto_sub_all):
+                 return
+             messagebox.showwarning("Model đang tải", "Whisper model đang được tải. Quá trình sub sẽ cần được bắt đầu thủ công sau khi model tải xong.", parent=self)
              return
 
         logging.info("Gọi auto_sub_all() để bắt đầu xử lý hàng chờ sub.")
@@ -20749,7 +20950,7 @@ class SubtitleApp(ctk.CTk):
             for index, task_data in enumerate(self.dub_processing_queue):
                 task_id_q = task_data.get('id', f"no_id_q_{index}")
                 is_currently_processing = (self.dub_is_processing and
-                                           self.dub_currently_processing_task_id == task_id_q)
+                                           task_id_q in self.dub_started_task_ids)
 
                 # --- LOGIC MÀU CHỮ VÀ NỀN ĐÃ SỬA ---
                 item_bg_color = "transparent"
@@ -22323,6 +22524,13 @@ class SubtitleApp(ctk.CTk):
         self.dub_is_processing = True
         self.dub_stop_event.clear()
         self.dub_batch_had_api_key_errors = False
+        # Scheduler của lô: TTS (mạng) của tác vụ này chạy song song với FFmpeg (CPU) của tác vụ khác
+        self.dub_scheduler = create_dub_scheduler(self.cfg)
+        self.dub_started_task_ids.clear()
+        self._dub_completions_waiting.clear()
+        self._dub_branding_in_progress = False
+        logging.info(f"[DubBatchStart] Scheduler: {self.dub_scheduler.slot_limits[STAGE_CPU]} slot CPU, "
+                     f"{self.dub_scheduler.slot_limits[STAGE_NETWORK]} slot mạng, tối đa {self.dub_scheduler.max_active_tasks} tác vụ song song.")
         self.start_time = time.time()
         self.update_time_realtime()
         
@@ -22366,7 +22574,7 @@ class SubtitleApp(ctk.CTk):
         
         self.update_status(f"Bắt đầu xử lý hàng loạt {len(self.dub_processing_queue)} tác vụ thuyết minh...")
         
-        # Bước 5: Bắt đầu xử lý với tác vụ đầu tiên
+        # Bước 5: Bắt đầu xử lý các tác vụ đầu tiên (theo số slot của scheduler)
         self._dub_process_next_item_in_queue()
 
 
@@ -22626,20 +22834,38 @@ class SubtitleApp(ctk.CTk):
 
 
 # HÀM TRÁI TIM CỦA TIẾN TRÌNH THUYẾT MINH HÀNG LOẠT
-# Hàm thu thập thông tin hàng chờ
+# Hàm lấp các slot trống của scheduler bằng các tác vụ chưa chạy trong hàng chờ
     def _dub_process_next_item_in_queue(self):
         if self.dub_stop_event.is_set():
+            if self.dub_started_task_ids:
+                logging.info("[DubBatch] Phát hiện yêu cầu dừng. Chờ các tác vụ đang chạy kết thúc.")
+                return
             logging.info("[DubBatch] Phát hiện yêu cầu dừng (đầu _dub_process_next_item_in_queue). Kết thúc xử lý hàng loạt.")
             self.dub_on_batch_finished(stopped=True)
             return
 
-        if not self.dub_processing_queue:
-            logging.info("[DubBatch] Hàng chờ thuyết minh trống (trong _dub_process_next_item_in_queue). Kết thúc xử lý hàng loạt.")
-            self.dub_on_batch_finished(stopped=False)
+        pending_tasks = [t for t in self.dub_processing_queue if t.get('id') not in self.dub_started_task_ids]
+        if not pending_tasks:
+            if not self.dub_started_task_ids:
+                logging.info("[DubBatch] Hàng chờ thuyết minh trống (trong _dub_process_next_item_in_queue). Kết thúc xử lý hàng loạt.")
+                self.dub_on_batch_finished(stopped=False)
             return
 
-        current_task = self.dub_processing_queue[0]
+        if self.dub_scheduler is None:
+            self.dub_scheduler = create_dub_scheduler(self.cfg)
+        # Mỗi tác vụ chạy từ context riêng của nó nên có thể bắt đầu tác vụ mới khi tác vụ khác còn chạy
+        for current_task in pending_tasks:
+            if not self.dub_scheduler.can_start():
+                break
+            self._dub_start_queued_task(current_task)
+
+    def _dub_start_queued_task(self, current_task):
+        """
+        Bắt đầu một tác vụ của hàng chờ: khôi phục cấu hình lên UI (để hiển thị), chụp cấu hình
+        thành DubTaskContext và giao worker cho scheduler.
+        """
         self.dub_currently_processing_task_id = current_task.get('id')
+        self.dub_started_task_ids.add(self.dub_currently_processing_task_id)
 
         current_task['status'] = 'Đang xử lý...'
         if hasattr(self, 'update_dub_queue_display'):
@@ -22657,15 +22883,14 @@ class SubtitleApp(ctk.CTk):
         try:
             logging.debug(f"[DubBatchRestore] Bắt đầu khôi phục UI config cho task ID: {self.dub_currently_processing_task_id}")
 
-            # === LẤY THÔNG TIN TỐI ƯU LUỒNG ĐỌC TỪ TASK CONFIG ===
-            self.current_task_optimize_flow_requested = current_task.get('optimize_flow_requested', False)
-            self.current_task_dub_flow_parameters = current_task.get('dub_flow_parameters', {})
+            # === LẤY THÔNG TIN TỐI ƯU LUỒNG ĐỌC TỪ TASK CONFIG (worker đọc lại từ DubTaskContext) ===
+            task_optimize_flow_requested = current_task.get('optimize_flow_requested', False)
             # >>> THÊM DÒNG NÀY ĐỂ ĐỌC CỜ MỚI TỪ SUB STEP <<<
-            self.current_task_was_optimize_tts_source_enabled_in_sub = current_task.get('was_optimize_tts_source_enabled_in_sub_step', False)
+            task_was_optimize_tts_source_enabled_in_sub = current_task.get('was_optimize_tts_source_enabled_in_sub_step', False)
             # Log trạng thái các cờ tối ưu
-            if self.current_task_optimize_flow_requested:
-                logging.info(f"[DubBatchRestore] Tác vụ này YÊU CẦU tối ưu luồng đọc (do UI tab Dubbing). Params: {self.current_task_dub_flow_parameters}")
-            elif self.current_task_was_optimize_tts_source_enabled_in_sub:
+            if task_optimize_flow_requested:
+                logging.info(f"[DubBatchRestore] Tác vụ này YÊU CẦU tối ưu luồng đọc (do UI tab Dubbing). Params: {current_task.get('dub_flow_parameters', {})}")
+            elif task_was_optimize_tts_source_enabled_in_sub:
                 logging.info(f"[DubBatchRestore] Tác vụ này KHÔNG yêu cầu tối ưu luồng đọc bởi UI tab Dubbing, NHƯNG cờ tối ưu nguồn TTS từ SUB step đã được BẬT.")
             else:
                 logging.info(f"[DubBatchRestore] Tác vụ này KHÔNG yêu cầu tối ưu luồng đọc (cả từ UI Dub và Sub step).")
@@ -22766,7 +22991,7 @@ class SubtitleApp(ctk.CTk):
             self.dub_audio_fade_in_duration_s_var.set(str(current_task.get('audio_fade_in_duration_s_config', self.cfg.get("dub_audio_fade_in_duration_s", "0.05"))))
             self.dub_audio_fade_out_duration_s_var.set(str(current_task.get('audio_fade_out_duration_s_config', self.cfg.get("dub_audio_fade_out_duration_s", "0.03"))))
                                     
-            # 6. Khôi phục đường dẫn audio ngoài (nếu có) vào biến tạm thời cho worker
+            # 6. Khôi phục đường dẫn audio ngoài (nếu có) để hiển thị (worker dùng DubTaskContext.external_audio_path)
             self.dub_audio_path_for_queue_temp = current_task.get('audio_path_config', None)
             if self.dub_audio_path_for_queue_temp and os.path.exists(self.dub_audio_path_for_queue_temp):
                 if hasattr(self, 'dub_current_audio_for_queue_display'):
@@ -22774,8 +22999,6 @@ class SubtitleApp(ctk.CTk):
             elif hasattr(self, 'dub_current_audio_for_queue_display'):
                  self.dub_current_audio_for_queue_display.set("(Không có/Lỗi)")
 
-            self.is_current_task_direct_audio_mux = current_task.get('is_direct_audio_mux', False)
-
             # KHÔI PHỤC UI CHO CPS:
             # Lấy từ dub_flow_parameters_from_ui của task, hoặc từ cfg chung nếu không có trong task
             task_dub_flow_params = current_task.get('dub_flow_parameters_from_ui', {})
@@ -22790,76 +23013,36 @@ class SubtitleApp(ctk.CTk):
             logging.error(f"[DubBatch] {error_msg_restore}", exc_info=True)
             current_task['status'] = 'Lỗi Cấu hình Task' 
             current_task['error_message'] = error_msg_restore
-            self.after(100, self._handle_single_dub_task_completion, False, None, error_msg_restore, False)
+            self.after(100, self._handle_single_dub_task_completion, False, None, error_msg_restore, False, current_task.get('id'))
             return 
         finally:
             self._is_restoring_task_config = False # Rất quan trọng: Đặt lại cờ này
             logging.debug(f"[DubBatchRestore] Đã đặt _is_restoring_task_config = False")
 
-        # --- CHUẨN BỊ DỮ LIỆU CHO WORKER ---
-        self.dub_video_path = current_task.get('video_path')
-        self.dub_srt_data = []
-        
-        # Chuẩn bị các tham số đã xử lý (kiểu số) cho luồng worker
-        # bằng cách đọc từ current_task (là từ điển cấu hình của tác vụ)
-        logging.debug(f"[{threading.current_thread().name}] Chuẩn bị tham số số cho worker từ current_task ID: {current_task.get('id')}")
-        self._worker_cfg_sync_tolerance_ms = current_task.get('sync_tolerance_ms_config', 20)
-        self._worker_cfg_sync_max_speed_up = current_task.get('sync_max_speed_up_config', 1.50)
-        try:
-            # Đảm bảo giá trị từ config được chuyển đổi đúng sang float
-            min_speed_down_val_str = str(current_task.get('sync_min_speed_down_val_config', "1.0"))
-            self._worker_cfg_sync_min_speed_down = float(min_speed_down_val_str)
-        except ValueError:
-            logging.warning(f"Giá trị sync_min_speed_down_val_config không hợp lệ: '{current_task.get('sync_min_speed_down_val_config', 'N/A')}'. Dùng mặc định 1.0")
-            self._worker_cfg_sync_min_speed_down = 1.0
-
-        self._worker_cfg_sync_force_cut = current_task.get('sync_force_cut_config', True)
-        self._worker_cfg_sync_min_srt_duration_ms = current_task.get('sync_min_srt_duration_config', 200) # Tên key đúng là 'sync_min_srt_duration_config'
-        self._worker_cfg_sync_pad_short_tts = current_task.get('sync_pad_short_tts_config', True)
-        
-        self._worker_cfg_audio_fade_in_s = current_task.get('audio_fade_in_duration_s_config', 0.05) # Sử dụng default từ câu trả lời trước của bạn
-        self._worker_cfg_audio_fade_out_s = current_task.get('audio_fade_out_duration_s_config', 0.03) # Sử dụng default từ câu trả lời trước của bạn
-        
-        self._worker_cfg_allow_overflow_ms = getattr(self, 'CFG_ALLOW_OVERFLOW_MS', 100) 
-        self._worker_cfg_min_silence_after_overflow_ms = getattr(self, 'CFG_MIN_SILENCE_AFTER_OVERFLOW_MS', 0)
-
-        self._worker_cfg_selected_tts_engine = current_task.get('tts_engine_config', "Google Translate (gTTS)")
-        self._worker_cfg_selected_voice_id = current_task.get('voice_id_config', "")
-        self._worker_cfg_use_google_ssml = current_task.get('google_ssml_config', False)
-        self._worker_cfg_openai_tts_model = current_task.get('openai_tts_model_config', "tts-1")
-
-        # Phần chuẩn bị self.dub_video_path, self.dub_srt_data và khởi chạy worker giữ nguyên
-        self.dub_video_path = current_task.get('video_path')
-        self.dub_srt_data = [] # Reset trước khi gán
-
-        srt_data_content_from_task_config = current_task.get('srt_data_content')
-        error_preparing_script = False
-        error_msg_script = ""
-
-        if not self.is_current_task_direct_audio_mux: # Chỉ cần srt_data nếu không phải direct mux
-            if srt_data_content_from_task_config and isinstance(srt_data_content_from_task_config, list):
-                self.dub_srt_data = list(srt_data_content_from_task_config) # Tạo bản sao
-                logging.info(f"[DubBatch] Sử dụng {len(self.dub_srt_data)} mục kịch bản đã lưu trong task cho TTS.")
-            else:
+        # --- CHUẨN BỊ CONTEXT CHO WORKER ---
+        # Worker chỉ đọc cấu hình từ context của tác vụ (không đọc biến UI dùng chung), nên tác vụ
+        # sau có thể được khôi phục lên UI và bắt đầu trong khi tác vụ này vẫn đang chạy.
+        task_ctx = self._dub_build_task_context(current_task)
+        self.dub_video_path = task_ctx.video_path
+        self.dub_srt_data = list(task_ctx.srt_data)
+
+        if not task_ctx.is_direct_audio_mux: # Chỉ cần srt_data nếu không phải direct mux
+            srt_data_content_from_task_config = current_task.get('srt_data_content')
+            error_msg_script = ""
+            if not (srt_data_content_from_task_config and isinstance(srt_data_content_from_task_config, list)):
                 error_msg_script = "Tác vụ yêu cầu TTS nhưng không có 'srt_data_content' hợp lệ trong task_config."
-                error_preparing_script = True
+                current_task['status'] = 'Lỗi Script Task'
+            elif not task_ctx.srt_data: # Cần TTS mà srt_data vẫn rỗng (ví dụ: lỗi logic ở trên)
+                error_msg_script = "Không có dữ liệu kịch bản hợp lệ để tạo TTS cho tác vụ này."
+                current_task['status'] = 'Lỗi Script (Rỗng)'
+            if error_msg_script:
+                logging.error(f"[DubBatch] {error_msg_script}")
+                current_task['error_message'] = error_msg_script
+                self.after(100, self._handle_single_dub_task_completion, False, None, error_msg_script, False, task_ctx.task_id)
+                return
+            logging.info(f"[DubBatch] Sử dụng {len(task_ctx.srt_data)} mục kịch bản đã lưu trong task cho TTS.")
         else: # Là direct audio mux
             logging.info(f"[DubBatch] Tác vụ Direct Audio Mux, không yêu cầu 'srt_data_content'.")
-            self.dub_srt_data = [] # Đảm bảo rỗng
-        
-        if error_preparing_script:
-            logging.error(f"[DubBatch] {error_msg_script}")
-            current_task['status'] = 'Lỗi Script Task'; current_task['error_message'] = error_msg_script
-            self.after(100, self._handle_single_dub_task_completion, False, None, error_msg_script, False)
-            return
-            
-        # Kiểm tra lại nếu cần TTS mà srt_data vẫn rỗng (ví dụ: lỗi logic ở trên)
-        if not self.is_current_task_direct_audio_mux and not self.dub_srt_data:
-            final_error_msg_empty_script = "Không có dữ liệu kịch bản hợp lệ để tạo TTS cho tác vụ này."
-            logging.error(f"[DubBatch] {final_error_msg_empty_script}")
-            current_task['status'] = 'Lỗi Script (Rỗng)'; current_task['error_message'] = final_error_msg_empty_script
-            self.after(100, self._handle_single_dub_task_completion, False, None, final_error_msg_empty_script, False)
-            return
 
         # Hiển thị script đang xử lý lên textbox (nếu có)
         if hasattr(self, 'dub_script_textbox') and self.dub_script_textbox.winfo_exists():
@@ -22870,7 +23053,7 @@ class SubtitleApp(ctk.CTk):
                     for item_idx, item_data in enumerate(self.dub_srt_data):
                         script_content_for_display_processing += f"{item_data.get('index', item_idx + 1)}\n{item_data.get('start_str', '00:00:00,000')} --> {item_data.get('end_str', '00:00:00,000')}\n{item_data.get('text', '')}\n\n"
                     self.dub_script_textbox.insert("1.0", script_content_for_display_processing.strip() + "\n")
-                elif self.is_current_task_direct_audio_mux and audio_name_log_display != 'Không có':
+                elif task_ctx.is_direct_audio_mux and audio_name_log_display != 'Không có':
                     # Hiển thị thông tin về audio ngoài nếu là direct mux
                     self.dub_script_textbox.insert("1.0", f"[Tác vụ sử dụng audio ngoài: {audio_name_log_display}. Không tạo TTS từ script.]")
                 else: # Trường hợp không có script và cũng không phải direct mux (lỗi)
@@ -22879,37 +23062,92 @@ class SubtitleApp(ctk.CTk):
             except Exception as e_display_script_processing: 
                 logging.error(f"[DubBatch] Lỗi hiển thị kịch bản đang xử lý: {e_display_script_processing}", exc_info=True)
         
-        log_detail_for_worker = f"(DirectMux: {self.is_current_task_direct_audio_mux}, ScriptItems: {len(self.dub_srt_data)}, AudioNgoài: {os.path.basename(self.dub_audio_path_for_queue_temp) if self.dub_audio_path_for_queue_temp else 'Không'})"
-        logging.info(f"[DubBatch] Chuẩn bị chạy worker cho task ID: {self.dub_currently_processing_task_id} {log_detail_for_worker}.")
-        dub_processing_thread = threading.Thread(target=self._execute_dub_task_worker_wrapper, daemon=True, name=f"DubTaskWorker_{self.dub_currently_processing_task_id[:8]}")
-        dub_processing_thread.start()
+        log_detail_for_worker = f"(DirectMux: {task_ctx.is_direct_audio_mux}, ScriptItems: {len(task_ctx.srt_data)}, AudioNgoài: {os.path.basename(task_ctx.external_audio_path) if task_ctx.external_audio_path else 'Không'})"
+        logging.info(f"[DubBatch] Chuẩn bị chạy worker cho task ID: {task_ctx.task_id} {log_detail_for_worker}.")
+        self.dub_scheduler.start(task_ctx, self._execute_dub_task_worker_wrapper, on_finished=self._dub_on_task_worker_finished)
+
+    def _dub_build_task_context(self, current_task):
+        """
+        Chụp cấu hình của một tác vụ trong hàng chờ thành DubTaskContext cho worker.
+
+        Args:
+            current_task: Từ điển cấu hình của tác vụ (một mục của self.dub_processing_queue)
+
+        Returns:
+            DubTaskContext của tác vụ
+        """
+        try:
+            # Đảm bảo giá trị từ config được chuyển đổi đúng sang float
+            sync_min_speed_down = float(str(current_task.get('sync_min_speed_down_val_config', "1.0")))
+        except ValueError:
+            logging.warning(f"Giá trị sync_min_speed_down_val_config không hợp lệ: '{current_task.get('sync_min_speed_down_val_config', 'N/A')}'. Dùng mặc định 1.0")
+            sync_min_speed_down = 1.0
+        custom_bg_volume = current_task.get('custom_bg_music_volume_config', self.cfg.get("dub_custom_bg_volume", 0.25))
+        try:
+            custom_bg_volume = float(custom_bg_volume) if 0.0 <= float(custom_bg_volume) <= 1.0 else 0.25
+        except (TypeError, ValueError):
+            custom_bg_volume = 0.25
+        is_direct_audio_mux = current_task.get('is_direct_audio_mux', False)
+        srt_data_content = current_task.get('srt_data_content')
+
+        return DubTaskContext(
+            task_id=current_task.get('id'),
+            video_path=current_task.get('video_path'),
+            srt_data=list(srt_data_content) if not is_direct_audio_mux and isinstance(srt_data_content, list) else [],
+            external_audio_path=current_task.get('audio_path_config', None),
+            is_direct_audio_mux=is_direct_audio_mux,
+            optimize_flow_requested=current_task.get('optimize_flow_requested', False),
+            dub_flow_parameters=current_task.get('dub_flow_parameters', {}),
+            tts_engine=current_task.get('tts_engine_config', "Google Translate (gTTS)"),
+            voice_id=current_task.get('voice_id_config', ""),
+            use_google_ssml=current_task.get('google_ssml_config', False),
+            openai_tts_model=current_task.get('openai_tts_model_config', "tts-1"),
+            sync_tolerance_ms=current_task.get('sync_tolerance_ms_config', 20),
+            sync_max_speed_up=current_task.get('sync_max_speed_up_config', 1.50),
+            sync_min_speed_down=sync_min_speed_down,
+            sync_force_cut=current_task.get('sync_force_cut_config', True),
+            sync_min_srt_duration_ms=current_task.get('sync_min_srt_duration_config', 200),
+            sync_pad_short_tts=current_task.get('sync_pad_short_tts_config', True),
+            audio_fade_in_s=current_task.get('audio_fade_in_duration_s_config', 0.05),
+            audio_fade_out_s=current_task.get('audio_fade_out_duration_s_config', 0.03),
+            allow_overflow_ms=getattr(self, 'CFG_ALLOW_OVERFLOW_MS', 100),
+            min_silence_after_overflow_ms=getattr(self, 'CFG_MIN_SILENCE_AFTER_OVERFLOW_MS', 0),
+            output_dir=current_task.get('output_path_config', self.cfg.get("dub_output_path", get_default_downloads_folder())),
+            background_audio_option=current_task.get('background_audio_option_config', self.cfg.get("dub_background_audio_option", self.dub_background_audio_options[0])),
+            background_mix_level=current_task.get('background_mix_level_config', self.cfg.get("dub_background_mix_level", 0.30)),
+            use_custom_bg_music=current_task.get('use_custom_bg_music_config', self.cfg.get("dub_use_custom_bg_music", False)),
+            custom_bg_music_path=current_task.get('custom_bg_music_path_config', self.cfg.get("dub_custom_bg_music_path", "")),
+            # Thư mục nhạc nền/phát ngẫu nhiên không lưu theo tác vụ: chụp giá trị UI lúc tác vụ bắt đầu
+            custom_bg_music_folder_path=self.dub_custom_bg_music_folder_path_var.get(),
+            randomize_bg_music=self.dub_randomize_bg_music_var.get(),
+            custom_bg_music_volume=custom_bg_volume,
+        )
+
+    def _dub_on_task_worker_finished(self, task_ctx):
+        """Scheduler gọi (trên luồng worker) khi worker của tác vụ kết thúc và đã trả slot."""
+        result = task_ctx.result or (False, None, "Lỗi không xác định trong quá trình xử lý thuyết minh.", False)
+        self.after(0, self._handle_single_dub_task_completion, *result, task_ctx.task_id)
 
 
 # Bên trong lớp SubtitleApp
-    def _execute_dub_task_worker_wrapper(self):
+    def _execute_dub_task_worker_wrapper(self, task_ctx):
 
-        task_id = self.dub_currently_processing_task_id
-        if not task_id:
-            logging.error("[DubTaskWorker_UnknownID] Không có ID tác vụ hiện tại. Ngừng xử lý.")
-            self.after(0, self._handle_single_dub_task_completion, False, None, "Lỗi nội bộ: Thiếu ID tác vụ", False)
-            return
+        task_id = task_ctx.task_id
 
         worker_log_prefix = f"[DubTaskWorker_{task_id[:6]}]"
         logging.info(f"{worker_log_prefix} Bắt đầu xử lý tác vụ.")
         
         logging.info(f"{worker_log_prefix} === KIỂM TRA ĐẦU VÀO WORKER ===")
-        logging.info(f"{worker_log_prefix}   Video Path (self.dub_video_path): {getattr(self, 'dub_video_path', 'N/A')}")
-        logging.info(f"{worker_log_prefix}   Direct Audio Mux (self.is_current_task_direct_audio_mux): {getattr(self, 'is_current_task_direct_audio_mux', 'N/A')}")
-        # Lấy giá trị từ self.attribute đã được thiết lập
-        logging.info(f"{worker_log_prefix}   Optimize Flow Requested (self.current_task_optimize_flow_requested): {getattr(self, 'current_task_optimize_flow_requested', 'N/A')}")
-        logging.info(f"{worker_log_prefix}   Dub Flow Parameters (self.current_task_dub_flow_parameters): {getattr(self, 'current_task_dub_flow_parameters', 'N/A')}")
-        
-        num_srt_segments = 0
-        # self.dub_srt_data đã được set bởi _dub_process_next_item_in_queue với srt_data_content từ task_config
-        if hasattr(self, 'dub_srt_data') and self.dub_srt_data: 
-            num_srt_segments = len(self.dub_srt_data)
-            if num_srt_segments > 0:
-                logging.debug(f"{worker_log_prefix}     SRT gốc (từ task config) - Seg 1 Text: '{self.dub_srt_data[0].get('text', 'N/A')[:50].replace(chr(10),' ')}...'")
+        # Mọi cấu hình của tác vụ lấy từ task_ctx (do _dub_start_queued_task chụp từ task_config),
+        # không từ self: các tác vụ khác có thể đang chạy song song và UI đã hiển thị tác vụ khác.
+        logging.info(f"{worker_log_prefix}   Video Path: {task_ctx.video_path}")
+        logging.info(f"{worker_log_prefix}   Direct Audio Mux: {task_ctx.is_direct_audio_mux}")
+        logging.info(f"{worker_log_prefix}   Optimize Flow Requested: {task_ctx.optimize_flow_requested}")
+        logging.info(f"{worker_log_prefix}   Dub Flow Parameters: {task_ctx.dub_flow_parameters}")
+        
+        num_srt_segments = len(task_ctx.srt_data)
+        if num_srt_segments > 0:
+            logging.debug(f"{worker_log_prefix}     SRT gốc (từ task config) - Seg 1 Text: '{task_ctx.srt_data[0].get('text', 'N/A')[:50].replace(chr(10),' ')}...'")
         logging.info(f"{worker_log_prefix}   Số lượng segment SRT (từ task config cho worker): {num_srt_segments}")
         logging.info(f"{worker_log_prefix} ================================")
 
@@ -22918,7 +23156,8 @@ class SubtitleApp(ctk.CTk):
         _error_message_worker = None
         _overall_success_worker = False
         
-        video_input_path_task_worker = self.dub_video_path
+        video_input_path_task_worker = task_ctx.video_path
+        external_audio_path_task_worker = task_ctx.external_audio_path
         
         # Các thư mục tạm cho tác vụ này
         dub_temp_base_for_this_task = os.path.join(self.temp_folder, f"PiuDubTask_{task_id}")
@@ -22926,6 +23165,8 @@ class SubtitleApp(ctk.CTk):
         adjusted_segments_output_folder_for_this_task = os.path.join(dub_temp_base_for_this_task, "02_Adjusted")
         
         final_audio_track_for_muxing_worker = None
+        tts_results_iter_worker = None # Pipeline TTS song song (đóng trước khi dọn thư mục tạm)
+        dub_audio_timeline = None # Track TTS ghi dần bằng engine NumPy (đóng trước khi dọn thư mục tạm)
 
         video_basename = os.path.basename(video_input_path_task_worker) if video_input_path_task_worker else f"Task_{task_id[:6]}"
         with keep_awake(f"Dubbing: {video_basename}"):
@@ -22944,18 +23185,17 @@ class SubtitleApp(ctk.CTk):
                 # --- A. CHUẨN BỊ KỊCH BẢN CHO VIỆC TẠO TTS ---
                 segments_for_tts_engine_processing = [] 
 
-                # Lấy các cờ và tham số tối ưu từ các thuộc tính self 
-                # (đã được _dub_process_next_item_in_queue thiết lập từ task_config của tác vụ hiện tại)
-                should_worker_run_its_own_optimization = self.current_task_optimize_flow_requested 
-                dub_flow_params_for_worker_optimization = self.current_task_dub_flow_parameters
+                # Lấy các cờ và tham số tối ưu từ context của tác vụ
+                should_worker_run_its_own_optimization = task_ctx.optimize_flow_requested
+                dub_flow_params_for_worker_optimization = task_ctx.dub_flow_parameters
                 
-                # self.dub_srt_data đã chứa nội dung script (có thể đã được tối ưu ở UI 
+                # task_ctx.srt_data chứa nội dung script (có thể đã được tối ưu ở UI 
                 # hoặc là bản gốc, tùy theo logic của dub_add_to_processing_queue 
                 # và giá trị 'srt_data_content' trong task_config khi tác vụ được tạo)
                 # Đây là dữ liệu mà worker sẽ làm việc với.
-                script_data_worker_received_from_task = list(self.dub_srt_data) # Tạo bản sao
+                script_data_worker_received_from_task = list(task_ctx.srt_data) # Tạo bản sao
 
-                if self.is_current_task_direct_audio_mux: # Biến này cũng đã được set từ task_config
+                if task_ctx.is_direct_audio_mux:
                     logging.info(f"{worker_log_prefix} Tác vụ Direct Audio Mux. Sẽ không tạo TTS từ kịch bản.")
                     segments_for_tts_engine_processing = [] # Đảm bảo rỗng
                 
@@ -23021,13 +23261,13 @@ class SubtitleApp(ctk.CTk):
                 elif script_data_worker_received_from_task: 
                     # Không tối ưu trong worker (vì cờ yêu cầu là False, nghĩa là UI đã xử lý HOẶC UI tắt tối ưu),
                     # và có dữ liệu script -> dùng trực tiếp dữ liệu script này.
-                    logging.info(f"{worker_log_prefix} WORKER: Cờ tối ưu TẮT. Sử dụng {len(script_data_worker_received_from_task)} segment đã có trong self.dub_srt_data cho TTS.")
+                    logging.info(f"{worker_log_prefix} WORKER: Cờ tối ưu TẮT. Sử dụng {len(script_data_worker_received_from_task)} segment đã có trong kịch bản của tác vụ cho TTS.")
                     segments_for_tts_engine_processing = list(script_data_worker_received_from_task)
-                    # Textbox đã được cập nhật bởi _dub_process_next_item_in_queue với nội dung này rồi,
+                    # Textbox đã được cập nhật bởi _dub_start_queued_task với nội dung này rồi,
                     # không cần gọi _update_dub_textbox_post_processing lại ở đây trừ khi bạn muốn một mô tả khác.
                 
                 else: # Không direct mux, không tối ưu trong worker, và không có script_data_worker_received_from_task (lỗi logic)
-                    if not self.is_current_task_direct_audio_mux: # Kiểm tra lại để chắc chắn
+                    if not task_ctx.is_direct_audio_mux: # Kiểm tra lại để chắc chắn
                         _error_message_worker = "Lỗi logic (Worker): Yêu cầu TTS nhưng không có dữ liệu kịch bản hợp lệ từ task_config."
                         logging.error(f"{worker_log_prefix} {_error_message_worker}")
                         raise ValueError(_error_message_worker)
@@ -23035,29 +23275,30 @@ class SubtitleApp(ctk.CTk):
                 # === KẾT THÚC PHẦN A: CHUẨN BỊ KỊCH BẢN CHO TTS ===
                 
                 # --- B. LẤY CÁC CÀI ĐẶT XỬ LÝ AUDIO ĐÃ ĐƯỢC CHUẨN BỊ CHO WORKER ---
-                cfg_sync_tolerance_ms = getattr(self, '_worker_cfg_sync_tolerance_ms', 20)
-                cfg_sync_max_speed_up = getattr(self, '_worker_cfg_sync_max_speed_up', 1.50)
-                cfg_sync_min_speed_down = getattr(self, '_worker_cfg_sync_min_speed_down', 1.0)
-                cfg_sync_force_cut = getattr(self, '_worker_cfg_sync_force_cut', True)
-                cfg_sync_min_srt_duration_ms = getattr(self, '_worker_cfg_sync_min_srt_duration_ms', 200)
-                cfg_sync_pad_short_tts = getattr(self, '_worker_cfg_sync_pad_short_tts', True)
-
-                cfg_audio_fade_in_s = getattr(self, '_worker_cfg_audio_fade_in_s', 0.05)
-                cfg_audio_fade_out_s = getattr(self, '_worker_cfg_audio_fade_out_s', 0.03)            
-                cfg_allow_overflow_ms = getattr(self, '_worker_cfg_allow_overflow_ms', 100)
-                cfg_min_silence_after_overflow_ms = getattr(self, '_worker_cfg_min_silence_after_overflow_ms', 0)
+                cfg_sync_tolerance_ms = task_ctx.sync_tolerance_ms
+                cfg_sync_max_speed_up = task_ctx.sync_max_speed_up
+                cfg_sync_min_speed_down = task_ctx.sync_min_speed_down
+                cfg_sync_force_cut = task_ctx.sync_force_cut
+                cfg_sync_min_srt_duration_ms = task_ctx.sync_min_srt_duration_ms
+                cfg_sync_pad_short_tts = task_ctx.sync_pad_short_tts
+
+                cfg_audio_fade_in_s = task_ctx.audio_fade_in_s
+                cfg_audio_fade_out_s = task_ctx.audio_fade_out_s
+                cfg_allow_overflow_ms = task_ctx.allow_overflow_ms
+                cfg_min_silence_after_overflow_ms = task_ctx.min_silence_after_overflow_ms
 
                 # Lấy thông tin engine và voice cho worker
-                selected_tts_engine_for_task = getattr(self, '_worker_cfg_selected_tts_engine', "Google Translate (gTTS)")
+                selected_tts_engine_for_task = task_ctx.tts_engine
                 logging.debug(f"{worker_log_prefix} Các config cho xử lý audio: Tol={cfg_sync_tolerance_ms}, MaxSpeed={cfg_sync_max_speed_up}, AllowOverflow={cfg_allow_overflow_ms}ms...")
                 
                 # --- C. XỬ LÝ AUDIO (TẠO TTS HOẶC DÙNG AUDIO NGOÀI) ---
-                if self.is_current_task_direct_audio_mux:
-                    # C.1 XỬ LÝ AUDIO NGOÀI (DIRECT MUX)
-                    if self.dub_audio_path_for_queue_temp and os.path.exists(self.dub_audio_path_for_queue_temp):
-                        logging.info(f"{worker_log_prefix} Direct Audio Mux. Chuẩn hóa audio ngoài: {os.path.basename(self.dub_audio_path_for_queue_temp)}")
+                if task_ctx.is_direct_audio_mux:
+                    # C.1 XỬ LÝ AUDIO NGOÀI (DIRECT MUX) - toàn bộ là FFmpeg: chờ slot CPU
+                    self.dub_scheduler.enter_stage(task_ctx, STAGE_CPU, self.dub_stop_event)
+                    if external_audio_path_task_worker and os.path.exists(external_audio_path_task_worker):
+                        logging.info(f"{worker_log_prefix} Direct Audio Mux. Chuẩn hóa audio ngoài: {os.path.basename(external_audio_path_task_worker)}")
                         standardized_external_audio_wav = os.path.join(adjusted_segments_output_folder_for_this_task, f"external_audio_std_{task_id[:6]}.wav")
-                        if not self.dub_ffmpeg_standardize_to_wav(self.dub_audio_path_for_queue_temp, standardized_external_audio_wav):
+                        if not self.dub_ffmpeg_standardize_to_wav(external_audio_path_task_worker, standardized_external_audio_wav):
                             _error_message_worker = "Lỗi chuẩn hóa file audio ngoài sang WAV."; raise RuntimeError(_error_message_worker)
                         
                         path_for_processing_external = standardized_external_audio_wav
@@ -23082,14 +23323,100 @@ class SubtitleApp(ctk.CTk):
                 
                 elif segments_for_tts_engine_processing: # C.2 TẠO TTS TỪ KỊCH BẢN
                     _total_segments_worker = len(segments_for_tts_engine_processing)
-                    final_processed_audio_files_for_concat_task = []
-                    selected_tts_engine_for_task = self.dub_selected_tts_engine_var.get()
+                    dub_track_placements = [] # (start_ms, file WAV, duration_ms) cho renderer FFmpeg
                     _segments_successfully_processed_worker = 0
                     accumulated_timeline_ms = 0.0 # Theo dõi timeline của audio đã ghép
 
+                    # TTS (chờ API) chiếm slot mạng; tác vụ khác có thể dùng slot CPU để ghép video cùng lúc
+                    self.dub_scheduler.enter_stage(task_ctx, STAGE_NETWORK, self.dub_stop_event)
                     logging.info(f"{worker_log_prefix} Bắt đầu tạo TTS cho {_total_segments_worker} segment(s) với engine: {selected_tts_engine_for_task}")
                     if self.dub_stop_event.is_set(): _worker_stopped_by_user = True; raise InterruptedError("Dừng trước vòng lặp segments TTS")
 
+                    # Hậu xử lý trong bộ nhớ (NumPy): mỗi segment giải mã một lần, tốc độ/cắt/fade xử lý trên mảng.
+                    # Track được dựng một lượt: mỗi segment ghi thẳng vào vị trí start_ms của nó (khoảng lặng ngầm định,
+                    # không cần file silence/concat). Thiếu numpy -> chuỗi FFmpeg từng bước + một đồ thị adelay/amix.
+                    from services import dub_audio_engine
+                    dub_audio_sr = self.dub_TARGET_AUDIO_PROCESSING_SAMPLE_RATE
+                    intermediate_concat_wav_path = os.path.join(dub_temp_base_for_this_task, "dub_tts_intermediate_all.wav")
+                    dub_overlap_policy = self.cfg.get("dub_overlap_policy", dub_audio_engine.OVERLAP_SHIFT)
+                    if dub_overlap_policy not in dub_audio_engine.OVERLAP_POLICIES:
+                        logging.warning(f"{worker_log_prefix} Chính sách chồng lấn '{dub_overlap_policy}' không hợp lệ. Dùng '{dub_audio_engine.OVERLAP_SHIFT}'.")
+                        dub_overlap_policy = dub_audio_engine.OVERLAP_SHIFT
+                    if dub_audio_engine.HAS_NUMPY and self.cfg.get("dub_numpy_audio_engine", True):
+                        dub_audio_timeline = dub_audio_engine.TimelineMixer(
+                            intermediate_concat_wav_path, dub_audio_sr, self.dub_TARGET_AUDIO_PROCESSING_CHANNELS,
+                            overlap_policy=dub_overlap_policy,
+                            expected_ms=max(float(seg_data["end_ms"]) for seg_data in segments_for_tts_engine_processing)
+                        )
+                    logging.info(f"{worker_log_prefix} Hậu xử lý audio segment: {'NumPy (trong bộ nhớ)' if dub_audio_timeline is not None else 'FFmpeg'}, chồng lấn: {dub_overlap_policy}")
+
+                    # --- C.2.0. TẠO TTS THÔ SONG SONG ---
+                    # Các request TTS được gửi đồng thời (pool giới hạn theo engine); vòng lặp bên dưới
+                    # nhận kết quả đúng thứ tự segment và hậu xử lý ngay khi segment sẵn sàng.
+                    _use_google_ssml_worker = task_ctx.use_google_ssml
+                    _tts_jobs_worker = []
+                    _raw_tts_paths_worker = {}
+
+                    # Dub lại tăng dần: manifest của video lưu audio đã xử lý của từng segment theo dấu vân tay đầu vào
+                    # (text, giọng, thời lượng mục tiêu, tham số xử lý). Segment không đổi -> bỏ qua TTS và hậu xử lý.
+                    from services.dub_manifest import DubManifest, get_dub_manifest
+                    dub_manifest_worker = None
+                    _segment_fingerprints_worker = {}
+                    _reused_segments_worker = {}
+                    if self.cfg.get("dub_incremental_redub", True):
+                        dub_manifest_worker = get_dub_manifest(os.path.abspath(video_input_path_task_worker), self.cfg)
+                    _dub_segment_settings_worker = {
+                        'engine': selected_tts_engine_for_task,
+                        'voice': task_ctx.voice_id,
+                        'openai_model': task_ctx.openai_tts_model if selected_tts_engine_for_task == "OpenAI TTS" else None,
+                        'sync': [cfg_sync_tolerance_ms, cfg_sync_max_speed_up, cfg_sync_min_speed_down, cfg_sync_force_cut, cfg_allow_overflow_ms],
+                        'fade': [cfg_audio_fade_in_s, cfg_audio_fade_out_s],
+                        'format': [dub_audio_sr, self.dub_TARGET_AUDIO_PROCESSING_CHANNELS, "numpy" if dub_audio_timeline is not None else "ffmpeg"],
+                    }
+                    for _job_seg_index, _job_seg_data in enumerate(segments_for_tts_engine_processing):
+                        _job_text = _job_seg_data["text"]
+                        if not _job_text.strip() or float(_job_seg_data["end_ms"]) - float(_job_seg_data["start_ms"]) < cfg_sync_min_srt_duration_ms:
+                            continue # Segment bị bỏ qua ở C.2.i
+                        _job_display_index = _job_seg_data.get('index', _job_seg_index + 1)
+                        _tts_raw_ext_seg = ".wav" if selected_tts_engine_for_task == "Giọng đọc Hệ thống (Offline)" else ".mp3"
+                        _raw_tts_paths_worker[_job_seg_index] = os.path.join(raw_tts_output_folder_for_this_task, f"rawtts_{_job_display_index:04d}{_tts_raw_ext_seg}")
+                        if selected_tts_engine_for_task == "Google Cloud TTS" and _use_google_ssml_worker:
+                            if not (_job_text.strip().lower().startswith("<speak>") and _job_text.strip().lower().endswith("</speak>")):
+                                _job_text = self.dub_generate_basic_ssml(_job_text)
+                                logging.info(f"{worker_log_prefix} Seg#{_job_display_index}: SSML được tạo: {_job_text[:100]}...")
+                        if dub_manifest_worker is not None:
+                            _segment_fingerprints_worker[_job_seg_index] = DubManifest.fingerprint(dict(
+                                _dub_segment_settings_worker, text=_job_text,
+                                target_ms=round(float(_job_seg_data["end_ms"]) - float(_job_seg_data["start_ms"]), 1)
+                            ))
+                            _reused_entry_job = dub_manifest_worker.lookup(_segment_fingerprints_worker[_job_seg_index])
+                            if _reused_entry_job is not None:
+                                _reused_segments_worker[_job_seg_index] = _reused_entry_job
+                                continue # Segment không đổi so với lần dub trước
+                        _tts_jobs_worker.append((_job_seg_index, _job_text, _raw_tts_paths_worker[_job_seg_index]))
+                    if dub_manifest_worker is not None:
+                        logging.info(f"{worker_log_prefix} Dub lại tăng dần: {len(_reused_segments_worker)} segment không đổi (dùng lại), {len(_tts_jobs_worker)} segment cần tạo TTS.")
+
+                    def _speak_segment_for_task(text_for_engine, output_path):
+                        # max_retries=0: ParallelTTSSynthesizer là lớp thử lại duy nhất, mỗi lần gọi API đều lấy token của bộ giới hạn tốc độ
+                        if selected_tts_engine_for_task == "OpenAI TTS": return self.dub_speak_with_openai(text_for_engine, output_path, is_preview=False, max_retries=0, voice_id=task_ctx.voice_id, tts_model=task_ctx.openai_tts_model)
+                        if selected_tts_engine_for_task == "Google Cloud TTS": return self.dub_speak_with_google(text_for_engine, output_path, is_preview=False, max_retries=0, voice_id=task_ctx.voice_id)
+                        if selected_tts_engine_for_task == "Google Translate (gTTS)": return self.dub_speak_with_gtts(text_for_engine, output_path, is_preview=False)
+                        if selected_tts_engine_for_task == "Giọng đọc Hệ thống (Offline)":
+                            if HAS_PYTTSX3 and callable(getattr(self, 'dub_speak_with_system_tts', None)): return self.dub_speak_with_system_tts(text_for_engine, output_path, is_preview=False, voice_id=task_ctx.voice_id)
+                            return "ERROR_SYSTEM_TTS_UNAVAILABLE"
+                        return False
+
+                    from services.tts_pipeline import ParallelTTSSynthesizer, get_engine_limits
+                    _tts_max_workers, _tts_rpm = get_engine_limits(selected_tts_engine_for_task, self.cfg)
+                    tts_synthesizer_worker = ParallelTTSSynthesizer(
+                        _speak_segment_for_task, selected_tts_engine_for_task,
+                        max_workers=_tts_max_workers, requests_per_minute=_tts_rpm,
+                        max_retries=int(self.cfg.get("dub_tts_segment_retries", 2)),
+                        stop_check=self.dub_stop_event.is_set
+                    )
+                    tts_results_iter_worker = tts_synthesizer_worker.run(_tts_jobs_worker)
+
                     for segment_index_loop, current_segment_data in enumerate(segments_for_tts_engine_processing):
                         current_segment_display_index_loop = current_segment_data.get('index', segment_index_loop + 1)
                         if self.dub_stop_event.is_set(): _worker_stopped_by_user = True; break
@@ -23113,11 +23440,7 @@ class SubtitleApp(ctk.CTk):
                             logging.info(f"{segment_log_prefix_tts_loop} Bỏ qua (text rỗng hoặc duration mục tiêu < {cfg_sync_min_srt_duration_ms}ms).")
                             silence_to_fill_skipped_segment_ms_loop = target_srt_end_time_ms - accumulated_timeline_ms
                             if silence_to_fill_skipped_segment_ms_loop > 10: # Chỉ thêm nếu khoảng lặng đáng kể
-                                skipped_gap_file_loop = os.path.join(adjusted_segments_output_folder_for_this_task, f"gap_skipped_{current_segment_display_index_loop:04d}.wav")
-                                if self.dub_ffmpeg_create_silence_file(skipped_gap_file_loop, silence_to_fill_skipped_segment_ms_loop):
-                                    final_processed_audio_files_for_concat_task.append(skipped_gap_file_loop)
-                                    accumulated_timeline_ms += silence_to_fill_skipped_segment_ms_loop
-                                else: logging.error(f"{segment_log_prefix_tts_loop} (Skipped) Lỗi tạo file silence lấp đầy.")
+                                accumulated_timeline_ms += silence_to_fill_skipped_segment_ms_loop # Khoảng lặng ngầm định trên timeline
                             elif silence_to_fill_skipped_segment_ms_loop < -cfg_sync_tolerance_ms : # Timeline đã vượt quá nhiều
                                  logging.warning(f"{segment_log_prefix_tts_loop} (Skipped) Timeline ({accumulated_timeline_ms:.0f}ms) đã vượt SRT end mục tiêu ({target_srt_end_time_ms:.0f}ms) của segment này.")
                                  accumulated_timeline_ms = target_srt_end_time_ms # Cập nhật timeline theo SRT end
@@ -23126,138 +23449,173 @@ class SubtitleApp(ctk.CTk):
                             logging.debug(f"{segment_log_prefix_tts_loop} (Skipped) Timeline sau khi lấp đầy/cập nhật: {accumulated_timeline_ms:.0f}ms")
                             continue
 
-                        # --- C.2.ii. TẠO TTS THÔ ---
-                        raw_tts_filepath_seg, duration_of_raw_tts_ms_seg = None, None
-                        _tts_raw_ext_seg = ".mp3"; _tts_raw_fn_seg = f"rawtts_{current_segment_display_index_loop:04d}{_tts_raw_ext_seg}"
-                        if selected_tts_engine_for_task == "Giọng đọc Hệ thống (Offline)": _tts_raw_ext_seg = ".wav"; _tts_raw_fn_seg = f"rawtts_{current_segment_display_index_loop:04d}.wav"
-                        raw_tts_filepath_seg = os.path.join(raw_tts_output_folder_for_this_task, _tts_raw_fn_seg)
-                        
-                        _text_for_engine_seg = text_content_for_tts_loop
-                        if selected_tts_engine_for_task == "Google Cloud TTS" and self.dub_use_google_ssml_var.get():
-                            if not (_text_for_engine_seg.strip().lower().startswith("<speak>") and _text_for_engine_seg.strip().lower().endswith("</speak>")):
-                                _text_for_engine_seg = self.dub_generate_basic_ssml(_text_for_engine_seg)
-                                logging.info(f"{segment_log_prefix_tts_loop} SSML được tạo: {_text_for_engine_seg[:100]}...")
-                        
-                        _tts_call_res_seg = False
-                        if selected_tts_engine_for_task == "OpenAI TTS": _tts_call_res_seg = self.dub_speak_with_openai(_text_for_engine_seg, raw_tts_filepath_seg, is_preview=False)
-                        elif selected_tts_engine_for_task == "Google Cloud TTS": _tts_call_res_seg = self.dub_speak_with_google(_text_for_engine_seg, raw_tts_filepath_seg, is_preview=False)
-                        elif selected_tts_engine_for_task == "Google Translate (gTTS)": _tts_call_res_seg = self.dub_speak_with_gtts(_text_for_engine_seg, raw_tts_filepath_seg, is_preview=False)
-                        elif selected_tts_engine_for_task == "Giọng đọc Hệ thống (Offline)":
-                            if HAS_PYTTSX3 and callable(getattr(self, 'dub_speak_with_system_tts', None)): _tts_call_res_seg = self.dub_speak_with_system_tts(_text_for_engine_seg, raw_tts_filepath_seg, is_preview=False)
-                            else: _tts_call_res_seg = "ERROR_SYSTEM_TTS_UNAVAILABLE"
-                        
-                        if isinstance(_tts_call_res_seg, str) and "ERROR_" in _tts_call_res_seg: # Mã lỗi API
-                            _error_message_worker = f"Lỗi API ({_tts_call_res_seg}) (Seg #{current_segment_display_index_loop})."; self.dub_batch_had_api_key_errors = True; break
-                        if _tts_call_res_seg == "STOPPED_BY_USER": _worker_stopped_by_user = True; _error_message_worker = "Dừng bởi người dùng khi tạo TTS."; break
-                        if not _tts_call_res_seg: logging.error(f"{segment_log_prefix_tts_loop} Lỗi tạo TTS thô."); continue # Lỗi TTS, bỏ qua segment
+                        _reused_entry_seg = _reused_segments_worker.get(segment_index_loop)
+                        if _reused_entry_seg is not None:
+                            # --- C.2.ii'. SEGMENT KHÔNG ĐỔI: DÙNG LẠI AUDIO ĐÃ XỬ LÝ TỪ MANIFEST ---
+                            path_after_fade_loop = _reused_entry_seg['path']
+                            actual_duration_of_this_processed_segment_ms_loop = _reused_entry_seg['duration_ms']
+                            final_effective_duration_for_this_segment_on_timeline_ms_loop = _reused_entry_seg.get('effective_duration_ms', target_srt_duration_ms)
+                            this_segment_overflowed_ms_loop = _reused_entry_seg.get('overflow_ms', 0.0)
+                            if dub_audio_timeline is not None:
+                                try: segment_samples_loop = dub_audio_engine.load_audio(path_after_fade_loop, dub_audio_sr, dub_audio_timeline.channels)
+                                except Exception as e_load_reused: logging.error(f"{segment_log_prefix_tts_loop} Lỗi đọc audio từ manifest: {e_load_reused}. Bỏ qua segment."); continue
+                                actual_duration_of_this_processed_segment_ms_loop = dub_audio_engine.duration_ms(segment_samples_loop, dub_audio_sr)
+                            logging.info(f"{segment_log_prefix_tts_loop} Không đổi so với lần dub trước: dùng lại audio đã xử lý ({actual_duration_of_this_processed_segment_ms_loop:.0f}ms).")
+                        else:
+                            # --- C.2.ii. NHẬN TTS THÔ TỪ PIPELINE (đúng thứ tự segment) ---
+                            raw_tts_filepath_seg, duration_of_raw_tts_ms_seg = _raw_tts_paths_worker[segment_index_loop], None
+                            _tts_job_index_seg, _tts_call_res_seg = next(tts_results_iter_worker, (None, "STOPPED_BY_USER"))
+                            if _tts_job_index_seg is not None and _tts_job_index_seg != segment_index_loop:
+                                _error_message_worker = f"Lỗi nội bộ: kết quả TTS lệch thứ tự (Seg #{current_segment_display_index_loop})."; break
+
+                            if isinstance(_tts_call_res_seg, str) and "ERROR_" in _tts_call_res_seg: # Mã lỗi API
+                                _error_message_worker = f"Lỗi API ({_tts_call_res_seg}) (Seg #{current_segment_display_index_loop})."; self.dub_batch_had_api_key_errors = True; break
+                            if _tts_call_res_seg == "STOPPED_BY_USER": _worker_stopped_by_user = True; _error_message_worker = "Dừng bởi người dùng khi tạo TTS."; break
+                            if not _tts_call_res_seg: logging.error(f"{segment_log_prefix_tts_loop} Lỗi tạo TTS thô."); continue # Lỗi TTS, bỏ qua segment
                         
-                        duration_of_raw_tts_ms_seg = self.dub_get_audio_duration_ms(raw_tts_filepath_seg)
-                        if duration_of_raw_tts_ms_seg is None or duration_of_raw_tts_ms_seg <= 30: # 30ms là ngưỡng rất nhỏ
-                            logging.error(f"{segment_log_prefix_tts_loop} Lỗi lấy duration TTS thô ({duration_of_raw_tts_ms_seg}ms) hoặc duration quá ngắn. Bỏ qua segment."); continue
-                        logging.info(f"{segment_log_prefix_tts_loop} TTS thô: {duration_of_raw_tts_ms_seg:.0f}ms")
+                            segment_samples_loop = None # Mảng float32 (frames, channels) khi dùng engine NumPy
+                            if dub_audio_timeline is not None:
+                                try:
+                                    segment_samples_loop = dub_audio_engine.load_audio(raw_tts_filepath_seg, dub_audio_sr, dub_audio_timeline.channels, stop_check=self.dub_stop_event.is_set)
+                                except InterruptedError: _worker_stopped_by_user = True; break
+                                except Exception as e_decode_seg: logging.error(f"{segment_log_prefix_tts_loop} Lỗi giải mã TTS thô: {e_decode_seg}. Bỏ qua segment."); continue
+                                duration_of_raw_tts_ms_seg = dub_audio_engine.duration_ms(segment_samples_loop, dub_audio_sr)
+                            else:
+                                duration_of_raw_tts_ms_seg = self.dub_get_audio_duration_ms(raw_tts_filepath_seg)
+                            if duration_of_raw_tts_ms_seg is None or duration_of_raw_tts_ms_seg <= 30: # 30ms là ngưỡng rất nhỏ
+                                logging.error(f"{segment_log_prefix_tts_loop} Lỗi lấy duration TTS thô ({duration_of_raw_tts_ms_seg}ms) hoặc duration quá ngắn. Bỏ qua segment."); continue
+                            logging.info(f"{segment_log_prefix_tts_loop} TTS thô: {duration_of_raw_tts_ms_seg:.0f}ms")
                         
-                        current_processed_audio_path_seg = raw_tts_filepath_seg
-                        current_audio_duration_ms_seg = duration_of_raw_tts_ms_seg
-                        if self.dub_stop_event.is_set(): _worker_stopped_by_user = True; break
-
-                        # --- C.2.iii. ĐIỀU CHỈNH TỐC ĐỘ (nếu cần) ---
-                        # (Sử dụng current_audio_duration_ms_seg và target_srt_duration_ms)
-                        # current_processed_audio_path_seg và current_audio_duration_ms_seg được cập nhật
-                        if abs(current_audio_duration_ms_seg - target_srt_duration_ms) > cfg_sync_tolerance_ms and \
-                           target_srt_duration_ms >= cfg_sync_min_srt_duration_ms: # Chỉ điều chỉnh nếu chênh lệch đáng kể và SRT đủ dài
-                            speed_factor_seg = 1.0
-                            if current_audio_duration_ms_seg > target_srt_duration_ms: # TTS dài hơn SRT -> tăng tốc TTS
-                                calculated_speed_seg = current_audio_duration_ms_seg / float(target_srt_duration_ms)
-                                speed_factor_seg = min(calculated_speed_seg, cfg_sync_max_speed_up)
-                                speed_factor_seg = max(speed_factor_seg, 1.001) # Đảm bảo > 1
-                            else: # TTS ngắn hơn SRT -> giảm tốc TTS
-                                calculated_speed_seg = current_audio_duration_ms_seg / float(target_srt_duration_ms)
-                                speed_factor_seg = max(calculated_speed_seg, cfg_sync_min_speed_down)
-                                if speed_factor_seg < 1.0: speed_factor_seg = min(speed_factor_seg, 0.999) # Đảm bảo < 1
-
-                            if abs(speed_factor_seg - 1.0) > 0.001: # Chỉ áp dụng nếu speed_factor thực sự thay đổi
-                                adj_speed_fn_seg = f"adj_speed_{current_segment_display_index_loop:04d}{os.path.splitext(current_processed_audio_path_seg)[1]}"
-                                adj_speed_fp_seg = os.path.join(adjusted_segments_output_folder_for_this_task, adj_speed_fn_seg)
-                                if self.dub_ffmpeg_adjust_audio_speed(current_processed_audio_path_seg, adj_speed_fp_seg, speed_factor_seg):
-                                    current_processed_audio_path_seg = adj_speed_fp_seg
-                                    current_audio_duration_ms_seg = self.dub_get_audio_duration_ms(current_processed_audio_path_seg) or 0
+                            current_processed_audio_path_seg = raw_tts_filepath_seg
+                            current_audio_duration_ms_seg = duration_of_raw_tts_ms_seg
+                            if self.dub_stop_event.is_set(): _worker_stopped_by_user = True; break
+
+                            # --- C.2.iii. ĐIỀU CHỈNH TỐC ĐỘ (nếu cần) ---
+                            # (Sử dụng current_audio_duration_ms_seg và target_srt_duration_ms)
+                            # current_processed_audio_path_seg và current_audio_duration_ms_seg được cập nhật
+                            if abs(current_audio_duration_ms_seg - target_srt_duration_ms) > cfg_sync_tolerance_ms and \
+                               target_srt_duration_ms >= cfg_sync_min_srt_duration_ms: # Chỉ điều chỉnh nếu chênh lệch đáng kể và SRT đủ dài
+                                speed_factor_seg = 1.0
+                                if current_audio_duration_ms_seg > target_srt_duration_ms: # TTS dài hơn SRT -> tăng tốc TTS
+                                    calculated_speed_seg = current_audio_duration_ms_seg / float(target_srt_duration_ms)
+                                    speed_factor_seg = min(calculated_speed_seg, cfg_sync_max_speed_up)
+                                    speed_factor_seg = max(speed_factor_seg, 1.001) # Đảm bảo > 1
+                                else: # TTS ngắn hơn SRT -> giảm tốc TTS
+                                    calculated_speed_seg = current_audio_duration_ms_seg / float(target_srt_duration_ms)
+                                    speed_factor_seg = max(calculated_speed_seg, cfg_sync_min_speed_down)
+                                    if speed_factor_seg < 1.0: speed_factor_seg = min(speed_factor_seg, 0.999) # Đảm bảo < 1
+
+                                if abs(speed_factor_seg - 1.0) > 0.001 and segment_samples_loop is not None:
+                                    segment_samples_loop = dub_audio_engine.time_stretch(segment_samples_loop, dub_audio_sr, speed_factor_seg)
+                                    current_audio_duration_ms_seg = dub_audio_engine.duration_ms(segment_samples_loop, dub_audio_sr)
                                     logging.info(f"{segment_log_prefix_tts_loop} Sau điều chỉnh tốc độ (x{speed_factor_seg:.3f}), duration mới: {current_audio_duration_ms_seg:.0f}ms")
-                                else:
-                                    logging.warning(f"{segment_log_prefix_tts_loop} Lỗi điều chỉnh tốc độ. Giữ nguyên audio trước đó.")
-                        if self.dub_stop_event.is_set(): _worker_stopped_by_user = True; break
+                                elif abs(speed_factor_seg - 1.0) > 0.001: # Chỉ áp dụng nếu speed_factor thực sự thay đổi
+                                    adj_speed_fn_seg = f"adj_speed_{current_segment_display_index_loop:04d}{os.path.splitext(current_processed_audio_path_seg)[1]}"
+                                    adj_speed_fp_seg = os.path.join(adjusted_segments_output_folder_for_this_task, adj_speed_fn_seg)
+                                    if self.dub_ffmpeg_adjust_audio_speed(current_processed_audio_path_seg, adj_speed_fp_seg, speed_factor_seg):
+                                        current_processed_audio_path_seg = adj_speed_fp_seg
+                                        current_audio_duration_ms_seg = self.dub_get_audio_duration_ms(current_processed_audio_path_seg) or 0
+                                        logging.info(f"{segment_log_prefix_tts_loop} Sau điều chỉnh tốc độ (x{speed_factor_seg:.3f}), duration mới: {current_audio_duration_ms_seg:.0f}ms")
+                                    else:
+                                        logging.warning(f"{segment_log_prefix_tts_loop} Lỗi điều chỉnh tốc độ. Giữ nguyên audio trước đó.")
+                            if self.dub_stop_event.is_set(): _worker_stopped_by_user = True; break
                         
-                        # --- C.2.iv. XỬ LÝ CẮT/OVERFLOW VÀ QUYẾT ĐỊNH THỜI LƯỢNG CUỐI CHO AUDIO ---
-                        path_for_audio_segment_content_loop = current_processed_audio_path_seg
-                        duration_of_audio_segment_content_ms_loop = current_audio_duration_ms_seg
-                        final_effective_duration_for_this_segment_on_timeline_ms_loop = target_srt_duration_ms # Mặc định
-                        this_segment_overflowed_ms_loop = 0.0
-
-                        if cfg_sync_force_cut: # Nếu bật "Luôn cắt..."
-                            time_difference_ms_loop = duration_of_audio_segment_content_ms_loop - target_srt_duration_ms
-                            if time_difference_ms_loop > cfg_sync_tolerance_ms: # Audio dài hơn SRT đáng kể
-                                if time_difference_ms_loop <= cfg_allow_overflow_ms: # Trong ngưỡng cho phép overflow
-                                    logging.info(f"{segment_log_prefix_tts_loop} Audio dài hơn SRT ({time_difference_ms_loop:.0f}ms) nhưng TRONG ngưỡng overflow ({cfg_allow_overflow_ms}ms). KHÔNG CẮT.")
-                                    final_effective_duration_for_this_segment_on_timeline_ms_loop = duration_of_audio_segment_content_ms_loop # Thời lượng hiệu dụng sẽ là của audio
-                                    this_segment_overflowed_ms_loop = time_difference_ms_loop
-                                else: # Vượt ngưỡng overflow -> PHẢI CẮT
-                                    logging.info(f"{segment_log_prefix_tts_loop} Audio dài hơn SRT ({time_difference_ms_loop:.0f}ms) và VƯỢT ngưỡng overflow ({cfg_allow_overflow_ms}ms). SẼ CẮT.")
-                                    duration_to_cut_to_ms_loop = target_srt_duration_ms # Cắt về bằng SRT target
+                            # --- C.2.iv. XỬ LÝ CẮT/OVERFLOW VÀ QUYẾT ĐỊNH THỜI LƯỢNG CUỐI CHO AUDIO ---
+                            path_for_audio_segment_content_loop = current_processed_audio_path_seg
+                            duration_of_audio_segment_content_ms_loop = current_audio_duration_ms_seg
+                            final_effective_duration_for_this_segment_on_timeline_ms_loop = target_srt_duration_ms # Mặc định
+                            this_segment_overflowed_ms_loop = 0.0
+
+                            if cfg_sync_force_cut: # Nếu bật "Luôn cắt..."
+                                time_difference_ms_loop = duration_of_audio_segment_content_ms_loop - target_srt_duration_ms
+                                if time_difference_ms_loop > cfg_sync_tolerance_ms: # Audio dài hơn SRT đáng kể
+                                    if time_difference_ms_loop <= cfg_allow_overflow_ms: # Trong ngưỡng cho phép overflow
+                                        logging.info(f"{segment_log_prefix_tts_loop} Audio dài hơn SRT ({time_difference_ms_loop:.0f}ms) nhưng TRONG ngưỡng overflow ({cfg_allow_overflow_ms}ms). KHÔNG CẮT.")
+                                        final_effective_duration_for_this_segment_on_timeline_ms_loop = duration_of_audio_segment_content_ms_loop # Thời lượng hiệu dụng sẽ là của audio
+                                        this_segment_overflowed_ms_loop = time_difference_ms_loop
+                                    else: # Vượt ngưỡng overflow -> PHẢI CẮT
+                                        logging.info(f"{segment_log_prefix_tts_loop} Audio dài hơn SRT ({time_difference_ms_loop:.0f}ms) và VƯỢT ngưỡng overflow ({cfg_allow_overflow_ms}ms). SẼ CẮT.")
+                                        duration_to_cut_to_ms_loop = target_srt_duration_ms # Cắt về bằng SRT target
                                     
-                                    # (Logic cắt bằng FFmpeg của bạn ở đây, tương tự như trong code gốc,
-                                    #  nhưng output là path_for_audio_segment_content_loop mới và cập nhật duration_of_audio_segment_content_ms_loop)
-                                    # Ví dụ:
-                                    cut_fn_loop = f"cut_{current_segment_display_index_loop:04d}{os.path.splitext(path_for_audio_segment_content_loop)[1]}"
-                                    cut_fp_loop = os.path.join(adjusted_segments_output_folder_for_this_task, cut_fn_loop)
-                                    if self.dub_ffmpeg_cut_audio(path_for_audio_segment_content_loop, cut_fp_loop, 0, duration_to_cut_to_ms_loop): # Cần hàm dub_ffmpeg_cut_audio
-                                         path_for_audio_segment_content_loop = cut_fp_loop
-                                         duration_of_audio_segment_content_ms_loop = self.dub_get_audio_duration_ms(path_for_audio_segment_content_loop) or duration_to_cut_to_ms_loop
-                                         logging.info(f"{segment_log_prefix_tts_loop} Đã cắt audio, thời lượng mới: {duration_of_audio_segment_content_ms_loop:.0f}ms.")
-                                    else:
-                                         logging.warning(f"{segment_log_prefix_tts_loop} Lỗi cắt audio. Sử dụng audio chưa cắt.")
-                                    # final_effective_duration_for_this_segment_on_timeline_ms_loop vẫn là target_srt_duration_ms vì đã cắt
-                        else: # Không bật "Luôn cắt..."
-                            final_effective_duration_for_this_segment_on_timeline_ms_loop = duration_of_audio_segment_content_ms_loop # Thời lượng hiệu dụng là của audio
-                            this_segment_overflowed_ms_loop = max(0, duration_of_audio_segment_content_ms_loop - target_srt_duration_ms)
-                            if this_segment_overflowed_ms_loop > 0:
-                                logging.info(f"{segment_log_prefix_tts_loop} Không cắt (do config). Audio dài hơn SRT ({this_segment_overflowed_ms_loop:.0f}ms). Thời lượng hiệu dụng sẽ là của audio.")
+                                        # (Logic cắt bằng FFmpeg của bạn ở đây, tương tự như trong code gốc,
+                                        #  nhưng output là path_for_audio_segment_content_loop mới và cập nhật duration_of_audio_segment_content_ms_loop)
+                                        # Ví dụ:
+                                        cut_fn_loop = f"cut_{current_segment_display_index_loop:04d}{os.path.splitext(path_for_audio_segment_content_loop)[1]}"
+                                        cut_fp_loop = os.path.join(adjusted_segments_output_folder_for_this_task, cut_fn_loop)
+                                        if segment_samples_loop is not None:
+                                            segment_samples_loop = dub_audio_engine.trim(segment_samples_loop, dub_audio_sr, 0, duration_to_cut_to_ms_loop)
+                                            duration_of_audio_segment_content_ms_loop = dub_audio_engine.duration_ms(segment_samples_loop, dub_audio_sr)
+                                            logging.info(f"{segment_log_prefix_tts_loop} Đã cắt audio, thời lượng mới: {duration_of_audio_segment_content_ms_loop:.0f}ms.")
+                                        elif self.dub_ffmpeg_cut_audio(path_for_audio_segment_content_loop, cut_fp_loop, 0, duration_to_cut_to_ms_loop): # Cần hàm dub_ffmpeg_cut_audio
+                                             path_for_audio_segment_content_loop = cut_fp_loop
+                                             duration_of_audio_segment_content_ms_loop = self.dub_get_audio_duration_ms(path_for_audio_segment_content_loop) or duration_to_cut_to_ms_loop
+                                             logging.info(f"{segment_log_prefix_tts_loop} Đã cắt audio, thời lượng mới: {duration_of_audio_segment_content_ms_loop:.0f}ms.")
+                                        else:
+                                             logging.warning(f"{segment_log_prefix_tts_loop} Lỗi cắt audio. Sử dụng audio chưa cắt.")
+                                        # final_effective_duration_for_this_segment_on_timeline_ms_loop vẫn là target_srt_duration_ms vì đã cắt
+                            else: # Không bật "Luôn cắt..."
+                                final_effective_duration_for_this_segment_on_timeline_ms_loop = duration_of_audio_segment_content_ms_loop # Thời lượng hiệu dụng là của audio
+                                this_segment_overflowed_ms_loop = max(0, duration_of_audio_segment_content_ms_loop - target_srt_duration_ms)
+                                if this_segment_overflowed_ms_loop > 0:
+                                    logging.info(f"{segment_log_prefix_tts_loop} Không cắt (do config). Audio dài hơn SRT ({this_segment_overflowed_ms_loop:.0f}ms). Thời lượng hiệu dụng sẽ là của audio.")
                         
-                        current_processed_audio_path_seg = path_for_audio_segment_content_loop # Cập nhật lại sau khi có thể đã cắt
-                        current_audio_duration_ms_seg = duration_of_audio_segment_content_ms_loop
-                        if self.dub_stop_event.is_set(): _worker_stopped_by_user = True; break
+                            current_processed_audio_path_seg = path_for_audio_segment_content_loop # Cập nhật lại sau khi có thể đã cắt
+                            current_audio_duration_ms_seg = duration_of_audio_segment_content_ms_loop
+                            if self.dub_stop_event.is_set(): _worker_stopped_by_user = True; break
                         
-                        # --- C.2.v. CHUẨN BỊ FILE AUDIO SEGMENT CUỐI CÙNG (WAV, ĐÃ FADE) ---
-                        # (Logic chuẩn hóa WAV, thêm leading silence, fade in/out của bạn như trước)
-                        # path_after_fade và actual_duration_of_this_processed_segment_ms được trả về
-                        path_for_processing_further_loop = current_processed_audio_path_seg
-                        duration_after_any_processing_loop = current_audio_duration_ms_seg
-
-                        std_wav_fn_loop = f"std_{current_segment_display_index_loop:04d}.wav"
-                        std_wav_fp_loop = os.path.join(adjusted_segments_output_folder_for_this_task, std_wav_fn_loop)
-                        if not path_for_processing_further_loop.lower().endswith(".wav"):
-                            if not self.dub_ffmpeg_standardize_to_wav(path_for_processing_further_loop, std_wav_fp_loop):
-                                logging.error(f"{segment_log_prefix_tts_loop} Lỗi chuẩn hóa WAV. Bỏ qua segment."); continue
-                            path_for_processing_further_loop = std_wav_fp_loop
-                        elif os.path.abspath(path_for_processing_further_loop) != os.path.abspath(std_wav_fp_loop):
-                            try: shutil.copy2(path_for_processing_further_loop, std_wav_fp_loop); path_for_processing_further_loop = std_wav_fp_loop
-                            except Exception as e_copy_std_wav: logging.error(f"Lỗi copy WAV (std): {e_copy_std_wav}"); continue
-                        duration_after_any_processing_loop = self.dub_get_audio_duration_ms(path_for_processing_further_loop) or 0
-                        if duration_after_any_processing_loop <= 0: logging.error(f"{segment_log_prefix_tts_loop} Lỗi: Duration sau chuẩn hóa WAV là 0. Bỏ qua."); continue                    
+                            # --- C.2.v. CHUẨN BỊ FILE AUDIO SEGMENT CUỐI CÙNG (WAV, ĐÃ FADE) ---
+                            # (Logic chuẩn hóa WAV, thêm leading silence, fade in/out của bạn như trước)
+                            # path_after_fade và actual_duration_of_this_processed_segment_ms được trả về
+                            path_for_processing_further_loop = current_processed_audio_path_seg
+                            duration_after_any_processing_loop = current_audio_duration_ms_seg
+
+                            if segment_samples_loop is not None:
+                                # Mảng đã ở định dạng xử lý (sample rate/kênh chuẩn): chỉ còn fade
+                                segment_samples_loop = dub_audio_engine.apply_fade(segment_samples_loop, dub_audio_sr, cfg_audio_fade_in_s, cfg_audio_fade_out_s, 0.0)
+                                path_after_fade_loop = raw_tts_filepath_seg
+                                actual_duration_of_this_processed_segment_ms_loop = dub_audio_engine.duration_ms(segment_samples_loop, dub_audio_sr)
+                                if actual_duration_of_this_processed_segment_ms_loop <= 0: logging.error(f"{segment_log_prefix_tts_loop} Lỗi: Duration sau xử lý là 0. Bỏ qua."); continue
+                                logging.info(f"{segment_log_prefix_tts_loop} Audio segment đã xử lý (NumPy): {actual_duration_of_this_processed_segment_ms_loop:.0f}ms.")
+                            else:
+                                std_wav_fn_loop = f"std_{current_segment_display_index_loop:04d}.wav"
+                                std_wav_fp_loop = os.path.join(adjusted_segments_output_folder_for_this_task, std_wav_fn_loop)
+                                if not path_for_processing_further_loop.lower().endswith(".wav"):
+                                    if not self.dub_ffmpeg_standardize_to_wav(path_for_processing_further_loop, std_wav_fp_loop):
+                                        logging.error(f"{segment_log_prefix_tts_loop} Lỗi chuẩn hóa WAV. Bỏ qua segment."); continue
+                                    path_for_processing_further_loop = std_wav_fp_loop
+                                elif os.path.abspath(path_for_processing_further_loop) != os.path.abspath(std_wav_fp_loop):
+                                    try: shutil.copy2(path_for_processing_further_loop, std_wav_fp_loop); path_for_processing_further_loop = std_wav_fp_loop
+                                    except Exception as e_copy_std_wav: logging.error(f"Lỗi copy WAV (std): {e_copy_std_wav}"); continue
+                                duration_after_any_processing_loop = self.dub_get_audio_duration_ms(path_for_processing_further_loop) or 0
+                                if duration_after_any_processing_loop <= 0: logging.error(f"{segment_log_prefix_tts_loop} Lỗi: Duration sau chuẩn hóa WAV là 0. Bỏ qua."); continue                    
                         
-                        path_after_fade_loop = path_for_processing_further_loop # Khởi tạo
-                        duration_for_fade_input_s_loop = duration_after_any_processing_loop / 1000.0
-                        min_dur_for_fade_loop = (cfg_audio_fade_in_s + cfg_audio_fade_out_s) + 0.0 + 0.02 
-                        if duration_for_fade_input_s_loop > min_dur_for_fade_loop:
-                            faded_wav_fn_loop = f"final_seg_{current_segment_display_index_loop:04d}.wav"
-                            faded_wav_fp_loop = os.path.join(adjusted_segments_output_folder_for_this_task, faded_wav_fn_loop)
-                            if self.dub_ffmpeg_apply_fade(path_for_processing_further_loop, faded_wav_fp_loop, 
-                                                          duration_for_fade_input_s_loop, cfg_audio_fade_in_s, cfg_audio_fade_out_s, 
-                                                          0.0):
-                                path_after_fade_loop = faded_wav_fp_loop
-                            else: logging.warning(f"{segment_log_prefix_tts_loop} Lỗi áp dụng fade.")
+                                path_after_fade_loop = path_for_processing_further_loop # Khởi tạo
+                                duration_for_fade_input_s_loop = duration_after_any_processing_loop / 1000.0
+                                min_dur_for_fade_loop = (cfg_audio_fade_in_s + cfg_audio_fade_out_s) + 0.0 + 0.02 
+                                if duration_for_fade_input_s_loop > min_dur_for_fade_loop:
+                                    faded_wav_fn_loop = f"final_seg_{current_segment_display_index_loop:04d}.wav"
+                                    faded_wav_fp_loop = os.path.join(adjusted_segments_output_folder_for_this_task, faded_wav_fn_loop)
+                                    if self.dub_ffmpeg_apply_fade(path_for_processing_further_loop, faded_wav_fp_loop, 
+                                                                  duration_for_fade_input_s_loop, cfg_audio_fade_in_s, cfg_audio_fade_out_s, 
+                                                                  0.0):
+                                        path_after_fade_loop = faded_wav_fp_loop
+                                    else: logging.warning(f"{segment_log_prefix_tts_loop} Lỗi áp dụng fade.")
                         
-                        actual_duration_of_this_processed_segment_ms_loop = self.dub_get_audio_duration_ms(path_after_fade_loop) or 0
-                        if actual_duration_of_this_processed_segment_ms_loop <= 0: logging.error(f"{segment_log_prefix_tts_loop} Lỗi: Duration sau fade là 0. Bỏ qua."); continue
-                        logging.info(f"{segment_log_prefix_tts_loop} Audio segment đã xử lý: {actual_duration_of_this_processed_segment_ms_loop:.0f}ms. Path: {os.path.basename(path_after_fade_loop)}")
+                                actual_duration_of_this_processed_segment_ms_loop = self.dub_get_audio_duration_ms(path_after_fade_loop) or 0
+                                if actual_duration_of_this_processed_segment_ms_loop <= 0: logging.error(f"{segment_log_prefix_tts_loop} Lỗi: Duration sau fade là 0. Bỏ qua."); continue
+                                logging.info(f"{segment_log_prefix_tts_loop} Audio segment đã xử lý: {actual_duration_of_this_processed_segment_ms_loop:.0f}ms. Path: {os.path.basename(path_after_fade_loop)}")
+
+                            if dub_manifest_worker is not None: # Lưu audio đã xử lý cho lần dub lại sau
+                                manifest_seg_fp = _segment_fingerprints_worker[segment_index_loop]
+                                try:
+                                    manifest_seg_audio_path = path_after_fade_loop
+                                    if segment_samples_loop is not None:
+                                        manifest_seg_audio_path = dub_manifest_worker.audio_path_for(manifest_seg_fp)
+                                        dub_audio_engine.write_wav(manifest_seg_audio_path, segment_samples_loop, dub_audio_sr)
+                                    dub_manifest_worker.store(manifest_seg_fp, manifest_seg_audio_path, actual_duration_of_this_processed_segment_ms_loop,
+                                                              effective_duration_ms=final_effective_duration_for_this_segment_on_timeline_ms_loop,
+                                                              overflow_ms=this_segment_overflowed_ms_loop)
+                                except Exception as e_manifest_seg: logging.warning(f"{segment_log_prefix_tts_loop} Không lưu được segment vào manifest: {e_manifest_seg}")
                         if self.dub_stop_event.is_set(): _worker_stopped_by_user = True; break
 
                         # --- C.2.vi. TÍNH TOÁN VÀ THÊM KHOẢNG LẶNG ĐỂ KHỚP TIMELINE ---
@@ -23270,12 +23628,8 @@ class SubtitleApp(ctk.CTk):
                             pass
                         
                         if silence_needed_before_ms > 10:
-                            # ... (logic tạo và thêm file silence TRƯỚC, cập nhật accumulated_timeline_ms)
-                            gap_before_file_name_loop = f"gap_before_{current_segment_display_index_loop:04d}.wav"
-                            gap_before_file_path_loop = os.path.join(adjusted_segments_output_folder_for_this_task, gap_before_file_name_loop)
-                            if self.dub_ffmpeg_create_silence_file(gap_before_file_path_loop, silence_needed_before_ms):
-                                final_processed_audio_files_for_concat_task.append(gap_before_file_path_loop)
-                                accumulated_timeline_ms += silence_needed_before_ms
+                            # Khoảng lặng TRƯỚC: chỉ dời vị trí đặt segment (timeline để trống = im lặng)
+                            accumulated_timeline_ms += silence_needed_before_ms
                         elif silence_needed_before_ms < -cfg_sync_tolerance_ms and not (this_segment_overflowed_ms_loop > 0):
                             logging.warning(f"{segment_log_prefix_tts_loop} Timeline bị âm ({silence_needed_before_ms:.0f}ms) TRƯỚC segment. Accumulated: {accumulated_timeline_ms:.0f}, TargetStart: {target_srt_start_time_ms:.0f}")
                             # Nếu timeline đã vượt quá điểm bắt đầu mong muốn, có thể cần cắt bớt audio trước đó hoặc chấp nhận lệch
@@ -23284,8 +23638,16 @@ class SubtitleApp(ctk.CTk):
                             # accumulated_timeline_ms = target_srt_start_time_ms
 
 
-                        final_processed_audio_files_for_concat_task.append(path_after_fade_loop)
-                        accumulated_timeline_ms += actual_duration_of_this_processed_segment_ms_loop
+                        # Vị trí đặt segment: "shift" nối tiếp timeline như cũ; "mix"/"truncate" đặt đúng SRT start
+                        # và để renderer xử lý phần chồng lấn với segment trước.
+                        placement_start_ms_loop = accumulated_timeline_ms
+                        if dub_overlap_policy != dub_audio_engine.OVERLAP_SHIFT:
+                            placement_start_ms_loop = min(accumulated_timeline_ms, target_srt_start_time_ms)
+                        if dub_audio_timeline is not None:
+                            _, accumulated_timeline_ms = dub_audio_timeline.place(placement_start_ms_loop, segment_samples_loop)
+                        else:
+                            dub_track_placements.append((placement_start_ms_loop, path_after_fade_loop, actual_duration_of_this_processed_segment_ms_loop))
+                            accumulated_timeline_ms = placement_start_ms_loop + actual_duration_of_this_processed_segment_ms_loop
                         
                         # Khoảng lặng SAU segment (để pad nếu audio ngắn hơn và cfg_sync_pad_short_tts=True)
                         # Điểm kết thúc MONG MUỐN trên timeline cho segment này
@@ -23294,12 +23656,7 @@ class SubtitleApp(ctk.CTk):
                         if cfg_sync_pad_short_tts:
                             silence_needed_after_ms = target_end_point_for_segment_on_timeline_ms - accumulated_timeline_ms
                             if silence_needed_after_ms > 10:
-                                # ... (logic tạo và thêm file silence SAU, cập nhật accumulated_timeline_ms)
-                                gap_after_file_name_loop = f"gap_after_{current_segment_display_index_loop:04d}.wav"
-                                gap_after_file_path_loop = os.path.join(adjusted_segments_output_folder_for_this_task, gap_after_file_name_loop)
-                                if self.dub_ffmpeg_create_silence_file(gap_after_file_path_loop, silence_needed_after_ms):
-                                    final_processed_audio_files_for_concat_task.append(gap_after_file_path_loop)
-                                    accumulated_timeline_ms += silence_needed_after_ms
+                                accumulated_timeline_ms += silence_needed_after_ms # Khoảng lặng SAU (ngầm định)
                         
                         # Đảm bảo accumulated_timeline_ms không nhỏ hơn điểm kết thúc mong muốn của segment này
                         accumulated_timeline_ms = max(accumulated_timeline_ms, target_end_point_for_segment_on_timeline_ms)
@@ -23314,35 +23671,36 @@ class SubtitleApp(ctk.CTk):
                                 gap_to_next_target_start = next_segment_target_start_ms - accumulated_timeline_ms
                                 # Chỉ thêm silence sau overflow nếu nó không làm lấn sang segment tiếp theo quá nhiều
                                 if gap_to_next_target_start > cfg_min_silence_after_overflow_ms:
-                                    silence_after_overflow_file = os.path.join(adjusted_segments_output_folder_for_this_task, f"gap_after_overflow_{current_segment_display_index_loop:04d}.wav")
-                                    if self.dub_ffmpeg_create_silence_file(silence_after_overflow_file, cfg_min_silence_after_overflow_ms):
-                                        final_processed_audio_files_for_concat_task.append(silence_after_overflow_file)
-                                        accumulated_timeline_ms += cfg_min_silence_after_overflow_ms
-                                        logging.info(f"{segment_log_prefix_tts_loop} Đã thêm {cfg_min_silence_after_overflow_ms}ms silence sau overflow.")
+                                    accumulated_timeline_ms += cfg_min_silence_after_overflow_ms
+                                    logging.info(f"{segment_log_prefix_tts_loop} Đã thêm {cfg_min_silence_after_overflow_ms}ms silence sau overflow.")
                         
                         if self.dub_stop_event.is_set(): _worker_stopped_by_user = True; break
                         _segments_successfully_processed_worker += 1
                         logging.info(f"{segment_log_prefix_tts_loop} Xong. Timeline cuối sau segment này: {accumulated_timeline_ms / 1000.0:.3f}s (Target End: {target_srt_end_time_ms / 1000.0:.3f}s)")
 
                     # ---- Kết thúc vòng lặp for segments_for_tts_engine_processing ----
+                    tts_results_iter_worker.close() # Hủy các request TTS chưa chạy nếu vòng lặp dừng sớm
+                    if dub_manifest_worker is not None: # Chỉ bỏ segment cũ khi đã đi hết kịch bản
+                        dub_manifest_worker.save(prune=not (_worker_stopped_by_user or _error_message_worker))
                     if _worker_stopped_by_user: raise InterruptedError("Dừng trong vòng lặp xử lý segments TTS.")
-                    if not final_processed_audio_files_for_concat_task:
+                    if not (len(dub_audio_timeline) if dub_audio_timeline is not None else dub_track_placements):
                         _error_message_worker = "Không có audio segments TTS nào được xử lý thành công để ghép."
                         raise ValueError(_error_message_worker)
+
+                    # TTS xong: trả slot mạng cho tác vụ tiếp theo, chờ slot CPU cho dựng track/chuẩn hóa/ghép video
+                    self.dub_scheduler.enter_stage(task_ctx, STAGE_CPU, self.dub_stop_event)
                     
-                    # --- C.2.vii. GHÉP CÁC FILE AUDIO ĐÃ XỬ LÝ THÀNH TRACK TTS HOÀN CHỈNH ---
-                    intermediate_concat_wav_path = os.path.join(dub_temp_base_for_this_task, "dub_tts_intermediate_all.wav")
-                    concat_list_file_tts_path = os.path.join(adjusted_segments_output_folder_for_this_task, "concat_list_tts.txt")
-                    with open(concat_list_file_tts_path, 'w', encoding='utf-8') as f_cl_tts:
-                        for wav_item_path_tts in final_processed_audio_files_for_concat_task:
-                            f_cl_tts.write(f"file '{os.path.abspath(wav_item_path_tts).replace(os.sep, '/')}'\n") # Dùng đường dẫn tuyệt đối
-                    
-                    if not self.dub_ffmpeg_concatenate_audios(concat_list_file_tts_path, intermediate_concat_wav_path):
-                        _error_message_worker = "Lỗi ghép các segment TTS thành track WAV trung gian."; raise RuntimeError(_error_message_worker)
+                    # --- C.2.vii. DỰNG TRACK TTS HOÀN CHỈNH (MỘT LƯỢT, THEO VỊ TRÍ TRÊN TIMELINE) ---
+                    if dub_audio_timeline is not None:
+                        try: dub_audio_timeline.close(total_ms=accumulated_timeline_ms)
+                        except Exception as e_write_track:
+                            _error_message_worker = f"Lỗi ghi track TTS WAV trung gian: {e_write_track}"; raise RuntimeError(_error_message_worker)
+                    elif not self.dub_ffmpeg_render_timeline(dub_track_placements, intermediate_concat_wav_path, accumulated_timeline_ms, dub_overlap_policy):
+                        _error_message_worker = "Lỗi dựng track WAV trung gian từ các segment TTS."; raise RuntimeError(_error_message_worker)
                     
                     # --- C.2.viii. CHUẨN HÓA VÀ CHUYỂN SANG MP3 CUỐI CÙNG CHO TRACK TTS ---
                     # Trường hợp có cả TTS và audio ngoài -> track TTS này sẽ được dùng để trộn
-                    if self.dub_audio_path_for_queue_temp and os.path.exists(self.dub_audio_path_for_queue_temp):
+                    if external_audio_path_task_worker and os.path.exists(external_audio_path_task_worker):
                         normalized_tts_mp3_for_mixing_path = os.path.join(dub_temp_base_for_this_task, "dub_tts_normalized_for_mix.mp3")
                         if not self.dub_ffmpeg_convert_wav_to_mp3_normalized(intermediate_concat_wav_path, normalized_tts_mp3_for_mixing_path):
                             _error_message_worker = "Lỗi chuẩn hóa MP3 cho track TTS (khi có audio ngoài)."; raise RuntimeError(_error_message_worker)
@@ -23353,7 +23711,7 @@ class SubtitleApp(ctk.CTk):
                             _error_message_worker = "Lỗi chuyển WAV (TTS) sang MP3 (normalized) cuối cùng."; raise RuntimeError(_error_message_worker)
                         final_audio_track_for_muxing_worker = final_mp3_track_normalized_path
                 
-                else: # is_current_task_direct_audio_mux is False VÀ segments_for_tts_engine_processing cũng rỗng (lỗi logic)
+                else: # task_ctx.is_direct_audio_mux is False VÀ segments_for_tts_engine_processing cũng rỗng (lỗi logic)
                     _error_message_worker = "Lỗi logic: Yêu cầu tạo TTS nhưng không có kịch bản nào được chuẩn bị."
                     raise RuntimeError(_error_message_worker)
 
@@ -23364,15 +23722,15 @@ class SubtitleApp(ctk.CTk):
                     raise RuntimeError(_error_message_worker)
 
                 # Xác định thư mục output và tên file output
-                output_dir_mux_final = self.dub_output_path_var.get() # Lấy từ self vì đã được restore
+                output_dir_mux_final = task_ctx.output_dir
                 os.makedirs(output_dir_mux_final, exist_ok=True)
                 video_base_mux_final = os.path.splitext(os.path.basename(video_input_path_task_worker))[0]
                 
                 engine_display_name_for_file_final = "audio_custom" # Mặc định nếu không rõ
-                if segments_for_tts_engine_processing and not self.is_current_task_direct_audio_mux : # Nếu có tạo TTS
-                    engine_name_raw_final = self.dub_selected_tts_engine_var.get()
+                if segments_for_tts_engine_processing and not task_ctx.is_direct_audio_mux : # Nếu có tạo TTS
+                    engine_name_raw_final = task_ctx.tts_engine
                     engine_display_name_for_file_final = engine_name_raw_final.split('(')[0].strip().lower().replace(" ", "_").replace("-","_")
-                elif self.is_current_task_direct_audio_mux:
+                elif task_ctx.is_direct_audio_mux:
                     engine_display_name_for_file_final = "external_audio"
                 
                 final_video_filename_mux_output = f"{create_safe_filename(video_base_mux_final)}_{engine_display_name_for_file_final}_PiuDub.mp4"
@@ -23383,19 +23741,22 @@ class SubtitleApp(ctk.CTk):
                 # Chỉ truyền audio ngoài vào hàm mux nếu tác vụ gốc có cả TTS VÀ audio ngoài (để trộn)
                 # Nếu là direct_audio_mux, thì audio ngoài đã trở thành final_audio_track_for_muxing_worker rồi.
                 if segments_for_tts_engine_processing and \
-                   self.dub_audio_path_for_queue_temp and \
-                   os.path.exists(self.dub_audio_path_for_queue_temp):
-                    external_audio_for_final_mux_if_any = self.dub_audio_path_for_queue_temp
+                   external_audio_path_task_worker and \
+                   os.path.exists(external_audio_path_task_worker):
+                    external_audio_for_final_mux_if_any = external_audio_path_task_worker
                 
                 mux_parameters = {
                     "video_input_path": video_input_path_task_worker,
                     "dub_audio_path": final_audio_track_for_muxing_worker, # Đây là track MP3 đã chuẩn hóa (từ TTS hoặc từ audio ngoài)
                     "output_video_path": _final_video_output_path_worker,
-                    "action": self.dub_background_audio_option_var.get(), # Lấy từ self đã restore
-                    "original_audio_mix_level": self.dub_background_mix_level_var.get(),
-                    "custom_bgm_path": self.dub_custom_bg_music_path_var.get() if self.dub_use_custom_bg_music_var.get() else None,
-                    "custom_bgm_level": self.get_validated_custom_bg_volume_float(),
-                    "external_audio_path": external_audio_for_final_mux_if_any # Chỉ dùng nếu có cả TTS và audio ngoài cần trộn
+                    "action": task_ctx.background_audio_option,
+                    "original_audio_mix_level": task_ctx.background_mix_level,
+                    "custom_bgm_path": task_ctx.custom_bg_music_path if task_ctx.use_custom_bg_music else None,
+                    "custom_bgm_level": task_ctx.custom_bg_music_volume,
+                    "external_audio_path": external_audio_for_final_mux_if_any, # Chỉ dùng nếu có cả TTS và audio ngoài cần trộn
+                    "use_custom_bgm": task_ctx.use_custom_bg_music,
+                    "custom_bgm_folder_path": task_ctx.custom_bg_music_folder_path,
+                    "randomize_bgm": task_ctx.randomize_bg_music,
                 }
                 
                 # Xử lý lại "action" cho hàm mux dựa trên logic bạn đã có
@@ -23442,6 +23803,13 @@ class SubtitleApp(ctk.CTk):
                 if not _error_message_worker: _error_message_worker = f"Lỗi không mong muốn trong worker: {str(e_general_worker)[:150]}"
                 logging.critical(f"{worker_log_prefix} {_error_message_worker}", exc_info=True) # Full exc_info cho lỗi lạ
             finally:
+                # Chờ các luồng TTS còn chạy kết thúc trước khi xóa thư mục chúng đang ghi vào
+                if tts_results_iter_worker is not None:
+                    try: tts_results_iter_worker.close()
+                    except Exception as e_close_tts: logging.warning(f"{worker_log_prefix} Lỗi đóng pipeline TTS: {e_close_tts}")
+                if dub_audio_timeline is not None:
+                    try: dub_audio_timeline.close()
+                    except Exception as e_close_track: logging.warning(f"{worker_log_prefix} Lỗi đóng track TTS: {e_close_track}")
                 # Dọn dẹp thư mục tạm của tác vụ
                 try:
                     if os.path.exists(dub_temp_base_for_this_task):
@@ -23458,11 +23826,8 @@ class SubtitleApp(ctk.CTk):
                 if not final_success_for_callback_ui and not _worker_stopped_by_user and not _error_message_worker:
                     _error_message_worker = "Lỗi không xác định trong quá trình xử lý thuyết minh."
 
-                self.after(0, self._handle_single_dub_task_completion, 
-                           final_success_for_callback_ui, 
-                           video_path_for_callback_ui, 
-                           _error_message_worker, 
-                           _worker_stopped_by_user)
+                # Scheduler trả slot rồi gọi _dub_on_task_worker_finished -> _handle_single_dub_task_completion
+                task_ctx.result = (final_success_for_callback_ui, video_path_for_callback_ui, _error_message_worker, _worker_stopped_by_user)
                 logging.info(f"{worker_log_prefix} Kết thúc worker. Gọi Callback với: Success={final_success_for_callback_ui}, Video={video_path_for_callback_ui}, ErrMsg='{_error_message_worker}', StoppedByUser={_worker_stopped_by_user}")
 
 
@@ -23763,23 +24128,34 @@ class SubtitleApp(ctk.CTk):
 
 
 # Hàm quản lý tác vụ chuyển tiếp trong hàng chờ
-    def _handle_single_dub_task_completion(self, was_successful, result_video_path, error_message, stopped_by_user):
+    def _handle_single_dub_task_completion(self, was_successful, result_video_path, error_message, stopped_by_user, task_id=None):
         """
         Callback xử lý khi một tác vụ thuyết minh hoàn thành.
         - Cập nhật UI hàng chờ.
         - Quyết định có áp dụng branding không.
         - Gọi hàm thêm vào hàng chờ upload.
         - Xử lý các bước tiếp theo trong hàng chờ thuyết minh.
+
+        Args:
+            task_id: ID tác vụ vừa xong (các tác vụ chạy song song nên không suy ra từ tác vụ hiện tại)
         """
-        task_id_just_completed = self.dub_currently_processing_task_id
+        task_id_just_completed = task_id or self.dub_currently_processing_task_id
         log_prefix_cb = f"[DubBatchCallback_{str(task_id_just_completed)[:6]}]"
 
+        # Branding xử lý từng video một: kết quả đến trong lúc đang branding thì chờ đến lượt
+        if self._dub_branding_in_progress:
+            logging.info(f"{log_prefix_cb} Đang branding video của tác vụ khác. Xếp kết quả này chờ xử lý.")
+            self._dub_completions_waiting.append((was_successful, result_video_path, error_message, stopped_by_user, task_id_just_completed))
+            return
+
         logging.info(f"{log_prefix_cb} Xử lý hoàn thành. Success: {was_successful}, Video: {result_video_path}, Error: {error_message}, Stopped: {stopped_by_user}")
 
         # Lấy bản sao của task object để sử dụng
         original_task_data = None
-        if task_id_just_completed and self.dub_processing_queue and self.dub_processing_queue[0].get('id') == task_id_just_completed:
-            original_task_data = self.dub_processing_queue[0].copy()
+        for queued_task in self.dub_processing_queue:
+            if task_id_just_completed and queued_task.get('id') == task_id_just_completed:
+                original_task_data = queued_task.copy()
+                break
 
         # Nếu tác vụ thành công, chúng ta cần quyết định video cuối cùng là gì và có branding không
         if was_successful and result_video_path and original_task_data:
@@ -23795,6 +24171,7 @@ class SubtitleApp(ctk.CTk):
 
                 # Hàm callback này sẽ được gọi SAU KHI branding xong
                 def _callback_after_branding(branding_success, branded_video_path, branding_error_msg, context_data):
+                    self._dub_branding_in_progress = False
                     task_object_from_branding = context_data.get("original_context_data", {})
                     log_prefix_brand_cb = f"[BrandingCb_ForDub_{str(task_object_from_branding.get('id',''))[:6]}]"
                     logging.info(f"{log_prefix_brand_cb} Branding hoàn tất. Success: {branding_success}")
@@ -23828,6 +24205,7 @@ class SubtitleApp(ctk.CTk):
                 }
                 
                 # Bắt đầu luồng branding và truyền callback ở trên
+                self._dub_branding_in_progress = True
                 self._start_branding_thread(
                     video_path_from_previous_step=result_video_path,
                     callback_after_branding=_callback_after_branding,
@@ -23849,13 +24227,31 @@ class SubtitleApp(ctk.CTk):
         """Hàm helper để dọn dẹp task đã xong và xử lý task tiếp theo hoặc kết thúc lô."""
         log_prefix_continue = f"[_ContinueDub_{str(completed_task_id)[:6]}]"
 
-        # Xóa tác vụ đã hoàn thành khỏi đầu hàng chờ
-        if self.dub_processing_queue and self.dub_processing_queue[0].get('id') == completed_task_id:
-            self.dub_processing_queue.pop(0)
+        # Xóa tác vụ đã hoàn thành khỏi hàng chờ (không nhất thiết ở đầu hàng chờ khi chạy song song)
+        for queue_index, queued_task in enumerate(self.dub_processing_queue):
+            if queued_task.get('id') == completed_task_id:
+                self.dub_processing_queue.pop(queue_index)
+                break
+        self.dub_started_task_ids.discard(completed_task_id)
 
-        self.dub_currently_processing_task_id = None
+        if self.dub_currently_processing_task_id == completed_task_id:
+            self.dub_currently_processing_task_id = None
         self.update_dub_queue_display()
 
+        # Kết quả của tác vụ khác đã chờ trong lúc branding -> xử lý tiếp
+        if self._dub_completions_waiting:
+            waiting_completion = self._dub_completions_waiting.pop(0)
+            self.after(100, lambda args=waiting_completion: self._handle_single_dub_task_completion(*args))
+            return
+
+        # Còn tác vụ khác đang chạy: chỉ lấp slot trống (nếu không dừng), lô kết thúc khi tác vụ cuối cùng xong
+        if self.dub_started_task_ids:
+            if not stopped_by_user and self.dub_is_processing:
+                self.after(100, self._dub_process_next_item_in_queue)
+            else:
+                logging.info(f"{log_prefix_continue} Đang dừng. Chờ {len(self.dub_started_task_ids)} tác vụ còn lại kết thúc.")
+            return
+
         if not stopped_by_user and self.dub_is_processing:
             if self.dub_processing_queue: # Nếu vẫn còn tác vụ trong hàng chờ
                 logging.info(f"{log_prefix_continue} Lên lịch xử lý tác vụ thuyết minh tiếp theo.")
@@ -23889,17 +24285,12 @@ class SubtitleApp(ctk.CTk):
 
         # --- B. RESET CÁC TRẠNG THÁI CHUNG ---
         self.dub_is_processing = False
-        if hasattr(self, 'dub_current_ffmpeg_process') and self.dub_current_ffmpeg_process:
-            try:
-                if self.dub_current_ffmpeg_process.poll() is None:
-                    self.dub_current_ffmpeg_process.terminate()
-                    self.dub_current_ffmpeg_process.wait(timeout=1.0)
-            except Exception as e_term_ffmpeg_final:
-                logging.warning(f"{log_prefix_bf} Lỗi khi cố dừng FFmpeg process còn sót lại: {e_term_ffmpeg_final}")
-            finally:
-                self.dub_current_ffmpeg_process = None
+        self._dub_terminate_ffmpeg_processes(log_prefix_bf)
         
         self.dub_currently_processing_task_id = None
+        self.dub_started_task_ids.clear()
+        self._dub_completions_waiting.clear()
+        self._dub_branding_in_progress = False
         
         # --- C. KHÔI PHỤC TRẠNG THÁI GIAO DIỆN ---
         try:
@@ -24138,8 +24529,30 @@ class SubtitleApp(ctk.CTk):
 
 
 # Hàm tạo TTS: Sử dụng OpenAI TTS API
-    def dub_speak_with_openai(self, text_to_speak, output_mp3_path, is_preview=False, max_retries=3, initial_retry_delay_s=20): # Giảm initial_retry_delay_s một chút
-        """Tạo file âm thanh MP3 từ text bằng OpenAI TTS API."""
+    def _dub_tts_cache_key(self, engine_name, voice_id, text, speaking_rate=1.0, pitch=0.0, ssml=False, extra=None):
+        """Khóa cache TTS cho một dòng, hoặc None nếu cache TTS bị tắt."""
+        tts_cache = getattr(self, 'tts_cache', None)
+        if tts_cache is None or not tts_cache.available:
+            return None
+        return tts_cache.make_key(engine_name, voice_id, text, speaking_rate=speaking_rate, pitch=pitch, ssml=ssml, extra=extra)
+
+    def _dub_tts_cache_restore(self, cache_key, output_path, log_prefix=""):
+        """Ghi audio đã cache ra output_path. Trả về True nếu trúng cache (không cần gọi engine)."""
+        if not cache_key or not self.tts_cache.get(cache_key, output_path):
+            return False
+        if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+            return False
+        logging.info(f"{log_prefix} Dùng audio từ cache TTS, bỏ qua gọi engine: {os.path.basename(output_path)}")
+        return True
+
+    def _dub_tts_cache_store(self, cache_key, audio_path, engine_name, voice_id, text):
+        """Lưu audio thô vừa tạo vào cache TTS (trước mọi bước hậu xử lý)."""
+        if cache_key:
+            self.tts_cache.put(cache_key, audio_path, engine=engine_name, voice_id=voice_id, text=text)
+
+    def dub_speak_with_openai(self, text_to_speak, output_mp3_path, is_preview=False, max_retries=3, initial_retry_delay_s=20, voice_id=None, tts_model=None): # Giảm initial_retry_delay_s một chút
+        """Tạo file âm thanh MP3 từ text bằng OpenAI TTS API.
+        voice_id/tts_model: cấu hình của tác vụ dub (None = lấy từ UI như preview)."""
         
         context_is_batch = hasattr(self, 'dub_is_processing') and self.dub_is_processing and not is_preview
         base_log_prefix = f"[Dubbing_OpenAI_Batch(Seg:{os.path.basename(output_mp3_path)})]" if context_is_batch else f"[Dubbing_OpenAI_Preview(File:{os.path.basename(output_mp3_path)})]"
@@ -24177,9 +24590,9 @@ class SubtitleApp(ctk.CTk):
         retries = 0
         current_delay_s = initial_retry_delay_s
 
-        # Lấy giọng đọc đã chọn từ self.dub_selected_voice_id_var (được cập nhật bởi dub_on_voice_selected)
-        selected_voice = self.dub_selected_voice_id_var.get()
-        if not selected_voice and self.dub_selected_tts_engine_var.get() == "OpenAI TTS":
+        # Lấy giọng đọc của tác vụ, hoặc đã chọn từ self.dub_selected_voice_id_var (được cập nhật bởi dub_on_voice_selected)
+        selected_voice = voice_id if voice_id is not None else self.dub_selected_voice_id_var.get()
+        if not selected_voice and (voice_id is not None or self.dub_selected_tts_engine_var.get() == "OpenAI TTS"):
             # Fallback nếu không có giọng nào được chọn cho OpenAI (dù dub_on_tts_engine_selected nên xử lý việc này)
             try:
                 default_openai_voice_id = list(self.dub_tts_voice_options["OpenAI TTS"].keys())[0]
@@ -24190,9 +24603,10 @@ class SubtitleApp(ctk.CTk):
                  selected_voice = "nova" # Fallback cứng
         
         # Sử dụng model đã cấu hình trong PiuApp.__init__ (self.dub_openai_tts_model)
-        tts_model_to_use = self.dub_openai_tts_model if hasattr(self, 'dub_openai_tts_model') else "tts-1"
+        tts_model_to_use = tts_model or (self.dub_openai_tts_model if hasattr(self, 'dub_openai_tts_model') else "tts-1")
 
         logging.info(f"{base_log_prefix} Sẽ sử dụng giọng: '{selected_voice}', model: '{tts_model_to_use}'.")
+        tts_cache_key = self._dub_tts_cache_key("OpenAI TTS", selected_voice, text_to_speak, extra={'model': tts_model_to_use})
 
         last_error_message_for_ui = "" # Lưu lỗi cuối cùng để hiển thị nếu tất cả retry thất bại
 
@@ -24209,20 +24623,22 @@ class SubtitleApp(ctk.CTk):
                 if is_preview and retries == 0: 
                     self.after(0, lambda: self.update_status(f"{log_prefix_with_retry} Đang gọi OpenAI TTS API..."))
                 
-                logging.debug(f"{log_prefix_with_retry} Gửi yêu cầu đến OpenAI TTS API...")
-                
-                response = client.audio.speech.create(
-                    model=tts_model_to_use,
-                    voice=selected_voice,
-                    input=text_to_speak,
-                    response_format="mp3" 
-                )
-                if self.dub_stop_event.is_set():
-                    logging.info(f"{log_prefix_with_retry} Yêu cầu dừng sau khi OpenAI API trả về, trước khi ghi file.")
-                    return False
-                
-                with open(output_mp3_path, 'wb') as f:
-                    f.write(response.content)
+                from_tts_cache = self._dub_tts_cache_restore(tts_cache_key, output_mp3_path, log_prefix_with_retry)
+                if not from_tts_cache:
+                    logging.debug(f"{log_prefix_with_retry} Gửi yêu cầu đến OpenAI TTS API...")
+
+                    response = client.audio.speech.create(
+                        model=tts_model_to_use,
+                        voice=selected_voice,
+                        input=text_to_speak,
+                        response_format="mp3" 
+                    )
+                    if self.dub_stop_event.is_set():
+                        logging.info(f"{log_prefix_with_retry} Yêu cầu dừng sau khi OpenAI API trả về, trước khi ghi file.")
+                        return False
+
+                    with open(output_mp3_path, 'wb') as f:
+                        f.write(response.content)
                 
                 if not os.path.exists(output_mp3_path) or os.path.getsize(output_mp3_path) == 0:
                     error_msg_file = f"{log_prefix_with_retry} Lỗi: File MP3 output không được tạo hoặc rỗng."
@@ -24230,7 +24646,9 @@ class SubtitleApp(ctk.CTk):
                     last_error_message_for_ui = error_msg_file
                     if is_preview: self.after(0, lambda msg=error_msg_file: self.update_status(msg))
                     return False
-                self._track_api_call(service_name="openai_tts_chars", units=len(text_to_speak))
+                if not from_tts_cache:
+                    self._track_api_call(service_name="openai_tts_chars", units=len(text_to_speak))
+                    self._dub_tts_cache_store(tts_cache_key, output_mp3_path, "OpenAI TTS", selected_voice, text_to_speak)
 
                 # <<< GỌI HÀM TỐI ƯU MỚI >>>
                 if not is_preview: # Chỉ tối ưu cho file không phải preview, hoặc tùy bạn quyết định
@@ -24310,9 +24728,10 @@ class SubtitleApp(ctk.CTk):
 
 
 # Tạo file âm thanh MP3 từ text hoặc SSML bằng Google Cloud TTS API ( Ngôn Ngữ Động )
-    def dub_speak_with_google(self, text_to_speak_or_ssml, output_mp3_path, is_preview=False, max_retries=2, initial_retry_delay_s=15):
+    def dub_speak_with_google(self, text_to_speak_or_ssml, output_mp3_path, is_preview=False, max_retries=2, initial_retry_delay_s=15, voice_id=None):
         """Tạo file âm thanh MP3 từ text hoặc SSML bằng Google Cloud TTS API.
         >>> ĐÃ SỬA LỖI: Tự động xác định mã ngôn ngữ từ ID của giọng đọc. <<<
+        voice_id: giọng của tác vụ dub (None = lấy từ UI như preview).
         """
 
         with keep_awake("Synthesize TTS (GCloud)"):
@@ -24340,7 +24759,6 @@ class SubtitleApp(ctk.CTk):
 
             try:
                 from google.cloud import texttospeech as google_tts_client
-                from google.oauth2 import service_account as google_service_auth
                 from google.api_core import exceptions as google_api_exceptions
             except ImportError:
                 error_msg_ui = "Lỗi thư viện: Google Cloud Text-to-Speech SDK chưa được cài đặt.\nVui lòng cài đặt: pip install google-cloud-texttospeech google-auth"
@@ -24352,7 +24770,7 @@ class SubtitleApp(ctk.CTk):
             retries = 0
             current_delay_s = initial_retry_delay_s
 
-            selected_voice_name = self.dub_selected_voice_id_var.get()
+            selected_voice_name = voice_id if voice_id is not None else self.dub_selected_voice_id_var.get()
 
             # Tự động trích xuất mã ngôn ngữ từ ID giọng đọc
             language_code_to_use = "vi-VN" # Mặc định an toàn
@@ -24365,7 +24783,7 @@ class SubtitleApp(ctk.CTk):
                 except Exception:
                     logging.warning(f"{base_log_prefix} Không thể trích xuất mã ngôn ngữ từ '{selected_voice_name}', dùng mặc định 'vi-VN'.")
 
-            if not selected_voice_name and self.dub_selected_tts_engine_var.get() == "Google Cloud TTS":
+            if not selected_voice_name and (voice_id is not None or self.dub_selected_tts_engine_var.get() == "Google Cloud TTS"):
                 try:
                     default_google_voice_id = list(self.dub_tts_voice_options["Google Cloud TTS"].keys())[0]
                     selected_voice_name = default_google_voice_id
@@ -24375,6 +24793,8 @@ class SubtitleApp(ctk.CTk):
                      selected_voice_name = "vi-VN-Neural2-A"
             
             logging.info(f"{base_log_prefix} Sẽ sử dụng giọng: '{selected_voice_name}', ngôn ngữ: '{language_code_to_use}'.")
+            tts_cache_key = self._dub_tts_cache_key("Google Cloud TTS", selected_voice_name, text_to_speak_or_ssml,
+                                                    ssml=is_ssml_input, extra={'language': language_code_to_use})
             last_error_message_for_ui = ""
 
             while retries <= max_retries:
@@ -24388,8 +24808,8 @@ class SubtitleApp(ctk.CTk):
                         logging.info(f"{log_prefix_with_retry} Đang thử lại sau {current_delay_s} giây...")
                         time.sleep(current_delay_s)
 
-                    gcp_credentials = google_service_auth.Credentials.from_service_account_file(current_google_key_path)
-                    client = google_tts_client.TextToSpeechClient(credentials=gcp_credentials)
+                    # Client TTS dùng chung từ pool (tự nạp lại khi file key thay đổi)
+                    client = get_google_tts_client(current_google_key_path)
                     
                     def __normalize_ascii_quotes(text: str) -> str:
                         out = []
@@ -24442,17 +24862,19 @@ class SubtitleApp(ctk.CTk):
                     if is_preview and retries == 0: 
                         self.after(0, lambda: self.update_status(f"{log_prefix_with_retry} Đang gọi Google Cloud TTS API..."))
                     
-                    logging.debug(f"{log_prefix_with_retry} Gửi yêu cầu đến Google Cloud TTS API...")
-                    response = client.synthesize_speech(
-                        request={"input": synthesis_input, "voice": voice_params, "audio_config": audio_config}
-                    )
+                    from_tts_cache = self._dub_tts_cache_restore(tts_cache_key, output_mp3_path, log_prefix_with_retry)
+                    if not from_tts_cache:
+                        logging.debug(f"{log_prefix_with_retry} Gửi yêu cầu đến Google Cloud TTS API...")
+                        response = client.synthesize_speech(
+                            request={"input": synthesis_input, "voice": voice_params, "audio_config": audio_config}
+                        )
 
-                    if self.dub_stop_event.is_set():
-                        logging.info(f"{log_prefix_with_retry} Yêu cầu dừng sau khi Google API trả về, trước khi ghi file.")
-                        return False
-                    
-                    with open(output_mp3_path, 'wb') as out_file:
-                        out_file.write(response.audio_content)
+                        if self.dub_stop_event.is_set():
+                            logging.info(f"{log_prefix_with_retry} Yêu cầu dừng sau khi Google API trả về, trước khi ghi file.")
+                            return False
+
+                        with open(output_mp3_path, 'wb') as out_file:
+                            out_file.write(response.audio_content)
 
                     if not os.path.exists(output_mp3_path) or os.path.getsize(output_mp3_path) == 0:
                         error_msg_file = f"{log_prefix_with_retry} Lỗi: File MP3 output không được tạo hoặc rỗng."
@@ -24460,7 +24882,9 @@ class SubtitleApp(ctk.CTk):
                         last_error_message_for_ui = error_msg_file
                         if is_preview: self.after(0, lambda msg=error_msg_file: self.update_status(msg))
                         return False 
-                    self._track_api_call(service_name="google_tts_chars", units=len(text_to_speak_or_ssml))
+                    if not from_tts_cache:
+                        self._track_api_call(service_name="google_tts_chars", units=len(text_to_speak_or_ssml))
+                        self._dub_tts_cache_store(tts_cache_key, output_mp3_path, "Google Cloud TTS", selected_voice_name, text_to_speak_or_ssml)
 
                     if not is_preview:
                         logging.info(f"{log_prefix_with_retry} Bắt đầu tối ưu khoảng lặng cho file Google TTS: {os.path.basename(output_mp3_path)}")
@@ -24601,26 +25025,28 @@ class SubtitleApp(ctk.CTk):
                 self.after(0, lambda: messagebox.showinfo("Thông tin", "Không có nội dung text để tạo âm thanh.", parent=self))
             return False
 
+        # gTTS chỉ cần khi dub: import lười (gTTSError cần có trước khối try bên dưới)
+        from gtts import gTTS
+        from gtts.tts import gTTSError
+
         try:
             if is_preview:
                  self.after(0, lambda: self.update_status(f"{base_log_prefix} Đang gọi API Google Translate (gTTS)..."))
 
             # lang='vi' cho tiếng Việt. gTTS không có nhiều tùy chọn giọng cho cùng một ngôn ngữ.
-            tts_object = gTTS(text=text_to_speak, lang='vi', slow=False)
-            tts_object.save(output_mp3_path)
+            tts_cache_key = self._dub_tts_cache_key("Google Translate (gTTS)", "vi", text_to_speak, extra={'slow': False})
+            from_tts_cache = self._dub_tts_cache_restore(tts_cache_key, output_mp3_path, base_log_prefix)
+            if not from_tts_cache:
+                tts_object = gTTS(text=text_to_speak, lang='vi', slow=False)
+                tts_object.save(output_mp3_path)
 
             if not os.path.exists(output_mp3_path) or os.path.getsize(output_mp3_path) == 0:
                 error_msg_file = f"{base_log_prefix} Lỗi: File MP3 output không được gTTS tạo hoặc rỗng."
                 logging.error(error_msg_file)
                 if is_preview: self.after(0, lambda msg=error_msg_file: self.update_status(msg))
                 return False
-                # <<< GỌI HÀM TỐI ƯU MỚI >>>
-                if not is_preview: # Chỉ tối ưu cho file không phải preview, hoặc tùy bạn quyết định
-                    logging.info(f"{log_prefix_with_retry} Bắt đầu tối ưu khoảng lặng cho file OpenAI TTS: {os.path.basename(output_mp3_path)}")
-                    if not self._optimize_trailing_silence_ffmpeg(output_mp3_path, target_pause_ms=150):
-                        logging.warning(f"{log_prefix_with_retry} Tối ưu khoảng lặng cho OpenAI TTS có thể đã thất bại. Tiếp tục với file chưa tối ưu.")
-                    else:
-                        logging.info(f"{log_prefix_with_retry} Tối ưu khoảng lặng cho OpenAI TTS thành công.")
+            if not from_tts_cache:
+                self._dub_tts_cache_store(tts_cache_key, output_mp3_path, "Google Translate (gTTS)", "vi", text_to_speak)
 
             success_msg = f"{base_log_prefix} Thành công: Đã tạo {os.path.basename(output_mp3_path)}"
             logging.info(success_msg)
@@ -24664,7 +25090,7 @@ class SubtitleApp(ctk.CTk):
 
 
 # Hàm sử dụng giọng đọc hệ thống
-    def dub_speak_with_system_tts(self, text_to_speak, output_audio_path, is_preview=False):
+    def dub_speak_with_system_tts(self, text_to_speak, output_audio_path, is_preview=False, voice_id=None):
         """Tạo file âm thanh từ text bằng pyttsx3 (Giọng đọc Hệ thống).
         Hàm này sẽ cố gắng lưu file dưới dạng WAV.
         Sử dụng thread.join() với timeout để chờ engine.runAndWait().
@@ -24699,6 +25125,12 @@ class SubtitleApp(ctk.CTk):
 
         engine = None
         tts_thread = None # Khởi tạo biến thread
+        selected_voice_id_for_system = voice_id if voice_id is not None else self.dub_selected_voice_id_var.get()
+        tts_cache_key = self._dub_tts_cache_key("Giọng đọc Hệ thống (Offline)", selected_voice_id_for_system, text_to_speak)
+        if self._dub_tts_cache_restore(tts_cache_key, final_output_wav_path, base_log_prefix):
+            if is_preview and PLAYSOUND_AVAILABLE and playsound:
+                threading.Thread(target=playsound, args=(os.path.abspath(final_output_wav_path),), daemon=True).start()
+            return True
         try:
             if is_preview:
                 self.after(0, lambda: self.update_status(f"{base_log_prefix} Đang khởi tạo engine pyttsx3..."))
@@ -24707,7 +25139,6 @@ class SubtitleApp(ctk.CTk):
             if engine is None:
                 raise RuntimeError("pyttsx3.init() trả về None.")
 
-            selected_voice_id_for_system = self.dub_selected_voice_id_var.get()
             if selected_voice_id_for_system and selected_voice_id_for_system != "default_system_voice":
                 try:
                     engine.setProperty('voice', selected_voice_id_for_system)
@@ -24766,6 +25197,7 @@ class SubtitleApp(ctk.CTk):
                     else:
                         logging.info(f"{log_prefix_with_retry} Tối ưu khoảng lặng cho OpenAI TTS thành công.")
 
+            self._dub_tts_cache_store(tts_cache_key, final_output_wav_path, "Giọng đọc Hệ thống (Offline)", selected_voice_id_for_system, text_to_speak)
             success_msg = f"{base_log_prefix} Thành công: Đã tạo {os.path.basename(final_output_wav_path)}"
             logging.info(success_msg)
 
@@ -25326,13 +25758,103 @@ class SubtitleApp(ctk.CTk):
             return False
 
 
+# Hàm FFmpeg: Dựng track audio từ các segment đặt theo vị trí trên timeline (một đồ thị adelay/amix)
+    def dub_ffmpeg_render_timeline(self, placements, output_path, total_ms, overlap_policy="shift"):
+        """
+        Render segments at their timeline positions into one WAV (fallback when NumPy is unavailable).
+
+        Args:
+            placements: List of (start_ms, wav_path, duration_ms) in timeline order
+            output_path: Output WAV path
+            total_ms: Length of the track (padded with silence)
+            overlap_policy: "shift", "mix" or "truncate" (see dub_audio_engine.resolve_overlaps)
+
+        Returns:
+            True if the track was written
+        """
+        from services import dub_audio_engine
+
+        if self.dub_stop_event.is_set():
+            logging.info(f"[DubbingFFmpeg] Dựng track bị hủy ({os.path.basename(output_path)}) do yêu cầu dừng.")
+            return False
+        if not placements:
+            return False
+
+        sample_rate = self.dub_TARGET_AUDIO_PROCESSING_SAMPLE_RATE
+        channels = self.dub_TARGET_AUDIO_PROCESSING_CHANNELS
+        resolved = dub_audio_engine.resolve_overlaps([(start_ms, dur_ms) for start_ms, _, dur_ms in placements], overlap_policy)
+        items = [(path, start_ms, kept_ms) for (_, path, _), (start_ms, kept_ms) in zip(placements, resolved) if kept_ms > 0]
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+
+        def _render(batch_items, batch_output_path, batch_name):
+            script_path = os.path.join(output_dir, f"{batch_name}_filter.txt")
+            with open(script_path, 'w', encoding='utf-8') as f_script:
+                f_script.write(dub_audio_engine.build_mix_filter_script(
+                    [(i, start_ms, kept_ms) for i, (_, start_ms, kept_ms) in enumerate(batch_items)],
+                    sample_rate, channels, total_ms
+                ))
+            cmd_params = ["-y"]
+            for item_path, _, _ in batch_items:
+                cmd_params += ["-i", os.path.abspath(item_path)]
+            cmd_params += [
+                "-filter_complex_script", script_path, "-map", "[out]",
+                "-c:a", self.dub_DEFAULT_WAV_CODEC, "-ar", str(sample_rate), "-ac", str(channels),
+                os.path.abspath(batch_output_path)
+            ]
+            ffmpeg_run_command(
+                cmd_params,
+                process_name="DubbingFFmpeg_RenderTimeline",
+                stop_event=self.dub_stop_event,
+                set_current_process=lambda p: setattr(self, 'dub_current_ffmpeg_process', p),
+                clear_current_process=lambda: setattr(self, 'dub_current_ffmpeg_process', None),
+                timeout_seconds=600,
+            )
+
+        logging.info(f"[DubbingFFmpeg] Dựng track từ {len(items)} segment ({total_ms / 1000.0:.2f}s, chồng lấn: {overlap_policy}).")
+        try:
+            # Giới hạn số input mỗi lệnh FFmpeg; nhiều hơn thì dựng từng phần (đủ độ dài) rồi trộn lại
+            max_inputs = self.dub_FFMPEG_MIX_MAX_INPUTS
+            level = 0
+            while len(items) > max_inputs:
+                part_items = []
+                for part_index in range(0, len(items), max_inputs):
+                    part_path = os.path.join(output_dir, f"timeline_part_{level}_{part_index // max_inputs:03d}.wav")
+                    _render(items[part_index:part_index + max_inputs], part_path, f"timeline_part_{level}_{part_index // max_inputs:03d}")
+                    part_items.append((part_path, 0.0, None))
+                items, level = part_items, level + 1
+            _render(items, output_path, "timeline_final")
+            if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+                logging.error(f"[DubbingFFmpeg] Lỗi dựng track: File output rỗng.")
+                return False
+            logging.debug(f"[DubbingFFmpeg] Dựng track thành công: {os.path.basename(output_path)}")
+            return True
+        except Exception as e_gen:
+            logging.error(f"[DubbingFFmpeg] Lỗi khi dựng track: {e_gen}", exc_info=True)
+            return False
+
+
 # Hàm FFmpeg: Chuyển đổi WAV sang MP3 và chuẩn hóa độ lớn
-    def dub_ffmpeg_convert_wav_to_mp3_normalized(self, input_wav_path, output_mp3_path):
+    def dub_ffmpeg_convert_wav_to_mp3_normalized(self, input_wav_path, output_mp3_path, target_i=-14.0, target_lra=7.0, target_tp=-1.5):
+        """
+        Chuẩn hóa EBU R128 hai lượt nhưng chỉ một lần encode: thông số độ lớn được đo
+        một lần (NumPy trên WAV, hoặc một lượt phân tích FFmpeg), lưu cạnh file, rồi
+        đưa vào loudnorm chế độ tuyến tính trong lượt chuyển sang MP3.
+        """
         if self.dub_stop_event.is_set():
             logging.info(f"[DubbingFFmpeg] Chuyển MP3 (norm) bị hủy cho '{os.path.basename(input_wav_path)}' do yêu cầu dừng.")
             return False
 
-        loudnorm_filter = "loudnorm=I=-14:LRA=7:TP=-1.5:print_format=summary"
+        from services import loudness_analysis
+        loudness_stats = self._dub_get_loudness_stats(input_wav_path, target_i, target_lra, target_tp)
+        loudnorm_filter = loudness_analysis.loudnorm_apply_filter(loudness_stats, target_i, target_tp, target_lra)
+        if loudnorm_filter:
+            logging.info(
+                f"[DubbingFFmpeg] Độ lớn đã đo: {loudness_stats['integrated_lufs']:.1f} LUFS, TP {loudness_stats['true_peak_db']:.1f} dBTP, "
+                f"LRA {loudness_stats['lra']:.1f} LU -> "
+                f"{'tuyến tính' if loudness_analysis.is_linear_possible(loudness_stats, target_i, target_tp, target_lra) else 'động (vượt TP/LRA)'}."
+            )
+        else:
+            loudnorm_filter = f"loudnorm=I={target_i:g}:LRA={target_lra:g}:TP={target_tp:g}:print_format=summary"
         cmd_params = [
             "-y", "-i", os.path.abspath(input_wav_path),
             "-af", loudnorm_filter, "-c:a", "libmp3lame",
@@ -25361,6 +25883,36 @@ class SubtitleApp(ctk.CTk):
             return False
 
 
+# Lấy thông số độ lớn (EBU R128) của một file: cache cạnh file -> đo NumPy -> một lượt phân tích FFmpeg
+    def _dub_get_loudness_stats(self, input_path, target_i, target_lra, target_tp):
+        from services import loudness_analysis
+
+        stats = loudness_analysis.get_cached_or_measured_stats(input_path)
+        if stats is not None:
+            return stats
+        cmd_params = [
+            "-hide_banner", "-nostdin", "-i", os.path.abspath(input_path),
+            "-af", loudness_analysis.loudnorm_analysis_filter(target_i, target_tp, target_lra),
+            "-f", "null", "-",
+        ]
+        try:
+            _, _, stderr_text = ffmpeg_run_command(
+                cmd_params,
+                process_name="DubbingFFmpeg_LoudnessAnalysis",
+                stop_event=self.dub_stop_event,
+                set_current_process=lambda p: setattr(self, 'dub_current_ffmpeg_process', p),
+                clear_current_process=lambda: setattr(self, 'dub_current_ffmpeg_process', None),
+                timeout_seconds=300,
+            )
+        except Exception as e:
+            logging.warning(f"[DubbingFFmpeg] Lượt đo độ lớn thất bại, dùng loudnorm một lượt: {e}")
+            return None
+        stats = loudness_analysis.parse_loudnorm_json(stderr_text)
+        if stats is not None:
+            loudness_analysis.store_cached_stats(input_path, stats)
+        return stats
+
+
 
 # Hàm FFmpeg: Ghép (mux) video gốc với track âm thanh thuyết minh và tùy chọn nhạc nền
     def dub_ffmpeg_mux_video_audio(self, video_input_path, dub_audio_path, output_video_path,
@@ -25368,12 +25920,17 @@ class SubtitleApp(ctk.CTk):
                                    original_audio_mix_level=0.15,
                                    custom_bgm_path=None, 
                                    custom_bgm_level=0.2,
-                                   external_audio_path=None):
+                                   external_audio_path=None,
+                                   use_custom_bgm=None,
+                                   custom_bgm_folder_path=None,
+                                   randomize_bgm=None):
         """
         (PHIÊN BẢN SỬA LỖI LOGIC BGM)
         Ghép video, audio thuyết minh, và nhạc nền.
         - Đảm bảo logic tiền xử lý nhạc nền (fade, concat) được thực thi đúng.
         - Giữ nguyên logic xử lý audio thuyết minh dài/ngắn hơn video.
+        - use_custom_bgm/custom_bgm_folder_path/randomize_bgm: cấu hình nhạc nền của tác vụ dub
+          (None = lấy từ UI).
         """
 
         with keep_awake("Mux audio/video & branding"):
@@ -25415,13 +25972,19 @@ class SubtitleApp(ctk.CTk):
                 
                 # === BƯỚC 2: TIỀN XỬ LÝ NHẠC NỀN (BGM) NẾU CÓ ===
                 # Logic này được đưa lên trước và cấu trúc lại để rõ ràng hơn.
-                if self.dub_use_custom_bg_music_var.get():
-                    use_bgm_from_folder = self.dub_custom_bg_music_folder_path_var.get()
+                if use_custom_bgm is None:
+                    use_custom_bgm = self.dub_use_custom_bg_music_var.get()
+                if custom_bgm_folder_path is None:
+                    custom_bgm_folder_path = self.dub_custom_bg_music_folder_path_var.get()
+                if randomize_bgm is None:
+                    randomize_bgm = self.dub_randomize_bg_music_var.get()
+                if use_custom_bgm:
+                    use_bgm_from_folder = custom_bgm_folder_path
                     use_bgm_from_single_file = custom_bgm_path and not use_bgm_from_folder
 
                     if use_bgm_from_folder:
                         logging.info(f"{worker_log_prefix} Chế độ nhạc nền từ thư mục: {use_bgm_from_folder}")
-                        bgm_list = self._prepare_bgm_list_from_folder(use_bgm_from_folder, self.dub_randomize_bg_music_var.get())
+                        bgm_list = self._prepare_bgm_list_from_folder(use_bgm_from_folder, randomize_bgm)
                         if bgm_list:
                             temp_concat_path = os.path.join(self.temp_folder, f"bgm_concat_{uuid.uuid4().hex[:6]}.m4a")
                             final_bgm_path_for_mux, temp_files = self._ffmpeg_create_concatenated_bgm(bgm_list, temp_concat_path, video_input_path)
@@ -25613,130 +26176,22 @@ class SubtitleApp(ctk.CTk):
 
 
 
-# Hàm tiện ích: Lấy thời lượng file audio bằng ffprobe (fallback)
-    def dub_get_audio_duration_ms_ffprobe(self, file_path, ffmpeg_executable_path_from_caller):
-        """
-        Lấy thời lượng audio (ms) bằng ffprobe. Trả về None nếu lỗi.
-        Hàm này nhận đường dẫn ffmpeg đã được xác định từ hàm gọi.
-        """
-        if not ffmpeg_executable_path_from_caller:
-            logging.error("[DubbingAudio_FFprobe] Đường dẫn FFmpeg không được cung cấp từ hàm gọi.")
-            return None
-        
-        # Xác định đường dẫn ffprobe dựa trên đường dẫn ffmpeg đã cung cấp
-        ffprobe_exe_name = "ffprobe.exe" if platform.system() == "Windows" else "ffprobe"
-        ffprobe_path_candidate = os.path.join(os.path.dirname(ffmpeg_executable_path_from_caller), ffprobe_exe_name)
-        final_ffprobe_path = None
-
-        if os.path.exists(ffprobe_path_candidate) and os.access(ffprobe_path_candidate, os.X_OK):
-            final_ffprobe_path = ffprobe_path_candidate
-            logging.debug(f"[DubbingAudio_FFprobe] Sử dụng ffprobe đi kèm ffmpeg: {final_ffprobe_path}")
-        else:
-            # Nếu không tìm thấy cùng thư mục, thử tìm trong PATH hệ thống
-            ffprobe_path_system = shutil.which(ffprobe_exe_name)
-            if ffprobe_path_system:
-                final_ffprobe_path = ffprobe_path_system
-                logging.debug(f"[DubbingAudio_FFprobe] Sử dụng ffprobe từ PATH hệ thống: {final_ffprobe_path}")
-            else:
-                logging.error(f"[DubbingAudio_FFprobe] Không tìm thấy ffprobe tại '{ffprobe_path_candidate}' "
-                              f"(dựa trên ffmpeg: {ffmpeg_executable_path_from_caller}) hoặc trong PATH hệ thống.")
-                return None
-        
-        command = [
-            final_ffprobe_path, 
-            "-v", "error", 
-            "-show_entries", "format=duration", 
-            "-of", "default=noprint_wrappers=1:nokey=1", 
-            os.path.abspath(file_path)
-        ]
-        logging.debug(f"[DubbingAudio_FFprobe] Lệnh ffprobe duration: {' '.join(command)}")
-        try:
-            creation_flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-            result = subprocess.run(command, capture_output=True, text=True, check=True, timeout=15, creationflags=creation_flags) # Tăng timeout nhẹ
-            duration_seconds_str = result.stdout.strip()
-            if duration_seconds_str and duration_seconds_str != "N/A":
-                duration_ms = int(float(duration_seconds_str) * 1000)
-                logging.debug(f"[DubbingAudio_FFprobe] ffprobe duration cho '{os.path.basename(file_path)}': {duration_ms}ms")
-                return duration_ms
-            else:
-                logging.warning(f"[DubbingAudio_FFprobe] ffprobe không trả về thời lượng hợp lệ cho '{os.path.basename(file_path)}'. "
-                                f"Output: '{duration_seconds_str}'")
-                return None
-        except subprocess.CalledProcessError as e:
-            logging.error(f"[DubbingAudio_FFprobe] Lỗi CalledProcessError với ffprobe cho '{os.path.basename(file_path)}': {e.stderr}")
-            return None
-        except subprocess.TimeoutExpired:
-            logging.error(f"[DubbingAudio_FFprobe] Timeout (15s) với ffprobe cho '{os.path.basename(file_path)}'.")
-            return None
-        except Exception as e:
-            logging.error(f"[DubbingAudio_FFprobe] Lỗi không mong muốn với ffprobe cho '{os.path.basename(file_path)}': {e}", exc_info=True)
-            return None
-        
-
-    # Hàm tiện ích: Lấy thời lượng file audio (ms), ưu tiên mutagen, fallback ffprobe
+# Hàm tiện ích: Lấy thời lượng file audio (ms) qua cache probe
     def dub_get_audio_duration_ms(self, file_path):
         """
-        Lấy thời lượng audio (ms). Ưu tiên mutagen, fallback ffprobe.
+        Lấy thời lượng audio (ms): WAV/MP3 đọc từ header, định dạng khác dùng ffprobe; kết quả được cache.
         Trả về None nếu không thể xác định.
-        Sửa lỗi: Gọi hàm find_ffmpeg() toàn cục thay vì self.find_ffmpeg().
         """
         if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
             logging.warning(f"[DubbingAudio] File audio không tồn tại hoặc rỗng: {file_path}")
             return None
-        
-        duration_ms = None
-        file_ext = os.path.splitext(file_path)[1].lower()
-        audio_info = None
-
-        # Gọi hàm find_ffmpeg() toàn cục
-        ffmpeg_path_for_ffprobe_usage = find_ffmpeg()
-
-        if not ffmpeg_path_for_ffprobe_usage:
-            logging.error(f"[DubbingAudio] Không tìm thấy FFmpeg khi bắt đầu dub_get_audio_duration_ms cho file: {file_path}. "
-                          "Không thể sử dụng ffprobe làm fallback.")
-
-        try:
-            if file_ext == ".mp3": audio_info = MP3(file_path)
-            elif file_ext == ".wav": audio_info = WAVE(file_path)
-            elif file_ext == ".flac": audio_info = FLAC(file_path)
-            elif file_ext == ".ogg" or file_ext == ".opus": audio_info = OggOpus(file_path)
-            elif file_ext == ".aac" or file_ext == ".m4a": audio_info = AAC(file_path)
-            else:
-                logging.info(f"[DubbingAudio] Định dạng '{file_ext}' không được mutagen hỗ trợ trực tiếp. "
-                             f"Thử ffprobe cho '{os.path.basename(file_path)}'.")
-                if ffmpeg_path_for_ffprobe_usage: # Chỉ gọi ffprobe nếu có đường dẫn
-                    duration_ms = self.dub_get_audio_duration_ms_ffprobe(file_path, ffmpeg_path_for_ffprobe_usage)
-                else:
-                    logging.warning(f"[DubbingAudio] Không có FFmpeg, không thể dùng ffprobe cho '{file_ext}'.")
-                return duration_ms
 
-            if audio_info and hasattr(audio_info, 'info') and hasattr(audio_info.info, 'length') and audio_info.info.length is not None:
-                duration_ms = int(audio_info.info.length * 1000)
-                logging.debug(f"[DubbingAudio] Mutagen duration cho '{os.path.basename(file_path)}': {duration_ms}ms")
-            else:
-                logging.warning(f"[DubbingAudio] Mutagen không lấy được 'audio.info.length' cho '{os.path.basename(file_path)}'. "
-                                f"Thử ffprobe.")
-                if ffmpeg_path_for_ffprobe_usage: # Chỉ gọi ffprobe nếu có đường dẫn
-                    duration_ms = self.dub_get_audio_duration_ms_ffprobe(file_path, ffmpeg_path_for_ffprobe_usage)
-                else:
-                    logging.warning(f"[DubbingAudio] Không có FFmpeg, không thể dùng ffprobe khi mutagen lỗi.")
-        
-        except ImportError as ie: 
-            logging.warning(f"[DubbingAudio] Lỗi Import Mutagen (có thể thiếu backend) cho '{file_ext}': {ie}. "
-                            f"Thử ffprobe cho '{os.path.basename(file_path)}'.")
-            if ffmpeg_path_for_ffprobe_usage:
-                duration_ms = self.dub_get_audio_duration_ms_ffprobe(file_path, ffmpeg_path_for_ffprobe_usage)
-            else:
-                logging.warning(f"[DubbingAudio] Không có FFmpeg, không thể dùng ffprobe khi mutagen import lỗi.")
-        except Exception as e:
-            logging.error(f"[DubbingAudio] Lỗi khi dùng mutagen cho '{os.path.basename(file_path)}': {e}. "
-                          f"Thử ffprobe.", exc_info=True)
-            if ffmpeg_path_for_ffprobe_usage:
-                duration_ms = self.dub_get_audio_duration_ms_ffprobe(file_path, ffmpeg_path_for_ffprobe_usage)
-            else:
-                logging.warning(f"[DubbingAudio] Không có FFmpeg, không thể dùng ffprobe khi mutagen lỗi chung.")
-            
-        return duration_ms
+        media_info = get_media_probe().probe(file_path)
+        if media_info is None or media_info.duration_ms is None:
+            logging.warning(f"[DubbingAudio] Không lấy được thời lượng của '{os.path.basename(file_path)}'.")
+            return None
+        logging.debug(f"[DubbingAudio] Thời lượng ({media_info.source}) của '{os.path.basename(file_path)}': {media_info.duration_ms}ms")
+        return media_info.duration_ms
 
 
  # Hàm FFmpeg: Điều chỉnh tốc độ file audio
@@ -26921,6 +27376,22 @@ class SubtitleApp(ctk.CTk):
             fade_out_duration_s = 2.0 # Thời gian fade-out cho bài cuối cùng
             crossfade_duration_s = 1.5 # Thời gian trộn chồng lên nhau giữa 2 bài hát
 
+            # --- Nhánh nhanh: dùng nhạc đã chuẩn hóa trong cache, ghép bằng cách cắt PCM (không chạy FFmpeg) ---
+            from services import dub_audio_engine
+            if dub_audio_engine.HAS_NUMPY and self.cfg.get("bgm_cache_enabled", True):
+                bed_wav_path = os.path.splitext(final_output_path)[0] + ".wav"
+                try:
+                    if self._build_bgm_bed_from_cache(audio_files, bed_wav_path, video_duration_s,
+                                                      fade_in_duration_s, fade_out_duration_s, crossfade_duration_s):
+                        temp_files_created.append(bed_wav_path)
+                        return bed_wav_path, temp_files_created
+                except InterruptedError:
+                    raise
+                except Exception as e_cache:
+                    logging.warning(f"{worker_log_prefix} Ghép BGM từ cache thất bại ({e_cache}). Chuyển sang FFmpeg.", exc_info=True)
+                if os.path.exists(bed_wav_path):
+                    temp_files_created.append(bed_wav_path)
+
             # --- Bước A: Chuẩn hóa và xử lý trước từng file ---
             for i, file_path in enumerate(audio_files):
                 if self.dub_stop_event.is_set(): raise InterruptedError("Dừng trong lúc tiền xử lý BGM")
@@ -26999,6 +27470,40 @@ class SubtitleApp(ctk.CTk):
             return None, temp_files_created
 
 
+# --- Ghép nhạc nền từ cache BGM đã chuẩn hóa (NumPy) ---
+    def _build_bgm_bed_from_cache(self, audio_files, output_wav_path, duration_s, fade_in_s, fade_out_s, crossfade_s, target_lufs=-23.0):
+        """
+        Lấy bản đã chuẩn hóa LUFS/resample của từng file nhạc từ cache (chỉ chuẩn hóa
+        file chưa có trong cache), rồi ghép thành nhạc nền dài đúng duration_s
+        (lặp danh sách, crossfade, fade-in/out) bằng cách cắt PCM đã cache.
+        Trả về True nếu đã ghi output_wav_path.
+        """
+        from services.bgm_cache import build_bgm_bed, get_bgm_cache
+
+        worker_log_prefix = f"[{threading.current_thread().name}_BGMCacheBed]"
+        bgm_cache = get_bgm_cache(self.cfg)
+        prepared_tracks = []
+        for file_path in audio_files:
+            if self.dub_stop_event.is_set(): raise InterruptedError("Dừng trong lúc chuẩn bị BGM từ cache")
+            prepared = bgm_cache.prepare(
+                file_path, self.dub_TARGET_AUDIO_PROCESSING_SAMPLE_RATE, self.dub_TARGET_AUDIO_PROCESSING_CHANNELS,
+                target_lufs=target_lufs, stop_check=self.dub_stop_event.is_set,
+            )
+            if prepared:
+                prepared_tracks.append(prepared['path'])
+            else:
+                logging.warning(f"{worker_log_prefix} Bỏ qua file BGM không chuẩn bị được: {os.path.basename(file_path)}")
+
+        if not prepared_tracks:
+            return False
+        cache_stats = bgm_cache.get_stats()
+        logging.info(f"{worker_log_prefix} {len(prepared_tracks)} file BGM sẵn sàng (cache: {cache_stats['hits']} lần dùng lại, {cache_stats['misses']} lần chuẩn hóa mới).")
+        written_s = build_bgm_bed(prepared_tracks, output_wav_path, duration_s, fade_in_s=fade_in_s, fade_out_s=fade_out_s,
+                                  crossfade_s=crossfade_s, stop_check=self.dub_stop_event.is_set)
+        logging.info(f"{worker_log_prefix} Đã ghép nhạc nền {written_s:.2f}s: {os.path.basename(output_wav_path)}")
+        return True
+
+
 # --- HÀM MỚI:  Chuẩn hóa một file audio duy nhất sang định dạng WAV với độ lớn mục tiêu (LUFS) ---
     def _ffmpeg_normalize_single_audio_to_wav(self, input_path, output_wav_path, target_lufs=-23.0):
         """
@@ -27564,6 +28069,7 @@ class SubtitleApp(ctk.CTk):
         logging.info("Mở cửa sổ cài đặt Kiểu Phụ đề...")
         # Truyền các biến style đã tạo trong __init__ vào đây nếu cần
         # Nhưng hiện tại SubtitleStyleSettingsWindow truy cập trực tiếp qua self.master_app
+        from ui.popups.subtitle_style_settings import SubtitleStyleSettingsWindow # kéo theo matplotlib
         self._subtitle_style_settings_win = SubtitleStyleSettingsWindow(master_app=self)
 
 
@@ -27579,6 +28085,7 @@ class SubtitleApp(ctk.CTk):
             return
 
         logging.info("Mở cửa sổ cài đặt Branding...")
+        from ui.popups.branding_settings import BrandingSettingsWindow
         self._branding_settings_win = BrandingSettingsWindow(master_app=self)
         # self._branding_settings_win.wait_window() # Nếu muốn chặn tương tác hoàn toàn cho đến khi popup đóng
 
@@ -27620,26 +28127,13 @@ class SubtitleApp(ctk.CTk):
                 logo_file_path_for_ffmpeg = self.branding_logo_path_var.get()
 
                 main_video_fps_str_logo, main_video_duration_str_logo, main_video_width_str_logo, main_video_height_str_logo = "30", "60", "1280", "720"
-                current_ffprobe_exec_logo = find_ffprobe()
-                if current_ffprobe_exec_logo:
-                    try:
-                        cmd_probe_fps_logo = [current_ffprobe_exec_logo, "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=r_frame_rate", "-of", "default=noprint_wrappers=1:nokey=1", input_video_for_logo]
-                        probe_res_fps_logo = subprocess.run(cmd_probe_fps_logo, capture_output=True, text=True, timeout=10, creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0, check=False)
-                        if probe_res_fps_logo.returncode == 0 and probe_res_fps_logo.stdout.strip():
-                            fps_raw_logo = probe_res_fps_logo.stdout.strip()
-                            if '/' in fps_raw_logo: num_s, den_s = fps_raw_logo.split('/'); main_video_fps_str_logo = str(float(num_s) / float(den_s)) if den_s != '0' else "30"
-                            elif fps_raw_logo.replace('.', '', 1).isdigit(): main_video_fps_str_logo = fps_raw_logo
-                        cmd_probe_dur_logo = [current_ffprobe_exec_logo, "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", input_video_for_logo]
-                        probe_res_dur_logo = subprocess.run(cmd_probe_dur_logo, capture_output=True, text=True, timeout=10, creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0, check=False)
-                        if probe_res_dur_logo.returncode == 0 and probe_res_dur_logo.stdout.strip().lower() != "n/a": main_video_duration_str_logo = probe_res_dur_logo.stdout.strip()
-                        cmd_probe_res_dim_logo = [current_ffprobe_exec_logo, "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height", "-of", "csv=s=x:p=0", input_video_for_logo]
-                        probe_res_dim_run_logo = subprocess.run(cmd_probe_res_dim_logo, capture_output=True, text=True, timeout=10, creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0, check=False)
-                        if probe_res_dim_run_logo.returncode == 0 and probe_res_dim_run_logo.stdout.strip():
-                            w_h_logo = probe_res_dim_run_logo.stdout.strip().split('x')
-                            main_video_width_str_logo, main_video_height_str_logo = (w_h_logo[0], w_h_logo[1]) if len(w_h_logo) == 2 and w_h_logo[0].isdigit() and w_h_logo[1].isdigit() else ("1280", "720")
-                        logging.info(f"Branding Worker (apply_logo) - Video Info: Res={main_video_width_str_logo}x{main_video_height_str_logo}, FPS={main_video_fps_str_logo}, Duration={main_video_duration_str_logo}s")
-                    except Exception as e_probe_logo_inner: logging.warning(f"Branding Worker (apply_logo): Lỗi ffprobe: {e_probe_logo_inner}. Dùng mặc định.")
-                else: logging.warning("Branding Worker (apply_logo): ffprobe không tìm thấy.")
+                media_info_logo = get_media_probe().probe(input_video_for_logo) # Một lần ffprobe cho fps, duration và kích thước
+                if media_info_logo is not None:
+                    if media_info_logo.frame_rate: main_video_fps_str_logo = str(media_info_logo.frame_rate)
+                    if media_info_logo.duration_s: main_video_duration_str_logo = str(media_info_logo.duration_s)
+                    if media_info_logo.video_size: main_video_width_str_logo, main_video_height_str_logo = (str(v) for v in media_info_logo.video_size)
+                    logging.info(f"Branding Worker (apply_logo) - Video Info: Res={main_video_width_str_logo}x{main_video_height_str_logo}, FPS={main_video_fps_str_logo}, Duration={main_video_duration_str_logo}s")
+                else: logging.warning("Branding Worker (apply_logo): Không probe được video. Dùng mặc định.")
 
                 main_video_width_for_calc_logo_inner = int(main_video_width_str_logo)
                 calculated_logo_width_inner = int(main_video_width_for_calc_logo_inner * (size_percentage / 100.0))
@@ -27683,24 +28177,13 @@ class SubtitleApp(ctk.CTk):
                 except Exception as e_logo_apply:
                     raise RuntimeError(f"Lỗi khi chèn logo: {e_logo_apply}")
 
-            # --- Helper function lấy thời lượng (GIỮ NGUYÊN CODE GỐC CỦA BẠN) ---
+            # --- Helper function lấy thời lượng (qua cache probe, mặc định 60s nếu lỗi) ---
             def get_video_duration_s(video_path_to_probe, ffprobe_exe_path):
-                if not ffprobe_exe_path or not os.path.exists(video_path_to_probe):
-                    logging.warning(f"get_video_duration_s: ffprobe không có hoặc file '{os.path.basename(video_path_to_probe)}' không tồn tại. Trả về 60s.")
-                    return 60.0
-                try:
-                    cmd_probe_duration = [ffprobe_exe_path, "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", video_path_to_probe]
-                    result_duration = subprocess.run(cmd_probe_duration, capture_output=True, text=True, timeout=10, check=False, creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0)
-                    if result_duration.returncode == 0 and result_duration.stdout.strip() and result_duration.stdout.strip().lower() != "n/a":
-                        duration = float(result_duration.stdout.strip())
-                        logging.debug(f"get_video_duration_s: Thời lượng của '{os.path.basename(video_path_to_probe)}' là {duration:.3f}s")
-                        return duration
-                    else:
-                        logging.warning(f"get_video_duration_s: ffprobe lỗi hoặc không trả về duration cho '{os.path.basename(video_path_to_probe)}'. Output: '{result_duration.stdout.strip()}'. Trả về 60s.")
-                        return 60.0
-                except Exception as e_get_dur:
-                    logging.warning(f"get_video_duration_s: Exception khi lấy duration cho '{os.path.basename(video_path_to_probe)}': {e_get_dur}. Trả về 60s.")
+                duration = get_media_probe().get_duration_s(video_path_to_probe) if ffprobe_exe_path else None
+                if not duration:
+                    logging.warning(f"get_video_duration_s: Không lấy được duration cho '{os.path.basename(video_path_to_probe)}'. Trả về 60s.")
                     return 60.0
+                return duration
             
             try:
                 target_width, target_height, target_fps, target_sar = "1280", "720", "30", "1/1"
@@ -28671,6 +29154,8 @@ class SubtitleApp(ctk.CTk):
 # ==========================
 
 if __name__ == "__main__":
+    # Cần cho các tiến trình con (transcribe song song) khi chạy bản đóng gói
+    multiprocessing.freeze_support()
 
     # Kích hoạt DPI Per-Monitor v2 (ưu tiên), fallback nếu máy không hỗ trợ
     try:
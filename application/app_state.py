@@ -8,6 +8,15 @@ Currently this is a Skeleton - we will gradually migrate state from Piu.py
 import customtkinter as ctk
 from config.settings import load_config, save_config
 import logging
+import threading
+
+
+# Trạng thái sẵn sàng của model Whisper (xem StateManager.set_model_status)
+MODEL_STATUS_IDLE = "idle"
+MODEL_STATUS_LOADING = "loading"
+MODEL_STATUS_WARMING = "warming"
+MODEL_STATUS_READY = "ready"
+MODEL_STATUS_ERROR = "error"
 
 
 class StateManager:
@@ -21,15 +30,18 @@ class StateManager:
     3. Keep Piu.py working throughout
     """
     
-    def __init__(self):
+    def __init__(self, cfg=None):
         """
         Initialize state manager.
         Load configuration and initialize basic state.
+        
+        Args:
+            cfg: Already loaded configuration dict. If None, loads it from disk.
         """
         logging.info("Initializing StateManager...")
         
         # === Configuration ===
-        self.cfg = load_config()
+        self.cfg = cfg if cfg is not None else load_config()
         
         # === UI State Variables ===
         self.ui_vars = {}
@@ -53,6 +65,12 @@ class StateManager:
         self.loaded_model_name = None
         self.loaded_model_device = None
         self.is_loading_model = False
+        # Tiến trình tải + warm-up model (có thể chạy nền ngay sau màn hình chờ)
+        self.model_status = MODEL_STATUS_IDLE
+        self.model_status_error = None
+        self.model_ready_event = threading.Event()
+        self._model_status_listeners = []
+        self._model_status_lock = threading.Lock()
         
         # === CUDA/GPU State ===
         self.cuda_status = "UNKNOWN"
@@ -148,6 +166,81 @@ class StateManager:
         self.loaded_model_name = None
         self.loaded_model_device = None
     
+    def set_model_status(self, status, model_name=None, device=None, error=None):
+        """
+        Report Whisper model readiness and notify listeners.
+        
+        Safe to call from any thread; listeners run on the calling thread.
+        
+        Args:
+            status: One of MODEL_STATUS_IDLE/LOADING/WARMING/READY/ERROR
+            model_name: Model being loaded or loaded
+            device: Device ('cuda' or 'cpu')
+            error: Error message (for MODEL_STATUS_ERROR)
+        """
+        with self._model_status_lock:
+            self.model_status = status
+            self.model_status_error = error
+            self.is_loading_model = status in (MODEL_STATUS_LOADING, MODEL_STATUS_WARMING)
+            if model_name is not None:
+                self.loaded_model_name = model_name
+            if device is not None:
+                self.loaded_model_device = device
+            if status == MODEL_STATUS_READY:
+                self.model_ready_event.set()
+            else:
+                self.model_ready_event.clear()
+            listeners = list(self._model_status_listeners)
+        
+        logging.debug(f"[StateManager] Model status: {status} ({model_name or self.loaded_model_name}, {device or self.loaded_model_device})")
+        for listener in listeners:
+            try:
+                listener(status)
+            except Exception as e:
+                logging.error(f"[StateManager] Lỗi trong listener trạng thái model: {e}", exc_info=True)
+    
+    def add_model_status_listener(self, callback):
+        """
+        Register callback(status) called on every model status change.
+        
+        Args:
+            callback: Callable taking the new status
+        """
+        with self._model_status_lock:
+            self._model_status_listeners.append(callback)
+    
+    def remove_model_status_listener(self, callback):
+        """
+        Unregister a callback added with add_model_status_listener.
+        
+        Args:
+            callback: Previously registered callable
+        """
+        with self._model_status_lock:
+            if callback in self._model_status_listeners:
+                self._model_status_listeners.remove(callback)
+    
+    def is_model_busy(self) -> bool:
+        """
+        Check if the model is being loaded or warmed up.
+        
+        Returns:
+            True while status is loading or warming
+        """
+        return self.model_status in (MODEL_STATUS_LOADING, MODEL_STATUS_WARMING)
+    
+    def wait_for_model_ready(self, timeout=None) -> bool:
+        """
+        Block until the model is loaded and warmed up.
+        
+        Args:
+            timeout: Seconds to wait (None = forever)
+            
+        Returns:
+            True if the model is ready
+        """
+        return self.model_ready_event.wait(timeout)
+    
     def get_state_summary(self) -> dict:
         """
         Get a summary of current state for debugging.
@@ -158,6 +251,7 @@ class StateManager:
         return {
             'model_loaded': self.is_model_loaded(),
             'model_name': self.loaded_model_name,
+            'model_status': self.model_status,
             'current_view': self.current_view,
             'download_queue_size': len(self.download_queue),
             'dubbing_queue_size': len(self.dubbing_queue),
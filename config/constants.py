@@ -277,6 +277,22 @@ WHISPER_VRAM_REQ_MB = {
     "large": 10240,    # Thêm "large" chung cho tiện
 }
 
+# Số tham số (triệu) của các model Whisper, dùng để ước tính bộ nhớ khi giữ nhiều model cùng lúc
+WHISPER_MODEL_PARAMS_M = {
+    "tiny": 39, "tiny.en": 39,
+    "base": 74, "base.en": 74,
+    "small": 244, "small.en": 244,
+    "medium": 769, "medium.en": 769,
+    "large-v1": 1550, "large-v2": 1550, "large-v3": 1550, "large": 1550,
+    "large-v3-turbo": 809, "turbo": 809,
+}
+
+# Transcribe song song trên CPU (chia file theo điểm lặng, mỗi tiến trình một model): chỉ bật cho file dài hơn
+PARALLEL_TRANSCRIBE_MIN_SECONDS = 600
+
+# Ngân sách RAM (MB) cho cache model Whisper thường trú. 0 = tự động (50% RAM còn trống khi khởi động)
+WHISPER_MODEL_CACHE_DEFAULT_MB = 0
+
 # --- Từ điển ánh xạ ID Danh mục YouTube sang Tiếng Việt ---
 YOUTUBE_CATEGORIES = {
     '1': 'Phim và hoạt hình',
@@ -327,3 +343,20 @@ API_PRICING_USD = {
     "openai_calls_per_call_estimate": 0.06,
 }
 
+
+# --- Giới hạn đóng gói batch khi dịch phụ đề (theo từng engine) ---
+# Google Cloud Translate v2: tối đa 128 đoạn/yêu cầu, khuyến nghị <= 5.000 ký tự/yêu cầu.
+# ChatGPT: AIService tự chia tiếp thành các batch nhỏ (OPENAI_TRANSLATE_DEFAULT_BATCH_*) và gửi song song,
+# nên ở mức file chỉ cần gom đủ lớn để các worker có việc.
+TRANSLATION_BATCH_LIMITS = {
+    "google_cloud": {"max_segments": 128, "max_chars": 5000},
+    "openai": {"max_segments": 240, "max_chars": 16000},
+}
+
+# --- Dịch song song bằng OpenAI (giới hạn theo tier tài khoản, có thể chỉnh trong config.json) ---
+OPENAI_TRANSLATE_DEFAULT_MAX_WORKERS = 8
+OPENAI_TRANSLATE_DEFAULT_RPM = 500
+OPENAI_TRANSLATE_DEFAULT_TPM = 200000
+# Chế độ batch theo context window: nhiều dòng/1 prompt (danh sách JSON có ID), 1 = mỗi dòng một yêu cầu
+OPENAI_TRANSLATE_DEFAULT_BATCH_SIZE = 30
+OPENAI_TRANSLATE_DEFAULT_BATCH_MAX_CHARS = 2000
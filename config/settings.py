@@ -53,6 +53,12 @@ def get_font_cache_path():
     return os.path.join(config_dir, FONT_CACHE_FILENAME)
 
 
+def get_transcribe_checkpoint_dir():
+    """Get folder for resumable transcription checkpoints, alongside config.json"""
+    config_dir = os.path.dirname(get_config_path())
+    return os.path.join(config_dir, "transcribe_checkpoints")
+
+
 def get_google_voices_cache_path():
     """Get full path to google_voices.json, alongside config.json"""
     config_dir = os.path.dirname(get_config_path())
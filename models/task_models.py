@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
 
 @dataclass
@@ -62,3 +62,43 @@ class SubtitleTask:
         return self.__dict__.copy()
 
 
+
+
+@dataclass
+class DubTaskContext:
+    """Ảnh chụp cấu hình của một tác vụ dub đang chạy (worker chỉ đọc từ đây, không đọc biến UI dùng chung)."""
+    task_id: str
+    video_path: Optional[str]
+    srt_data: List[Dict[str, Any]] = field(default_factory=list)
+    external_audio_path: Optional[str] = None
+    is_direct_audio_mux: bool = False
+    optimize_flow_requested: bool = False
+    dub_flow_parameters: Dict[str, Any] = field(default_factory=dict)
+    # TTS
+    tts_engine: str = "Google Translate (gTTS)"
+    voice_id: str = ""
+    use_google_ssml: bool = False
+    openai_tts_model: str = "tts-1"
+    # Đồng bộ/hậu xử lý segment
+    sync_tolerance_ms: float = 20
+    sync_max_speed_up: float = 1.50
+    sync_min_speed_down: float = 1.0
+    sync_force_cut: bool = True
+    sync_min_srt_duration_ms: float = 200
+    sync_pad_short_tts: bool = True
+    audio_fade_in_s: float = 0.05
+    audio_fade_out_s: float = 0.03
+    allow_overflow_ms: float = 100
+    min_silence_after_overflow_ms: float = 0
+    # Output và âm thanh nền
+    output_dir: str = ""
+    background_audio_option: str = ""
+    background_mix_level: float = 0.30
+    use_custom_bg_music: bool = False
+    custom_bg_music_path: str = ""
+    custom_bg_music_folder_path: str = ""
+    randomize_bg_music: bool = False
+    custom_bg_music_volume: float = 0.25
+    # Trạng thái chạy (do scheduler/worker cập nhật)
+    stage: Optional[str] = None  # None | 'network' | 'cpu'
+    result: Optional[Tuple[bool, Optional[str], Optional[str], bool]] = None  # (thành công, video, lỗi, bị dừng)
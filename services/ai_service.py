@@ -11,9 +11,11 @@ Migration from Piu.py:
 - Batch processing core logic
 """
 
+import json
 import logging
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Tuple, Callable
 
 # Google API exceptions - import separately to avoid conflicts
@@ -51,6 +53,8 @@ except ImportError:
 # Import utilities
 from utils.srt_utils import extract_dialogue_from_srt_string
 from utils.helpers import sanitize_script_for_ai
+from utils.rate_limiter import TokenBucketRateLimiter
+from services.translation_service import build_translation_batches
 
 # Constants
 APP_NAME = "Piu"
@@ -64,6 +68,67 @@ AVAILABLE_GPT_MODELS = [
     "gpt-3.5-turbo", "gpt-4", "gpt-4-turbo", "gpt-4o"
 ]
 
+# Concurrent OpenAI translation defaults (override via translate_with_openai args)
+OPENAI_TRANSLATE_MAX_RETRIES_ON_429 = 5
+# Context-window batch mode: max output tokens per request (gpt-3.5-turbo / gpt-4o limit)
+OPENAI_TRANSLATE_BATCH_MAX_OUTPUT_TOKENS = 4096
+
+
+def parse_batch_translation_response(content: str, expected_ids: list) -> Dict[int, str]:
+    """
+    Parse and validate a batched translation answer.
+    
+    Accepts the JSON protocol ({"translations": [{"id": 1, "text": "..."}]} or a bare list),
+    optionally wrapped in markdown code fences, or numbered lines ("1. ...", "[1] ...") as fallback.
+    
+    Args:
+        content: Raw model answer
+        expected_ids: IDs sent in the request
+        
+    Returns:
+        Dict mapping id -> translated text (exactly one entry per expected id)
+        
+    Raises:
+        ValueError: If the answer cannot be parsed, or IDs/count do not match
+    """
+    text = (content or "").strip()
+    text = re.sub(r"^```(?:\w+)?\s*|\s*```$", "", text).strip()
+    
+    entries = None
+    try:
+        start = min([pos for pos in (text.find("{"), text.find("[")) if pos != -1], default=-1)
+        data = json.JSONDecoder().raw_decode(text[start:])[0] if start != -1 else None
+        if isinstance(data, dict):
+            data = data.get("translations", data.get("items"))
+        if isinstance(data, list):
+            entries = []
+            for item in data:
+                if not isinstance(item, dict) or "id" not in item or not isinstance(item.get("text"), str):
+                    raise ValueError(f"Phần tử không hợp lệ: {item!r}")
+                entries.append((int(item["id"]), item["text"]))
+    except json.JSONDecodeError:
+        entries = None
+    
+    if entries is None:
+        # Fallback: danh sách đánh số, mỗi dòng một mục
+        matches = re.findall(r"^\s*\[?(\d+)[\].:)]\s*(.*?)\s*$", text, flags=re.MULTILINE)
+        if not matches:
+            raise ValueError("Không đọc được JSON hoặc danh sách đánh số từ phản hồi.")
+        entries = [(int(num), line) for num, line in matches]
+    
+    result: Dict[int, str] = {}
+    for entry_id, translated in entries:
+        if entry_id in result:
+            raise ValueError(f"ID {entry_id} bị lặp.")
+        result[entry_id] = translated.strip()
+    if len(result) != len(expected_ids) or set(result) != set(expected_ids):
+        missing = sorted(set(expected_ids) - set(result))
+        extra = sorted(set(result) - set(expected_ids))
+        raise ValueError(
+            f"Số mục không khớp: nhận {len(result)}/{len(expected_ids)} (thiếu: {missing[:10]}, thừa: {extra[:10]})."
+        )
+    return result
+
 
 class AIService:
     """
@@ -73,15 +138,17 @@ class AIService:
     separate from UI handling which remains in Piu.py.
     """
     
-    def __init__(self, logger: Optional[logging.Logger] = None):
+    def __init__(self, logger: Optional[logging.Logger] = None, translation_memory=None):
         """
         Initialize AI Service.
         
         Args:
             logger: Optional logger instance. If None, creates a new logger.
+            translation_memory: Optional TranslationMemory consulted before OpenAI translation calls.
         """
         self.logger = logger or logging.getLogger(APP_NAME)
         self.logger.info("[AIService] Initializing AI Service...")
+        self.translation_memory = translation_memory
     
     # ========================================================================
     # GEMINI METHODS
@@ -921,11 +988,24 @@ class AIService:
         source_lang: Optional[str] = None,
         translation_style: str = "Mặc định (trung tính)",
         model_name: str = "gpt-3.5-turbo",
-        stop_event: Optional[Callable[[], bool]] = None
+        stop_event: Optional[Callable[[], bool]] = None,
+        use_cache: bool = True,
+        max_workers: int = 1,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        batch_size: int = 1,
+        batch_max_chars: int = 2000
     ) -> Tuple[Optional[list], Optional[str]]:
         """
         Translate text list using OpenAI API.
         
+        With max_workers > 1, requests are sent concurrently from a thread pool,
+        bounded by a shared RPM/TPM token bucket with adaptive back-off on 429.
+        With batch_size > 1, many lines are packed into one prompt as a JSON list
+        of {id, text}; answers are validated for count/IDs and failing batches are
+        bisected and retried down to single lines.
+        Results are always returned in input order.
+        
         Args:
             text_list: List of texts to translate
             target_lang: Target language code (e.g., 'vi', 'en', 'Vietnamese', 'English')
@@ -934,6 +1014,12 @@ class AIService:
             translation_style: Translation style (e.g., 'Mặc định (trung tính)', 'Cổ trang (historical/ancient)')
             model_name: Model name to use
             stop_event: Callable that returns True if processing should stop
+            use_cache: Look up / store results in the translation memory (if configured)
+            max_workers: Number of concurrent requests (1 = sequential)
+            requests_per_minute: RPM limit for concurrent mode (None = unlimited)
+            tokens_per_minute: TPM limit for concurrent mode (None = unlimited)
+            batch_size: Max lines per request in context-window batch mode (1 = one line per request)
+            batch_max_chars: Max source characters per batch request
             
         Returns:
             Tuple of (translated_list, error_message)
@@ -949,7 +1035,6 @@ class AIService:
         if not api_key:
             return None, "Lỗi: OpenAI API Key không được cung cấp."
         
-        translated_texts = []
         num_lines = len(text_list)
         source_lang_name = source_lang if source_lang and source_lang != 'auto' else "the original language"
         
@@ -960,56 +1045,97 @@ class AIService:
         elif "Cổ trang" in translation_style:
             style_instruction = "in a style suitable for historical or ancient contexts (e.g., historical drama, classic literature)"
         
-        self.logger.info(f"{log_prefix} Translating {num_lines} lines to '{target_lang}' (Style: {translation_style})...")
+        # Look up translation memory before any network call
+        memory = self.translation_memory if use_cache else None
+        cache_args = dict(
+            engine="openai",
+            model=model_name,
+            target_lang=target_lang,
+            source_lang=source_lang if source_lang and source_lang != 'auto' else None,
+            style=translation_style,
+        )
+        if memory is not None and memory.available:
+            translated_texts = memory.get_many(text_list, **cache_args)
+        else:
+            translated_texts = [None] * num_lines
+        pending_indices = [
+            i for i, text in enumerate(text_list)
+            if translated_texts[i] is None and text.strip()
+        ]
+        for i, text in enumerate(text_list):
+            if not text.strip():
+                translated_texts[i] = ""
         
+        self.logger.info(
+            f"{log_prefix} Translating {len(pending_indices)}/{num_lines} lines to '{target_lang}' "
+            f"(Style: {translation_style}, {num_lines - len(pending_indices)} from cache/empty)..."
+        )
+        if not pending_indices:
+            return translated_texts, None
+        
+        def build_prompt(text_to_translate: str) -> str:
+            return (
+                f"You are a highly skilled translator. Translate the following text "
+                f"from {source_lang_name} to {target_lang} {style_instruction}. "
+                f"IMPORTANT: Respond ONLY with the translated text itself, without any introductory phrases, "
+                f"explanations, quotation marks, or markdown formatting."
+                f"\n\nText to translate:\n---\n{text_to_translate}\n---"
+                f"\n\nTranslated text:"
+            )
+        
+        newly_translated = {}
         try:
             client = OpenAI(api_key=api_key, timeout=60.0)
             
-            for i, text_to_translate in enumerate(text_list):
-                if stop_event and stop_event():
-                    self.logger.warning(f"{log_prefix} Stop event detected during translation.")
-                    return translated_texts  # Return what we have so far
-                
-                if not text_to_translate.strip():
-                    translated_texts.append("")
-                    continue
-                
-                # Build prompt
-                prompt_message = (
-                    f"You are a highly skilled translator. Translate the following text "
-                    f"from {source_lang_name} to {target_lang} {style_instruction}. "
-                    f"IMPORTANT: Respond ONLY with the translated text itself, without any introductory phrases, "
-                    f"explanations, quotation marks, or markdown formatting."
-                    f"\n\nText to translate:\n---\n{text_to_translate}\n---"
-                    f"\n\nTranslated text:"
-                )
-                
+            if batch_size and batch_size > 1 and len(pending_indices) > 1:
+                limiter = TokenBucketRateLimiter(requests_per_minute, tokens_per_minute)
                 try:
-                    response = client.chat.completions.create(
-                        model=model_name,
-                        messages=[
-                            {"role": "user", "content": prompt_message}
-                        ],
-                        temperature=0.2,
-                        max_tokens=int(len(text_to_translate) * 2.5) + 60,
+                    self._translate_in_context_batches(
+                        client, model_name, text_list, pending_indices,
+                        source_lang_name, target_lang, style_instruction, build_prompt,
+                        batch_size, batch_max_chars, max(1, max_workers or 1), limiter,
+                        stop_event, translated_texts, newly_translated
                     )
+                finally:
+                    self._store_translations_in_memory(memory, text_list, newly_translated, cache_args)
+            elif max_workers and max_workers > 1 and len(pending_indices) > 1:
+                limiter = TokenBucketRateLimiter(requests_per_minute, tokens_per_minute)
+                try:
+                    self._translate_lines_concurrently(
+                        client, model_name, text_list, pending_indices, build_prompt,
+                        max_workers, limiter, stop_event, translated_texts, newly_translated
+                    )
+                finally:
+                    self._store_translations_in_memory(memory, text_list, newly_translated, cache_args)
+            else:
+                for i in pending_indices:
+                    if stop_event and stop_event():
+                        self.logger.warning(f"{log_prefix} Stop event detected during translation.")
+                        break
                     
-                    translated_line = response.choices[0].message.content.strip()
-                    
-                    # Remove quotes if AI wrapped the response
-                    if translated_line.startswith('"') and translated_line.endswith('"'):
-                        translated_line = translated_line[1:-1].strip()
-                    
-                    translated_texts.append(translated_line)
-                    time.sleep(0.3)  # Small delay between requests
-                    
-                except Exception as api_call_error:
-                    self.logger.error(f"{log_prefix} Error translating line {i+1}: {api_call_error}")
-                    # Keep original text if translation fails
-                    translated_texts.append(text_to_translate)
-                    time.sleep(1)
+                    text_to_translate = text_list[i]
+                    try:
+                        translated_line = self._request_openai_line_translation(
+                            client, model_name, text_to_translate, build_prompt(text_to_translate)
+                        )
+                        translated_texts[i] = translated_line
+                        newly_translated[i] = translated_line
+                        time.sleep(0.3)  # Small delay between requests
+                        
+                    except Exception as api_call_error:
+                        self.logger.error(f"{log_prefix} Error translating line {i+1}: {api_call_error}")
+                        # Keep original text if translation fails
+                        translated_texts[i] = text_to_translate
+                        time.sleep(1)
+                
+                self._store_translations_in_memory(memory, text_list, newly_translated, cache_args)
             
-            self.logger.info(f"{log_prefix} Translation completed. Translated {len(translated_texts)} lines.")
+            # Lines not reached (stop requested) keep their original text
+            translated_texts = [
+                text_list[i] if value is None else value
+                for i, value in enumerate(translated_texts)
+            ]
+            self.logger.info(f"{log_prefix} Translation completed. Translated {len(newly_translated)} lines via API.")
             return translated_texts, None
             
         except AuthenticationError as e:
@@ -1032,6 +1158,284 @@ class AIService:
             self.logger.error(f"{log_prefix} {error_message}", exc_info=True)
             return None, error_message
     
+    @staticmethod
+    def _request_openai_line_translation(client, model_name: str, text_to_translate: str, prompt_message: str) -> str:
+        """Send one line translation request and clean up the answer."""
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "user", "content": prompt_message}
+            ],
+            temperature=0.2,
+            max_tokens=int(len(text_to_translate) * 2.5) + 60,
+        )
+        
+        translated_line = response.choices[0].message.content.strip()
+        
+        # Remove quotes if AI wrapped the response
+        if translated_line.startswith('"') and translated_line.endswith('"'):
+            translated_line = translated_line[1:-1].strip()
+        return translated_line
+    
+    @staticmethod
+    def _get_retry_after_seconds(error) -> Optional[float]:
+        """Read the Retry-After header from an OpenAI error, if present."""
+        try:
+            headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+            value = headers.get('retry-after')
+            return float(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+    
+    def _translate_lines_concurrently(
+        self,
+        client,
+        model_name: str,
+        text_list: list,
+        pending_indices: list,
+        build_prompt: Callable[[str], str],
+        max_workers: int,
+        limiter: TokenBucketRateLimiter,
+        stop_event: Optional[Callable[[], bool]],
+        translated_texts: list,
+        newly_translated: Dict[int, str]
+    ) -> None:
+        """
+        Translate pending lines from a thread pool, writing results by index.
+        
+        Raises:
+            AuthenticationError: Propagated so the caller aborts the whole job
+        """
+        log_prefix = "[OpenAITranslate:Concurrent]"
+        self.logger.info(
+            f"{log_prefix} {len(pending_indices)} lines, {max_workers} workers "
+            f"(RPM: {limiter.requests_per_minute or 'unlimited'}, TPM: {limiter.tokens_per_minute or 'unlimited'})."
+        )
+        
+        def worker(i: int) -> None:
+            text_to_translate = text_list[i]
+            prompt_message = build_prompt(text_to_translate)
+            # Rough estimate: ~4 characters per token for prompt, plus max completion tokens
+            estimated_tokens = len(prompt_message) / 4 + int(len(text_to_translate) * 2.5) + 60
+            
+            for attempt in range(OPENAI_TRANSLATE_MAX_RETRIES_ON_429 + 1):
+                if not limiter.acquire(estimated_tokens, stop_check=stop_event):
+                    return  # Stop requested; line keeps its original text
+                try:
+                    translated_line = self._request_openai_line_translation(
+                        client, model_name, text_to_translate, prompt_message
+                    )
+                    limiter.report_success()
+                    translated_texts[i] = translated_line
+                    newly_translated[i] = translated_line
+                    return
+                except Exception as api_call_error:
+                    if AuthenticationError is not None and isinstance(api_call_error, AuthenticationError):
+                        raise
+                    if RateLimitError is not None and isinstance(api_call_error, RateLimitError):
+                        limiter.report_rate_limited(self._get_retry_after_seconds(api_call_error))
+                        continue
+                    self.logger.error(f"{log_prefix} Error translating line {i+1}: {api_call_error}")
+                    break
+            # Keep original text if translation fails
+            translated_texts[i] = text_to_translate
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="OpenAITranslate") as executor:
+            futures = [executor.submit(worker, i) for i in pending_indices]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    
+    @staticmethod
+    def _request_openai_batch_translation(client, model_name: str, items: list, system_message: str) -> Dict[int, str]:
+        """
+        Send one context-window batch request and parse the answer.
+        
+        Args:
+            items: List of (id, text) pairs
+            
+        Raises:
+            ValueError: If the answer fails validation (see parse_batch_translation_response)
+        """
+        payload = json.dumps({"items": [{"id": item_id, "text": text} for item_id, text in items]}, ensure_ascii=False)
+        total_chars = sum(len(text) for _, text in items)
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": payload}
+            ],
+            temperature=0.2,
+            max_tokens=min(OPENAI_TRANSLATE_BATCH_MAX_OUTPUT_TOKENS, int(total_chars * 1.5) + 16 * len(items) + 100),
+        )
+        choice = response.choices[0]
+        if getattr(choice, "finish_reason", None) == "length":
+            raise ValueError("Phản hồi bị cắt do vượt max_tokens.")
+        return parse_batch_translation_response(choice.message.content, [item_id for item_id, _ in items])
+    
+    def _call_openai_with_rate_limit(
+        self,
+        call: Callable[[], object],
+        estimated_tokens: float,
+        limiter: TokenBucketRateLimiter,
+        stop_event: Optional[Callable[[], bool]],
+        label: str
+    ) -> Tuple[str, object]:
+        """
+        Run one OpenAI call under the limiter, retrying on 429.
+        
+        Returns:
+            ('ok', result), ('stopped', None) or ('failed', None)
+            
+        Raises:
+            AuthenticationError: Propagated so the caller aborts the whole job
+        """
+        for attempt in range(OPENAI_TRANSLATE_MAX_RETRIES_ON_429 + 1):
+            if not limiter.acquire(estimated_tokens, stop_check=stop_event):
+                return 'stopped', None
+            try:
+                result = call()
+                limiter.report_success()
+                return 'ok', result
+            except Exception as api_call_error:
+                if AuthenticationError is not None and isinstance(api_call_error, AuthenticationError):
+                    raise
+                if RateLimitError is not None and isinstance(api_call_error, RateLimitError):
+                    limiter.report_rate_limited(self._get_retry_after_seconds(api_call_error))
+                    continue
+                self.logger.warning(f"[OpenAITranslate:Batch] {label} thất bại: {api_call_error}")
+                break
+        return 'failed', None
+    
+    def _translate_in_context_batches(
+        self,
+        client,
+        model_name: str,
+        text_list: list,
+        pending_indices: list,
+        source_lang_name: str,
+        target_lang: str,
+        style_instruction: str,
+        build_prompt: Callable[[str], str],
+        batch_size: int,
+        batch_max_chars: int,
+        max_workers: int,
+        limiter: TokenBucketRateLimiter,
+        stop_event: Optional[Callable[[], bool]],
+        translated_texts: list,
+        newly_translated: Dict[int, str]
+    ) -> None:
+        """
+        Translate pending lines in context-window batches, writing results by index.
+        
+        The instruction preamble is sent once per batch and the model sees the
+        neighbouring lines as context. A batch whose answer fails validation is
+        split in half and retried; a single line that still fails falls back to
+        the one-line prompt, then to the original text.
+        
+        Raises:
+            AuthenticationError: Propagated so the caller aborts the whole job
+        """
+        log_prefix = "[OpenAITranslate:Batch]"
+        system_message = (
+            f"You are a highly skilled subtitle translator. Translate every item of the JSON list "
+            f"from {source_lang_name} to {target_lang} {style_instruction}. "
+            f"The items are consecutive subtitle lines: use the surrounding lines as context "
+            f"and keep names and terms consistent. Translate each item separately; never merge, "
+            f"split, skip or reorder items. "
+            f'IMPORTANT: Respond ONLY with a JSON object of the form '
+            f'{{"translations": [{{"id": <id>, "text": "<translated text>"}}]}} '
+            f"containing exactly one entry for every input id, without markdown or explanations."
+        )
+        pending_texts = [text_list[i] for i in pending_indices]
+        batches = [
+            [pending_indices[j] for j in batch]
+            for batch in build_translation_batches(pending_texts, batch_max_chars, batch_size)
+        ]
+        self.logger.info(
+            f"{log_prefix} {len(pending_indices)} lines in {len(batches)} batches "
+            f"(≤{batch_size} lines/≤{batch_max_chars} chars), {max_workers} workers."
+        )
+        
+        def translate_single(i: int) -> None:
+            text_to_translate = text_list[i]
+            prompt_message = build_prompt(text_to_translate)
+            status, translated_line = self._call_openai_with_rate_limit(
+                lambda: self._request_openai_line_translation(client, model_name, text_to_translate, prompt_message),
+                len(prompt_message) / 4 + int(len(text_to_translate) * 2.5) + 60,
+                limiter, stop_event, f"Dòng {i+1}"
+            )
+            if status == 'ok':
+                translated_texts[i] = translated_line
+                newly_translated[i] = translated_line
+            elif status == 'failed':
+                # Keep original text if translation fails
+                translated_texts[i] = text_to_translate
+        
+        def translate_batch(indices: list) -> None:
+            if len(indices) == 1:
+                translate_single(indices[0])
+                return
+            # ID cục bộ 1..n trong batch: ngắn gọn, dễ kiểm tra
+            items = [(n + 1, text_list[i]) for n, i in enumerate(indices)]
+            total_chars = sum(len(text) for _, text in items)
+            estimated_tokens = (len(system_message) + total_chars) / 4 + min(
+                OPENAI_TRANSLATE_BATCH_MAX_OUTPUT_TOKENS, int(total_chars * 1.5) + 16 * len(items) + 100
+            )
+            status, result = self._call_openai_with_rate_limit(
+                lambda: self._request_openai_batch_translation(client, model_name, items, system_message),
+                estimated_tokens, limiter, stop_event,
+                f"Batch dòng {indices[0]+1}-{indices[-1]+1}"
+            )
+            if status == 'stopped':
+                return
+            if status == 'ok':
+                for n, i in enumerate(indices):
+                    translated_texts[i] = result[n + 1]
+                    newly_translated[i] = result[n + 1]
+                return
+            # Chia đôi batch lỗi và thử lại từng nửa
+            mid = len(indices) // 2
+            self.logger.info(f"{log_prefix} Chia đôi batch {len(indices)} dòng ({mid} + {len(indices) - mid}) để thử lại.")
+            translate_batch(indices[:mid])
+            translate_batch(indices[mid:])
+        
+        if max_workers <= 1 or len(batches) == 1:
+            for batch in batches:
+                if stop_event and stop_event():
+                    self.logger.warning(f"{log_prefix} Stop event detected during translation.")
+                    break
+                translate_batch(batch)
+            return
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="OpenAITranslate") as executor:
+            futures = [executor.submit(translate_batch, batch) for batch in batches]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    
+    def _store_translations_in_memory(self, memory, text_list: list, translated_by_index: Dict[int, str], cache_args: Dict) -> None:
+        """Store successfully translated lines (by index) in the translation memory."""
+        if memory is None or not translated_by_index:
+            return
+        indices = sorted(translated_by_index)
+        try:
+            memory.put_many(
+                [text_list[i] for i in indices],
+                [translated_by_index[i] for i in indices],
+                **cache_args
+            )
+        except Exception as e:
+            self.logger.warning(f"[OpenAITranslate] Không thể lưu kết quả vào cache dịch: {e}")
+    
     def test_openai_key(self, api_key: str) -> Tuple[bool, str]:
         """
         Test if OpenAI API key is valid.
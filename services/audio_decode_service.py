@@ -0,0 +1,206 @@
+"""
+Audio Decode Service for Piu Application
+
+Decodes each input media file once to 16 kHz mono float32 (the format
+Whisper and Silero VAD expect) and keeps the samples in a memory-mapped
+.npy file under the task temp folder. VAD, Whisper (transcribe() accepts
+arrays) and any later analysis share the same zero-copy array instead of
+each spawning its own ffmpeg decode.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+# Optional imports with fallback
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    np = None
+
+from utils.ffmpeg_utils import find_ffmpeg
+
+# Constants
+APP_NAME = "Piu"
+SAMPLE_RATE = 16000
+# Header .npy được giữ chỗ trước rồi ghi lại khi biết số mẫu (v1.0, bội số của 64 byte)
+NPY_HEADER_SIZE = 128
+_COPY_CHUNK_BYTES = 1024 * 1024
+
+
+class DecodedAudio:
+    """A decoded media file: memory-mapped float32 samples at 16 kHz mono."""
+
+    def __init__(self, media_path: str, npy_path: str, audio):
+        self.media_path = media_path
+        self.npy_path = npy_path
+        self.audio = audio
+        self.sample_rate = SAMPLE_RATE
+
+    @property
+    def duration_s(self) -> float:
+        """Duration in seconds."""
+        return len(self.audio) / float(self.sample_rate)
+
+    def slice_seconds(self, start_s: float = 0.0, end_s: Optional[float] = None):
+        """Return a zero-copy view of the samples between start_s and end_s."""
+        start = max(0, int(round(start_s * self.sample_rate)))
+        end = len(self.audio) if end_s is None else min(len(self.audio), int(round(end_s * self.sample_rate)))
+        return self.audio[start:end]
+
+
+_registry: Dict[Tuple[str, int, int, str], DecodedAudio] = {}
+_registry_lock = threading.Lock()
+_decode_locks: Dict[Tuple[str, int, int, str], threading.Lock] = {}
+
+
+def _media_key(media_path: str, cache_dir: str) -> Tuple[str, int, int, str]:
+    abs_path = os.path.abspath(media_path)
+    stat = os.stat(abs_path)
+    return abs_path, stat.st_size, stat.st_mtime_ns, os.path.abspath(cache_dir)
+
+
+def _write_npy_header(f, num_samples: int) -> None:
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header, {'descr': np.lib.format.dtype_to_descr(np.dtype(np.float32)), 'fortran_order': False, 'shape': (num_samples,)}
+    )
+    data = header.getvalue()
+    if len(data) != NPY_HEADER_SIZE:
+        raise RuntimeError(f"Kích thước header .npy không mong muốn: {len(data)}")
+    f.seek(0)
+    f.write(data)
+
+
+def _decode_to_npy(media_path: str, npy_path: str, stop_event: Optional[Callable[[], bool]] = None) -> None:
+    """Stream ffmpeg's f32le output straight into an .npy file (no full copy in RAM)."""
+    ffmpeg_path = find_ffmpeg()
+    if not ffmpeg_path:
+        raise RuntimeError("Không tìm thấy FFmpeg để giải mã audio.")
+
+    cmd = [
+        ffmpeg_path, "-nostdin", "-v", "error", "-i", os.path.abspath(media_path),
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "-"
+    ]
+    creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+    tmp_path = npy_path + ".part"
+    # stderr vào file tạm (không phải pipe): ffmpeg ghi nhiều lỗi giải mã sẽ không bị chặn khi pipe đầy
+    stderr_file = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, creationflags=creationflags)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(b"\x00" * NPY_HEADER_SIZE)
+            data_bytes = 0
+            while True:
+                if stop_event and stop_event():
+                    proc.kill()
+                    raise InterruptedError("Dừng bởi người dùng khi đang giải mã audio.")
+                chunk = proc.stdout.read(_COPY_CHUNK_BYTES)
+                if not chunk:
+                    break
+                f.write(chunk)
+                data_bytes += len(chunk)
+            return_code = proc.wait()
+            if return_code != 0:
+                stderr_file.seek(0)
+                stderr_data = stderr_file.read()
+                raise RuntimeError(
+                    f"FFmpeg giải mã audio thất bại (mã {return_code}): "
+                    f"{stderr_data.decode('utf-8', errors='ignore').strip()[-500:]}"
+                )
+            _write_npy_header(f, data_bytes // 4)
+        os.replace(tmp_path, npy_path)
+    except BaseException:
+        if proc.poll() is None:
+            proc.kill()
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        proc.stdout.close()
+        stderr_file.close()
+
+
+def decode_audio_once(
+    media_path: str,
+    cache_dir: str,
+    stop_event: Optional[Callable[[], bool]] = None
+) -> DecodedAudio:
+    """
+    Decode media_path once to 16 kHz mono float32 and return the shared buffer.
+
+    Subsequent calls for the same file (same size/mtime) in the same cache_dir
+    return the same memory-mapped array. The .npy is opened copy-on-write, so
+    consumers that need a writable array (torch.from_numpy) get one without
+    touching the file.
+
+    Args:
+        media_path: Input audio/video file
+        cache_dir: Folder for the .npy (normally the task temp folder)
+        stop_event: Callable returning True to abort decoding
+
+    Returns:
+        DecodedAudio
+
+    Raises:
+        RuntimeError: If numpy/ffmpeg are unavailable or decoding fails
+        InterruptedError: If stop_event() returns True
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("Thư viện numpy chưa được cài đặt.")
+
+    key = _media_key(media_path, cache_dir)
+    with _registry_lock:
+        decoded = _registry.get(key)
+        if decoded is not None:
+            return decoded
+        decode_lock = _decode_locks.setdefault(key, threading.Lock())
+
+    with decode_lock:
+        with _registry_lock:
+            decoded = _registry.get(key)
+            if decoded is not None:
+                return decoded
+
+        os.makedirs(cache_dir, exist_ok=True)
+        digest = hashlib.sha1(f"{key[0]}|{key[1]}|{key[2]}".encode("utf-8")).hexdigest()[:16]
+        npy_path = os.path.join(cache_dir, f"audio16k_{digest}.npy")
+        if not os.path.exists(npy_path):
+            logging.info(f"[AudioDecode] Giải mã '{os.path.basename(media_path)}' -> 16 kHz mono float32...")
+            _decode_to_npy(media_path, npy_path, stop_event)
+        audio = np.load(npy_path, mmap_mode="c")
+        decoded = DecodedAudio(key[0], npy_path, audio)
+        logging.info(
+            f"[AudioDecode] Sẵn sàng: '{os.path.basename(media_path)}' "
+            f"({decoded.duration_s:.1f}s, {os.path.getsize(npy_path) / (1024 * 1024):.1f} MB, mmap)."
+        )
+        with _registry_lock:
+            _registry[key] = decoded
+            _decode_locks.pop(key, None)
+        return decoded
+
+
+def release_decoded_audio(cache_dir: str, remove_files: bool = True) -> None:
+    """
+    Forget every buffer decoded into cache_dir and optionally delete the folder.
+
+    Callers must drop their own references to the arrays first
+    (on Windows a mapped file cannot be deleted).
+    """
+    cache_dir = os.path.abspath(cache_dir)
+    with _registry_lock:
+        for key in [k for k in _registry if k[3] == cache_dir]:
+            _registry.pop(key, None)
+    if remove_files:
+        shutil.rmtree(cache_dir, ignore_errors=True)
@@ -0,0 +1,317 @@
+"""
+BGM Asset Cache for Piu Application
+
+Persistent cache of background-music library files prepared for the dub mix.
+Each source file is decoded once, measured (EBU R128 integrated loudness,
+true peak, loudness range), gain-normalized to the target loudness and stored
+as PCM WAV at the processing sample rate / channel count, next to a JSON file
+with the measured stats. A batch that reuses the same BGM folder then skips
+the per-video normalization passes, and the music bed of each video is built
+by slicing the cached PCM (crossfades, looping, fades) instead of an FFmpeg
+acrossfade chain.
+
+Key: SHA-1 of the source content + target format (sample rate, channels,
+target LUFS, true peak limit). Content hashes are memoized by path, size and
+mtime so unchanged library files are not re-read.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import wave
+from typing import Callable, Dict, List, Optional
+
+from services import dub_audio_engine, loudness_analysis
+from services.dub_manifest import file_sha1
+
+# Constants
+APP_NAME = "Piu"
+BGM_CACHE_DIRNAME = "bgm_cache"
+INDEX_FILENAME = "index.json"
+DEFAULT_MAX_SIZE_MB = 2048
+# Khi vượt quota, xóa thêm một phần để không phải dọn dẹp sau mỗi lần ghi
+EVICTION_HEADROOM_RATIO = 0.9
+DEFAULT_TARGET_LUFS = -23.0
+DEFAULT_TRUE_PEAK_DB = -1.5
+# Ghi nhạc nền theo khối 10 s để không giữ cả bản nhạc dạng float trong RAM
+BED_WRITE_BLOCK_S = 10.0
+# Bỏ qua bản nhạc quá ngắn để lặp (tránh vòng lặp hàng triệu lần cho file lỗi)
+MIN_BED_TRACK_S = 1.0
+
+
+class BGMCache:
+    """
+    Folder of loudness-normalized BGM tracks with hit/miss counters and
+    size-based LRU eviction.
+    """
+
+    def __init__(self, root_dir: str, max_size_mb: float = DEFAULT_MAX_SIZE_MB,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Initialize BGM Cache.
+
+        Args:
+            root_dir: Folder holding the prepared tracks
+            max_size_mb: Disk quota; least recently used tracks are evicted beyond it
+            logger: Optional logger instance
+        """
+        self.logger = logger or logging.getLogger(APP_NAME)
+        self.root_dir = root_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.index_path = os.path.join(root_dir, INDEX_FILENAME)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._sources: Dict[str, Dict] = {}
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self._sources = json.load(f).get("sources", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"[BGMCache] Chỉ mục cache hỏng, bỏ qua: {e}")
+            self._sources = {}
+
+    def _save_index(self):
+        try:
+            os.makedirs(self.root_dir, exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"sources": self._sources}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            self.logger.warning(f"[BGMCache] Không lưu được chỉ mục cache: {e}")
+
+    def _source_hash(self, source_path: str) -> str:
+        """Content SHA-1 of a source file, memoized by path + size + mtime."""
+        source_path = os.path.abspath(source_path)
+        st = os.stat(source_path)
+        with self._lock:
+            known = self._sources.get(source_path)
+            if known and known.get("size") == st.st_size and known.get("mtime_ns") == st.st_mtime_ns:
+                return known["sha1"]
+        digest = file_sha1(source_path)
+        with self._lock:
+            self._sources[source_path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": digest}
+            self._save_index()
+        return digest
+
+    @staticmethod
+    def make_key(source_sha1: str, sample_rate: int, channels: int, target_lufs: float, true_peak_db: float) -> str:
+        """Cache key of a source file prepared for a target format."""
+        payload = f"{source_sha1}|{int(sample_rate)}|{int(channels)}|{float(target_lufs):.2f}|{float(true_peak_db):.2f}"
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def prepare(self, source_path: str, sample_rate: int, channels: int,
+                target_lufs: float = DEFAULT_TARGET_LUFS, true_peak_db: float = DEFAULT_TRUE_PEAK_DB,
+                stop_check: Optional[Callable[[], bool]] = None) -> Optional[Dict]:
+        """
+        Get the normalized version of a BGM file, preparing it on a miss.
+
+        Args:
+            source_path: BGM library file (any format FFmpeg decodes)
+            sample_rate: Target sample rate
+            channels: Target channel count
+            target_lufs: Integrated loudness of the stored track
+            true_peak_db: True peak ceiling; the gain is reduced to stay below it
+            stop_check: Optional callable; decoding is aborted when it returns True
+
+        Returns:
+            {'path', 'key', 'stats', 'gain_db', 'duration_ms'} or None if the file cannot be decoded
+        """
+        try:
+            key = self.make_key(self._source_hash(source_path), sample_rate, channels, target_lufs, true_peak_db)
+        except OSError as e:
+            self.logger.warning(f"[BGMCache] Không đọc được file nhạc '{source_path}': {e}")
+            return None
+        wav_path = os.path.join(self.root_dir, f"{key}.wav")
+        meta_path = os.path.join(self.root_dir, f"{key}.json")
+
+        if os.path.exists(wav_path) and os.path.exists(meta_path):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                os.utime(wav_path, None)  # Đánh dấu vừa dùng (LRU)
+                with self._lock:
+                    self.hits += 1
+                return dict(meta, path=wav_path, key=key)
+            except Exception as e:
+                self.logger.warning(f"[BGMCache] Mục cache hỏng, chuẩn bị lại: {e}")
+
+        np = dub_audio_engine.np
+        try:
+            samples = dub_audio_engine.load_audio(source_path, sample_rate, channels, stop_check=stop_check)
+        except InterruptedError:
+            raise
+        except Exception as e:
+            self.logger.warning(f"[BGMCache] Không giải mã được '{os.path.basename(source_path)}': {e}")
+            return None
+
+        stats = loudness_analysis.measure_loudness(samples, sample_rate)
+        gain_db = loudness_analysis.normalization_gain_db(stats, target_lufs, true_peak_db)
+        if gain_db != 0.0:
+            samples = samples * np.float32(10.0 ** (gain_db / 20.0))
+        meta = {
+            "source_name": os.path.basename(source_path),
+            "stats": stats,
+            "gain_db": gain_db,
+            "duration_ms": dub_audio_engine.duration_ms(samples, sample_rate),
+            "created_at": time.time(),
+        }
+        try:
+            os.makedirs(self.root_dir, exist_ok=True)
+            tmp_path = f"{wav_path}.{threading.get_ident()}.tmp"
+            dub_audio_engine.write_wav(tmp_path, samples, sample_rate)
+            os.replace(tmp_path, wav_path)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+        except Exception as e:
+            self.logger.warning(f"[BGMCache] Không ghi được nhạc nền đã chuẩn hóa: {e}")
+            return None
+        with self._lock:
+            self.misses += 1
+        self.logger.info(
+            f"[BGMCache] Đã chuẩn hóa '{meta['source_name']}': {stats['integrated_lufs']:.1f} LUFS, "
+            f"TP {stats['true_peak_db']:.1f} dBTP, LRA {stats['lra']:.1f} LU, gain {gain_db:+.1f} dB."
+        )
+        self._evict_if_needed()
+        return dict(meta, path=wav_path, key=key)
+
+    def _evict_if_needed(self):
+        try:
+            entries = []
+            for name in os.listdir(self.root_dir):
+                if name.endswith(".wav"):
+                    path = os.path.join(self.root_dir, name)
+                    st = os.stat(path)
+                    entries.append((st.st_mtime, st.st_size, path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_size_bytes:
+            return
+        target = self.max_size_bytes * EVICTION_HEADROOM_RATIO
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            for stale_path in (path, os.path.splitext(path)[0] + ".json"):
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        self.logger.info(f"[BGMCache] Đã xóa {removed} bản nhạc ít dùng nhất để giữ quota.")
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'known_sources': len(self._sources)}
+
+
+def build_bgm_bed(track_paths: List[str], output_path: str, duration_s: float,
+                  fade_in_s: float = 0.5, fade_out_s: float = 2.0, crossfade_s: float = 1.5,
+                  stop_check: Optional[Callable[[], bool]] = None) -> float:
+    """
+    Write a music bed of exactly duration_s from prepared tracks (same format),
+    played in order and looped, with linear crossfades between tracks, a fade-in
+    at the start and a fade-out at the end.
+
+    Args:
+        track_paths: Normalized tracks from BGMCache.prepare
+        output_path: Output WAV path
+        duration_s: Bed duration (the video duration)
+        fade_in_s: Fade-in of the bed
+        fade_out_s: Fade-out ending at duration_s
+        crossfade_s: Overlap between consecutive tracks
+        stop_check: Optional callable; raises InterruptedError when it returns True
+
+    Returns:
+        Written duration in seconds
+    """
+    np = dub_audio_engine.np
+    tracks = []
+    sample_rate = channels = None
+    for path in track_paths:
+        pcm, rate = dub_audio_engine.open_pcm16_wav(path)
+        if len(pcm) < MIN_BED_TRACK_S * rate:
+            continue
+        if sample_rate is None:
+            sample_rate, channels = rate, pcm.shape[1]
+        elif (rate, pcm.shape[1]) != (sample_rate, channels):
+            raise ValueError(f"Định dạng nhạc nền không đồng nhất: {os.path.basename(path)}")
+        tracks.append(pcm)
+    if not tracks:
+        raise ValueError("Không có bản nhạc nền nào đủ dài để ghép.")
+
+    total = int(round(duration_s * sample_rate))
+    fade_in = int(round(fade_in_s * sample_rate))
+    fade_out = min(total, int(round(fade_out_s * sample_rate)))
+    xfade = int(round(crossfade_s * sample_rate))
+    block = max(1, int(BED_WRITE_BLOCK_S * sample_rate))
+    written = 0
+
+    with wave.open(output_path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+
+        def emit(chunk):
+            nonlocal written
+            chunk = np.asarray(chunk, dtype=np.float32)[:total - written]
+            if len(chunk) == 0:
+                return
+            positions = np.arange(written, written + len(chunk), dtype=np.float32)
+            if fade_in > 0 and written < fade_in:
+                chunk = chunk * np.clip(positions / fade_in, 0.0, 1.0)[:, None]
+            if fade_out > 0 and written + len(chunk) > total - fade_out:
+                chunk = chunk * np.clip((total - positions) / fade_out, 0.0, 1.0)[:, None]
+            wf.writeframes(np.clip(chunk, -32768.0, 32767.0).round().astype("<i2").tobytes())
+            written += len(chunk)
+
+        tail = None  # Đuôi bản trước, chờ trộn với đầu bản sau
+        index = 0
+        while written < total:
+            if stop_check and stop_check():
+                raise InterruptedError("Dừng bởi người dùng khi ghép nhạc nền.")
+            pcm = tracks[index % len(tracks)]
+            index += 1
+            overlap = min(xfade, len(tail), len(pcm) // 2) if tail is not None else 0
+            if tail is not None:
+                emit(tail[:len(tail) - overlap])
+                ramp = (np.arange(overlap, dtype=np.float32) / max(1, overlap))[:, None]
+                emit(tail[len(tail) - overlap:] * (1.0 - ramp) + pcm[:overlap].astype(np.float32) * ramp)
+            keep_tail = min(xfade, len(pcm) - overlap)
+            for start in range(overlap, len(pcm) - keep_tail, block):
+                if written >= total:
+                    break
+                emit(pcm[start:min(start + block, len(pcm) - keep_tail)])
+            tail = pcm[len(pcm) - keep_tail:].astype(np.float32)
+    return written / float(sample_rate)
+
+
+_default_cache: Optional[BGMCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_bgm_cache(cfg: Optional[dict] = None) -> BGMCache:
+    """
+    Get the shared BGMCache (stored alongside config.json).
+
+    Args:
+        cfg: Optional app config; reads 'bgm_cache_max_mb'
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            from config.settings import get_config_path
+            root_dir = os.path.join(os.path.dirname(get_config_path()), BGM_CACHE_DIRNAME)
+            _default_cache = BGMCache(root_dir, max_size_mb=float((cfg or {}).get("bgm_cache_max_mb", DEFAULT_MAX_SIZE_MB)))
+        return _default_cache
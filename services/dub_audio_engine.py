@@ -0,0 +1,445 @@
+"""
+Dub Audio Engine for Piu Application
+
+In-process NumPy post-processing of TTS segments for the dubbing worker.
+Each segment is decoded once into a float32 array (frames x channels) at the
+processing sample rate; speed adjustment (WSOLA time-stretch, pitch kept),
+cutting and fades then run in memory, and every segment is placed at its
+start time into a single WAV track (TimelineMixer). This replaces the chain
+of ffmpeg/ffprobe processes, per-gap silence files and the concat pass.
+"""
+
+import logging
+import os
+import struct
+import subprocess
+import sys
+import wave
+from typing import Callable, List, Optional, Tuple
+
+# Optional imports with fallback
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    np = None
+
+from utils.ffmpeg_utils import find_ffmpeg
+
+# Constants
+APP_NAME = "Piu"
+# Giới hạn tốc độ giống bộ lọc atempo của bản FFmpeg cũ
+MIN_SPEED_FACTOR = 0.5
+MAX_SPEED_FACTOR = 3.0
+# WSOLA: cửa sổ 30 ms (chồng 50%), tìm điểm khớp trong ±10 ms
+WSOLA_WINDOW_S = 0.03
+WSOLA_TOLERANCE_S = 0.01
+# Tìm điểm khớp trên tín hiệu mono đã lấy mẫu thưa (nhanh hơn nhiều, sai số vài mẫu)
+WSOLA_SEARCH_DECIMATION = 4
+DECODE_TIMEOUT_S = 60
+# Xử lý segment chồng lấn trên timeline
+OVERLAP_SHIFT = "shift"        # Segment sau đợi segment trước kết thúc (hành vi cũ)
+OVERLAP_MIX = "mix"            # Đặt đúng vị trí, cộng audio chồng lấn
+OVERLAP_TRUNCATE = "truncate"  # Đặt đúng vị trí, cắt đuôi segment trước
+OVERLAP_POLICIES = (OVERLAP_SHIFT, OVERLAP_MIX, OVERLAP_TRUNCATE)
+WAV_HEADER_BYTES = 44
+MIXER_GROWTH_FACTOR = 1.5
+
+
+def to_channels(samples, channels: int):
+    """Convert (frames, n) samples to `channels` channels (mono mixdown or duplication)."""
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    if samples.shape[1] == channels:
+        return samples
+    mono = samples.mean(axis=1, keepdims=True, dtype=np.float32)
+    return np.repeat(mono, channels, axis=1) if channels > 1 else mono
+
+
+def resample(samples, src_rate: int, dst_rate: int):
+    """Resample (frames, channels) samples with linear interpolation."""
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    dst_frames = max(1, int(round(len(samples) * dst_rate / float(src_rate))))
+    src_positions = np.arange(dst_frames, dtype=np.float64) * (src_rate / float(dst_rate))
+    src_index = np.arange(len(samples), dtype=np.float64)
+    return np.stack(
+        [np.interp(src_positions, src_index, samples[:, c]) for c in range(samples.shape[1])], axis=1
+    ).astype(np.float32)
+
+
+def read_wav(path: str):
+    """
+    Read a PCM WAV file.
+
+    Returns:
+        (samples float32 (frames, channels) in [-1, 1], sample_rate)
+    """
+    with wave.open(path, "rb") as wf:
+        channels, width, rate = wf.getnchannels(), wf.getsampwidth(), wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+    if width == 1:
+        data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        data = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        as_bytes = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        as_int = (as_bytes[:, 0].astype(np.int32) | (as_bytes[:, 1].astype(np.int32) << 8)
+                  | (as_bytes[:, 2].astype(np.int32) << 16))
+        as_int = np.where(as_int >= 1 << 23, as_int - (1 << 24), as_int)
+        data = as_int.astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        data = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Độ rộng mẫu WAV không hỗ trợ: {width} byte")
+    return data.reshape(-1, channels), rate
+
+
+def write_wav(path: str, samples, sample_rate: int) -> None:
+    """Write (frames, channels) float32 samples as 16-bit PCM WAV."""
+    samples = np.asarray(samples, dtype=np.float32)
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).round().astype("<i2")
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(pcm.shape[1])
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm.tobytes())
+
+
+def open_pcm16_wav(path: str):
+    """
+    Map a 16-bit PCM WAV (as written by write_wav / TimelineMixer) without loading it.
+
+    Returns:
+        (int16 memmap (frames, channels), sample_rate)
+    """
+    with wave.open(path, "rb") as wf:
+        channels, width, rate, frames = wf.getnchannels(), wf.getsampwidth(), wf.getframerate(), wf.getnframes()
+    if width != 2:
+        raise ValueError(f"WAV không phải PCM 16-bit: {path}")
+    if frames == 0:
+        return np.zeros((0, channels), dtype="<i2"), rate
+    data_offset = os.path.getsize(path) - frames * channels * 2
+    return np.memmap(path, dtype="<i2", mode="r", offset=data_offset, shape=(frames, channels)), rate
+
+
+def decode_with_ffmpeg(path: str, sample_rate: int, channels: int,
+                       stop_check: Optional[Callable[[], bool]] = None):
+    """Decode any audio file to (frames, channels) float32 with a single ffmpeg process."""
+    ffmpeg_path = find_ffmpeg()
+    if not ffmpeg_path:
+        raise RuntimeError("Không tìm thấy FFmpeg để giải mã audio.")
+    if stop_check and stop_check():
+        raise InterruptedError("Dừng bởi người dùng trước khi giải mã audio.")
+    cmd = [
+        ffmpeg_path, "-nostdin", "-v", "error", "-i", os.path.abspath(path),
+        "-vn", "-ac", str(channels), "-ar", str(sample_rate), "-f", "f32le", "-"
+    ]
+    creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+    proc = subprocess.run(cmd, capture_output=True, timeout=DECODE_TIMEOUT_S, creationflags=creationflags)
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"FFmpeg giải mã audio thất bại (mã {proc.returncode}): "
+            f"{proc.stderr.decode('utf-8', errors='ignore').strip()[-300:]}"
+        )
+    return np.frombuffer(proc.stdout, dtype="<f4").reshape(-1, channels).copy()
+
+
+def load_audio(path: str, sample_rate: int, channels: int,
+               stop_check: Optional[Callable[[], bool]] = None):
+    """
+    Decode an audio file once to (frames, channels) float32 at sample_rate.
+
+    PCM WAV files are read and resampled in-process; other formats
+    (MP3 from the TTS engines) go through one ffmpeg decode.
+    """
+    if path.lower().endswith(".wav"):
+        try:
+            samples, rate = read_wav(path)
+            return resample(to_channels(samples, channels), rate, sample_rate)
+        except (wave.Error, ValueError, EOFError):
+            pass  # WAV không phải PCM (float, ADPCM...): để FFmpeg giải mã
+    return decode_with_ffmpeg(path, sample_rate, channels, stop_check)
+
+
+def duration_ms(samples, sample_rate: int) -> float:
+    """Duration of samples in milliseconds."""
+    return len(samples) * 1000.0 / sample_rate
+
+
+def make_silence(duration_ms_value: float, sample_rate: int, channels: int):
+    """Silent (frames, channels) float32 block of the given duration."""
+    frames = max(0, int(round(duration_ms_value * sample_rate / 1000.0)))
+    return np.zeros((frames, channels), dtype=np.float32)
+
+
+def trim(samples, sample_rate: int, start_ms: float, end_ms: float):
+    """Return samples between start_ms and end_ms (a view)."""
+    start = max(0, int(round(start_ms * sample_rate / 1000.0)))
+    end = min(len(samples), int(round(end_ms * sample_rate / 1000.0)))
+    return samples[start:max(start, end)]
+
+
+def apply_fade(samples, sample_rate: int, fade_in_s: float, fade_out_s: float, fade_delay_s: float = 0.0):
+    """
+    Apply linear fade-in/fade-out, with the same rules as the FFmpeg afade step:
+    segments too short for the requested fades are left unchanged; audio before
+    a delayed fade-in is silent; if fade-in and fade-out overlap, the fade-in is dropped.
+    """
+    segment_duration_s = len(samples) / float(sample_rate)
+    if abs(fade_in_s) < 0.001 and abs(fade_out_s) < 0.001 and abs(fade_delay_s) < 0.001:
+        return samples
+    if segment_duration_s <= (fade_in_s + fade_out_s) + fade_delay_s + 0.02:
+        return samples
+
+    fade_in_start_s = fade_delay_s if segment_duration_s > fade_delay_s + fade_in_s else 0.0
+    fade_out_start_s = max(0.0, segment_duration_s - fade_out_s)
+    if (fade_in_start_s + fade_in_s) >= fade_out_start_s > fade_in_start_s:
+        fade_in_start_s, fade_in_s = 0.0, 0.0
+
+    t = np.arange(len(samples), dtype=np.float32) / float(sample_rate)
+    gain = np.ones(len(samples), dtype=np.float32)
+    if fade_in_s > 0:
+        gain *= np.clip((t - fade_in_start_s) / fade_in_s, 0.0, 1.0)
+    elif fade_in_start_s > 0:
+        gain[t < fade_in_start_s] = 0.0
+    if fade_out_s > 0:
+        gain *= np.clip(1.0 - (t - fade_out_start_s) / fade_out_s, 0.0, 1.0)
+    return samples * gain[:, None]
+
+
+def time_stretch(samples, sample_rate: int, speed_factor: float):
+    """
+    Change tempo by speed_factor (>1 = faster/shorter) keeping the pitch, using
+    WSOLA (waveform-similarity overlap-add). speed_factor is clamped to 0.5..3.0.
+    """
+    speed = max(MIN_SPEED_FACTOR, min(MAX_SPEED_FACTOR, float(speed_factor)))
+    frames, channels = samples.shape
+    out_frames = int(round(frames / speed))
+    if abs(speed - 1.0) < 0.001 or frames == 0:
+        return samples.copy()
+
+    win = max(64, int(sample_rate * WSOLA_WINDOW_S) // 2 * 2)
+    hop = win // 2
+    tol = max(1, int(sample_rate * WSOLA_TOLERANCE_S))
+    if frames < 2 * win:
+        # Quá ngắn cho WSOLA: nội suy (đổi cao độ nhẹ, không nghe thấy với vài chục ms)
+        return resample(samples, frames, out_frames) if out_frames > 0 else samples[:0].copy()
+
+    n_out_hops = out_frames // hop + 1
+    anchors = np.round(np.arange(n_out_hops + 1) * hop * speed).astype(np.int64)
+    pad_end = int(anchors[-1]) + win + 2 * tol + hop - frames
+    padded = np.pad(samples, ((tol, max(0, pad_end)), (0, 0)))
+    dec = WSOLA_SEARCH_DECIMATION
+    mono = padded.mean(axis=1)[::dec]
+    tol_dec, win_dec = max(1, tol // dec), max(1, win // dec)
+
+    window = (0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(win) / win)).astype(np.float32)
+    out = np.zeros((n_out_hops * hop + win, channels), dtype=np.float32)
+    norm = np.zeros(n_out_hops * hop + win, dtype=np.float32)
+    delta = 0
+    for k in range(n_out_hops):
+        pos = int(anchors[k]) + tol + delta  # vị trí trong `padded`
+        out[k * hop:k * hop + win] += padded[pos:pos + win] * window[:, None]
+        norm[k * hop:k * hop + win] += window
+        # Đoạn "tự nhiên" tiếp theo của khung vừa chép; tìm khung đầu vào gần anchor kế tiếp giống nó nhất
+        natural = (pos + hop) // dec
+        template = mono[natural:natural + win_dec]
+        start = (int(anchors[k + 1]) + tol) // dec - tol_dec
+        region = mono[max(0, start):start + win_dec + 2 * tol_dec]
+        if len(template) == win_dec and len(region) >= win_dec:
+            corr = np.correlate(region, template, mode="valid")
+            delta = (int(np.argmax(corr)) + max(0, start) - start - tol_dec) * dec
+            delta = max(-tol, min(tol, delta))
+        else:
+            delta = 0
+    norm[norm < 1e-3] = 1.0
+    return (out / norm[:, None])[:out_frames]
+
+
+def resolve_overlaps(placements: List[Tuple[float, float]], overlap_policy: str = OVERLAP_SHIFT) -> List[Tuple[float, float]]:
+    """
+    Apply an overlap policy to timeline placements (used by the FFmpeg renderer;
+    TimelineMixer applies the same rules while writing).
+
+    Args:
+        placements: (start_ms, duration_ms) of each segment, in timeline order
+        overlap_policy: OVERLAP_SHIFT (later segment waits for the previous one to end),
+            OVERLAP_MIX (overlapping audio is summed) or OVERLAP_TRUNCATE (earlier
+            segments are cut where the next one starts)
+
+    Returns:
+        (start_ms, kept_duration_ms) of each segment
+    """
+    if overlap_policy not in OVERLAP_POLICIES:
+        raise ValueError(f"Chính sách chồng lấn không hợp lệ: {overlap_policy}")
+    resolved: List[List[float]] = []
+    last_end_ms = 0.0
+    for start_ms, seg_duration_ms in placements:
+        start_ms = max(0.0, float(start_ms))
+        if overlap_policy == OVERLAP_SHIFT:
+            start_ms = max(start_ms, last_end_ms)
+        elif overlap_policy == OVERLAP_TRUNCATE and start_ms < last_end_ms:
+            for earlier in resolved:
+                if earlier[0] + earlier[1] > start_ms:
+                    earlier[1] = max(0.0, start_ms - earlier[0])
+            last_end_ms = start_ms
+        resolved.append([start_ms, float(seg_duration_ms)])
+        last_end_ms = max(last_end_ms, start_ms + float(seg_duration_ms))
+    return [(start_ms, kept_ms) for start_ms, kept_ms in resolved]
+
+
+def build_mix_filter_script(placements: List[Tuple[int, float, Optional[float]]], sample_rate: int,
+                            channels: int, total_ms: float) -> str:
+    """
+    Build one FFmpeg filter graph placing every input on the timeline
+    (atrim + adelay per input, a single amix), output label [out].
+
+    Args:
+        placements: (input_index, start_ms, kept_duration_ms or None for the whole input)
+        sample_rate: Output sample rate
+        channels: Output channel count
+        total_ms: Exact length of the rendered track (padded with silence)
+    """
+    layout = {1: "mono", 2: "stereo"}.get(channels, f"{channels}c")
+    total_frames = max(1, int(round(total_ms * sample_rate / 1000.0)))
+    chains = []
+    for n, (input_index, start_ms, kept_ms) in enumerate(placements):
+        chain = f"[{input_index}:a]aresample={sample_rate},aformat=sample_fmts=fltp:channel_layouts={layout}"
+        if kept_ms is not None:
+            chain += f",atrim=end_sample={max(1, int(round(kept_ms * sample_rate / 1000.0)))}"
+        delay_frames = max(0, int(round(start_ms * sample_rate / 1000.0)))
+        if delay_frames:
+            chain += ",adelay=delays=" + "|".join([f"{delay_frames}S"] * channels)
+        chains.append(f"{chain}[p{n}]")
+    mix_inputs = "".join(f"[p{n}]" for n in range(len(placements)))
+    chains.append(
+        f"{mix_inputs}amix=inputs={len(placements)}:duration=longest:dropout_transition=0:normalize=0,"
+        f"apad=whole_len={total_frames},atrim=end_sample={total_frames}[out]"
+    )
+    return ";\n".join(chains)
+
+
+class TimelineMixer:
+    """
+    Dub track rendered in a single pass: each segment is written at its
+    sample-exact start position into one output buffer (a 16-bit PCM WAV
+    file mapped into memory, so memory use does not grow with the video
+    length). Gaps need no silence blocks - unwritten frames are zero.
+    Overlaps follow the overlap policy (see resolve_overlaps).
+    """
+
+    def __init__(self, output_path: str, sample_rate: int, channels: int,
+                 overlap_policy: str = OVERLAP_SHIFT, expected_ms: float = 0.0,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            output_path: WAV file of the whole track
+            sample_rate: Processing sample rate of every segment
+            channels: Channel count of every segment
+            overlap_policy: OVERLAP_SHIFT, OVERLAP_MIX or OVERLAP_TRUNCATE
+            expected_ms: Expected track length, preallocated up front (the buffer grows if exceeded)
+            logger: Optional logger instance
+        """
+        if overlap_policy not in OVERLAP_POLICIES:
+            raise ValueError(f"Chính sách chồng lấn không hợp lệ: {overlap_policy}")
+        self.logger = logger or logging.getLogger(APP_NAME)
+        self.output_path = output_path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.overlap_policy = overlap_policy
+        self.frames = 0  # Độ dài track (frame)
+        self.placed = 0
+        self.overlaps = 0
+        self.closed = False
+        self._last_end = 0  # Frame kết thúc xa nhất đã ghi
+        self._capacity = 0
+        self._buffer = None
+        self._file = open(output_path, "w+b")
+        self._file.write(b"\0" * WAV_HEADER_BYTES)
+        self._reserve(self._ms_to_frames(expected_ms))
+
+    def _ms_to_frames(self, value_ms: float) -> int:
+        return max(0, int(round(float(value_ms) * self.sample_rate / 1000.0)))
+
+    def _release_buffer(self) -> None:
+        if self._buffer is not None:
+            self._buffer.flush()
+            self._buffer = None  # Phải bỏ ánh xạ trước khi đổi kích thước file (Windows)
+
+    def _reserve(self, frames: int) -> None:
+        if frames <= self._capacity:
+            return
+        capacity = max(frames, int(self._capacity * MIXER_GROWTH_FACTOR))
+        self._release_buffer()
+        self._file.truncate(WAV_HEADER_BYTES + capacity * self.channels * 2)
+        self._buffer = np.memmap(self._file, dtype="<i2", mode="r+", offset=WAV_HEADER_BYTES,
+                                 shape=(capacity, self.channels))
+        self._capacity = capacity
+
+    def place(self, start_ms: float, samples) -> Tuple[float, float]:
+        """
+        Write a (frames, channels) segment at start_ms (fractional ms allowed).
+
+        Returns:
+            (start_ms, end_ms) where the segment actually landed
+        """
+        if self.closed:
+            raise ValueError("Track đã đóng.")
+        samples = to_channels(np.asarray(samples, dtype=np.float32), self.channels)
+        start = self._ms_to_frames(start_ms)
+        if start < self._last_end:
+            self.overlaps += 1
+            if self.overlap_policy == OVERLAP_SHIFT:
+                start = self._last_end
+        end = start + len(samples)
+        self._reserve(end)
+        if self.overlap_policy == OVERLAP_TRUNCATE and start < self._last_end:
+            self._buffer[start:self._last_end] = 0
+            self._last_end = start
+        if len(samples):
+            region = self._buffer[start:end]
+            mixed = region.astype(np.float32) / 32767.0 + samples
+            region[:] = (np.clip(mixed, -1.0, 1.0) * 32767.0).round().astype("<i2")
+        self._last_end = max(self._last_end, end)
+        self.frames = max(self.frames, end)
+        self.placed += 1
+        return start * 1000.0 / self.sample_rate, end * 1000.0 / self.sample_rate
+
+    @property
+    def duration_ms(self) -> float:
+        """Current length of the track in milliseconds."""
+        return self.frames * 1000.0 / self.sample_rate
+
+    def __len__(self) -> int:
+        return self.placed
+
+    def close(self, total_ms: Optional[float] = None) -> None:
+        """
+        Finalize the WAV header and close the file.
+
+        Args:
+            total_ms: Pad (with silence) the track to at least this length
+        """
+        if self.closed:
+            return
+        if total_ms is not None:
+            self.frames = max(self.frames, self._ms_to_frames(total_ms))
+        self._release_buffer()
+        data_bytes = self.frames * self.channels * 2
+        self._file.truncate(WAV_HEADER_BYTES + data_bytes)
+        self._file.seek(0)
+        self._file.write(struct.pack(
+            "<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_bytes, b"WAVE", b"fmt ", 16, 1, self.channels,
+            self.sample_rate, self.sample_rate * self.channels * 2, self.channels * 2, 16, b"data", data_bytes
+        ))
+        self._file.close()
+        self.closed = True
+        self.logger.info(
+            f"[DubAudioEngine] Đã ghi track {self.duration_ms / 1000.0:.2f}s "
+            f"({self.placed} segment, {self.overlaps} chồng lấn, chính sách '{self.overlap_policy}') "
+            f"-> {os.path.basename(self.output_path)}"
+        )
@@ -0,0 +1,205 @@
+"""
+Dub Segment Manifest for Piu Application
+
+Persistent per-video record of the dubbed segments of the last run: for each
+segment, a fingerprint of everything that shapes its processed audio (text
+sent to the engine, voice settings, target duration, post-processing
+parameters) and the processed audio itself (WAV + SHA-1). A re-run after a
+script edit diffs against it: unchanged segments are placed on the timeline
+straight from the stored audio (no TTS, no post-processing); only changed
+segments are synthesized and processed again.
+
+Layout: <root>/<sha1(video path)[:16]>/manifest.json + seg_<fingerprint[:20]>.wav
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+
+# Constants
+APP_NAME = "Piu"
+MANIFEST_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+DUB_MANIFESTS_DIRNAME = "dub_manifests"
+# Số video giữ manifest (cũ nhất bị xóa trước)
+DEFAULT_MAX_MANIFESTS = 10
+
+
+def file_sha1(path: str) -> str:
+    """SHA-1 of a file's content."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DubManifest:
+    """
+    Segment manifest of one source video: fingerprint -> processed segment audio.
+    """
+
+    def __init__(self, root_dir: str, source_key: str, max_manifests: int = DEFAULT_MAX_MANIFESTS,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Initialize (and load) the manifest of a source video.
+
+        Args:
+            root_dir: Folder holding the manifests of all videos
+            source_key: Identity of the dub target (absolute video path)
+            max_manifests: Number of videos whose manifests are kept (checked on save)
+            logger: Optional logger instance
+        """
+        self.logger = logger or logging.getLogger(APP_NAME)
+        self.root_dir = root_dir
+        self.max_manifests = max_manifests
+        self.source_key = source_key
+        self.dir = os.path.join(root_dir, hashlib.sha1(source_key.encode("utf-8")).hexdigest()[:16])
+        self.path = os.path.join(self.dir, MANIFEST_FILENAME)
+
+        self.previous: Dict[str, Dict] = {}  # Mục của lần chạy trước
+        self.current: Dict[str, Dict] = {}   # Mục dùng/tạo trong lần chạy này
+        self.reused = 0
+        self.rebuilt = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def fingerprint(segment_inputs: Dict) -> str:
+        """Fingerprint of the inputs that determine a segment's processed audio."""
+        payload = json.dumps(segment_inputs, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION and data.get("source") == self.source_key:
+                self.previous = data.get("segments", {})
+                self.logger.info(f"[DubManifest] Đã tải manifest ({len(self.previous)} segment) của lần dub trước.")
+        except Exception as e:
+            self.logger.warning(f"[DubManifest] Manifest hỏng, bỏ qua: {e}")
+            self.previous = {}
+
+    def _audio_path(self, entry: Dict) -> str:
+        return os.path.join(self.dir, entry["file"])
+
+    def lookup(self, fp: str) -> Optional[Dict]:
+        """
+        Find an unchanged segment from the previous run.
+
+        Returns:
+            Entry dict with the absolute 'path' of its processed audio, or None
+        """
+        entry = self.previous.get(fp) or self.current.get(fp)
+        if not entry:
+            return None
+        audio_path = self._audio_path(entry)
+        try:
+            if os.path.getsize(audio_path) != entry.get("size"):
+                return None
+        except OSError:
+            return None
+        with self._lock:
+            self.current[fp] = entry
+            self.reused += 1
+        return dict(entry, path=audio_path)
+
+    def store(self, fp: str, audio_path: str, duration_ms: float, **extra) -> None:
+        """
+        Record the processed audio of a (re)built segment; audio_path is copied into the manifest folder.
+
+        Args:
+            fp: Segment fingerprint
+            audio_path: Processed segment audio (WAV)
+            duration_ms: Duration of the processed audio
+            extra: Other per-segment results to keep (effective duration, overflow, ...)
+        """
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            file_name = f"seg_{fp[:20]}.wav"
+            target_path = os.path.join(self.dir, file_name)
+            if os.path.abspath(audio_path) != os.path.abspath(target_path):
+                shutil.copyfile(audio_path, target_path)
+            entry = dict(extra, file=file_name, duration_ms=float(duration_ms),
+                         size=os.path.getsize(target_path), audio_sha1=file_sha1(target_path))
+        except Exception as e:
+            self.logger.warning(f"[DubManifest] Không lưu được segment vào manifest: {e}")
+            return
+        with self._lock:
+            self.current[fp] = entry
+            self.rebuilt += 1
+
+    def audio_path_for(self, fp: str) -> str:
+        """Path where the processed audio of a segment is kept (to write it in place)."""
+        os.makedirs(self.dir, exist_ok=True)
+        return os.path.join(self.dir, f"seg_{fp[:20]}.wav")
+
+    def save(self, prune: bool = True) -> None:
+        """
+        Write the manifest of this run.
+
+        Args:
+            prune: True when the run covered the whole script: segments not used
+                this run are dropped (with their audio). False keeps them, so an
+                interrupted run does not lose the previous results.
+        """
+        with self._lock:
+            segments = dict(self.current) if prune else dict(self.previous, **self.current)
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "source": self.source_key, "updated_at": time.time(),
+                           "segments": segments}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+            if prune:
+                keep_files = {entry["file"] for entry in segments.values()}
+                for name in os.listdir(self.dir):
+                    if name.startswith("seg_") and name not in keep_files:
+                        os.remove(os.path.join(self.dir, name))
+            prune_manifests(self.root_dir, self.max_manifests, self.logger)
+            self.logger.info(
+                f"[DubManifest] Đã lưu manifest: {self.reused} segment dùng lại, {self.rebuilt} segment tạo mới, "
+                f"{len(segments)} segment trong manifest."
+            )
+        except Exception as e:
+            self.logger.warning(f"[DubManifest] Không lưu được manifest: {e}")
+
+
+def prune_manifests(root_dir: str, max_manifests: int = DEFAULT_MAX_MANIFESTS,
+                    logger: Optional[logging.Logger] = None) -> None:
+    """Delete the manifests of the least recently dubbed videos beyond max_manifests."""
+    logger = logger or logging.getLogger(APP_NAME)
+    if not os.path.isdir(root_dir):
+        return
+    manifest_dirs = []
+    for name in os.listdir(root_dir):
+        manifest_path = os.path.join(root_dir, name, MANIFEST_FILENAME)
+        if os.path.exists(manifest_path):
+            manifest_dirs.append((os.path.getmtime(manifest_path), os.path.join(root_dir, name)))
+    manifest_dirs.sort(reverse=True)
+    for _, old_dir in manifest_dirs[max_manifests:]:
+        shutil.rmtree(old_dir, ignore_errors=True)
+        logger.info(f"[DubManifest] Đã xóa manifest cũ: {os.path.basename(old_dir)}")
+
+
+def get_dub_manifest(source_key: str, cfg: Optional[dict] = None) -> DubManifest:
+    """
+    Open the manifest of a source video (stored alongside config.json).
+
+    Args:
+        source_key: Identity of the dub target (absolute video path)
+        cfg: Optional app config; reads 'dub_manifest_max_videos'
+    """
+    from config.settings import get_config_path
+    root_dir = os.path.join(os.path.dirname(get_config_path()), DUB_MANIFESTS_DIRNAME)
+    return DubManifest(root_dir, source_key,
+                       max_manifests=int((cfg or {}).get("dub_manifest_max_videos", DEFAULT_MAX_MANIFESTS)))
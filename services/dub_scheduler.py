@@ -0,0 +1,165 @@
+"""
+Dub Task Scheduler for Piu Application
+
+Runs several tasks of the dub batch queue at once. Each task works from its
+own context (a snapshot of its settings, see models.task_models.DubTaskContext)
+and moves through two kinds of stage:
+
+- network: TTS synthesis of the script segments (waits on remote APIs)
+- cpu: FFmpeg work (standardize, render, loudness normalize, encode, mux)
+
+Each kind has its own slot limit, so task B's TTS requests can run while
+task A is muxing. A task holds at most one slot at a time and releases it
+before waiting for the next one, so tasks cannot deadlock each other; waiting
+tasks get a slot in the order they asked for it.
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Constants
+APP_NAME = "Piu"
+STAGE_NETWORK = "network"
+STAGE_CPU = "cpu"
+STAGES = (STAGE_NETWORK, STAGE_CPU)
+DEFAULT_CPU_SLOTS = 1
+DEFAULT_NETWORK_SLOTS = 1
+# Chu kỳ kiểm tra yêu cầu dừng khi đang chờ slot
+SLOT_POLL_INTERVAL_S = 0.2
+
+
+class DubTaskScheduler:
+    """
+    Slot scheduler for concurrent dub tasks (CPU-bound and network-bound stages).
+    """
+
+    def __init__(self, cpu_slots: int = DEFAULT_CPU_SLOTS, network_slots: int = DEFAULT_NETWORK_SLOTS,
+                 max_active_tasks: Optional[int] = None, logger: Optional[logging.Logger] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            cpu_slots: Tasks allowed in a CPU stage (FFmpeg) at the same time
+            network_slots: Tasks allowed in a network stage (TTS) at the same time
+            max_active_tasks: Tasks started at the same time (default: cpu_slots + network_slots)
+            logger: Optional logger instance
+        """
+        self.logger = logger or logging.getLogger(APP_NAME)
+        self.slot_limits = {STAGE_CPU: max(1, int(cpu_slots)), STAGE_NETWORK: max(1, int(network_slots))}
+        self.max_active_tasks = max(1, int(max_active_tasks or sum(self.slot_limits.values())))
+
+        self._cond = threading.Condition()
+        self._slots_in_use = {stage: 0 for stage in STAGES}
+        self._waiting = {stage: deque() for stage in STAGES}
+        self._active: Dict[str, object] = {}  # task_id -> context
+        self._stats = {'started': 0, 'finished': 0, 'max_parallel': 0}
+
+    def can_start(self) -> bool:
+        """True if another task may be started now."""
+        with self._cond:
+            return len(self._active) < self.max_active_tasks
+
+    def start(self, ctx, run_fn: Callable, on_finished: Optional[Callable] = None,
+              thread_name: Optional[str] = None) -> threading.Thread:
+        """
+        Run a task in its own thread.
+
+        Its slot is released and the task is no longer active before
+        on_finished(ctx) is called, even if run_fn raises.
+
+        Args:
+            ctx: Task context (needs 'task_id' and 'stage' attributes)
+            run_fn: Worker, called as run_fn(ctx)
+            on_finished: Optional callback, called as on_finished(ctx) in the worker thread
+            thread_name: Optional thread name
+        """
+        with self._cond:
+            self._active[ctx.task_id] = ctx
+            self._stats['started'] += 1
+            self._stats['max_parallel'] = max(self._stats['max_parallel'], len(self._active))
+
+        def _run():
+            try:
+                run_fn(ctx)
+            except Exception as e:
+                self.logger.error(f"[DubScheduler] Lỗi không mong muốn của tác vụ {ctx.task_id}: {e}", exc_info=True)
+            finally:
+                self.release(ctx)
+                with self._cond:
+                    self._active.pop(ctx.task_id, None)
+                    self._stats['finished'] += 1
+                    self._cond.notify_all()
+                if on_finished:
+                    on_finished(ctx)
+
+        thread = threading.Thread(target=_run, daemon=True, name=thread_name or f"DubTaskWorker_{ctx.task_id[:8]}")
+        thread.start()
+        return thread
+
+    def enter_stage(self, ctx, stage: str, stop_event: Optional[threading.Event] = None) -> None:
+        """
+        Move a task to a stage, waiting for a free slot of that kind.
+
+        The slot of the previous stage is released first.
+
+        Raises:
+            InterruptedError: stop_event was set while waiting
+        """
+        if stage not in self.slot_limits:
+            raise ValueError(f"Giai đoạn không hợp lệ: {stage}")
+        if ctx.stage == stage:
+            return
+        self.release(ctx)
+        with self._cond:
+            queue = self._waiting[stage]
+            queue.append(ctx.task_id)
+            try:
+                if self._slots_in_use[stage] >= self.slot_limits[stage] or queue[0] != ctx.task_id:
+                    self.logger.info(f"[DubScheduler] Tác vụ {ctx.task_id[:6]} chờ slot {stage}...")
+                while self._slots_in_use[stage] >= self.slot_limits[stage] or queue[0] != ctx.task_id:
+                    if stop_event is not None and stop_event.is_set():
+                        raise InterruptedError(f"Dừng khi chờ slot {stage}")
+                    self._cond.wait(SLOT_POLL_INTERVAL_S)
+                self._slots_in_use[stage] += 1
+                ctx.stage = stage
+            finally:
+                queue.remove(ctx.task_id)
+                self._cond.notify_all()
+        self.logger.debug(f"[DubScheduler] Tác vụ {ctx.task_id[:6]} vào giai đoạn {stage}.")
+
+    def release(self, ctx) -> None:
+        """Release the slot held by a task (if any)."""
+        with self._cond:
+            if ctx.stage in self._slots_in_use:
+                self._slots_in_use[ctx.stage] -= 1
+                self._cond.notify_all()
+            ctx.stage = None
+
+    def active_task_ids(self) -> List[str]:
+        """IDs of the tasks started and not finished yet."""
+        with self._cond:
+            return list(self._active)
+
+    def get_stats(self) -> Dict:
+        """Get scheduler statistics."""
+        with self._cond:
+            return dict(self._stats, active=len(self._active), slots_in_use=dict(self._slots_in_use),
+                        slot_limits=dict(self.slot_limits), max_active_tasks=self.max_active_tasks)
+
+
+def create_dub_scheduler(cfg: Optional[dict] = None) -> DubTaskScheduler:
+    """
+    Create the scheduler of a dub batch from the app config.
+
+    Args:
+        cfg: Optional app config; reads 'dub_scheduler_cpu_slots', 'dub_scheduler_network_slots'
+             and 'dub_max_concurrent_tasks' (0 = cpu + network slots)
+    """
+    cfg = cfg or {}
+    return DubTaskScheduler(
+        cpu_slots=int(cfg.get("dub_scheduler_cpu_slots", DEFAULT_CPU_SLOTS)),
+        network_slots=int(cfg.get("dub_scheduler_network_slots", DEFAULT_NETWORK_SLOTS)),
+        max_active_tasks=int(cfg.get("dub_max_concurrent_tasks", 0)) or None,
+    )
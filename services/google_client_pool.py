@@ -0,0 +1,194 @@
+"""
+Google Client Pool for Piu Application
+
+Shares Google Cloud clients (Translate v2, Text-to-Speech) and their
+service-account credentials across the subtitle, dubbing and batch threads.
+
+Before this pool every call re-parsed the service-account JSON and built a
+new client (new TLS session) per subtitle block / TTS segment.
+
+Entries are keyed by (absolute key-file path, mtime): when the key file is
+replaced or edited, the stale client is dropped and rebuilt on next use.
+"""
+
+import datetime
+import logging
+import os
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+# Optional imports with fallback
+try:
+    from google.oauth2 import service_account
+    from google.auth.transport.requests import Request as GoogleAuthRequest
+    HAS_GOOGLE_AUTH = True
+except ImportError:
+    HAS_GOOGLE_AUTH = False
+    service_account = None
+    GoogleAuthRequest = None
+
+try:
+    from google.cloud import translate_v2 as google_translate
+    HAS_GOOGLE_CLOUD_TRANSLATE = True
+except ImportError:
+    HAS_GOOGLE_CLOUD_TRANSLATE = False
+    google_translate = None
+
+try:
+    from google.cloud import texttospeech as google_tts
+    HAS_GOOGLE_TTS = True
+except ImportError:
+    HAS_GOOGLE_TTS = False
+    google_tts = None
+
+TRANSLATE_SCOPES = ("https://www.googleapis.com/auth/cloud-translation",)
+CLOUD_PLATFORM_SCOPES = ("https://www.googleapis.com/auth/cloud-platform",)
+
+# Làm mới token sớm hơn thời điểm hết hạn thực tế (giây)
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+_pool_lock = threading.RLock()
+# Mỗi bộ credentials có lock làm mới riêng: làm mới token (gọi mạng) không giữ _pool_lock
+_credentials_cache: Dict[Tuple[str, Tuple[str, ...]], Tuple[int, object, threading.Lock]] = {}
+_client_cache: Dict[Tuple[str, str], Tuple[int, object, object, threading.Lock]] = {}
+
+
+def _key_file_signature(key_path: str) -> Tuple[str, int]:
+    """Return (absolute path, mtime_ns) for the key file. Raises OSError if missing."""
+    abs_path = os.path.abspath(key_path)
+    return abs_path, os.stat(abs_path).st_mtime_ns
+
+
+def _token_needs_refresh(credentials) -> bool:
+    expiry = getattr(credentials, "expiry", None)
+    if not getattr(credentials, "token", None) or expiry is None:
+        return True
+    return (expiry - datetime.datetime.utcnow()).total_seconds() < TOKEN_REFRESH_MARGIN_SECONDS
+
+
+def _refresh_if_needed(credentials, refresh_lock: threading.Lock, log_prefix: str = "[GoogleClientPool]") -> None:
+    """
+    Refresh the access token if it is missing or about to expire.
+
+    Must be called without holding _pool_lock (the refresh is a network round trip).
+    refresh_lock makes concurrent callers of the same credentials refresh only once.
+    """
+    if GoogleAuthRequest is None or credentials is None:
+        return
+    try:
+        if not _token_needs_refresh(credentials):
+            return
+        with refresh_lock:
+            if _token_needs_refresh(credentials): # Luồng khác có thể vừa làm mới xong
+                credentials.refresh(GoogleAuthRequest())
+                logging.debug(f"{log_prefix} Đã làm mới access token (hết hạn: {credentials.expiry}).")
+    except Exception as e:
+        # Không chặn luồng gọi: thư viện client vẫn tự refresh khi gửi request
+        logging.warning(f"{log_prefix} Không thể làm mới token trước: {e}")
+
+
+def _get_credentials_entry(abs_path: str, mtime_ns: int, scopes: Sequence[str]) -> Tuple[object, threading.Lock]:
+    """Load (or reuse) credentials and their refresh lock. Caller holds _pool_lock."""
+    cache_key = (abs_path, tuple(scopes))
+    cached = _credentials_cache.get(cache_key)
+    if cached and cached[0] == mtime_ns:
+        return cached[1], cached[2]
+    if cached:
+        logging.info(f"[GoogleClientPool] File key '{os.path.basename(abs_path)}' đã thay đổi. Nạp lại credentials.")
+    credentials = service_account.Credentials.from_service_account_file(abs_path, scopes=list(scopes))
+    refresh_lock = threading.Lock()
+    _credentials_cache[cache_key] = (mtime_ns, credentials, refresh_lock)
+    return credentials, refresh_lock
+
+
+def get_service_account_credentials(key_path: str, scopes: Sequence[str] = CLOUD_PLATFORM_SCOPES):
+    """
+    Load (or reuse) service-account credentials for a key file.
+
+    Args:
+        key_path: Path to the service-account JSON key
+        scopes: OAuth scopes to request
+
+    Returns:
+        google.oauth2.service_account.Credentials
+
+    Raises:
+        RuntimeError: If google-auth is not installed
+        OSError: If the key file does not exist
+    """
+    if not HAS_GOOGLE_AUTH:
+        raise RuntimeError("Thư viện google-auth chưa được cài đặt.")
+
+    abs_path, mtime_ns = _key_file_signature(key_path)
+    with _pool_lock:
+        credentials, refresh_lock = _get_credentials_entry(abs_path, mtime_ns, scopes)
+    _refresh_if_needed(credentials, refresh_lock)
+    return credentials
+
+
+def _get_client(kind: str, key_path: str, scopes: Sequence[str], factory):
+    if not HAS_GOOGLE_AUTH:
+        raise RuntimeError("Thư viện google-auth chưa được cài đặt.")
+
+    abs_path, mtime_ns = _key_file_signature(key_path)
+    cache_key = (kind, abs_path)
+    with _pool_lock:
+        cached = _client_cache.get(cache_key)
+        if cached and cached[0] == mtime_ns:
+            _, client, credentials, refresh_lock = cached
+        else:
+            credentials, refresh_lock = _get_credentials_entry(abs_path, mtime_ns, scopes)
+            client = factory(credentials)
+            _client_cache[cache_key] = (mtime_ns, client, credentials, refresh_lock)
+            logging.info(f"[GoogleClientPool] Đã tạo client '{kind}' cho key '{os.path.basename(abs_path)}'.")
+    _refresh_if_needed(credentials, refresh_lock)
+    return client
+
+
+def get_google_translate_client(key_path: str):
+    """
+    Return a shared google.cloud.translate_v2.Client for the key file.
+
+    Raises:
+        RuntimeError: If google-cloud-translate is not installed
+        OSError: If the key file does not exist
+    """
+    if not HAS_GOOGLE_CLOUD_TRANSLATE:
+        raise RuntimeError("Thư viện Google Cloud Translate chưa được cài đặt.")
+    return _get_client("translate_v2", key_path, TRANSLATE_SCOPES,
+                       lambda creds: google_translate.Client(credentials=creds))
+
+
+def get_google_tts_client(key_path: str):
+    """
+    Return a shared texttospeech.TextToSpeechClient for the key file.
+
+    Raises:
+        RuntimeError: If google-cloud-texttospeech is not installed
+        OSError: If the key file does not exist
+    """
+    if not HAS_GOOGLE_TTS:
+        raise RuntimeError("Thư viện Google Cloud Text-to-Speech chưa được cài đặt.")
+    return _get_client("texttospeech", key_path, CLOUD_PLATFORM_SCOPES,
+                       lambda creds: google_tts.TextToSpeechClient(credentials=creds))
+
+
+def invalidate_google_clients(key_path: Optional[str] = None) -> None:
+    """
+    Drop cached clients/credentials.
+
+    Args:
+        key_path: Only drop entries of this key file. If None, clear everything.
+    """
+    with _pool_lock:
+        if key_path is None:
+            _client_cache.clear()
+            _credentials_cache.clear()
+            logging.info("[GoogleClientPool] Đã xóa toàn bộ client/credentials trong pool.")
+            return
+        abs_path = os.path.abspath(key_path)
+        for cache_key in [k for k in _client_cache if k[1] == abs_path]:
+            _client_cache.pop(cache_key, None)
+        for cache_key in [k for k in _credentials_cache if k[0] == abs_path]:
+            _credentials_cache.pop(cache_key, None)
+        logging.info(f"[GoogleClientPool] Đã xóa client/credentials của key '{os.path.basename(abs_path)}'.")
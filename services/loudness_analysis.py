@@ -0,0 +1,291 @@
+"""
+Loudness Analysis for Piu Application
+
+EBU R128 / ITU-R BS.1770 measurement (integrated loudness, true peak,
+loudness range) for two-pass normalization without two full decodes:
+tracks the app wrote itself (16-bit PCM WAV) are measured in-process from a
+memory map of the file; anything else takes one FFmpeg loudnorm analysis
+pass. The stats are cached next to the asset (<file>.loudness.json, valid
+while size and mtime match) and turned into a linear-mode loudnorm filter
+for the single apply/encode pass.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from typing import Dict, Optional
+
+# Optional imports with fallback
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    np = None
+
+from services.dub_audio_engine import open_pcm16_wav
+
+# Constants
+APP_NAME = "Piu"
+STATS_SUFFIX = ".loudness.json"
+# Đo độ lớn theo ITU-R BS.1770 / EBU R128 (giống bộ lọc loudnorm của FFmpeg)
+LOUDNESS_SUBBLOCK_S = 0.1          # Khối 400 ms chồng 75% = 4 khối con 100 ms
+LOUDNESS_BLOCK_SUBBLOCKS = 4
+LOUDNESS_SHORT_TERM_SUBBLOCKS = 30  # Cửa sổ 3 s cho LRA
+LOUDNESS_ABSOLUTE_GATE_LUFS = -70.0
+LOUDNESS_RELATIVE_GATE_LU = -10.0
+LRA_RELATIVE_GATE_LU = -20.0
+TRUE_PEAK_OVERSAMPLING = 4
+TRUE_PEAK_BLOCK_FRAMES = 1 << 15
+TRUE_PEAK_MARGIN_FRAMES = 1024
+
+
+def _k_weighting_power_response(n_fft: int, sample_rate: int):
+    """|H(f)|^2 of the BS.1770 K-weighting filter (high shelf + high pass) at the rfft bins."""
+    w = 2.0 * np.pi * np.fft.rfftfreq(n_fft)
+    z1, z2 = np.exp(-1j * w), np.exp(-2j * w)
+
+    def biquad_power(b, a):
+        return np.abs((b[0] + b[1] * z1 + b[2] * z2) / (a[0] + a[1] * z1 + a[2] * z2)) ** 2
+
+    # Hệ số theo libebur128 (biến đổi song tuyến tính, đúng cho mọi tần số lấy mẫu)
+    # Bậc 1: high shelf +4 dB quanh 1.68 kHz
+    K = np.tan(np.pi * 1681.974450955533 / sample_rate)
+    Q = 0.7071752369554196
+    Vh = 10.0 ** (3.999843853973347 / 20.0)
+    Vb = Vh ** 0.4996667741545416
+    a0 = 1.0 + K / Q + K * K
+    shelf = biquad_power(((Vh + Vb * K / Q + K * K) / a0, 2.0 * (K * K - Vh) / a0, (Vh - Vb * K / Q + K * K) / a0),
+                         (1.0, 2.0 * (K * K - 1.0) / a0, (1.0 - K / Q + K * K) / a0))
+    # Bậc 2: high pass 38 Hz
+    K = np.tan(np.pi * 38.13547087602444 / sample_rate)
+    Q = 0.5003270373238773
+    a0 = 1.0 + K / Q + K * K
+    high_pass = biquad_power((1.0, -2.0, 1.0), (1.0, 2.0 * (K * K - 1.0) / a0, (1.0 - K / Q + K * K) / a0))
+    return shelf * high_pass
+
+
+def _power_to_lufs(power):
+    with np.errstate(divide="ignore"):
+        return -0.691 + 10.0 * np.log10(power)
+
+
+def _gated_mean_power(block_power, relative_gate_lu: float):
+    """Mean power of the blocks passing the absolute and relative gates (0.0 if none)."""
+    block_power = block_power[_power_to_lufs(block_power) > LOUDNESS_ABSOLUTE_GATE_LUFS]
+    if len(block_power) == 0:
+        return 0.0, block_power
+    gate_lufs = _power_to_lufs(block_power.mean()) + relative_gate_lu
+    block_power = block_power[_power_to_lufs(block_power) > gate_lufs]
+    return (float(block_power.mean()) if len(block_power) else 0.0), block_power
+
+
+def _as_float32(block):
+    """float32 copy of a block of samples; 16-bit PCM (memmap of a WAV) is scaled to [-1, 1]."""
+    if block.dtype.kind == "i":
+        return block.astype(np.float32) / 32768.0
+    return np.asarray(block, dtype=np.float32)
+
+
+def true_peak_db(samples, sample_rate: int) -> float:
+    """True peak (dBTP) with 4x FFT oversampling over overlapping fixed-size blocks."""
+    if len(samples) == 0:
+        return float("-inf")
+    block, margin = TRUE_PEAK_BLOCK_FRAMES, TRUE_PEAK_MARGIN_FRAMES
+    step = block - 2 * margin
+    os_factor = TRUE_PEAK_OVERSAMPLING
+    peak = 0.0
+    for start in range(0, len(samples), step):
+        lo = max(0, start - margin)
+        chunk = _as_float32(samples[lo:lo + block])
+        peak = max(peak, float(np.abs(chunk).max()))
+        if len(chunk) < 2 * margin:
+            chunk = np.pad(chunk, ((0, 2 * margin - len(chunk)), (0, 0)))
+        upsampled = np.fft.irfft(np.fft.rfft(chunk, axis=0), n=len(chunk) * os_factor, axis=0) * os_factor
+        # Bỏ phần rìa mỗi khối (nhiễu biên của FFT); phần rìa nằm trong khối kề bên
+        keep = upsampled[(start - lo) * os_factor:(start - lo + step) * os_factor]
+        if len(keep):
+            peak = max(peak, float(np.abs(keep).max()))
+    return float(20.0 * np.log10(peak)) if peak > 0 else float("-inf")
+
+
+def measure_loudness(samples, sample_rate: int) -> dict:
+    """
+    Measure integrated loudness, loudness range and true peak (EBU R128).
+    samples: (frames, channels) float32, or int16 PCM (e.g. open_pcm16_wav).
+
+    K-weighting is applied in the frequency domain per 100 ms sub-block; the
+    gated 400 ms blocks (75% overlap) and 3 s short-term windows for LRA are
+    built from the sub-block powers.
+
+    Returns:
+        {'integrated_lufs', 'true_peak_db', 'lra', 'threshold_lufs'} (-inf when silent)
+    """
+    samples = samples[:, None] if samples.ndim == 1 else samples
+    n_fft = max(1, int(round(sample_rate * LOUDNESS_SUBBLOCK_S)))
+    n_sub = len(samples) // n_fft
+    result = {'integrated_lufs': float("-inf"), 'true_peak_db': true_peak_db(samples, sample_rate),
+              'lra': 0.0, 'threshold_lufs': float("-inf")}
+    if n_sub < LOUDNESS_BLOCK_SUBBLOCKS:
+        return result
+
+    # Parseval: tổng bình phương của khối đã lọc = tổng |X|^2 * |H|^2 (bin DC/Nyquist tính một lần)
+    bin_weights = _k_weighting_power_response(n_fft, sample_rate) * 2.0
+    bin_weights[0] /= 2.0
+    if n_fft % 2 == 0:
+        bin_weights[-1] /= 2.0
+    sub_power = np.empty(n_sub, dtype=np.float64)
+    batch = 200
+    for i in range(0, n_sub, batch):
+        blocks = _as_float32(samples[i * n_fft:min(n_sub, i + batch) * n_fft])
+        spectrum = np.fft.rfft(blocks.reshape(-1, n_fft, samples.shape[1]), axis=1)
+        power = (np.abs(spectrum) ** 2 * bin_weights[None, :, None]).sum(axis=1) / float(n_fft * n_fft)
+        sub_power[i:i + len(power)] = power.sum(axis=1)  # Hệ số kênh L/R = 1.0
+
+    def window_power(n):
+        cumulative = np.concatenate([[0.0], np.cumsum(sub_power)])
+        return (cumulative[n:] - cumulative[:-n]) / n
+
+    integrated_power, _ = _gated_mean_power(window_power(LOUDNESS_BLOCK_SUBBLOCKS), LOUDNESS_RELATIVE_GATE_LU)
+    if integrated_power > 0:
+        result['integrated_lufs'] = float(_power_to_lufs(integrated_power))
+        result['threshold_lufs'] = result['integrated_lufs'] + LOUDNESS_RELATIVE_GATE_LU
+    if n_sub >= LOUDNESS_SHORT_TERM_SUBBLOCKS:
+        _, short_term = _gated_mean_power(window_power(LOUDNESS_SHORT_TERM_SUBBLOCKS), LRA_RELATIVE_GATE_LU)
+        if len(short_term):
+            low, high = np.percentile(_power_to_lufs(short_term), [10, 95])
+            result['lra'] = float(high - low)
+    return result
+
+
+def normalization_gain_db(stats: dict, target_lufs: float, true_peak_limit_db: float) -> float:
+    """
+    Linear gain that brings measured audio to target_lufs, reduced if needed so
+    the true peak stays below true_peak_limit_db. Silent audio gets 0 dB.
+    """
+    if not np.isfinite(stats.get('integrated_lufs', float("-inf"))):
+        return 0.0
+    gain_db = target_lufs - stats['integrated_lufs']
+    if np.isfinite(stats.get('true_peak_db', float("-inf"))):
+        gain_db = min(gain_db, true_peak_limit_db - stats['true_peak_db'])
+    return float(gain_db)
+
+
+def parse_loudnorm_json(ffmpeg_stderr: str) -> Optional[Dict]:
+    """
+    Read the stats printed by an FFmpeg 'loudnorm=...:print_format=json' pass.
+
+    Returns:
+        Stats dict in the measure_loudness format, or None if not found
+    """
+    matches = re.findall(r"\{[^{}]*\"input_i\"[^{}]*\}", ffmpeg_stderr or "")
+    if not matches:
+        return None
+    try:
+        data = json.loads(matches[-1])
+        return {
+            'integrated_lufs': float(data["input_i"]),
+            'true_peak_db': float(data["input_tp"]),
+            'lra': float(data["input_lra"]),
+            'threshold_lufs': float(data["input_thresh"]),
+        }
+    except (ValueError, KeyError):
+        return None
+
+
+def loudnorm_analysis_filter(target_i: float, target_tp: float, target_lra: float) -> str:
+    """Filter of the single FFmpeg measurement pass (stats printed as JSON on stderr)."""
+    return f"loudnorm=I={target_i:g}:TP={target_tp:g}:LRA={target_lra:g}:print_format=json"
+
+
+def loudnorm_apply_filter(stats: Optional[Dict], target_i: float, target_tp: float, target_lra: float) -> Optional[str]:
+    """
+    Linear-mode loudnorm filter for the apply pass, from measured stats.
+
+    FFmpeg applies a plain gain when the target is reachable without exceeding
+    target_tp and the measured LRA fits target_lra, and falls back to dynamic
+    mode otherwise. Returns None for unusable stats (silence, failed measurement).
+    """
+    if not stats or not all(math.isfinite(stats.get(k, float("nan")))
+                            for k in ('integrated_lufs', 'true_peak_db', 'lra', 'threshold_lufs')):
+        return None
+    # Giới hạn theo miền giá trị FFmpeg chấp nhận cho các tham số measured_*
+    measured_i = min(0.0, max(-99.0, stats['integrated_lufs']))
+    measured_tp = min(99.0, max(-99.0, stats['true_peak_db']))
+    measured_lra = min(99.0, max(0.0, stats['lra']))
+    measured_thresh = min(0.0, max(-99.0, stats['threshold_lufs']))
+    return (
+        f"loudnorm=I={target_i:g}:TP={target_tp:g}:LRA={target_lra:g}"
+        f":measured_I={measured_i:.2f}:measured_TP={measured_tp:.2f}"
+        f":measured_LRA={measured_lra:.2f}:measured_thresh={measured_thresh:.2f}"
+        f":linear=true:print_format=summary"
+    )
+
+
+def is_linear_possible(stats: Dict, target_i: float, target_tp: float, target_lra: float) -> bool:
+    """Whether FFmpeg loudnorm will stay in linear mode for these stats (same rule as the filter)."""
+    return (stats['true_peak_db'] + (target_i - stats['integrated_lufs']) <= target_tp
+            and 0.0 < stats['lra'] <= target_lra)
+
+
+def _stats_path(path: str) -> str:
+    return path + STATS_SUFFIX
+
+
+def load_cached_stats(path: str) -> Optional[Dict]:
+    """Stats cached next to an asset, or None if missing or the asset changed since."""
+    try:
+        st = os.stat(path)
+        with open(_stats_path(path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("size") != st.st_size or data.get("mtime_ns") != st.st_mtime_ns:
+        return None
+    return data.get("stats")
+
+
+def store_cached_stats(path: str, stats: Dict, logger: Optional[logging.Logger] = None) -> None:
+    """Cache stats next to an asset (tied to its current size and mtime)."""
+    try:
+        st = os.stat(path)
+        with open(_stats_path(path), "w", encoding="utf-8") as f:
+            json.dump({"size": st.st_size, "mtime_ns": st.st_mtime_ns, "stats": stats}, f)
+    except OSError as e:
+        (logger or logging.getLogger(APP_NAME)).warning(f"[Loudness] Không lưu được thông số độ lớn: {e}")
+
+
+def measure_wav_loudness(path: str) -> Dict:
+    """
+    Measure a 16-bit PCM WAV in-process from a memory map (no decode).
+
+    Raises:
+        ValueError / wave.Error if the file is not 16-bit PCM WAV
+    """
+    samples, rate = open_pcm16_wav(path)
+    try:
+        return measure_loudness(samples, rate)
+    finally:
+        del samples  # Đóng memmap (Windows không xóa được file đang map)
+
+
+def get_cached_or_measured_stats(path: str, logger: Optional[logging.Logger] = None) -> Optional[Dict]:
+    """
+    Stats of an asset from its cache, else measured in-process and cached.
+
+    Returns:
+        Stats dict, or None if the asset needs an FFmpeg analysis pass
+        (not 16-bit PCM WAV, or NumPy missing)
+    """
+    stats = load_cached_stats(path)
+    if stats is not None or not HAS_NUMPY or not path.lower().endswith(".wav"):
+        return stats
+    try:
+        stats = measure_wav_loudness(path)
+    except Exception as e:
+        (logger or logging.getLogger(APP_NAME)).debug(f"[Loudness] Không đo trực tiếp được '{os.path.basename(path)}': {e}")
+        return None
+    store_cached_stats(path, stats, logger)
+    return stats
@@ -0,0 +1,377 @@
+"""
+Media Probe Service for Piu Application
+
+Central place to read media durations and stream info. Each file is probed
+once with a single `ffprobe -show_format -show_streams -of json` and the
+parsed result is cached in memory keyed by (path, size, mtime), so repeated
+questions about the same file (duration, audio stream, resolution, fps...)
+are dictionary lookups. WAV and MP3 files - the formats the app writes
+itself (TTS output, intermediate tracks) - are read from their headers
+without starting a process.
+"""
+
+import json
+import logging
+import os
+import struct
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.ffmpeg_utils import find_ffprobe
+
+# Constants
+APP_NAME = "Piu"
+PROBE_TIMEOUT_S = 15
+MAX_CACHE_ENTRIES = 4096
+# Bảng bitrate (kbps) và sample rate của MPEG Audio Layer III
+_MP3_BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_MP3_BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_MP3_SCAN_BYTES = 64 * 1024
+
+
+class MediaInfo:
+    """Parsed probe result of one media file (ffprobe JSON layout)."""
+
+    def __init__(self, path: str, duration_s: Optional[float], streams: List[Dict],
+                 format_info: Optional[Dict] = None, source: str = "ffprobe"):
+        self.path = path
+        self.duration_s = duration_s
+        self.streams = streams
+        self.format_info = format_info or {}
+        self.source = source  # "ffprobe", "wav" hoặc "mp3"
+
+    @property
+    def duration_ms(self) -> Optional[int]:
+        """Duration in whole milliseconds, or None if unknown."""
+        return None if self.duration_s is None else int(self.duration_s * 1000)
+
+    @property
+    def audio_streams(self) -> List[Dict]:
+        return [s for s in self.streams if s.get("codec_type") == "audio"]
+
+    @property
+    def has_audio(self) -> bool:
+        return bool(self.audio_streams)
+
+    @property
+    def video_stream(self) -> Optional[Dict]:
+        """First video stream that is not an attached picture (cover art), or None."""
+        for stream in self.streams:
+            if stream.get("codec_type") == "video" and not stream.get("disposition", {}).get("attached_pic"):
+                return stream
+        return None
+
+    @property
+    def has_video(self) -> bool:
+        return self.video_stream is not None
+
+    @property
+    def video_size(self) -> Optional[Tuple[int, int]]:
+        """(width, height) of the video stream, or None."""
+        stream = self.video_stream
+        if stream and stream.get("width") and stream.get("height"):
+            return int(stream["width"]), int(stream["height"])
+        return None
+
+    @property
+    def frame_rate(self) -> Optional[float]:
+        """Frame rate of the video stream (r_frame_rate), or None."""
+        rate = (self.video_stream or {}).get("r_frame_rate", "")
+        try:
+            num, _, den = rate.partition("/")
+            value = float(num) / float(den or 1)
+            return value if value > 0 else None
+        except (ValueError, ZeroDivisionError):
+            return None
+
+
+def parse_wav_header(path: str, file_size: int) -> Optional[MediaInfo]:
+    """Read duration and format from the RIFF chunks of a WAV file (any codec with a byte rate)."""
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] not in (b"RIFF", b"RF64") or riff[8:12] != b"WAVE":
+            return None
+        fmt = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = chunk_header[:4], struct.unpack("<I", chunk_header[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", f.read(16))
+                f.seek(chunk_size - 16 + (chunk_size & 1), os.SEEK_CUR)
+            elif chunk_id == b"data":
+                data_offset = f.tell()
+                break
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+    if fmt is None:
+        return None
+    audio_format, channels, sample_rate, byte_rate, _, bits = fmt
+    if not byte_rate or not sample_rate:
+        return None
+    # File ghi qua pipe (ffmpeg -f wav -) có kích thước data sai/0xFFFFFFFF: lấy phần còn lại của file
+    available = max(0, file_size - data_offset)
+    data_size = chunk_size if 0 < chunk_size <= available else available
+    stream = {
+        "codec_type": "audio",
+        "codec_name": {1: f"pcm_s{bits}le", 3: f"pcm_f{bits}le"}.get(audio_format, f"wav_{audio_format}"),
+        "sample_rate": str(sample_rate),
+        "channels": channels,
+    }
+    return MediaInfo(path, data_size / float(byte_rate), [stream], {"format_name": "wav"}, source="wav")
+
+
+def _mp3_frame_header(data: bytes, pos: int) -> Optional[Tuple[int, int, int, int, bool]]:
+    """Decode an MPEG Layer III frame header at pos: (version, bitrate_kbps, sample_rate, frame_len, mono)."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 0x03
+    layer = (data[pos + 1] >> 1) & 0x03
+    bitrate_index = data[pos + 2] >> 4
+    sample_rate_index = (data[pos + 2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    bitrate = (_MP3_BITRATES_V1 if version == 3 else _MP3_BITRATES_V2)[bitrate_index]
+    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (data[pos + 2] >> 1) & 0x01
+    frame_len = (144 if version == 3 else 72) * bitrate * 1000 // sample_rate + padding
+    return version, bitrate, sample_rate, frame_len, (data[pos + 3] >> 6) == 3
+
+
+def parse_mp3_header(path: str, file_size: int) -> Optional[MediaInfo]:
+    """
+    Read the duration of an MP3 file from its first frame: the Xing/Info or
+    VBRI frame count when present (VBR), otherwise the constant bitrate.
+    """
+    with open(path, "rb") as f:
+        head = f.read(10)
+        offset = 0
+        if head[:3] == b"ID3" and len(head) == 10:
+            tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+            offset = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+        f.seek(offset)
+        data = f.read(_MP3_SCAN_BYTES)
+        has_id3v1 = False
+        if file_size >= 128:
+            f.seek(file_size - 128)
+            has_id3v1 = f.read(3) == b"TAG"
+
+    # Khung đầu tiên hợp lệ: header giải mã được và khung kế tiếp cũng là header hợp lệ
+    for pos in range(max(0, len(data) - 4)):
+        header = _mp3_frame_header(data, pos)
+        if header and (pos + header[3] + 4 > len(data) or _mp3_frame_header(data, pos + header[3])):
+            break
+    else:
+        return None
+    version, bitrate, sample_rate, frame_len, mono = header
+    samples_per_frame = 1152 if version == 3 else 576
+
+    frames = None
+    side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+    xing_pos = pos + 4 + side_info
+    if data[xing_pos:xing_pos + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing_pos + 4:xing_pos + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", data[xing_pos + 8:xing_pos + 12])[0]
+    elif data[pos + 36:pos + 40] == b"VBRI":
+        frames = struct.unpack(">I", data[pos + 50:pos + 54])[0]
+
+    if frames:
+        duration_s = frames * samples_per_frame / float(sample_rate)
+    else:
+        audio_bytes = file_size - offset - pos - (128 if has_id3v1 else 0)
+        duration_s = max(0, audio_bytes) * 8.0 / (bitrate * 1000)
+    stream = {
+        "codec_type": "audio",
+        "codec_name": "mp3",
+        "sample_rate": str(sample_rate),
+        "channels": 1 if mono else 2,
+        "bit_rate": str(bitrate * 1000),
+    }
+    return MediaInfo(path, duration_s, [stream], {"format_name": "mp3"}, source="mp3")
+
+
+_NATIVE_PARSERS = {".wav": parse_wav_header, ".mp3": parse_mp3_header}
+
+
+class MediaProbeService:
+    """
+    Cached media probing: one ffprobe (or header read) per file version,
+    shared by every caller in the app.
+    """
+
+    def __init__(self, max_entries: int = MAX_CACHE_ENTRIES, logger: Optional[logging.Logger] = None):
+        """
+        Initialize Media Probe Service.
+
+        Args:
+            max_entries: Number of probed files kept (least recently used are dropped)
+            logger: Optional logger instance
+        """
+        self.logger = logger or logging.getLogger(APP_NAME)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.native_reads = 0
+        self.ffprobe_runs = 0
+        self._cache: "OrderedDict[Tuple[str, int, int], MediaInfo]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._ffprobe_path = None
+
+    def _get_ffprobe(self) -> Optional[str]:
+        if self._ffprobe_path is None:
+            self._ffprobe_path = find_ffprobe() or ""
+        return self._ffprobe_path or None
+
+    def probe(self, path: str) -> Optional[MediaInfo]:
+        """
+        Probe a media file (cached by path, size and modification time).
+
+        Returns:
+            MediaInfo, or None if the file is missing or cannot be probed
+        """
+        if not path:
+            return None
+        abs_path = os.path.abspath(path)
+        try:
+            st = os.stat(abs_path)
+        except OSError:
+            self.logger.warning(f"[MediaProbe] File không tồn tại: '{os.path.basename(abs_path)}'.")
+            return None
+        key = (os.path.normcase(abs_path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            info = self._cache.get(key)
+            if info is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return info
+            self.misses += 1
+
+        info = self._probe_uncached(abs_path, st.st_size)
+        if info is not None:
+            with self._lock:
+                self._cache[key] = info
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return info
+
+    def _probe_uncached(self, path: str, file_size: int) -> Optional[MediaInfo]:
+        parser = _NATIVE_PARSERS.get(os.path.splitext(path)[1].lower())
+        if parser is not None and file_size > 0:
+            try:
+                info = parser(path, file_size)
+                if info is not None and info.duration_s:
+                    self.native_reads += 1
+                    return info
+            except Exception as e:
+                self.logger.debug(f"[MediaProbe] Không đọc được header '{os.path.basename(path)}': {e}. Dùng ffprobe.")
+        return self._run_ffprobe(path)
+
+    def _run_ffprobe(self, path: str) -> Optional[MediaInfo]:
+        ffprobe_path = self._get_ffprobe()
+        if not ffprobe_path:
+            self.logger.warning("[MediaProbe] Không tìm thấy ffprobe.")
+            return None
+        command = [ffprobe_path, "-v", "error", "-show_format", "-show_streams", "-of", "json", path]
+        try:
+            creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+            result = subprocess.run(command, capture_output=True, timeout=PROBE_TIMEOUT_S,
+                                    check=False, creationflags=creationflags)
+            self.ffprobe_runs += 1
+            if result.returncode != 0:
+                self.logger.warning(
+                    f"[MediaProbe] ffprobe lỗi (mã {result.returncode}) cho '{os.path.basename(path)}': "
+                    f"{result.stderr.decode('utf-8', errors='ignore').strip()[-300:]}"
+                )
+                return None
+            data = json.loads(result.stdout.decode("utf-8", errors="ignore") or "{}")
+        except subprocess.TimeoutExpired:
+            self.logger.error(f"[MediaProbe] Timeout ({PROBE_TIMEOUT_S}s) với ffprobe cho '{os.path.basename(path)}'.")
+            return None
+        except Exception as e:
+            self.logger.error(f"[MediaProbe] Lỗi ffprobe cho '{os.path.basename(path)}': {e}")
+            return None
+
+        streams = data.get("streams", [])
+        format_info = data.get("format", {})
+        duration_s = _to_float(format_info.get("duration"))
+        if duration_s is None:
+            stream_durations = [d for d in (_to_float(s.get("duration")) for s in streams) if d is not None]
+            duration_s = max(stream_durations) if stream_durations else None
+        return MediaInfo(path, duration_s, streams, format_info, source="ffprobe")
+
+    def get_duration_s(self, path: str) -> Optional[float]:
+        """Duration in seconds, or None if unknown."""
+        info = self.probe(path)
+        return info.duration_s if info else None
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Drop the cached result of one file (or of every file)."""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+                return
+            norm_path = os.path.normcase(os.path.abspath(path))
+            for key in [k for k in self._cache if k[0] == norm_path]:
+                del self._cache[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get probe statistics.
+
+        Returns:
+            Dict with keys: 'entries', 'hits', 'misses', 'native_reads', 'ffprobe_runs'
+        """
+        with self._lock:
+            entries = len(self._cache)
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'native_reads': self.native_reads,
+            'ffprobe_runs': self.ffprobe_runs,
+        }
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        result = float(value)
+        return result if result >= 0 else None
+    except (TypeError, ValueError):
+        return None
+
+
+_default_probe: Optional[MediaProbeService] = None
+_default_probe_lock = threading.Lock()
+
+
+def get_media_probe() -> MediaProbeService:
+    """Get the shared MediaProbeService."""
+    global _default_probe
+    with _default_probe_lock:
+        if _default_probe is None:
+            _default_probe = MediaProbeService()
+        return _default_probe
+
+
+def get_video_duration_s(video_path_to_probe: str) -> float:
+    """
+    Get media duration in seconds through the shared probe cache.
+
+    Args:
+        video_path_to_probe: Path to a video or audio file
+
+    Returns:
+        Duration in seconds (float) or 0.0 if error
+    """
+    duration = get_media_probe().get_duration_s(video_path_to_probe)
+    if not duration:
+        logging.warning(f"[GetDuration] Không lấy được thời lượng của '{os.path.basename(video_path_to_probe or '')}'.")
+        return 0.0
+    logging.debug(f"[GetDuration] Thời lượng của '{os.path.basename(video_path_to_probe)}' là {duration:.3f}s")
+    return duration
@@ -16,26 +16,43 @@ import logging
 import os
 import sys
 import gc
+import hashlib
+import json
+import shutil
 import subprocess
-from typing import Optional, Dict, Tuple, Callable
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional, Dict, Iterator, Tuple, Callable
 from contextlib import redirect_stdout, redirect_stderr
 
 # Optional imports with fallback
+from services.whisper_backends import WhisperBackend, OpenAIWhisperBackend, HAS_WHISPER
+
+if not HAS_WHISPER:
+    logging.warning("Thư viện whisper chưa được cài đặt. Chức năng transcription sẽ không hoạt động.")
+
+from utils.lazy_import import lazy_import, is_module_available
+
+# torch được import khi dùng lần đầu (chọn device / giải phóng VRAM), không phải lúc khởi động
+HAS_TORCH = is_module_available("torch")
+torch = lazy_import("torch") if HAS_TORCH else None
+if not HAS_TORCH:
+    logging.warning("Thư viện torch chưa được cài đặt. CUDA detection sẽ bị hạn chế.")
+
 try:
-    import whisper
-    HAS_WHISPER = True
+    import psutil
+    HAS_PSUTIL = True
 except ImportError:
-    HAS_WHISPER = False
-    whisper = None
-    logging.warning("Thư viện whisper chưa được cài đặt. Chức năng transcription sẽ không hoạt động.")
+    HAS_PSUTIL = False
+    psutil = None
 
 try:
-    import torch
-    HAS_TORCH = True
+    import numpy as np
+    HAS_NUMPY = True
 except ImportError:
-    HAS_TORCH = False
-    torch = None
-    logging.warning("Thư viện torch chưa được cài đặt. CUDA detection sẽ bị hạn chế.")
+    HAS_NUMPY = False
+    np = None
 
 # Import utilities
 try:
@@ -45,6 +62,20 @@ except ImportError:
         """Fallback if system_utils not available"""
         return ("UNKNOWN", 0)
 
+try:
+    from utils.audio_utils import (
+        plan_audio_windows, merge_speech_regions, build_gated_audio, remap_gated_time, WHISPER_SAMPLE_RATE
+    )
+except ImportError:
+    plan_audio_windows = None
+    merge_speech_regions = build_gated_audio = remap_gated_time = None
+    WHISPER_SAMPLE_RATE = 16000
+
+try:
+    from config.constants import WHISPER_MODEL_PARAMS_M
+except ImportError:
+    WHISPER_MODEL_PARAMS_M = {"tiny": 39, "base": 74, "small": 244, "medium": 769, "large": 1550}
+
 try:
     from config.constants import WHISPER_VRAM_REQ_MB
 except ImportError:
@@ -55,8 +86,10 @@ except ImportError:
     }
 
 try:
-    from utils.srt_utils import write_srt, write_vtt
+    from utils.srt_utils import write_srt, write_vtt, SubtitleStreamWriter
 except ImportError:
+    SubtitleStreamWriter = None
+
     # Fallback functions if not available
     def write_srt(f, segments):
         """Fallback SRT writer"""
@@ -74,6 +107,20 @@ except ImportError:
 
 # Constants
 APP_NAME = "Piu"
+# Độ dài mỗi cửa sổ khi transcribe kiểu streaming (giây)
+STREAMING_WINDOW_SECONDS = 120.0
+# Số ký tự cuối của cửa sổ trước dùng làm initial_prompt cho cửa sổ sau
+STREAMING_PROMPT_CHARS = 200
+# Ước tính bộ nhớ model = số tham số * 4 byte (fp32) * hệ số phụ trội (buffer, cache decoder)
+MODEL_MEMORY_OVERHEAD = 1.2
+# Dùng tối đa tỉ lệ này của VRAM cho các model thường trú trên GPU
+VRAM_CACHE_RATIO = 0.9
+# Lọc theo VAD không đáng nếu phần có giọng nói chiếm quá tỉ lệ này của audio
+VAD_GATE_MAX_SPEECH_RATIO = 0.9
+# Khoảng thời gian tối thiểu giữa hai lần fsync file phụ đề đang ghi dở (giây)
+STREAM_FSYNC_INTERVAL_SECONDS = 5.0
+# Độ dài đoạn im lặng dùng để warm-up model sau khi tải (giây)
+WARMUP_AUDIO_SECONDS = 1.0
 
 
 class ModelService:
@@ -84,21 +131,45 @@ class ModelService:
     separate from UI handling which remains in Piu.py.
     """
     
-    def __init__(self, logger: Optional[logging.Logger] = None):
+    def __init__(
+        self,
+        logger: Optional[logging.Logger] = None,
+        cache_budget_mb: Optional[float] = None,
+        transcription_cache=None,
+        backend: Optional[WhisperBackend] = None
+    ):
         """
         Initialize Model Service.
         
         Args:
             logger: Optional logger instance. If None, creates a new logger.
+            cache_budget_mb: RAM budget for resident (cached) Whisper models.
+                None or 0 = auto (50% of available RAM).
+            transcription_cache: Optional TranscriptionCache; transcribe_and_save()
+                reuses stored segments for the same media/model/language/options.
+            backend: Speech-recognition backend (services.whisper_backends).
+                None = openai-whisper.
         """
         self.logger = logger or logging.getLogger(APP_NAME)
         self.logger.info("[ModelService] Initializing Model Service...")
+        self.transcription_cache = transcription_cache
+        self.backend = backend or OpenAIWhisperBackend()
+        self.logger.info(f"[ModelService] Whisper backend: {self.backend.describe()}")
         
         # Model state
         self.current_model = None
         self.model_name = None
         self.device = None
         
+        # Residency cache: (model_name, device) -> {'model', 'size_mb'}, LRU order (oldest first)
+        self._resident_models: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        # Model đang được dùng (model active + các tác vụ transcribe đang chạy): key -> số lần ghim
+        self._pinned_models: "Counter[Tuple[str, str]]" = Counter()
+        self._active_pin: Optional[Tuple[str, str]] = None
+        self._cache_lock = threading.RLock()
+        self.cache_budget_mb = 0.0
+        self.set_cache_budget(cache_budget_mb)
+        
         # CUDA state
         self.cuda_status = "UNKNOWN"
         self.gpu_vram_mb = 0
@@ -231,8 +302,8 @@ class ModelService:
         """
         log_prefix = f"[ModelService:Load]"
         
-        if not HAS_WHISPER or whisper is None:
-            error_msg = "Thư viện Whisper chưa được cài đặt."
+        if not self.backend.is_available():
+            error_msg = f"Thư viện {self.backend.name} chưa được cài đặt."
             self.logger.error(f"{log_prefix} {error_msg}")
             return None, None, None, error_msg
         
@@ -250,15 +321,27 @@ class ModelService:
         if stop_event and stop_event():
             return None, None, None, "Đã dừng bởi người dùng."
         
-        # Unload old model
-        self.unload_model()
+        # Model still resident from an earlier load: switch without touching the disk
+        if force_reload:
+            self._evict_resident_model((model_name, device))
+        else:
+            resident = self._activate_resident_model(model_name, device)
+            if resident is not None:
+                self.logger.info(f"{log_prefix} Model '{model_name}' on '{device}' taken from residency cache.")
+                return resident, model_name, device, None
+        
+        # Free room for the new model (LRU; models pinned by a running job are never evicted)
+        self._release_active_pin()
+        self._make_room_for_model(model_name, device)
         
         # Check stop event again
         if stop_event and stop_event():
             return None, None, None, "Đã dừng bởi người dùng."
         
         try:
-            self.logger.info(f"{log_prefix} Loading model '{model_name}' on device '{device}'...")
+            self.logger.info(
+                f"{log_prefix} Loading model '{model_name}' on device '{device}' ({self.backend.describe()})..."
+            )
             
             # Disable tqdm progress bar
             old_tqdm_disable = os.environ.get("TQDM_DISABLE", None)
@@ -277,13 +360,13 @@ class ModelService:
                     # Try loading with fallback CUDA -> CPU
                     try:
                         with redirect_stdout(fnull), redirect_stderr(fnull):
-                            loaded_model = whisper.load_model(model_name, device=device)
+                            loaded_model = self.backend.load_model(model_name, device)
                     except Exception as e1:
                         if device.lower() == 'cuda':
                             self.logger.warning(f"{log_prefix} CUDA load failed: {e1}. Fallback to CPU...")
                             try:
                                 with redirect_stdout(fnull), redirect_stderr(fnull):
-                                    loaded_model = whisper.load_model(model_name, device="cpu")
+                                    loaded_model = self.backend.load_model(model_name, "cpu")
                                 device = "cpu"  # Update actual device used
                             except Exception as e2:
                                 error_msg = f"CUDA error: {e1}; CPU fallback error: {e2}"
@@ -304,15 +387,17 @@ class ModelService:
                         sys.stderr = orig_stderr
             
             # Success - update state
+            self._add_resident_model(model_name, device, loaded_model)
             self.current_model = loaded_model
             self.model_name = model_name
             self.device = device
+            self._pin_active((model_name, device))
             
             self.logger.info(f"{log_prefix} Successfully loaded model '{model_name}' on '{device}'.")
             return loaded_model, model_name, device, None
             
         except ImportError as e:
-            error_msg = f"Lỗi import thư viện whisper: {e}"
+            error_msg = f"Lỗi import thư viện {self.backend.name}: {e}"
             self.logger.error(f"{log_prefix} {error_msg}")
             return None, None, None, error_msg
         except Exception as e:
@@ -320,27 +405,268 @@ class ModelService:
             self.logger.error(f"{log_prefix} {error_msg}", exc_info=True)
             return None, None, None, error_msg
     
+    def warm_up(self) -> bool:
+        """
+        Run a tiny decode (WARMUP_AUDIO_SECONDS of silence) with the current model.
+        
+        The first decode after loading pays for CUDA context/kernel setup and
+        CPU kernel initialisation; running it right after the load moves that
+        cost out of the first real job. Uses the same decode options as a job.
+        
+        Returns:
+            True if the warm-up decode ran, False if skipped or failed.
+        """
+        log_prefix = "[ModelService:WarmUp]"
+        if self.current_model is None or not HAS_NUMPY:
+            return False
+        
+        silence = np.zeros(int(WARMUP_AUDIO_SECONDS * WHISPER_SAMPLE_RATE), dtype=np.float32)
+        options = self._build_transcribe_options("en", None, {'condition_on_previous_text': False})
+        started = time.time()
+        try:
+            with open(os.devnull, "w", encoding="utf-8") as fnull:
+                with redirect_stdout(fnull):
+                    self.current_model.transcribe(silence, **options)
+        except Exception as e:
+            self.logger.warning(f"{log_prefix} Warm-up model '{self.model_name}' ({self.device}) lỗi, bỏ qua: {e}")
+            return False
+        self.logger.info(
+            f"{log_prefix} Đã warm-up model '{self.model_name}' ({self.device}) trong {time.time() - started:.2f}s."
+        )
+        return True
+    
+    def set_backend(self, backend: WhisperBackend) -> None:
+        """
+        Switch the speech-recognition backend.
+        
+        Models of the previous backend are dropped (they cannot be reused).
+        """
+        if backend.describe() == self.backend.describe():
+            return
+        self.clear_model_cache()
+        self.backend = backend
+        self.logger.info(f"[ModelService] Whisper backend: {self.backend.describe()}")
+    
     def unload_model(self):
-        """Unload current Whisper model and free memory."""
+        """Unload current Whisper model (also from the residency cache) and free memory."""
         if self.current_model is not None:
             self.logger.debug("[ModelService] Unloading current model...")
+            device = self.device
+            with self._cache_lock:
+                self._resident_models.pop((self.model_name, self.device), None)
+                self._pinned_models.pop((self.model_name, self.device), None)
+                if self._active_pin == (self.model_name, self.device):
+                    self._active_pin = None
             del self.current_model
             self.current_model = None
-            gc.collect()
-            
-            # Clear CUDA cache if available
-            if self.device == "cuda" and HAS_TORCH and torch is not None:
-                try:
-                    if torch.cuda.is_available():
-                        torch.cuda.empty_cache()
-                        self.logger.debug("[ModelService] Cleared CUDA cache.")
-                except Exception:
-                    pass
-            
             self.model_name = None
             self.device = None
+            self._free_memory(device)
             self.logger.debug("[ModelService] Model unloaded.")
     
+    def _free_memory(self, device: Optional[str]) -> None:
+        """Run GC and release cached CUDA memory after dropping a model."""
+        gc.collect()
+        
+        # Clear CUDA cache if available
+        if device == "cuda" and HAS_TORCH and torch is not None:
+            try:
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+                    self.logger.debug("[ModelService] Cleared CUDA cache.")
+            except Exception:
+                pass
+    
+    # ========================================================================
+    # RESIDENCY CACHE METHODS
+    # ========================================================================
+    
+    def set_cache_budget(self, cache_budget_mb: Optional[float] = None) -> None:
+        """
+        Set the RAM budget for resident Whisper models.
+        
+        Args:
+            cache_budget_mb: Budget in MB. None or 0 = auto (50% of available RAM).
+        """
+        if cache_budget_mb and cache_budget_mb > 0:
+            self.cache_budget_mb = float(cache_budget_mb)
+        elif HAS_PSUTIL and psutil is not None:
+            try:
+                self.cache_budget_mb = psutil.virtual_memory().available / (1024 * 1024) * 0.5
+            except Exception:
+                self.cache_budget_mb = 0.0
+        else:
+            self.cache_budget_mb = 0.0
+        self.logger.info(
+            f"[ModelService] Model residency budget: "
+            f"{f'{self.cache_budget_mb:.0f} MB' if self.cache_budget_mb else 'single model (unknown RAM)'}"
+        )
+    
+    @staticmethod
+    def estimate_model_size_mb(model_name: str, model: Optional[object] = None, bytes_per_param: int = 4) -> float:
+        """
+        Estimate the memory footprint of a Whisper model.
+        
+        Uses the real parameter/buffer sizes when a loaded (PyTorch) model is given,
+        otherwise the known parameter count of the model name times bytes_per_param
+        (4 for fp32, 1 for int8 CTranslate2 models).
+        """
+        if model is not None and hasattr(model, "parameters"):
+            try:
+                size_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+                if hasattr(model, "buffers"):
+                    size_bytes += sum(b.numel() * b.element_size() for b in model.buffers())
+                return size_bytes * MODEL_MEMORY_OVERHEAD / (1024 * 1024)
+            except Exception:
+                pass
+        params_m = WHISPER_MODEL_PARAMS_M.get(model_name)
+        if params_m is None:
+            params_m = WHISPER_MODEL_PARAMS_M.get(model_name.split("-")[0].split(".")[0], 1550)
+        return params_m * 1e6 * bytes_per_param * MODEL_MEMORY_OVERHEAD / (1024 * 1024)
+    
+    def _budget_for_device(self, device: str) -> float:
+        if device == "cuda":
+            return self.gpu_vram_mb * VRAM_CACHE_RATIO if self.gpu_vram_mb else 0.0
+        return self.cache_budget_mb
+    
+    def pin_model(self, model_name: str, device: str) -> None:
+        """Keep this model resident until unpin_model (pins are counted, one unpin per pin)."""
+        with self._cache_lock:
+            self._pinned_models[(model_name, device)] += 1
+    
+    def unpin_model(self, model_name: str, device: str) -> None:
+        """Release one pin taken by pin_model."""
+        with self._cache_lock:
+            key = (model_name, device)
+            if self._pinned_models[key] <= 1:
+                self._pinned_models.pop(key, None)
+            else:
+                self._pinned_models[key] -= 1
+    
+    def _pin_active(self, key: Tuple[str, str]) -> None:
+        """Pin the model load_model just activated (replaces the previous active pin)."""
+        with self._cache_lock:
+            self._release_active_pin()
+            self.pin_model(*key)
+            self._active_pin = key
+    
+    def _release_active_pin(self) -> None:
+        with self._cache_lock:
+            if self._active_pin is not None:
+                self.unpin_model(*self._active_pin)
+                self._active_pin = None
+    
+    def _activate_resident_model(self, model_name: str, device: str) -> Optional[object]:
+        """Make a resident model the active one. Returns it, or None if not resident."""
+        with self._cache_lock:
+            entry = self._resident_models.get((model_name, device))
+            if entry is None:
+                return None
+            self._resident_models.move_to_end((model_name, device))
+            self.current_model = entry['model']
+            self.model_name = model_name
+            self.device = device
+            self._pin_active((model_name, device))
+            return entry['model']
+    
+    def _add_resident_model(self, model_name: str, device: str, model: object) -> None:
+        with self._cache_lock:
+            size_mb = self.estimate_model_size_mb(model_name, model, self.backend.bytes_per_param)
+            self._resident_models[(model_name, device)] = {'model': model, 'size_mb': size_mb}
+            self._resident_models.move_to_end((model_name, device))
+            self.logger.info(
+                f"[ModelService:Cache] Resident models: {len(self._resident_models)} "
+                f"(~{sum(e['size_mb'] for e in self._resident_models.values()):.0f} MB)."
+            )
+    
+    def _evict_resident_model(self, key: Tuple[str, str]) -> None:
+        with self._cache_lock:
+            entry = self._resident_models.pop(key, None)
+            if entry is None:
+                return
+            if (self.model_name, self.device) == key:
+                self.current_model = None
+                self.model_name = None
+                self.device = None
+            if self._active_pin == key:
+                self._release_active_pin()
+            del entry
+        self._free_memory(key[1])
+        self.logger.info(f"[ModelService:Cache] Evicted model '{key[0]}' ({key[1]}).")
+    
+    def _make_room_for_model(self, model_name: str, device: str) -> None:
+        """
+        Evict least recently used models until the new one fits the device budget.
+        
+        Pinned models (in use by a running job) are never evicted; if the new
+        model still does not fit, the budget is exceeded with a warning. The
+        unpinned active model is evicted last (it is about to be replaced
+        anyway). Without a known budget only one unpinned model is kept
+        (previous behaviour).
+        """
+        needed_mb = self.estimate_model_size_mb(model_name, bytes_per_param=self.backend.bytes_per_param)
+        budget_mb = self._budget_for_device(device)
+        active_key = (self.model_name, self.device)
+        with self._cache_lock:
+            same_device = [key for key in self._resident_models if key[1] == device]
+            pinned = [key for key in same_device if key in self._pinned_models]
+            if not budget_mb:
+                victims = [key for key in same_device if key not in self._pinned_models]
+                used_mb = sum(self._resident_models[key]['size_mb'] for key in pinned)
+            else:
+                used_mb = sum(self._resident_models[key]['size_mb'] for key in same_device)
+                victims = []
+                # LRU trước, model đang active sau cùng
+                candidates = [key for key in same_device if key != active_key and key not in self._pinned_models]
+                if active_key in same_device and active_key not in self._pinned_models:
+                    candidates.append(active_key)
+                for key in candidates:
+                    if used_mb + needed_mb <= budget_mb:
+                        break
+                    victims.append(key)
+                    used_mb -= self._resident_models[key]['size_mb']
+        if pinned and (not budget_mb or used_mb + needed_mb > budget_mb):
+            self.logger.warning(
+                f"[ModelService:Cache] Giữ {len(pinned)} model đang được dùng ({', '.join(k[0] for k in pinned)}); "
+                f"model '{model_name}' sẽ vượt ngân sách bộ nhớ (~{used_mb + needed_mb:.0f}/{budget_mb or needed_mb:.0f} MB)."
+            )
+        for key in victims:
+            self._evict_resident_model(key)
+    
+    def clear_model_cache(self) -> None:
+        """Drop every resident model (including the active and pinned ones)."""
+        with self._cache_lock:
+            keys = list(self._resident_models)
+            self._pinned_models.clear()
+            self._active_pin = None
+        for key in keys:
+            self._evict_resident_model(key)
+    
+    def get_model_cache_info(self) -> Dict:
+        """
+        Get residency cache information.
+        
+        Returns:
+            Dict with keys: 'models' (list of {'model_name', 'device', 'size_mb', 'pinned', 'active'}),
+            'used_mb', 'budget_mb'
+        """
+        with self._cache_lock:
+            models = [
+                {
+                    'model_name': key[0],
+                    'device': key[1],
+                    'size_mb': entry['size_mb'],
+                    'pinned': key in self._pinned_models,
+                    'active': key == (self.model_name, self.device),
+                }
+                for key, entry in self._resident_models.items()
+            ]
+        return {
+            'models': models,
+            'used_mb': sum(m['size_mb'] for m in models),
+            'budget_mb': self.cache_budget_mb,
+        }
+    
     def is_model_loaded(self) -> bool:
         """Check if a model is currently loaded."""
         return self.current_model is not None
@@ -350,11 +676,12 @@ class ModelService:
         Get current model information.
         
         Returns:
-            Dict with keys: 'model_name', 'device', 'cuda_status', 'vram_mb'
+            Dict with keys: 'model_name', 'device', 'backend', 'cuda_status', 'vram_mb'
         """
         return {
             'model_name': self.model_name,
             'device': self.device,
+            'backend': self.backend.describe(),
             'cuda_status': self.cuda_status,
             'vram_mb': self.gpu_vram_mb
         }
@@ -368,6 +695,7 @@ class ModelService:
         audio_path: str,
         language: Optional[str] = None,
         fp16: Optional[bool] = None,
+        audio=None,
         **kwargs
     ) -> Dict:
         """
@@ -377,6 +705,8 @@ class ModelService:
             audio_path: Path to audio file
             language: Language code (e.g., "vi", "en", "auto"). If None, auto-detects.
             fp16: Use FP16 precision (faster on CUDA). If None, auto-detects based on device.
+            audio: Already decoded 16 kHz mono float32 samples of audio_path
+                (see services.audio_decode_service); skips Whisper's own ffmpeg decode
             **kwargs: Additional transcribe options
             
         Returns:
@@ -390,14 +720,37 @@ class ModelService:
         if self.current_model is None:
             raise RuntimeError("Model chưa được load. Vui lòng load model trước khi transcribe.")
         
-        if not os.path.exists(audio_path):
+        if audio is None and not os.path.exists(audio_path):
             raise FileNotFoundError(f"Audio file không tồn tại: {audio_path}")
         
-        # Determine FP16 based on device if not specified
+        transcribe_options = self._build_transcribe_options(language, fp16, kwargs)
+        fp16 = transcribe_options['fp16']
+        
+        try:
+            self.logger.info(
+                f"{log_prefix} Transcribing '{os.path.basename(audio_path)}' "
+                f"(Model: '{self.model_name}', Device: {self.device}, FP16: {fp16}, Lang: {language or 'auto'})"
+            )
+            
+            result = self.current_model.transcribe(audio_path if audio is None else audio, **transcribe_options)
+            
+            num_segments = len(result.get('segments', []))
+            self.logger.info(f"{log_prefix} Transcription complete. Found {num_segments} segments.")
+            
+            return result
+            
+        except Exception as e:
+            self.logger.error(
+                f"{log_prefix} Error transcribing on device '{self.device}': {e}",
+                exc_info=True
+            )
+            raise
+    
+    def _build_transcribe_options(self, language: Optional[str], fp16: Optional[bool], kwargs: Dict) -> Dict:
+        """Build whisper transcribe() options (FP16 auto-detected from device if None)."""
         if fp16 is None:
             fp16 = (self.device == 'cuda')
         
-        # Build transcribe options
         transcribe_options = {
             'fp16': fp16,
             'patience': 2.0,
@@ -409,26 +762,404 @@ class ModelService:
         
         if language and language != "auto":
             transcribe_options['language'] = language
-        
+        return transcribe_options
+    
+    def _transcription_cache_entry(
+        self,
+        audio_path: str,
+        language: Optional[str],
+        audio,
+        kwargs: Dict,
+        speech_regions: Optional[list] = None
+    ) -> Optional[Tuple[str, str, Dict]]:
+        """Return (key, media_hash, options) for the transcription cache, or None if unavailable."""
+        cache = self.transcription_cache
+        if cache is None or not cache.available or not self.model_name:
+            return None
         try:
+            media_hash = cache.fingerprint(audio_path)
+        except OSError:
+            return None
+        options = self._build_transcribe_options(language, None, kwargs)
+        if audio is not None:
+            # Mảng đã cắt bỏ đoạn lặng đầu (VAD) cho kết quả khác với file gốc
+            options['audio_samples'] = len(audio)
+        if speech_regions is not None:
+            options['speech_regions'] = [(round(start, 2), round(end, 2)) for start, end in speech_regions]
+        # Backend/kiểu tính toán khác nhau cho kết quả khác nhau
+        model_id = f"{self.backend.describe()}/{self.model_name}"
+        return cache.make_key(media_hash, model_id, language, options), media_hash, options
+    
+    def get_cached_transcription(
+        self,
+        audio_path: str,
+        language: Optional[str] = None,
+        audio=None,
+        **kwargs
+    ) -> Optional[Dict]:
+        """
+        Look up a stored transcription for audio_path with the current model.
+        
+        Args:
+            audio_path: Path to audio file
+            language: Language code (None/"auto" = auto-detect)
+            audio: Decoded samples actually transcribed (part of the key)
+            **kwargs: Transcribe options (part of the key)
+            
+        Returns:
+            Result dict ('text', 'segments', 'language'), or None on miss.
+        """
+        entry = self._transcription_cache_entry(audio_path, language, audio, kwargs)
+        if entry is None:
+            return None
+        return self.transcription_cache.get(entry[0])
+    
+    def store_transcription(
+        self,
+        audio_path: str,
+        result: Dict,
+        language: Optional[str] = None,
+        audio=None,
+        **kwargs
+    ) -> None:
+        """Store a transcription result produced outside transcribe_and_save() (e.g. parallel CPU mode)."""
+        entry = self._transcription_cache_entry(audio_path, language, audio, kwargs)
+        if entry is None:
+            return
+        key, media_hash, options = entry
+        self.transcription_cache.put(key, result, media_hash, self.model_name, language, options)
+    
+    def _gate_audio(self, audio, speech_regions: list):
+        """
+        Keep only the (padded, merged) speech regions of audio.
+        
+        Returns:
+            Tuple of (audio_to_transcribe, mapping) - mapping is None when gating
+            is not worth it (speech covers almost the whole audio).
+        """
+        total_seconds = len(audio) / WHISPER_SAMPLE_RATE
+        regions = merge_speech_regions(speech_regions, total_seconds)
+        speech_seconds = sum(end - start for start, end in regions)
+        if total_seconds > 0 and speech_seconds / total_seconds > VAD_GATE_MAX_SPEECH_RATIO:
             self.logger.info(
-                f"{log_prefix} Transcribing '{os.path.basename(audio_path)}' "
-                f"(Model: '{self.model_name}', Device: {self.device}, FP16: {fp16}, Lang: {language or 'auto'})"
+                f"[ModelService:VADGate] Giọng nói chiếm {speech_seconds / total_seconds:.0%} audio. Bỏ qua lọc VAD."
             )
+            return audio, None
+        gated_audio, mapping = build_gated_audio(audio, regions, WHISPER_SAMPLE_RATE)
+        self.logger.info(
+            f"[ModelService:VADGate] Chỉ transcribe {len(mapping)} vùng có giọng nói: "
+            f"{len(gated_audio) / WHISPER_SAMPLE_RATE:.0f}s / {total_seconds:.0f}s."
+        )
+        return gated_audio, mapping
+    
+    @staticmethod
+    def _remap_gated_segments(segments: list, mapping: list) -> list:
+        """Copy segments with timestamps (and word timings) moved back to the original timeline."""
+        remapped = []
+        for segment in segments:
+            new_segment = {
+                **segment,
+                'start': remap_gated_time(segment['start'], mapping),
+                'end': remap_gated_time(segment['end'], mapping),
+            }
+            if segment.get('words'):
+                new_segment['words'] = [
+                    {**word, 'start': remap_gated_time(word['start'], mapping), 'end': remap_gated_time(word['end'], mapping)}
+                    for word in segment['words']
+                ]
+            remapped.append(new_segment)
+        return remapped
+    
+    def transcribe_stream(
+        self,
+        audio_path: str,
+        language: Optional[str] = None,
+        fp16: Optional[bool] = None,
+        window_seconds: float = STREAMING_WINDOW_SECONDS,
+        stop_event: Optional[Callable[[], bool]] = None,
+        audio=None,
+        start_seconds: float = 0.0,
+        previous_text: str = "",
+        **kwargs
+    ) -> Iterator[Dict]:
+        """
+        Transcribe audio window by window, yielding segments as they are decoded.
+        
+        The audio is decoded once, cut into ~window_seconds windows at quiet points,
+        and each window is transcribed with the tail of the previous text as
+        initial_prompt. Segment timestamps are offset back to the full timeline.
+        
+        Args:
+            audio_path: Path to audio/video file
+            language: Language code. If None/auto, detected on the first window then kept.
+            fp16: Use FP16 precision. If None, auto-detects based on device.
+            window_seconds: Nominal window length
+            stop_event: Callable that returns True if processing should stop
+            audio: Already decoded 16 kHz mono float32 samples (skips decoding audio_path)
+            start_seconds: Resume point - audio before it is skipped
+            previous_text: Text transcribed before start_seconds (prompt for the first window)
+            **kwargs: Additional transcribe options
             
-            result = self.current_model.transcribe(audio_path, **transcribe_options)
+        Yields:
+            Dict per window: 'segments' (new segments, full timeline), 'end' (window end, s),
+            'language' (detected language), 'text' (window text)
             
-            num_segments = len(result.get('segments', []))
-            self.logger.info(f"{log_prefix} Transcription complete. Found {num_segments} segments.")
+        Raises:
+            RuntimeError: If model is not loaded or other transcription error
+            InterruptedError: If stop_event() returns True between windows
+        """
+        log_prefix = "[ModelService:TranscribeStream]"
+        
+        if self.current_model is None:
+            raise RuntimeError("Model chưa được load. Vui lòng load model trước khi transcribe.")
+        if audio is None and not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file không tồn tại: {audio_path}")
+        if plan_audio_windows is None:
+            raise RuntimeError("Không thể chia cửa sổ audio (thiếu utils.audio_utils).")
+        
+        transcribe_options = self._build_transcribe_options(language, fp16, kwargs)
+        use_previous_text = transcribe_options.get('condition_on_previous_text', True) and 'initial_prompt' not in kwargs
+        
+        if audio is None:
+            audio = self.backend.load_audio(audio_path)
+        base_sample = min(len(audio), max(0, int(round(start_seconds * WHISPER_SAMPLE_RATE))))
+        windows = plan_audio_windows(audio[base_sample:], WHISPER_SAMPLE_RATE, window_seconds)
+        self.logger.info(
+            f"{log_prefix} '{os.path.basename(audio_path)}' ({len(audio) / WHISPER_SAMPLE_RATE:.0f}s"
+            f"{f', từ {start_seconds:.0f}s' if base_sample else ''}) "
+            f"-> {len(windows)} windows (Model: '{self.model_name}', Device: {self.device})"
+        )
+        
+        prompt_text = previous_text or ""
+        detected_language = transcribe_options.get('language')
+        for window_index, (start_sample, end_sample) in enumerate(windows):
+            if stop_event and stop_event():
+                raise InterruptedError("Dừng bởi người dùng khi đang transcribe.")
             
-            return result
+            start_sample += base_sample
+            end_sample += base_sample
+            offset = start_sample / WHISPER_SAMPLE_RATE
+            window_end = end_sample / WHISPER_SAMPLE_RATE
+            options = dict(transcribe_options)
+            if detected_language:
+                options['language'] = detected_language
+            if use_previous_text and prompt_text:
+                options['initial_prompt'] = prompt_text[-STREAMING_PROMPT_CHARS:]
             
-        except Exception as e:
-            self.logger.error(
-                f"{log_prefix} Error transcribing on device '{self.device}': {e}",
-                exc_info=True
+            try:
+                result = self.current_model.transcribe(audio[start_sample:end_sample], **options)
+            except Exception as e:
+                self.logger.error(
+                    f"{log_prefix} Error transcribing window {window_index + 1}/{len(windows)} on device '{self.device}': {e}",
+                    exc_info=True
+                )
+                raise
+            
+            if not detected_language:
+                detected_language = result.get('language')
+            
+            new_segments = []
+            for segment in result.get('segments', []):
+                segment = dict(segment)
+                segment['start'] = min(segment['start'] + offset, window_end)
+                segment['end'] = min(segment['end'] + offset, window_end)
+                if segment.get('words'):
+                    segment['words'] = [
+                        {**word, 'start': word['start'] + offset, 'end': word['end'] + offset}
+                        for word in segment['words']
+                    ]
+                new_segments.append(segment)
+            window_text = result.get('text', '').strip()
+            if window_text:
+                prompt_text = f"{prompt_text} {window_text}".strip()[-STREAMING_PROMPT_CHARS:]
+            
+            self.logger.debug(
+                f"{log_prefix} Window {window_index + 1}/{len(windows)} "
+                f"({offset:.1f}s-{window_end:.1f}s): {len(new_segments)} segments."
             )
-            raise
+            yield {'segments': new_segments, 'end': window_end, 'language': detected_language, 'text': window_text}
+    
+    def transcribe_windowed(
+        self,
+        audio_path: str,
+        language: Optional[str] = None,
+        fp16: Optional[bool] = None,
+        window_seconds: float = STREAMING_WINDOW_SECONDS,
+        on_segments: Optional[Callable[[list], None]] = None,
+        stop_event: Optional[Callable[[], bool]] = None,
+        audio=None,
+        **kwargs
+    ) -> Dict:
+        """
+        Transcribe audio window by window (transcribe_stream), reporting segments as they are produced.
+        
+        Args:
+            audio_path: Path to audio/video file
+            language: Language code. If None/auto, detected on the first window then kept.
+            fp16: Use FP16 precision. If None, auto-detects based on device.
+            window_seconds: Nominal window length
+            on_segments: Callable receiving the list of new segments after each window
+            stop_event: Callable that returns True if processing should stop
+            audio: Already decoded 16 kHz mono float32 samples (skips decoding audio_path)
+            **kwargs: Additional transcribe options
+            
+        Returns:
+            Transcription result dictionary with 'text', 'segments' and 'language'
+            
+        Raises:
+            RuntimeError: If model is not loaded or other transcription error
+            InterruptedError: If stop_event() returns True between windows
+        """
+        all_segments = []
+        texts = []
+        detected_language = None
+        for window in self.transcribe_stream(
+            audio_path, language=language, fp16=fp16, window_seconds=window_seconds,
+            stop_event=stop_event, audio=audio, **kwargs
+        ):
+            new_segments = window['segments']
+            for segment in new_segments:
+                segment['id'] = len(all_segments)
+                all_segments.append(segment)
+            if window['text']:
+                texts.append(window['text'])
+            detected_language = window['language']
+            if on_segments and new_segments:
+                on_segments(new_segments)
+        
+        self.logger.info(f"[ModelService:TranscribeWindowed] Transcription complete. Found {len(all_segments)} segments.")
+        return {'text': " ".join(texts), 'segments': all_segments, 'language': detected_language}
+    
+    def _stream_signature(self, audio_path: str, language: Optional[str], audio, kwargs: Dict,
+                          speech_regions: Optional[list]) -> str:
+        """Identity of a streaming transcription (source file, model, options) for resuming."""
+        try:
+            stat = os.stat(audio_path)
+            source = [os.path.abspath(audio_path), stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            source = [os.path.abspath(audio_path)]
+        options = self._build_transcribe_options(language, None, kwargs)
+        options.pop('fp16', None)
+        parts = {
+            'source': source,
+            'model': f"{self.backend.describe()}/{self.model_name}",
+            'options': options,
+            'samples': len(audio) if audio is not None else None,
+            'speech_regions': [(round(a, 2), round(b, 2)) for a, b in speech_regions] if speech_regions else None,
+        }
+        return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:20]
+    
+    def _load_stream_checkpoint(self, checkpoint_path: str, signature: str) -> Optional[Dict]:
+        try:
+            with open(checkpoint_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('signature') != signature:
+            return None
+        state['segments'] = [
+            {'id': i, 'start': start, 'end': end, 'text': text}
+            for i, (start, end, text) in enumerate(state.get('segments', []))
+        ]
+        return state
+    
+    @staticmethod
+    def _save_stream_checkpoint(checkpoint_path: str, state: Dict) -> None:
+        """Write the checkpoint atomically (tmp file + fsync + replace)."""
+        data = {
+            **state,
+            'segments': [[seg['start'], seg['end'], seg['text']] for seg in state['segments']],
+        }
+        tmp_path = checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, checkpoint_path)
+    
+    def _transcribe_incremental(
+        self,
+        audio_path: str,
+        output_path: str,
+        output_format: str,
+        language: Optional[str],
+        fp16: Optional[bool],
+        on_segments: Optional[Callable[[list], None]],
+        stop_event: Optional[Callable[[], bool]],
+        audio,
+        remap: Optional[Callable[[list], list]],
+        signature: str,
+        checkpoint_dir: Optional[str],
+        resume: bool,
+        kwargs: Dict
+    ) -> Dict:
+        """
+        Streaming transcription written to disk as it goes, resumable after a crash/stop.
+        
+        Segments are appended to a '.part' file (fsync'ed periodically) and a checkpoint
+        (last completed window end, language, prompt text, segments) is saved after each
+        window. A later call with the same signature continues from the checkpoint.
+        """
+        log_prefix = "[ModelService:Incremental]"
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            stem = os.path.join(checkpoint_dir, signature)
+        else:
+            stem = f"{output_path}.{signature}"
+        part_path = f"{stem}.part.{output_format}"
+        checkpoint_path = f"{stem}.progress.json"
+        
+        state = self._load_stream_checkpoint(checkpoint_path, signature) if resume else None
+        if state is not None:
+            self.logger.info(
+                f"{log_prefix} Tiếp tục transcribe từ {state['completed_until']:.1f}s "
+                f"({len(state['segments'])} segments đã có)."
+            )
+        else:
+            state = {'signature': signature, 'completed_until': 0.0, 'language': None, 'prompt': "", 'segments': []}
+        
+        done_segments = state['segments']
+        if on_segments and done_segments:
+            on_segments(list(done_segments))
+        
+        writer = SubtitleStreamWriter(part_path, output_format, STREAM_FSYNC_INTERVAL_SECONDS, existing_segments=done_segments)
+        try:
+            for window in self.transcribe_stream(
+                audio_path, language=state['language'] or language, fp16=fp16, stop_event=stop_event,
+                audio=audio, start_seconds=state['completed_until'], previous_text=state['prompt'], **kwargs
+            ):
+                new_segments = remap(window['segments']) if remap else window['segments']
+                for segment in new_segments:
+                    segment['id'] = len(done_segments)
+                    done_segments.append(segment)
+                writer.append(new_segments)
+                
+                state['completed_until'] = window['end']
+                state['language'] = window['language']
+                if window['text']:
+                    state['prompt'] = f"{state['prompt']} {window['text']}".strip()[-STREAMING_PROMPT_CHARS:]
+                self._save_stream_checkpoint(checkpoint_path, state)
+                
+                if on_segments and new_segments:
+                    on_segments(new_segments)
+        finally:
+            writer.close()
+        
+        # Thư mục checkpoint có thể nằm trên ổ khác với output_path
+        shutil.move(part_path, output_path)
+        try:
+            os.remove(checkpoint_path)
+        except OSError:
+            pass
+        self.logger.info(f"{log_prefix} Transcription complete. Found {len(done_segments)} segments.")
+        return {
+            'text': " ".join(seg['text'].strip() for seg in done_segments),
+            'segments': done_segments,
+            'language': state['language'],
+        }
     
     def transcribe_and_save(
         self,
@@ -437,6 +1168,13 @@ class ModelService:
         output_format: str = "srt",
         language: Optional[str] = None,
         fp16: Optional[bool] = None,
+        on_segments: Optional[Callable[[list], None]] = None,
+        stop_event: Optional[Callable[[], bool]] = None,
+        audio=None,
+        speech_regions: Optional[list] = None,
+        incremental: bool = False,
+        checkpoint_dir: Optional[str] = None,
+        resume: bool = True,
         **kwargs
     ) -> str:
         """
@@ -448,6 +1186,18 @@ class ModelService:
             output_format: Output format ("txt", "srt", or "vtt")
             language: Language code
             fp16: Use FP16 precision
+            on_segments: If given, transcribe window by window (transcribe_windowed)
+                and pass each batch of new segments to this callable
+            stop_event: Callable that returns True if processing should stop (windowed mode)
+            audio: Already decoded 16 kHz mono float32 samples of audio_path (optional)
+            speech_regions: (start_s, end_s) speech regions of the audio (VAD). If given,
+                only the padded/merged regions are transcribed and timestamps are
+                remapped to the original timeline
+            incremental: Write segments to disk as they are decoded (with periodic fsync)
+                and checkpoint progress so an interrupted run can resume
+            checkpoint_dir: Folder for the partial file and checkpoint (None = next to output_path).
+                Use a persistent folder to resume across application restarts
+            resume: Continue from a matching checkpoint if one exists (incremental mode)
             **kwargs: Additional transcribe options
             
         Returns:
@@ -457,8 +1207,62 @@ class ModelService:
             RuntimeError: If model is not loaded or transcription fails
             ValueError: If output_format is not supported
         """
-        # Transcribe
-        result = self.transcribe(audio_path, language=language, fp16=fp16, **kwargs)
+        written_incrementally = False
+        
+        # Kết quả đã có trong cache (cùng nội dung media, model, ngôn ngữ, tùy chọn giải mã)
+        cache_entry = self._transcription_cache_entry(audio_path, language, audio, kwargs, speech_regions)
+        result = self.transcription_cache.get(cache_entry[0]) if cache_entry else None
+        
+        if result is not None:
+            self.logger.info(
+                f"[ModelService] Dùng kết quả transcribe từ cache cho '{os.path.basename(audio_path)}' "
+                f"({len(result['segments'])} segments, model '{self.model_name}')."
+            )
+            if on_segments is not None and result['segments']:
+                on_segments(result['segments'])
+        else:
+            # Định danh để tiếp tục khi bị gián đoạn (tính trên audio gốc, trước khi lọc VAD)
+            signature = self._stream_signature(audio_path, language, audio, kwargs, speech_regions) if incremental else None
+            
+            # Lọc VAD: chỉ đưa các vùng có giọng nói vào Whisper, sau đó đổi timestamp về timeline gốc
+            gate_mapping = None
+            if speech_regions is not None and build_gated_audio is not None:
+                if audio is None:
+                    audio = self.backend.load_audio(audio_path)
+                audio, gate_mapping = self._gate_audio(audio, speech_regions)
+            
+            segment_callback = on_segments
+            if on_segments is not None and gate_mapping is not None:
+                segment_callback = lambda segments: on_segments(self._remap_gated_segments(segments, gate_mapping))
+            
+            # Transcribe
+            if gate_mapping is not None and len(audio) == 0:
+                self.logger.info("[ModelService:VADGate] Không có vùng giọng nói nào. Bỏ qua Whisper.")
+                result = {'text': "", 'segments': [], 'language': language}
+            elif incremental and SubtitleStreamWriter is not None:
+                result = self._transcribe_incremental(
+                    audio_path, output_path, output_format, language, fp16, on_segments, stop_event, audio,
+                    remap=(lambda segments: self._remap_gated_segments(segments, gate_mapping)) if gate_mapping else None,
+                    signature=signature, checkpoint_dir=checkpoint_dir, resume=resume, kwargs=kwargs
+                )
+                gate_mapping = None  # Segment đã được đổi timestamp khi ghi
+                written_incrementally = True
+            elif on_segments is not None:
+                result = self.transcribe_windowed(
+                    audio_path, language=language, fp16=fp16,
+                    on_segments=segment_callback, stop_event=stop_event, audio=audio, **kwargs
+                )
+            else:
+                result = self.transcribe(audio_path, language=language, fp16=fp16, audio=audio, **kwargs)
+            if gate_mapping is not None:
+                result = {**result, 'segments': self._remap_gated_segments(result['segments'], gate_mapping)}
+            if cache_entry:
+                key, media_hash, options = cache_entry
+                self.transcription_cache.put(key, result, media_hash, self.model_name, language, options)
+        
+        if written_incrementally:
+            self.logger.info(f"[ModelService] Saved transcription to: {output_path}")
+            return output_path
         
         # Ensure output directory exists
         output_dir = os.path.dirname(output_path)
@@ -0,0 +1,257 @@
+"""
+Parallel Transcription for Piu Application
+
+CPU-only nodes: one whisper.transcribe() call on a long file leaves most
+cores idle. This module transcribes the chunks of a file (cut at quiet
+points, see utils.audio_utils) in a pool of worker processes, each holding
+its own copy of the model, and returns one SRT per chunk in order. Chunks
+are either split audio files or sample ranges of the shared decoded .npy
+buffer, which workers memory-map instead of decoding again.
+
+Worker functions are module-level so they can be pickled by the 'spawn'
+start method (used on every platform: forking a process that already runs
+torch threads can deadlock).
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+import wave
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Optional imports with fallback
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+    psutil = None
+
+from utils.audio_utils import plan_audio_windows, WHISPER_SAMPLE_RATE
+
+try:
+    from config.constants import WHISPER_MODEL_PARAMS_M
+except ImportError:
+    WHISPER_MODEL_PARAMS_M = {"tiny": 39, "base": 74, "small": 244, "medium": 769, "large": 1550}
+
+# Constants
+APP_NAME = "Piu"
+# Mỗi worker cần ít nhất bấy nhiêu luồng CPU để chạy hiệu quả
+MIN_THREADS_PER_WORKER = 2
+MAX_WORKERS = 16
+# Bộ nhớ phụ trội mỗi tiến trình worker (Python + torch + buffer giải mã), MB
+WORKER_OVERHEAD_MB = 600
+# Chỉ dùng tối đa tỉ lệ này của RAM còn trống cho các worker
+RAM_USAGE_RATIO = 0.7
+# Chunk ngắn nhất (giây): chunk quá ngắn làm mất ngữ cảnh ở biên và tốn thời gian nạp
+MIN_CHUNK_SECONDS = 120.0
+# Mỗi worker nhận khoảng bấy nhiêu chunk để cân bằng tải
+CHUNKS_PER_WORKER = 2
+
+# State of a worker process (set by _init_worker)
+_worker_model = None
+
+
+def estimate_worker_memory_mb(model_name: str) -> float:
+    """Estimate the RAM used by one worker process holding model_name (fp32)."""
+    params_m = WHISPER_MODEL_PARAMS_M.get(model_name)
+    if params_m is None:
+        params_m = WHISPER_MODEL_PARAMS_M.get(model_name.split("-")[0].split(".")[0], 1550)
+    return params_m * 1e6 * 4 / (1024 * 1024) + WORKER_OVERHEAD_MB
+
+
+def compute_worker_count(
+    model_name: str,
+    cpu_count: Optional[int] = None,
+    available_mb: Optional[float] = None,
+    max_workers: int = MAX_WORKERS
+) -> Tuple[int, int]:
+    """
+    Derive the number of worker processes from CPU cores and available RAM.
+
+    Args:
+        model_name: Whisper model name (selects the per-worker memory estimate)
+        cpu_count: Logical CPUs (None = detect)
+        available_mb: Available RAM in MB (None = detect with psutil)
+        max_workers: Upper bound
+
+    Returns:
+        Tuple of (workers, torch_threads_per_worker)
+    """
+    if cpu_count is None:
+        cpu_count = os.cpu_count() or 1
+    if available_mb is None:
+        available_mb = 0.0
+        if HAS_PSUTIL and psutil is not None:
+            try:
+                available_mb = psutil.virtual_memory().available / (1024 * 1024)
+            except Exception:
+                available_mb = 0.0
+
+    by_cpu = max(1, cpu_count // MIN_THREADS_PER_WORKER)
+    by_ram = int(available_mb * RAM_USAGE_RATIO // estimate_worker_memory_mb(model_name)) if available_mb else 1
+    workers = max(1, min(by_cpu, by_ram, max_workers))
+    threads = max(1, cpu_count // workers)
+    return workers, threads
+
+
+def wav_duration_s(wav_path: str) -> float:
+    """Exact duration of a PCM WAV file from its header (frames / rate)."""
+    with wave.open(wav_path, "rb") as wav_file:
+        return wav_file.getnframes() / float(wav_file.getframerate())
+
+
+def chunk_offsets_s(chunk_paths: Sequence[str]) -> List[float]:
+    """Start time of each WAV chunk on the original timeline (cumulative exact durations)."""
+    offsets = []
+    position = 0.0
+    for chunk_path in chunk_paths:
+        offsets.append(position)
+        position += wav_duration_s(chunk_path)
+    return offsets
+
+
+def plan_split_points(audio_duration_s: float, audio, workers: int) -> List[float]:
+    """
+    Choose chunk boundaries (seconds) at quiet points of the decoded audio.
+
+    Args:
+        audio_duration_s: Duration of the audio
+        audio: Decoded 16 kHz mono audio (whisper.load_audio)
+        workers: Number of worker processes
+
+    Returns:
+        Sorted boundaries, excluding 0 and the end (empty = no split).
+    """
+    chunk_seconds = max(MIN_CHUNK_SECONDS, audio_duration_s / max(1, workers * CHUNKS_PER_WORKER))
+    windows = plan_audio_windows(audio, WHISPER_SAMPLE_RATE, window_seconds=chunk_seconds)
+    return [start / WHISPER_SAMPLE_RATE for start, _ in windows[1:]]
+
+
+def _init_worker(model_name: str, torch_threads: int) -> None:
+    """Pool initializer: load this worker's own model copy once."""
+    global _worker_model
+    import torch
+    import whisper
+
+    torch.set_num_threads(max(1, torch_threads))
+    _worker_model = whisper.load_model(model_name, device="cpu")
+
+
+def _load_chunk_source(source):
+    """A chunk source is an audio file path or (npy_path, start_sample, end_sample) of a decoded buffer."""
+    if isinstance(source, (tuple, list)):
+        import numpy as np
+
+        npy_path, start_sample, end_sample = source
+        # mmap: mỗi worker chỉ đọc phần mẫu của mình, không giải mã lại file gốc
+        return np.load(npy_path, mmap_mode="c")[start_sample:end_sample]
+    return source
+
+
+def _transcribe_chunk(job: Tuple[int, object, str, Dict]) -> Tuple[int, str, List[Dict]]:
+    """
+    Pool task: transcribe one chunk and write its SRT.
+
+    Returns:
+        Tuple of (chunk_index, srt_path, segments) - segments are relative to the chunk.
+    """
+    from utils.srt_utils import write_srt
+
+    chunk_index, source, srt_path, options = job
+    result = _worker_model.transcribe(_load_chunk_source(source), **options)
+    segments = [
+        {'start': float(seg['start']), 'end': float(seg['end']), 'text': seg['text']}
+        for seg in result.get('segments', [])
+    ]
+    with open(srt_path, "w", encoding="utf-8") as f:
+        write_srt(f, segments)
+    return chunk_index, srt_path, segments
+
+
+def transcribe_chunks_parallel(
+    chunk_paths: Sequence,
+    output_dir: str,
+    model_name: str,
+    workers: int,
+    torch_threads: int,
+    options: Dict,
+    stop_event: Optional[Callable[[], bool]] = None,
+    on_chunk_done: Optional[Callable[[int, List[Dict]], None]] = None,
+    logger: Optional[logging.Logger] = None
+) -> List[str]:
+    """
+    Transcribe audio chunks in a process pool.
+
+    Args:
+        chunk_paths: Chunk audio files, or (npy_path, start_sample, end_sample)
+            ranges of a decoded buffer (services.audio_decode_service), in timeline order
+        output_dir: Folder for the per-chunk SRT files
+        model_name: Whisper model each worker loads
+        workers: Number of worker processes
+        torch_threads: torch threads per worker
+        options: whisper transcribe() options (fp16 is forced off)
+        stop_event: Callable returning True to abort (the pool is terminated)
+        on_chunk_done: Callable(chunk_index, segments) called in timeline order
+        logger: Optional logger instance
+
+    Returns:
+        SRT paths aligned with chunk_paths.
+
+    Raises:
+        InterruptedError: If stop_event() returns True
+        Exception: The first worker error
+    """
+    logger = logger or logging.getLogger(APP_NAME)
+    log_prefix = "[ParallelTranscribe]"
+    options = {**options, 'fp16': False, 'verbose': None}
+
+    jobs = []
+    for i, chunk_path in enumerate(chunk_paths):
+        if isinstance(chunk_path, (tuple, list)):
+            base_name = f"chunk_{i:03d}"
+        else:
+            base_name = os.path.splitext(os.path.basename(chunk_path))[0]
+        jobs.append((i, chunk_path, os.path.join(output_dir, f"{base_name}.srt"), options))
+
+    workers = max(1, min(workers, len(jobs)))
+    logger.info(
+        f"{log_prefix} {len(jobs)} chunks, {workers} processes x {torch_threads} threads (model '{model_name}')."
+    )
+    started = time.monotonic()
+    srt_paths: List[Optional[str]] = [None] * len(jobs)
+    done_segments: Dict[int, List[Dict]] = {}
+    next_to_report = 0
+
+    ctx = multiprocessing.get_context("spawn")
+    pool = ctx.Pool(processes=workers, initializer=_init_worker, initargs=(model_name, torch_threads))
+    try:
+        results = pool.imap_unordered(_transcribe_chunk, jobs)
+        remaining = len(jobs)
+        while remaining:
+            if stop_event and stop_event():
+                raise InterruptedError("Dừng bởi người dùng khi đang transcribe song song.")
+            try:
+                chunk_index, srt_path, segments = results.next(timeout=0.5)
+            except multiprocessing.TimeoutError:
+                continue
+            remaining -= 1
+            srt_paths[chunk_index] = srt_path
+            done_segments[chunk_index] = segments
+            logger.info(f"{log_prefix} Chunk {chunk_index + 1}/{len(jobs)} xong ({len(segments)} segments).")
+            # Báo kết quả theo đúng thứ tự thời gian
+            while next_to_report in done_segments:
+                segments_in_order = done_segments.pop(next_to_report)
+                if on_chunk_done:
+                    on_chunk_done(next_to_report, segments_in_order)
+                next_to_report += 1
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    logger.info(f"{log_prefix} Hoàn tất {len(jobs)} chunks trong {time.monotonic() - started:.1f}s.")
+    return srt_paths
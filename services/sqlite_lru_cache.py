@@ -0,0 +1,269 @@
+"""
+SQLite LRU Cache Base for Piu Application
+
+Shared machinery of the persistent caches (translation memory, Whisper
+results, TTS audio): one SQLite table per cache, opened in WAL mode, with
+hit/miss counters, size-based LRU eviction and a bypass switch.
+
+Every table has the columns key (primary key), size, created_at, last_used
+and hit_count; subclasses add their own columns through TABLE_COLUMNS.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Sequence, Type
+
+# Constants
+APP_NAME = "Piu"
+# Khi vượt quota, xóa thêm một phần để không phải dọn dẹp sau mỗi lần ghi
+EVICTION_HEADROOM_RATIO = 0.9
+# SQLite giới hạn số tham số trong một câu lệnh
+_SQL_CHUNK_SIZE = 500
+
+
+class SQLiteLRUCache:
+    """
+    Base class of the SQLite-backed caches with hit/miss counters,
+    size-based LRU eviction and a bypass switch.
+
+    Subclasses set TABLE_NAME, TABLE_COLUMNS (extra column definitions),
+    LOG_PREFIX and CACHE_NAME (used in log messages).
+    """
+
+    TABLE_NAME = ""
+    TABLE_COLUMNS = ""
+    LOG_PREFIX = "[SQLiteLRUCache]"
+    CACHE_NAME = "cache"
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size_mb: float,
+        enabled: bool = True,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_size_mb: Disk quota; least recently used entries are evicted beyond it
+            enabled: If False, lookups always miss and nothing is stored (bypass)
+            logger: Optional logger instance
+        """
+        self.logger = logger or logging.getLogger(APP_NAME)
+        self.db_path = db_path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.enabled = enabled
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._open()
+
+    # ------------------------------------------------------------------
+    # Setup
+    # ------------------------------------------------------------------
+
+    def _open(self):
+        try:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema()
+            self._conn.commit()
+            self.logger.info(f"{self.LOG_PREFIX} Đã mở {self.CACHE_NAME}: {self.db_path}")
+        except Exception as e:
+            self.logger.error(f"{self.LOG_PREFIX} Không thể mở {self.CACHE_NAME} '{self.db_path}': {e}. Tắt cache.", exc_info=True)
+            self._conn = None
+
+    def _create_schema(self):
+        """Create the cache table and its last_used index (override to add more)."""
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.TABLE_NAME} ("
+            f" key TEXT PRIMARY KEY,"
+            f" {self.TABLE_COLUMNS},"
+            f" size INTEGER, created_at REAL, last_used REAL, hit_count INTEGER DEFAULT 0)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{self.TABLE_NAME}_last_used ON {self.TABLE_NAME}(last_used)"
+        )
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+
+    @property
+    def available(self) -> bool:
+        """True if the cache is enabled and the database is usable."""
+        return self.enabled and self._conn is not None
+
+    # ------------------------------------------------------------------
+    # Lookup / store helpers (for subclasses)
+    # ------------------------------------------------------------------
+
+    def _fetch_many_locked(self, keys: Sequence[str], column: str) -> Dict[str, object]:
+        """
+        Read one column for the given keys and mark the found rows as used.
+
+        Caller holds self._lock. Errors are logged and count as misses.
+
+        Returns:
+            Dict key -> column value (found keys only)
+        """
+        found: Dict[str, object] = {}
+        try:
+            unique_keys = list(dict.fromkeys(keys))
+            for i in range(0, len(unique_keys), _SQL_CHUNK_SIZE):
+                chunk = unique_keys[i:i + _SQL_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, {column} FROM {self.TABLE_NAME} WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self.TABLE_NAME} SET last_used = ?, hit_count = hit_count + 1 WHERE key = ?",
+                    [(now, k) for k in found]
+                )
+                self._conn.commit()
+        except Exception as e:
+            self.logger.warning(f"{self.LOG_PREFIX} Lỗi đọc cache: {e}")
+            found = {}
+        return found
+
+    def _store_rows(self, columns: Sequence[str], rows: Sequence[tuple]) -> None:
+        """
+        Insert or replace rows, then enforce the size quota.
+
+        Args:
+            columns: Column names of each row tuple; must include key, size,
+                     created_at and last_used (hit_count is reset to 0)
+            rows: Row tuples aligned with columns
+        """
+        if not rows:
+            return
+        names = ", ".join(columns)
+        placeholders = ", ".join("?" * len(columns))
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.TABLE_NAME} ({names}, hit_count) VALUES ({placeholders}, 0)",
+                    rows
+                )
+                self._conn.commit()
+                self._evict_if_needed_locked()
+            except Exception as e:
+                self.logger.warning(f"{self.LOG_PREFIX} Lỗi ghi cache: {e}")
+
+    def _evict_if_needed_locked(self):
+        total_size = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.TABLE_NAME}").fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+        target_size = int(self.max_size_bytes * EVICTION_HEADROOM_RATIO)
+        to_free = total_size - target_size
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute(f"SELECT key, size FROM {self.TABLE_NAME} ORDER BY last_used ASC"):
+            victims.append((key,))
+            freed += size
+            if freed >= to_free:
+                break
+        self._conn.executemany(f"DELETE FROM {self.TABLE_NAME} WHERE key = ?", victims)
+        self._conn.commit()
+        self.evictions += len(victims)
+        self.logger.info(f"{self.LOG_PREFIX} Đã loại {len(victims)} mục cũ (giải phóng ~{freed / 1024:.0f} KB).")
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def clear(self) -> None:
+        """Delete all cached entries."""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.TABLE_NAME}")
+            self._conn.commit()
+        self.logger.info(f"{self.LOG_PREFIX} Đã xóa toàn bộ {self.CACHE_NAME}.")
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict with keys: 'enabled', 'entries', 'size_bytes', 'hits', 'misses', 'hit_rate', 'evictions'
+        """
+        entries, size_bytes = 0, 0
+        if self._conn is not None:
+            with self._lock:
+                try:
+                    entries, size_bytes = self._conn.execute(
+                        f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.TABLE_NAME}"
+                    ).fetchone()
+                except Exception:
+                    pass
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': entries,
+            'size_bytes': size_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+
+_shared_caches: Dict[type, SQLiteLRUCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def get_shared_cache(
+    cache_cls: Type[SQLiteLRUCache],
+    filename: str,
+    cfg: Optional[dict],
+    enabled_key: str,
+    max_mb_key: str,
+    default_max_mb: float
+) -> SQLiteLRUCache:
+    """
+    Get the shared instance of a cache class (stored alongside config.json).
+
+    Args:
+        cache_cls: SQLiteLRUCache subclass
+        filename: Database file name
+        cfg: Optional app config
+        enabled_key: Config key of the bypass switch
+        max_mb_key: Config key of the disk quota (MB)
+        default_max_mb: Quota used when max_mb_key is not set
+    """
+    with _shared_caches_lock:
+        cache = _shared_caches.get(cache_cls)
+        if cache is None:
+            from config.settings import get_config_path
+            db_path = os.path.join(os.path.dirname(get_config_path()), filename)
+            cfg = cfg or {}
+            cache = cache_cls(
+                db_path,
+                max_size_mb=float(cfg.get(max_mb_key, default_max_mb)),
+                enabled=bool(cfg.get(enabled_key, True)),
+            )
+            _shared_caches[cache_cls] = cache
+        return cache
@@ -0,0 +1,171 @@
+"""
+Subtitle Pipeline for Piu Application
+
+Overlaps transcription and translation: segments produced by the transcriber
+flow through a bounded queue into a translation worker thread, which
+translates them in micro-batches while Whisper keeps running. When the
+transcription ends, the subtitle file is rendered from the lines already
+translated; only lines the worker missed are sent again.
+"""
+
+import logging
+import queue
+import threading
+from typing import Callable, Dict, List, Optional
+
+from services.translation_service import build_translation_batches, get_batch_limits
+
+# Constants
+APP_NAME = "Piu"
+# Số lô segment tối đa chờ dịch; transcriber bị chặn (backpressure) khi hàng đợi đầy
+DEFAULT_QUEUE_SIZE = 8
+
+_END_OF_STREAM = object()
+
+
+def segment_text_lines(segment: Dict) -> List[str]:
+    """
+    Return the subtitle text lines of a Whisper segment, exactly as they will
+    appear in the SRT/VTT written by utils.srt_utils (and re-parsed by
+    translation_service.parse_subtitle_blocks).
+    """
+    text = (segment.get('text') or '').strip().replace('-->', '->')
+    return [line.strip() for line in text.split('\n') if line.strip()]
+
+
+class StreamingTranslationWorker:
+    """
+    Background translation worker fed with transcription segments.
+
+    Usage:
+        worker = StreamingTranslationWorker(translate_batch_fn, "openai")
+        worker.start()
+        model_service.transcribe_and_save(..., on_segments=worker.submit)
+        pretranslated = worker.finish()
+    """
+
+    def __init__(
+        self,
+        translate_batch_fn: Callable[[List[str]], Optional[List[str]]],
+        engine_key: str,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        stop_check: Optional[Callable[[], bool]] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Args:
+            translate_batch_fn: Engine call for a list of texts (returns list or None)
+            engine_key: 'google_cloud' or 'openai' (selects batch limits)
+            queue_size: Max pending segment batches before submit() blocks
+            stop_check: Callable returning True if processing should stop
+            logger: Optional logger instance
+        """
+        self.logger = logger or logging.getLogger(APP_NAME)
+        self.translate_batch_fn = translate_batch_fn
+        self.engine_key = engine_key
+        self.stop_check = stop_check
+        self.limits = get_batch_limits(engine_key)
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._translations: Dict[str, str] = {}
+        self._cancelled = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.failed_lines = 0
+
+    def start(self) -> None:
+        """Start the worker thread."""
+        self._thread = threading.Thread(target=self._run, name="StreamingTranslation", daemon=True)
+        self._thread.start()
+        self.logger.info(f"[SubtitlePipeline] Bắt đầu dịch song song với transcribe (engine: {self.engine_key}).")
+
+    def submit(self, segments: List[Dict]) -> None:
+        """Queue new segments for translation (blocks while the queue is full)."""
+        lines = [line for segment in segments for line in segment_text_lines(segment)]
+        if not lines:
+            return
+        while not self._cancelled.is_set() and self._thread is not None and self._thread.is_alive():
+            try:
+                self._queue.put(lines, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def finish(self, cancel: bool = False, timeout: Optional[float] = None) -> Dict[str, str]:
+        """
+        Signal end of transcription and wait for the worker.
+
+        Args:
+            cancel: Drop pending work instead of translating it (error/stop path)
+            timeout: Max seconds to wait for the worker
+
+        Returns:
+            Dict mapping source line -> translated line (lines translated so far).
+        """
+        if cancel:
+            self._cancelled.set()
+        if self._thread is not None:
+            while self._thread.is_alive():
+                try:
+                    self._queue.put(_END_OF_STREAM, timeout=0.5)
+                    break
+                except queue.Full:
+                    if cancel:
+                        self._drain()
+            self._thread.join(timeout)
+        self.logger.info(
+            f"[SubtitlePipeline] Worker dịch kết thúc: {len(self._translations)} dòng đã dịch trước, "
+            f"{self.failed_lines} dòng lỗi (sẽ dịch lại ở bước cuối)."
+        )
+        return dict(self._translations)
+
+    def _drain(self) -> None:
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _should_stop(self) -> bool:
+        return self._cancelled.is_set() or bool(self.stop_check and self.stop_check())
+
+    def _run(self) -> None:
+        finished = False
+        while not finished:
+            item = self._queue.get()
+            if item is _END_OF_STREAM:
+                break
+            pending = list(item)
+            # Gom thêm các lô đang chờ thành một micro-batch lớn hơn
+            while True:
+                try:
+                    extra = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is _END_OF_STREAM:
+                    finished = True
+                    break
+                pending.extend(extra)
+
+            if self._should_stop():
+                continue
+            self._translate_lines(pending)
+
+    def _translate_lines(self, lines: List[str]) -> None:
+        unique_lines = [line for line in dict.fromkeys(lines) if line not in self._translations]
+        if not unique_lines:
+            return
+        for batch in build_translation_batches(unique_lines, self.limits["max_chars"], self.limits["max_segments"]):
+            if self._should_stop():
+                return
+            batch_texts = [unique_lines[i] for i in batch]
+            try:
+                result = self.translate_batch_fn(batch_texts)
+            except Exception as e:
+                self.logger.warning(f"[SubtitlePipeline] Lỗi dịch micro-batch {len(batch_texts)} dòng: {e}")
+                result = None
+            if result is None or len(result) != len(batch_texts):
+                self.failed_lines += len(batch_texts)
+                continue
+            for source, translated in zip(batch_texts, result):
+                if translated is not None:
+                    self._translations[source] = translated
@@ -0,0 +1,178 @@
+"""
+Transcription Cache for Piu Application
+
+Persistent (SQLite) cache of Whisper results. Re-subbing a video after a
+style change, or resuming a batch after a crash, reuses the stored segments
+instead of running Whisper again; SRT, VTT and TXT are all regenerated from
+the same segment list.
+
+Key: sampled content hash of the media (size + evenly spaced blocks) +
+model + language + decode options (beam_size, patience, thresholds, ...).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+
+from services.sqlite_lru_cache import SQLiteLRUCache, get_shared_cache
+
+# Constants
+TRANSCRIPTION_CACHE_FILENAME = "transcription_cache.sqlite3"
+DEFAULT_MAX_SIZE_MB = 500
+# Hash nội dung: đọc bấy nhiêu khối rải đều trong file thay vì cả file
+FINGERPRINT_BLOCKS = 16
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+# Tùy chọn không ảnh hưởng tới nội dung kết quả (chỉ độ chính xác số học / log)
+_OPTIONS_NOT_IN_KEY = ("fp16", "verbose")
+
+
+def compute_media_fingerprint(path: str) -> str:
+    """
+    Fast content hash of a media file: size + FINGERPRINT_BLOCKS blocks
+    spread evenly over the file (whole file if it is small).
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        if size <= FINGERPRINT_BLOCKS * FINGERPRINT_BLOCK_SIZE:
+            digest.update(f.read())
+        else:
+            step = (size - FINGERPRINT_BLOCK_SIZE) / (FINGERPRINT_BLOCKS - 1)
+            for i in range(FINGERPRINT_BLOCKS):
+                f.seek(int(i * step))
+                digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+def pack_segments(result: Dict) -> bytes:
+    """Compact form of a Whisper result: language + [start_ms, end_ms, text] per segment, zlib JSON."""
+    data = {
+        'l': result.get('language'),
+        's': [
+            [int(round(seg['start'] * 1000)), int(round(seg['end'] * 1000)), seg.get('text', '')]
+            for seg in result.get('segments', [])
+        ],
+    }
+    return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def unpack_segments(blob: bytes) -> Dict:
+    """Rebuild a Whisper-like result dict ('text', 'segments', 'language') from pack_segments()."""
+    data = json.loads(zlib.decompress(blob).decode("utf-8"))
+    segments = [
+        {'id': i, 'start': start / 1000.0, 'end': end / 1000.0, 'text': text}
+        for i, (start, end, text) in enumerate(data.get('s', []))
+    ]
+    return {
+        'text': "".join(seg['text'] for seg in segments),
+        'segments': segments,
+        'language': data.get('l'),
+    }
+
+
+class TranscriptionCache(SQLiteLRUCache):
+    """
+    SQLite-backed Whisper result cache with hit/miss counters,
+    size-based LRU eviction and a bypass switch.
+    """
+
+    TABLE_NAME = "transcriptions"
+    TABLE_COLUMNS = "media_hash TEXT, model TEXT, language TEXT, options TEXT, data BLOB"
+    LOG_PREFIX = "[TranscriptionCache]"
+    CACHE_NAME = "cache transcribe"
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size_mb: float = DEFAULT_MAX_SIZE_MB,
+        enabled: bool = True,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Initialize Transcription Cache.
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_size_mb: Disk quota; least recently used entries are evicted beyond it
+            enabled: If False, lookups always miss and nothing is stored (bypass)
+            logger: Optional logger instance
+        """
+        self._fingerprints: Dict[Tuple[str, int, int], str] = {}
+        super().__init__(db_path, max_size_mb, enabled, logger)
+
+    def fingerprint(self, media_path: str) -> str:
+        """Content hash of media_path, memoized per (path, size, mtime)."""
+        stat = os.stat(media_path)
+        memo_key = (os.path.abspath(media_path), stat.st_size, stat.st_mtime_ns)
+        fingerprint = self._fingerprints.get(memo_key)
+        if fingerprint is None:
+            fingerprint = compute_media_fingerprint(media_path)
+            self._fingerprints[memo_key] = fingerprint
+        return fingerprint
+
+    @staticmethod
+    def make_key(media_hash: str, model: str, language: Optional[str], options: Dict) -> str:
+        """Build the cache key for one transcription."""
+        key_options = {k: v for k, v in options.items() if k not in _OPTIONS_NOT_IN_KEY and k != 'language'}
+        parts = [
+            media_hash,
+            model or "",
+            (language or "auto").lower(),
+            json.dumps(key_options, sort_keys=True, default=str),
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a transcription.
+
+        Returns:
+            Result dict ('text', 'segments', 'language'), or None on miss.
+        """
+        if not self.available:
+            return None
+        with self._lock:
+            blob = self._fetch_many_locked([key], "data").get(key)
+            if blob is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        try:
+            return unpack_segments(blob)
+        except Exception as e:
+            self.logger.warning(f"[TranscriptionCache] Mục cache hỏng, bỏ qua: {e}")
+            return None
+
+    def put(self, key: str, result: Dict, media_hash: str = "", model: str = "",
+            language: Optional[str] = None, options: Optional[Dict] = None) -> None:
+        """Store a Whisper result (only the compact segment list is kept)."""
+        if not self.available:
+            return
+        blob = pack_segments(result)
+        now = time.time()
+        self._store_rows(
+            ("key", "media_hash", "model", "language", "options", "data", "size", "created_at", "last_used"),
+            [(key, media_hash, model, language or "auto",
+              json.dumps(options or {}, sort_keys=True, default=str),
+              sqlite3.Binary(blob), len(blob) + 200, now, now)]
+        )
+
+
+def get_transcription_cache(cfg: Optional[dict] = None) -> TranscriptionCache:
+    """
+    Get the shared TranscriptionCache (stored alongside config.json).
+
+    Args:
+        cfg: Optional app config; reads 'transcription_cache_enabled' and 'transcription_cache_max_mb'
+    """
+    return get_shared_cache(TranscriptionCache, TRANSCRIPTION_CACHE_FILENAME, cfg,
+                            "transcription_cache_enabled", "transcription_cache_max_mb", DEFAULT_MAX_SIZE_MB)
@@ -0,0 +1,193 @@
+"""
+Translation Memory Cache for Piu Application
+
+Persistent (SQLite) translation memory shared by all translation engines
+(Google Cloud Translate, OpenAI). Consulted before any network call so that
+re-runs after a crash, repeated phrases and bilingual re-renders do not pay
+API cost and latency again.
+
+Key: engine + model + source/target language + style + normalized source text.
+"""
+
+import hashlib
+import logging
+import time
+import unicodedata
+from typing import List, Optional, Sequence
+
+from services.sqlite_lru_cache import SQLiteLRUCache, get_shared_cache
+
+# Constants
+TRANSLATION_CACHE_FILENAME = "translation_memory.sqlite3"
+DEFAULT_MAX_SIZE_MB = 200
+
+
+def normalize_source_text(text: str) -> str:
+    """Normalize source text for cache lookups (NFC, trimmed, collapsed whitespace)."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+class TranslationMemory(SQLiteLRUCache):
+    """
+    SQLite-backed translation memory with hit/miss counters,
+    size-based LRU eviction and a bypass switch.
+    """
+
+    TABLE_NAME = "translations"
+    TABLE_COLUMNS = ("engine TEXT, model TEXT, source_lang TEXT, target_lang TEXT, style TEXT,"
+                     " source_text TEXT, translated_text TEXT")
+    LOG_PREFIX = "[TranslationMemory]"
+    CACHE_NAME = "cache dịch"
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size_mb: float = DEFAULT_MAX_SIZE_MB,
+        enabled: bool = True,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Initialize Translation Memory.
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_size_mb: Disk quota; least recently used entries are evicted beyond it
+            enabled: If False, lookups always miss and nothing is stored (bypass)
+            logger: Optional logger instance
+        """
+        super().__init__(db_path, max_size_mb, enabled, logger)
+
+    @staticmethod
+    def make_key(engine: str, model: str, source_lang: Optional[str], target_lang: str,
+                 style: str, text: str) -> str:
+        """Build the cache key for one source text."""
+        parts = [
+            engine or "",
+            model or "",
+            (source_lang or "auto").lower(),
+            (target_lang or "").lower(),
+            style or "",
+            normalize_source_text(text),
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def get_many(
+        self,
+        texts: Sequence[str],
+        engine: str,
+        target_lang: str,
+        source_lang: Optional[str] = None,
+        model: str = "",
+        style: str = ""
+    ) -> List[Optional[str]]:
+        """
+        Look up translations for a list of texts.
+
+        Returns:
+            List aligned with texts: cached translation, or None on miss.
+        """
+        results: List[Optional[str]] = [None] * len(texts)
+        if not self.available or not texts:
+            return results
+
+        keys = [self.make_key(engine, model, source_lang, target_lang, style, t) for t in texts]
+        with self._lock:
+            found = self._fetch_many_locked(keys, "translated_text")
+            for i, key in enumerate(keys):
+                if key in found:
+                    results[i] = found[key]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return results
+
+    def put_many(
+        self,
+        texts: Sequence[str],
+        translations: Sequence[str],
+        engine: str,
+        target_lang: str,
+        source_lang: Optional[str] = None,
+        model: str = "",
+        style: str = ""
+    ) -> None:
+        """Store translations for a list of texts (aligned lists)."""
+        if not self.available or not texts:
+            return
+        now = time.time()
+        rows = []
+        for text, translated in zip(texts, translations):
+            if translated is None or not normalize_source_text(text):
+                continue
+            key = self.make_key(engine, model, source_lang, target_lang, style, text)
+            size = len(text.encode("utf-8")) + len(translated.encode("utf-8")) + 160
+            rows.append((key, engine, model, (source_lang or "auto"), target_lang, style,
+                         text, translated, size, now, now))
+        self._store_rows(
+            ("key", "engine", "model", "source_lang", "target_lang", "style", "source_text", "translated_text",
+             "size", "created_at", "last_used"),
+            rows
+        )
+
+
+def translate_with_memory(
+    memory: Optional[TranslationMemory],
+    texts: Sequence[str],
+    translate_fn,
+    engine: str,
+    target_lang: str,
+    source_lang: Optional[str] = None,
+    model: str = "",
+    style: str = ""
+) -> Optional[List[str]]:
+    """
+    Translate texts, sending only cache misses to translate_fn.
+
+    Args:
+        memory: TranslationMemory (None or disabled = always call translate_fn)
+        texts: Texts to translate
+        translate_fn: Callable(list_of_missing_texts) -> list or None
+        engine, target_lang, source_lang, model, style: Cache key parts
+
+    Returns:
+        Translated list aligned with texts, or None if translate_fn failed.
+    """
+    if memory is None or not memory.available:
+        return translate_fn(list(texts))
+
+    cached = memory.get_many(texts, engine, target_lang, source_lang, model, style)
+    missing_indices = [i for i, value in enumerate(cached) if value is None]
+    if not missing_indices:
+        memory.logger.info(f"[TranslationMemory] Toàn bộ {len(texts)} dòng lấy từ cache ({engine}).")
+        return list(cached)
+
+    missing_texts = [texts[i] for i in missing_indices]
+    translated_missing = translate_fn(missing_texts)
+    if translated_missing is None or len(translated_missing) != len(missing_texts):
+        return None
+
+    memory.put_many(missing_texts, translated_missing, engine, target_lang, source_lang, model, style)
+    results = list(cached)
+    for i, value in zip(missing_indices, translated_missing):
+        results[i] = value
+    if len(missing_indices) < len(texts):
+        memory.logger.info(
+            f"[TranslationMemory] {len(texts) - len(missing_indices)}/{len(texts)} dòng lấy từ cache, "
+            f"{len(missing_indices)} dòng gửi tới {engine}."
+        )
+    return results
+
+
+def get_translation_memory(cfg: Optional[dict] = None) -> TranslationMemory:
+    """
+    Get the shared TranslationMemory (stored alongside config.json).
+
+    Args:
+        cfg: Optional app config; reads 'translation_cache_enabled' and 'translation_cache_max_mb'
+    """
+    return get_shared_cache(TranslationMemory, TRANSLATION_CACHE_FILENAME, cfg,
+                            "translation_cache_enabled", "translation_cache_max_mb", DEFAULT_MAX_SIZE_MB)
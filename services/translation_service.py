@@ -0,0 +1,269 @@
+"""
+Translation Service for Piu Application
+
+This service handles batched translation of whole subtitle files.
+Business logic extracted from Piu.py (translate_subtitle_file/_translate_block).
+
+Instead of one API round trip per subtitle block, the file is parsed once,
+all text lines are packed into requests sized to each engine's limits,
+and the translated lines are reassembled back into the blocks by index.
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional, Sequence
+
+try:
+    from config.constants import TRANSLATION_BATCH_LIMITS
+except ImportError:
+    TRANSLATION_BATCH_LIMITS = {
+        "google_cloud": {"max_segments": 128, "max_chars": 5000},
+        "openai": {"max_segments": 240, "max_chars": 16000},
+    }
+
+
+def get_engine_key(selected_engine: str) -> Optional[str]:
+    """
+    Map the UI engine label (translation_engine_var) to an internal engine key.
+
+    Returns:
+        'google_cloud', 'openai', or None if the engine is not a batch engine.
+    """
+    if not selected_engine:
+        return None
+    if "Google Cloud API" in selected_engine:
+        return "google_cloud"
+    if "ChatGPT API" in selected_engine:
+        return "openai"
+    return None
+
+
+def get_batch_limits(engine_key: str) -> Dict[str, int]:
+    """Return {'max_segments', 'max_chars'} for an engine key."""
+    return dict(TRANSLATION_BATCH_LIMITS.get(engine_key, {"max_segments": 50, "max_chars": 4000}))
+
+
+def parse_subtitle_blocks(content: str) -> List[List[str]]:
+    """
+    Split SRT/VTT content into blocks of non-empty lines.
+
+    A block is a run of consecutive non-blank lines (index, timecode, text...).
+    Blocks with fewer than 3 lines (e.g. the 'WEBVTT' header) are kept as-is.
+    """
+    blocks = []
+    current = []
+    for raw_line in content.replace('\r\n', '\n').split('\n'):
+        line = raw_line.strip()
+        if not line:
+            if current:
+                blocks.append(current)
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+def build_translation_batches(
+    texts: Sequence[str],
+    max_chars: int,
+    max_segments: int
+) -> List[List[int]]:
+    """
+    Pack text indices into batches that respect the engine limits.
+
+    A single text longer than max_chars still gets its own batch
+    (the engine decides whether to accept it).
+
+    Returns:
+        List of batches, each a list of indices into texts.
+    """
+    max_segments = max(1, int(max_segments))
+    max_chars = max(1, int(max_chars))
+
+    batches = []
+    current = []
+    current_chars = 0
+    for idx, text in enumerate(texts):
+        text_len = len(text)
+        if current and (len(current) >= max_segments or current_chars + text_len > max_chars):
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(idx)
+        current_chars += text_len
+    if current:
+        batches.append(current)
+    return batches
+
+
+def translate_texts_in_batches(
+    texts: Sequence[str],
+    translate_batch_fn: Callable[[List[str]], Optional[List[str]]],
+    max_chars: int,
+    max_segments: int,
+    stop_check: Optional[Callable[[], bool]] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> List[str]:
+    """
+    Translate a list of texts with as few engine calls as possible.
+
+    Identical texts are translated once. A batch that fails (None or count
+    mismatch) falls back to the original texts of that batch only.
+
+    Args:
+        texts: Texts to translate
+        translate_batch_fn: Callable taking a list of texts, returning translated list or None
+        max_chars: Max total characters per request
+        max_segments: Max texts per request
+        stop_check: Callable returning True if processing should stop
+        progress_callback: Callable(done_batches, total_batches)
+
+    Returns:
+        Translated texts, aligned with the input list.
+
+    Raises:
+        InterruptedError: If stop_check() returns True between batches
+    """
+    log_prefix = "[TranslationService]"
+
+    # Khử trùng lặp: các câu lặp lại (ví dụ "Yeah.", "OK") chỉ dịch một lần
+    unique_texts = []
+    unique_index = {}
+    for text in texts:
+        if text not in unique_index:
+            unique_index[text] = len(unique_texts)
+            unique_texts.append(text)
+
+    batches = build_translation_batches(unique_texts, max_chars, max_segments)
+    logging.info(
+        f"{log_prefix} {len(texts)} dòng ({len(unique_texts)} dòng duy nhất) "
+        f"được đóng gói thành {len(batches)} yêu cầu (max_segments={max_segments}, max_chars={max_chars})."
+    )
+
+    translated_unique = list(unique_texts)
+    for batch_num, batch_indices in enumerate(batches, 1):
+        if stop_check and stop_check():
+            logging.warning(f"{log_prefix} Yêu cầu dừng trước batch {batch_num}/{len(batches)}.")
+            raise InterruptedError("Dừng bởi người dùng khi đang dịch file.")
+
+        batch_texts = [unique_texts[i] for i in batch_indices]
+        try:
+            batch_result = translate_batch_fn(batch_texts)
+        except InterruptedError:
+            raise
+        except Exception as e:
+            logging.error(f"{log_prefix} Lỗi khi dịch batch {batch_num}/{len(batches)}: {e}", exc_info=True)
+            batch_result = None
+
+        if batch_result is None:
+            logging.error(f"{log_prefix} Batch {batch_num}/{len(batches)} dịch thất bại. Giữ văn bản gốc cho batch này.")
+        elif len(batch_result) != len(batch_texts):
+            logging.error(
+                f"{log_prefix} Batch {batch_num}/{len(batches)}: số dòng trả về ({len(batch_result)}) "
+                f"không khớp số dòng gửi đi ({len(batch_texts)}). Giữ văn bản gốc cho batch này."
+            )
+        else:
+            for i, translated in zip(batch_indices, batch_result):
+                translated_unique[i] = translated if translated is not None else unique_texts[i]
+
+        if progress_callback:
+            try:
+                progress_callback(batch_num, len(batches))
+            except Exception:
+                pass
+
+    return [translated_unique[unique_index[text]] for text in texts]
+
+
+def render_translated_blocks(
+    blocks: Sequence[Sequence[str]],
+    translated_lines: Sequence[str],
+    bilingual: bool = False
+) -> str:
+    """
+    Rebuild subtitle content from parsed blocks and translated text lines.
+
+    Args:
+        blocks: Output of parse_subtitle_blocks()
+        translated_lines: Translated text lines, in the same order as collect_block_text_lines()
+        bilingual: If True, each original line is followed by its translation
+
+    Returns:
+        Subtitle content ending with a blank line.
+    """
+    output_blocks = []
+    cursor = 0
+    for block in blocks:
+        if len(block) < 3:
+            output_blocks.append("\n".join(block))
+            continue
+        out = [block[0], block[1]]
+        for original_line in block[2:]:
+            translated_line = translated_lines[cursor].strip()
+            cursor += 1
+            if bilingual:
+                out.append(original_line.strip())
+            out.append(translated_line)
+        output_blocks.append("\n".join(out))
+    return "\n\n".join(output_blocks).rstrip() + "\n\n"
+
+
+def collect_block_text_lines(blocks: Sequence[Sequence[str]]) -> List[str]:
+    """Return all text lines (3rd line onward) of valid blocks, in order."""
+    texts = []
+    for block in blocks:
+        if len(block) >= 3:
+            texts.extend(block[2:])
+    return texts
+
+
+def translate_subtitle_content(
+    content: str,
+    translate_batch_fn: Callable[[List[str]], Optional[List[str]]],
+    engine_key: str,
+    bilingual: bool = False,
+    stop_check: Optional[Callable[[], bool]] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    pretranslated: Optional[Dict[str, str]] = None
+) -> str:
+    """
+    Translate a whole SRT/VTT content string in batches.
+
+    Args:
+        content: Subtitle file content
+        translate_batch_fn: Engine call for a list of texts (returns list or None)
+        engine_key: 'google_cloud' or 'openai' (selects batch limits)
+        bilingual: Keep original line above each translated line
+        stop_check: Callable returning True if processing should stop
+        progress_callback: Callable(done_batches, total_batches)
+        pretranslated: Lines already translated (source line -> translation),
+            e.g. by the streaming worker of services.subtitle_pipeline; only the others are sent
+
+    Returns:
+        Translated subtitle content.
+    """
+    blocks = parse_subtitle_blocks(content)
+    texts = collect_block_text_lines(blocks)
+    logging.info(f"[TranslationService] Đã phân tích {len(blocks)} khối, {len(texts)} dòng văn bản cần dịch (engine: {engine_key}).")
+
+    pretranslated = pretranslated or {}
+    missing_texts = [text for text in texts if text not in pretranslated]
+    if pretranslated:
+        logging.info(
+            f"[TranslationService] {len(texts) - len(missing_texts)}/{len(texts)} dòng đã được dịch trước, "
+            f"còn {len(missing_texts)} dòng cần gửi."
+        )
+
+    limits = get_batch_limits(engine_key)
+    translated_missing = translate_texts_in_batches(
+        missing_texts,
+        translate_batch_fn,
+        max_chars=limits["max_chars"],
+        max_segments=limits["max_segments"],
+        stop_check=stop_check,
+        progress_callback=progress_callback,
+    ) if missing_texts else []
+    missing_iter = iter(translated_missing)
+    translated = [pretranslated[text] if text in pretranslated else next(missing_iter) for text in texts]
+    return render_translated_blocks(blocks, translated, bilingual=bilingual)
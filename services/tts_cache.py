@@ -0,0 +1,154 @@
+"""
+TTS Audio Cache for Piu Application
+
+Persistent (SQLite) content-addressed cache of synthesized speech. Re-running
+a dub, previewing a line again or retrying a batch reuses the stored audio of
+every line whose text and voice settings did not change, so editing one line
+of a long script costs one API call instead of one per line.
+
+Key: engine + voice ID + speaking rate + pitch + SSML flag + extra engine
+settings (model, language, ...) + normalized text. The stored audio is the
+raw engine output, before any post-processing.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import Dict, Optional
+
+from services.sqlite_lru_cache import SQLiteLRUCache, get_shared_cache
+
+# Constants
+TTS_CACHE_FILENAME = "tts_cache.sqlite3"
+DEFAULT_MAX_SIZE_MB = 1000
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_tts_text(text: str) -> str:
+    """Normalize text for the cache key: Unicode NFC, collapsed whitespace, stripped."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+class TTSCache(SQLiteLRUCache):
+    """
+    SQLite-backed cache of synthesized audio with hit/miss counters,
+    size-based LRU eviction and a bypass switch.
+    """
+
+    TABLE_NAME = "tts_audio"
+    TABLE_COLUMNS = "engine TEXT, voice TEXT, text_preview TEXT, data BLOB"
+    LOG_PREFIX = "[TTSCache]"
+    CACHE_NAME = "cache TTS"
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size_mb: float = DEFAULT_MAX_SIZE_MB,
+        enabled: bool = True,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Initialize TTS Cache.
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_size_mb: Disk quota; least recently used entries are evicted beyond it
+            enabled: If False, lookups always miss and nothing is stored (bypass)
+            logger: Optional logger instance
+        """
+        super().__init__(db_path, max_size_mb, enabled, logger)
+
+    @staticmethod
+    def make_key(
+        engine: str,
+        voice_id: Optional[str],
+        text: str,
+        speaking_rate: float = 1.0,
+        pitch: float = 0.0,
+        ssml: bool = False,
+        extra: Optional[Dict] = None
+    ) -> str:
+        """
+        Build the cache key for one synthesized line.
+
+        Args:
+            engine: Engine display name (e.g. "OpenAI TTS")
+            voice_id: Voice ID/name used by the engine
+            text: Text or SSML sent to the engine
+            speaking_rate: Speaking rate (1.0 = normal)
+            pitch: Pitch offset (0.0 = normal)
+            ssml: True if text is SSML
+            extra: Other settings that change the audio (model, language, ...)
+        """
+        parts = [
+            engine or "",
+            voice_id or "",
+            f"{float(speaking_rate):.3f}",
+            f"{float(pitch):.3f}",
+            "ssml" if ssml else "text",
+            json.dumps(extra or {}, sort_keys=True, default=str),
+            normalize_tts_text(text),
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def get(self, key: str, output_path: str) -> bool:
+        """
+        Look up a line and write its audio to output_path.
+
+        Returns:
+            True on hit (output_path written), False on miss.
+        """
+        if not self.available:
+            return False
+        with self._lock:
+            blob = self._fetch_many_locked([key], "data").get(key)
+            if not blob:
+                self.misses += 1
+                return False
+            self.hits += 1
+        try:
+            with open(output_path, "wb") as f:
+                f.write(blob)
+            return True
+        except Exception as e:
+            self.logger.warning(f"[TTSCache] Không thể ghi audio từ cache ra '{output_path}': {e}")
+            return False
+
+    def put(self, key: str, audio_path: str, engine: str = "", voice_id: str = "", text: str = "") -> None:
+        """Store the audio file of a synthesized line."""
+        if not self.available:
+            return
+        try:
+            with open(audio_path, "rb") as f:
+                blob = f.read()
+        except Exception as e:
+            self.logger.warning(f"[TTSCache] Không thể đọc audio để lưu cache '{audio_path}': {e}")
+            return
+        if not blob:
+            return
+        now = time.time()
+        self._store_rows(
+            ("key", "engine", "voice", "text_preview", "data", "size", "created_at", "last_used"),
+            [(key, engine, voice_id or "", normalize_tts_text(text)[:80],
+              sqlite3.Binary(blob), len(blob) + 200, now, now)]
+        )
+
+
+def get_tts_cache(cfg: Optional[dict] = None) -> TTSCache:
+    """
+    Get the shared TTSCache (stored alongside config.json).
+
+    Args:
+        cfg: Optional app config; reads 'tts_cache_enabled' and 'tts_cache_max_mb'
+    """
+    return get_shared_cache(TTSCache, TTS_CACHE_FILENAME, cfg,
+                            "tts_cache_enabled", "tts_cache_max_mb", DEFAULT_MAX_SIZE_MB)
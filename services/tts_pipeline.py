@@ -0,0 +1,201 @@
+"""
+TTS Pipeline for Piu Application
+
+Concurrent synthesis stage of the dubbing worker. Segment texts are sent to
+the TTS engine through a bounded thread pool (per-engine concurrency and
+request-rate limits), while the caller consumes the results strictly in
+script order and post-processes each segment (speed, cut, fade, timeline)
+as soon as it is ready. A segment whose synthesis fails is retried on its
+own, without holding back the others.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from utils.rate_limiter import TokenBucketRateLimiter
+
+# Constants
+APP_NAME = "Piu"
+ENGINE_OPENAI = "OpenAI TTS"
+ENGINE_GOOGLE_CLOUD = "Google Cloud TTS"
+ENGINE_GTTS = "Google Translate (gTTS)"
+ENGINE_SYSTEM = "Giọng đọc Hệ thống (Offline)"
+# Giới hạn mặc định theo engine: số request đồng thời + số request mỗi phút (None = không giới hạn)
+# - gTTS là API không chính thức, gửi dồn dập dễ bị chặn (429) nên để thấp
+# - pyttsx3 (giọng hệ thống) không an toàn khi chạy đa luồng
+ENGINE_LIMITS: Dict[str, Dict[str, Optional[float]]] = {
+    ENGINE_OPENAI: {'max_workers': 8, 'requests_per_minute': 300},
+    ENGINE_GOOGLE_CLOUD: {'max_workers': 8, 'requests_per_minute': 600},
+    ENGINE_GTTS: {'max_workers': 3, 'requests_per_minute': 60},
+    ENGINE_SYSTEM: {'max_workers': 1, 'requests_per_minute': None},
+}
+DEFAULT_ENGINE_LIMITS = {'max_workers': 4, 'requests_per_minute': None}
+# Số segment được gửi trước so với segment đang hậu xử lý = max_workers * hệ số này
+PREFETCH_FACTOR = 2
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_DELAY_S = 2.0
+
+RESULT_STOPPED = "STOPPED_BY_USER"
+
+
+def is_fatal_tts_result(result) -> bool:
+    """True for results that must not be retried: API error codes ("ERROR_...") and user stop."""
+    return isinstance(result, str) and (result == RESULT_STOPPED or "ERROR_" in result)
+
+
+def get_engine_limits(engine: str, cfg: Optional[dict] = None) -> Tuple[int, Optional[float]]:
+    """
+    Get (max_workers, requests_per_minute) for a TTS engine.
+
+    Args:
+        engine: Engine display name (e.g. "OpenAI TTS")
+        cfg: Optional app config; 'dub_tts_max_workers' and 'dub_tts_requests_per_minute'
+             override the defaults (0 = keep the engine default). The system voice
+             always runs on a single worker.
+    """
+    limits = ENGINE_LIMITS.get(engine, DEFAULT_ENGINE_LIMITS)
+    max_workers = int(limits['max_workers'])
+    requests_per_minute = limits['requests_per_minute']
+    if cfg and engine != ENGINE_SYSTEM:
+        max_workers = int(cfg.get("dub_tts_max_workers", 0) or max_workers)
+        requests_per_minute = cfg.get("dub_tts_requests_per_minute", 0) or requests_per_minute
+    return max(1, max_workers), requests_per_minute
+
+
+class ParallelTTSSynthesizer:
+    """
+    Bounded, rate-limited pool for TTS requests with in-order results.
+
+    Usage:
+        synthesizer = ParallelTTSSynthesizer(speak_fn, "OpenAI TTS", stop_check=stop_event.is_set)
+        for job_id, result in synthesizer.run(jobs):   # jobs: (job_id, text, output_path)
+            ...  # post-process job_id; results arrive in the order of jobs
+    """
+
+    def __init__(
+        self,
+        synthesize_fn: Callable[[str, str], object],
+        engine: str,
+        max_workers: Optional[int] = None,
+        requests_per_minute: Optional[float] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_delay_s: float = DEFAULT_RETRY_DELAY_S,
+        stop_check: Optional[Callable[[], bool]] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Args:
+            synthesize_fn: Engine call (text, output_path) -> True, False, "ERROR_..." or "STOPPED_BY_USER"
+            engine: Engine display name (selects default limits)
+            max_workers: Concurrent requests (default: per-engine limit)
+            requests_per_minute: Request rate limit (default: per-engine limit)
+            max_retries: Extra attempts for a segment whose synthesis failed
+            retry_delay_s: Delay before the first retry (doubled on each retry)
+            stop_check: Callable returning True if processing should stop
+            logger: Optional logger instance
+        """
+        self.logger = logger or logging.getLogger(APP_NAME)
+        default_workers, default_rpm = get_engine_limits(engine)
+        self.synthesize_fn = synthesize_fn
+        self.engine = engine
+        self.max_workers = max(1, int(max_workers or default_workers))
+        self.requests_per_minute = requests_per_minute if requests_per_minute is not None else default_rpm
+        self.max_retries = max(0, int(max_retries))
+        self.retry_delay_s = retry_delay_s
+        self.stop_check = stop_check
+        self.limiter = TokenBucketRateLimiter(requests_per_minute=self.requests_per_minute)
+
+        self.retried_segments = 0
+        self.failed_segments = 0
+        self._stats_lock = threading.Lock()
+
+    def _should_stop(self) -> bool:
+        return bool(self.stop_check and self.stop_check())
+
+    def _sleep_unless_stopped(self, seconds: float) -> bool:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if self._should_stop():
+                return False
+            time.sleep(min(0.2, max(0.0, deadline - time.monotonic())))
+        return True
+
+    def synthesize_one(self, job_id, text: str, output_path: str):
+        """
+        Synthesize one segment with rate limiting and per-segment retries.
+
+        Returns:
+            The engine result of the last attempt (exceptions count as False).
+        """
+        delay_s = self.retry_delay_s
+        result = False
+        for attempt in range(self.max_retries + 1):
+            if not self.limiter.acquire(stop_check=self.stop_check):
+                return RESULT_STOPPED
+            try:
+                result = self.synthesize_fn(text, output_path)
+            except Exception as e:
+                self.logger.error(f"[TTSPipeline] Seg {job_id}: lỗi khi gọi {self.engine}: {e}", exc_info=True)
+                result = False
+            if result and not is_fatal_tts_result(result):
+                return result
+            if is_fatal_tts_result(result) or attempt >= self.max_retries:
+                break
+            with self._stats_lock:
+                self.retried_segments += 1
+            self.logger.warning(
+                f"[TTSPipeline] Seg {job_id}: tạo TTS thất bại (lần {attempt + 1}/{self.max_retries + 1}). "
+                f"Thử lại sau {delay_s:.1f}s..."
+            )
+            if not self._sleep_unless_stopped(delay_s):
+                return RESULT_STOPPED
+            delay_s *= 2
+        if not result:
+            with self._stats_lock:
+                self.failed_segments += 1
+        return result
+
+    def run(self, jobs: Iterable[Tuple[object, str, str]]) -> Iterator[Tuple[object, object]]:
+        """
+        Synthesize jobs concurrently and yield (job_id, result) in job order.
+
+        At most max_workers * PREFETCH_FACTOR segments are in flight ahead of
+        the consumer. Closing the generator early (break, exception) cancels
+        segments that have not started yet.
+
+        Args:
+            jobs: Iterable of (job_id, text, output_path)
+        """
+        jobs_iter = iter(jobs)
+        window = self.max_workers * PREFETCH_FACTOR
+        pending = deque()
+        self.logger.info(
+            f"[TTSPipeline] Tạo TTS song song: engine={self.engine}, workers={self.max_workers}, "
+            f"rpm={self.requests_per_minute or 'không giới hạn'}"
+        )
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="DubTTS")
+        try:
+            while True:
+                while len(pending) < window and not self._should_stop():
+                    job = next(jobs_iter, None)
+                    if job is None:
+                        break
+                    job_id, text, output_path = job
+                    pending.append((job_id, executor.submit(self.synthesize_one, job_id, text, output_path)))
+                if not pending:
+                    break
+                job_id, future = pending.popleft()
+                yield job_id, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            if self.retried_segments or self.failed_segments:
+                self.logger.info(
+                    f"[TTSPipeline] Thử lại {self.retried_segments} lần, "
+                    f"{self.failed_segments} segment vẫn lỗi sau khi thử lại."
+                )
@@ -0,0 +1,223 @@
+"""
+VAD Service for Piu Application
+
+Silero VAD (voice activity detection) loaded once per process and shared by
+every task thread. The model is loaded offline whenever possible:
+1. the pip package 'silero-vad' (weights bundled with the package),
+2. a local copy of the repo (configured path or the torch hub cache),
+3. only if neither exists, a one-time torch.hub download from GitHub.
+
+Finding the first speech onset analyses a short prefix of the audio first
+and widens the window only if no speech is found there.
+"""
+
+import logging
+import os
+import sys
+import threading
+from contextlib import redirect_stdout, redirect_stderr
+from typing import Callable, List, Optional, Tuple
+
+from utils.lazy_import import lazy_import, is_module_available
+
+# Optional imports, lazy: torch chỉ được import khi load model VAD lần đầu
+HAS_TORCH = is_module_available("torch")
+torch = lazy_import("torch") if HAS_TORCH else None
+
+HAS_SILERO_VAD_PKG = is_module_available("silero_vad")
+silero_vad_pkg = lazy_import("silero_vad") if HAS_SILERO_VAD_PKG else None
+
+# Constants
+APP_NAME = "Piu"
+SAMPLE_RATE = 16000
+SILERO_HUB_REPO = "snakers4/silero-vad"
+# Thư mục repo trong torch hub cache sau lần tải đầu tiên
+SILERO_HUB_CACHE_DIRNAME = "snakers4_silero-vad_master"
+# Độ dài đoạn đầu được phân tích trước khi tìm giọng nói đầu tiên (giây)
+VAD_PREFIX_SECONDS = 60.0
+# Mỗi lần không thấy giọng nói, cửa sổ được nới rộng theo hệ số này
+VAD_WIDEN_FACTOR = 4
+# Phần chồng lấn giữa hai lần phân tích để không bỏ sót giọng nói nằm ở biên (giây)
+VAD_OVERLAP_SECONDS = 1.0
+MIN_SPEECH_DURATION_MS = 250
+
+
+class VADService:
+    """
+    Shared Silero VAD model with speech detection helpers.
+
+    The model keeps internal state between chunks, so inference calls are
+    serialised with a lock; loading happens once, on first use.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, model_path: Optional[str] = None):
+        """
+        Initialize VAD Service.
+
+        Args:
+            logger: Optional logger instance
+            model_path: Local silero-vad repo folder (hubconf.py) to load from.
+                None = pip package or torch hub cache.
+        """
+        self.logger = logger or logging.getLogger(APP_NAME)
+        self.model_path = model_path or None
+        self._model = None
+        self._get_speech_timestamps: Optional[Callable] = None
+        self._read_audio: Optional[Callable] = None
+        self.model_source: Optional[str] = None
+        self._load_lock = threading.Lock()
+        self._inference_lock = threading.Lock()
+
+    # ========================================================================
+    # MODEL LOADING
+    # ========================================================================
+
+    def is_loaded(self) -> bool:
+        """Return True if the model is loaded."""
+        return self._model is not None
+
+    def _local_repo_dirs(self) -> List[str]:
+        dirs = []
+        if self.model_path:
+            dirs.append(self.model_path)
+        if HAS_TORCH:
+            try:
+                dirs.append(os.path.join(torch.hub.get_dir(), SILERO_HUB_CACHE_DIRNAME))
+            except Exception:
+                pass
+        return [d for d in dirs if os.path.isfile(os.path.join(d, "hubconf.py"))]
+
+    def _load_from_hub(self, repo_or_dir: str, source: str):
+        # Trong GUI (pythonw) sys.stderr có thể là None -> torch.hub ghi log sẽ lỗi 'NoneType'
+        with open(os.devnull, "w", encoding="utf-8") as fnull:
+            orig_stderr = sys.stderr
+            patched_stderr = False
+            if orig_stderr is None:
+                sys.stderr = fnull
+                patched_stderr = True
+            try:
+                with redirect_stdout(fnull), redirect_stderr(fnull):
+                    return torch.hub.load(
+                        repo_or_dir=repo_or_dir, model='silero_vad', source=source,
+                        force_reload=False, trust_repo=True
+                    )
+            finally:
+                if patched_stderr:
+                    sys.stderr = orig_stderr
+
+    def load(self) -> None:
+        """
+        Load the Silero VAD model once (thread-safe, no-op if already loaded).
+
+        Raises:
+            RuntimeError: If torch is not installed
+        """
+        if self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            if not HAS_TORCH:
+                raise RuntimeError("Thư viện torch chưa được cài đặt.")
+
+            if HAS_SILERO_VAD_PKG:
+                model = silero_vad_pkg.load_silero_vad()
+                self._get_speech_timestamps = silero_vad_pkg.get_speech_timestamps
+                self._read_audio = silero_vad_pkg.read_audio
+                self.model_source = "package"
+            else:
+                local_dirs = self._local_repo_dirs()
+                if local_dirs:
+                    model, utils = self._load_from_hub(local_dirs[0], source="local")
+                    self.model_source = local_dirs[0]
+                else:
+                    self.logger.warning("[VADService] Không có bản Silero VAD cục bộ. Tải từ torch hub (một lần)...")
+                    model, utils = self._load_from_hub(SILERO_HUB_REPO, source="github")
+                    self.model_source = "github"
+                self._get_speech_timestamps, _, self._read_audio, *_ = utils
+
+            self._model = model
+            self.logger.info(f"[VADService] Đã load Silero VAD (nguồn: {self.model_source}).")
+
+    # ========================================================================
+    # SPEECH DETECTION
+    # ========================================================================
+
+    def read_audio(self, audio_path: str):
+        """Decode an audio file to a 16 kHz mono tensor with Silero's reader."""
+        self.load()
+        return self._read_audio(audio_path, sampling_rate=SAMPLE_RATE)
+
+    @staticmethod
+    def _as_tensor(audio):
+        if HAS_TORCH and not isinstance(audio, torch.Tensor):
+            return torch.from_numpy(audio)
+        return audio
+
+    def _speech_timestamps(self, audio, min_speech_duration_ms: int, **kwargs) -> List[dict]:
+        self.load()
+        with self._inference_lock:
+            return self._get_speech_timestamps(
+                self._as_tensor(audio), self._model,
+                sampling_rate=SAMPLE_RATE,
+                min_speech_duration_ms=min_speech_duration_ms,
+                **kwargs
+            )
+
+    def get_speech_regions(
+        self,
+        audio,
+        min_speech_duration_ms: int = MIN_SPEECH_DURATION_MS,
+        **kwargs
+    ) -> List[Tuple[float, float]]:
+        """
+        Detect every speech region of an audio buffer.
+
+        Args:
+            audio: 16 kHz mono float32 samples (numpy array or torch tensor)
+            min_speech_duration_ms: Shorter speech bursts are ignored
+            **kwargs: Extra get_speech_timestamps options (threshold, min_silence_duration_ms, ...)
+
+        Returns:
+            List of (start_s, end_s) in seconds, in order.
+        """
+        timestamps = self._speech_timestamps(audio, min_speech_duration_ms, **kwargs)
+        return [(ts['start'] / SAMPLE_RATE, ts['end'] / SAMPLE_RATE) for ts in timestamps]
+
+    def find_first_speech(
+        self,
+        audio,
+        prefix_seconds: float = VAD_PREFIX_SECONDS,
+        min_speech_duration_ms: int = MIN_SPEECH_DURATION_MS
+    ) -> Optional[float]:
+        """
+        Find the start of the first speech region.
+
+        Only the first prefix_seconds are analysed; if they contain no speech the
+        window grows (x VAD_WIDEN_FACTOR) over the rest of the audio.
+
+        Args:
+            audio: 16 kHz mono float32 samples (numpy array or torch tensor)
+            prefix_seconds: Length of the first analysed window
+            min_speech_duration_ms: Shorter speech bursts are ignored
+
+        Returns:
+            Onset in seconds, or None if the audio contains no speech.
+        """
+        total = len(audio)
+        overlap = int(VAD_OVERLAP_SECONDS * SAMPLE_RATE)
+        window_end = min(total, max(1, int(prefix_seconds * SAMPLE_RATE)))
+        analysed_end = 0
+        while analysed_end < total:
+            start = max(0, analysed_end - overlap)
+            timestamps = self._speech_timestamps(audio[start:window_end], min_speech_duration_ms)
+            if timestamps:
+                return (start + timestamps[0]['start']) / SAMPLE_RATE
+            analysed_end = window_end
+            window_end = min(total, window_end * VAD_WIDEN_FACTOR)
+            if analysed_end < total:
+                self.logger.debug(
+                    f"[VADService] Không có giọng nói trong {analysed_end / SAMPLE_RATE:.0f}s đầu, "
+                    f"nới rộng tới {window_end / SAMPLE_RATE:.0f}s."
+                )
+        return None
@@ -0,0 +1,220 @@
+"""
+Whisper Backends for Piu Application
+
+ModelService talks to the speech-recognition engine through a small backend
+interface so the engine can be swapped without touching the rest of the
+pipeline:
+
+- OpenAIWhisperBackend: the reference 'openai-whisper' package (PyTorch).
+- FasterWhisperBackend: 'faster-whisper' (CTranslate2) with quantized
+  compute types (int8, int8_float16, ...), several times faster and
+  lighter on CPU.
+
+Every backend returns models whose transcribe(audio, **options) produces the
+openai-whisper result shape ({'text', 'segments', 'language'}), which is what
+write_srt/write_vtt and the rest of ModelService consume.
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from utils.lazy_import import lazy_import, is_module_available
+
+# Optional imports, lazy: whisper/faster-whisper (và torch) chỉ được import khi tải model lần đầu
+HAS_WHISPER = is_module_available("whisper")
+whisper = lazy_import("whisper") if HAS_WHISPER else None
+
+HAS_FASTER_WHISPER = is_module_available("faster_whisper")
+faster_whisper = lazy_import("faster_whisper") if HAS_FASTER_WHISPER else None
+
+# Constants
+APP_NAME = "Piu"
+BACKEND_OPENAI_WHISPER = "openai-whisper"
+BACKEND_FASTER_WHISPER = "faster-whisper"
+FASTER_WHISPER_COMPUTE_TYPES = ("int8", "int8_float16", "int8_float32", "float16", "float32", "default")
+DEFAULT_COMPUTE_TYPE = "int8"
+# Số byte mỗi tham số theo kiểu tính toán (ước tính RAM cho residency cache)
+_BYTES_PER_PARAM = {
+    "int8": 1, "int8_float16": 1, "int8_float32": 1, "float16": 2, "float32": 4, "default": 4,
+}
+# Tùy chọn transcribe của openai-whisper -> tên tham số tương ứng của faster-whisper
+_FASTER_WHISPER_OPTION_NAMES = {
+    'language': 'language',
+    'task': 'task',
+    'beam_size': 'beam_size',
+    'best_of': 'best_of',
+    'patience': 'patience',
+    'temperature': 'temperature',
+    'compression_ratio_threshold': 'compression_ratio_threshold',
+    'logprob_threshold': 'log_prob_threshold',
+    'no_speech_threshold': 'no_speech_threshold',
+    'condition_on_previous_text': 'condition_on_previous_text',
+    'initial_prompt': 'initial_prompt',
+    'word_timestamps': 'word_timestamps',
+    'prepend_punctuations': 'prepend_punctuations',
+    'append_punctuations': 'append_punctuations',
+    'suppress_tokens': 'suppress_tokens',
+}
+
+
+class WhisperBackend(ABC):
+    """Interface of a speech-recognition backend used by ModelService."""
+
+    name = ""
+    # Dùng để ước tính bộ nhớ model (xem ModelService.estimate_model_size_mb)
+    bytes_per_param = 4
+
+    @abstractmethod
+    def is_available(self) -> bool:
+        """Return True if the backend's library is installed."""
+
+    @abstractmethod
+    def load_model(self, model_name: str, device: str):
+        """Load model_name on device; the returned object has transcribe(audio, **options) -> dict."""
+
+    @abstractmethod
+    def load_audio(self, audio_path: str):
+        """Decode audio_path to 16 kHz mono float32 samples."""
+
+    def describe(self) -> str:
+        """Short label for logs."""
+        return self.name
+
+
+class OpenAIWhisperBackend(WhisperBackend):
+    """Reference openai-whisper (PyTorch) backend."""
+
+    name = BACKEND_OPENAI_WHISPER
+
+    def is_available(self) -> bool:
+        return HAS_WHISPER and whisper is not None
+
+    def load_model(self, model_name: str, device: str):
+        return whisper.load_model(model_name, device=device)
+
+    def load_audio(self, audio_path: str):
+        return whisper.load_audio(audio_path)
+
+
+class FasterWhisperModel:
+    """Adapter giving a faster_whisper.WhisperModel the openai-whisper transcribe() interface."""
+
+    def __init__(self, model, compute_type: str, logger: Optional[logging.Logger] = None):
+        self.model = model
+        self.compute_type = compute_type
+        self.logger = logger or logging.getLogger(APP_NAME)
+
+    def _convert_options(self, options: Dict) -> Dict:
+        converted = {}
+        for key, value in options.items():
+            target = _FASTER_WHISPER_OPTION_NAMES.get(key)
+            if target is not None:
+                converted[target] = value
+            elif key not in ('fp16', 'verbose'):
+                self.logger.debug(f"[FasterWhisper] Bỏ qua tùy chọn không hỗ trợ: {key}")
+        if isinstance(converted.get('temperature'), list):
+            converted['temperature'] = tuple(converted['temperature'])
+        return converted
+
+    def transcribe(self, audio, **options) -> Dict:
+        """
+        Transcribe a file path or 16 kHz mono float32 array.
+
+        Returns:
+            openai-whisper shaped result: {'text', 'segments', 'language'}
+        """
+        segments_iter, info = self.model.transcribe(audio, **self._convert_options(options))
+        segments: List[Dict] = []
+        # faster-whisper trả về generator: việc giải mã thực sự diễn ra khi duyệt
+        for i, seg in enumerate(segments_iter):
+            segment = {
+                'id': i,
+                'seek': getattr(seg, 'seek', 0),
+                'start': float(seg.start),
+                'end': float(seg.end),
+                'text': seg.text,
+                'tokens': list(getattr(seg, 'tokens', None) or []),
+                'temperature': getattr(seg, 'temperature', 0.0),
+                'avg_logprob': getattr(seg, 'avg_logprob', 0.0),
+                'compression_ratio': getattr(seg, 'compression_ratio', 0.0),
+                'no_speech_prob': getattr(seg, 'no_speech_prob', 0.0),
+            }
+            if getattr(seg, 'words', None):
+                segment['words'] = [
+                    {'word': w.word, 'start': float(w.start), 'end': float(w.end), 'probability': w.probability}
+                    for w in seg.words
+                ]
+            segments.append(segment)
+        return {
+            'text': "".join(seg['text'] for seg in segments),
+            'segments': segments,
+            'language': getattr(info, 'language', None),
+        }
+
+
+class FasterWhisperBackend(WhisperBackend):
+    """faster-whisper (CTranslate2) backend with quantized compute types."""
+
+    name = BACKEND_FASTER_WHISPER
+
+    def __init__(self, compute_type: str = DEFAULT_COMPUTE_TYPE, cpu_threads: int = 0,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            compute_type: CTranslate2 compute type ('int8', 'int8_float16', 'float16', ...)
+            cpu_threads: Threads used on CPU (0 = CTranslate2 default)
+            logger: Optional logger instance
+        """
+        if compute_type not in FASTER_WHISPER_COMPUTE_TYPES:
+            raise ValueError(f"Compute type không hợp lệ: {compute_type}")
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.logger = logger or logging.getLogger(APP_NAME)
+        self.bytes_per_param = _BYTES_PER_PARAM.get(compute_type, 4)
+
+    def is_available(self) -> bool:
+        return HAS_FASTER_WHISPER and faster_whisper is not None
+
+    def compute_type_for_device(self, device: str) -> str:
+        """CPU has no float16 kernels: int8_float16 -> int8, float16 -> float32."""
+        if device == "cpu":
+            return {"int8_float16": "int8", "float16": "float32"}.get(self.compute_type, self.compute_type)
+        return self.compute_type
+
+    def load_model(self, model_name: str, device: str):
+        compute_type = self.compute_type_for_device(device)
+        model = faster_whisper.WhisperModel(
+            model_name, device=device, compute_type=compute_type, cpu_threads=self.cpu_threads
+        )
+        return FasterWhisperModel(model, compute_type, self.logger)
+
+    def load_audio(self, audio_path: str):
+        return faster_whisper.decode_audio(audio_path, sampling_rate=16000)
+
+    def describe(self) -> str:
+        return f"{self.name} ({self.compute_type})"
+
+
+def create_whisper_backend(
+    name: Optional[str] = None,
+    compute_type: Optional[str] = None,
+    logger: Optional[logging.Logger] = None
+) -> WhisperBackend:
+    """
+    Create the configured backend, falling back to openai-whisper if it is not installed.
+
+    Args:
+        name: 'openai-whisper' (default) or 'faster-whisper'
+        compute_type: faster-whisper compute type (default 'int8')
+        logger: Optional logger instance
+    """
+    logger = logger or logging.getLogger(APP_NAME)
+    if name == BACKEND_FASTER_WHISPER:
+        backend = FasterWhisperBackend(compute_type or DEFAULT_COMPUTE_TYPE, logger=logger)
+        if backend.is_available():
+            return backend
+        logger.warning("[WhisperBackend] Thư viện faster-whisper chưa được cài đặt. Dùng openai-whisper.")
+    elif name and name != BACKEND_OPENAI_WHISPER:
+        logger.warning(f"[WhisperBackend] Backend không xác định '{name}'. Dùng openai-whisper.")
+    return OpenAIWhisperBackend()
@@ -9,23 +9,33 @@ import time
 import logging
 import shutil
 from typing import Tuple, Optional
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import (
-    TimeoutException,
-    ElementClickInterceptedException,
-    StaleElementReferenceException,
-    WebDriverException,
-    NoSuchWindowException
-)
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from config.settings import get_config_path
+from utils.lazy_import import lazy_import, lazy_import_attr, is_module_available
+
+# Selenium chỉ được import khi bắt đầu upload bằng trình duyệt, không phải lúc khởi động.
+# Exception dùng trong 'except' phải lấy qua selenium_exceptions.<Tên> (module proxy).
+HAS_SELENIUM = is_module_available("selenium")
+webdriver = lazy_import("selenium.webdriver")
+selenium_exceptions = lazy_import("selenium.common.exceptions")
+EC = lazy_import("selenium.webdriver.support.expected_conditions")
+Keys = lazy_import_attr("selenium.webdriver.common.keys", "Keys")
+ActionChains = lazy_import_attr("selenium.webdriver.common.action_chains", "ActionChains")
+WebDriverWait = lazy_import_attr("selenium.webdriver.support.ui", "WebDriverWait")
+Service = lazy_import_attr("selenium.webdriver.chrome.service", "Service")
+Options = lazy_import_attr("selenium.webdriver.chrome.options", "Options")
+ChromeDriverManager = lazy_import_attr("webdriver_manager.chrome", "ChromeDriverManager")
+
+
+class By:
+    """Locator strategies, same values as selenium.webdriver.common.by.By (usable without importing Selenium)."""
+    ID = "id"
+    XPATH = "xpath"
+    LINK_TEXT = "link text"
+    PARTIAL_LINK_TEXT = "partial link text"
+    NAME = "name"
+    TAG_NAME = "tag name"
+    CLASS_NAME = "class name"
+    CSS_SELECTOR = "css selector"
 
 
 # YouTube Locators (moved from Piu.py to here for reusability)
@@ -104,7 +114,8 @@ def click_with_fallback(driver, locator, timeout=10, human_delay_s=0.5):
                 logging.info(f"  -> ✅ Lớp 1 (Click thường) thành công vào locator: {locator}")
                 time.sleep(human_delay_s)
                 return clickable_element  # <--- TRẢ VỀ ELEMENT
-            except (ElementClickInterceptedException, TimeoutException, StaleElementReferenceException):
+            except (selenium_exceptions.ElementClickInterceptedException, selenium_exceptions.TimeoutException,
+                    selenium_exceptions.StaleElementReferenceException):
                 logging.warning(f"  -> ⚠️ Lớp 1 (Click thường) vào {locator} bị chặn/timeout. Chuyển sang Lớp 2...")
             
             try:
@@ -126,7 +137,7 @@ def click_with_fallback(driver, locator, timeout=10, human_delay_s=0.5):
                 logging.error(f"  -> ❌ Lớp 3 (JavaScript) vào {locator} cũng thất bại! Không còn phương án nào khác.")
                 raise e_js
 
-        except StaleElementReferenceException:
+        except selenium_exceptions.StaleElementReferenceException:
             logging.warning(f"  -> Gặp StaleElementReferenceException với {locator}. Đang thử lại lần {i+1}/2...")
             if i == 1:
                 logging.error(f"  -> Thử lại lần 2 vẫn gặp StaleElementReferenceException. Bỏ cuộc.")
@@ -139,7 +150,7 @@ def click_with_fallback(driver, locator, timeout=10, human_delay_s=0.5):
             raise e_other
 
 
-def create_chrome_options(chrome_portable_exe_path: str, headless: bool, user_data_dir: str) -> Options:
+def create_chrome_options(chrome_portable_exe_path: str, headless: bool, user_data_dir: str) -> "Options":
     """
     Create and configure Chrome options for browser automation.
     
@@ -204,7 +215,7 @@ def init_chrome_driver(
     headless: bool,
     max_retries: int = 3,
     retry_delay: int = 5
-) -> Tuple[Optional[webdriver.Chrome], Optional[Service], str]:
+) -> Tuple[Optional["webdriver.Chrome"], Optional["Service"], str]:
     """
     Initialize Chrome WebDriver with retry logic.
     
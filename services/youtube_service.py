@@ -14,16 +14,6 @@ import logging
 import uuid
 from typing import Optional, List, Dict, Callable, Tuple, Any
 
-# Selenium imports (optional)
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service
-    HAS_SELENIUM = True
-except ImportError:
-    webdriver = None
-    Service = None
-    HAS_SELENIUM = False
-
 # Import existing YouTube services
 try:
     from services.youtube_upload_service import (
@@ -44,13 +34,16 @@ except ImportError:
     logging.warning("YouTube API upload service not available")
 
 try:
+    # Selenium được import lười bên trong service này (khi khởi tạo WebDriver)
     from services.youtube_browser_upload_service import (
         init_chrome_driver,
-        YOUTUBE_LOCATORS
+        YOUTUBE_LOCATORS,
+        HAS_SELENIUM
     )
 except ImportError:
     init_chrome_driver = None
     YOUTUBE_LOCATORS = None
+    HAS_SELENIUM = False
     logging.warning("YouTube browser upload service not available")
 
 # Constants
@@ -372,7 +365,7 @@ class YouTubeService:
         
         This is a wrapper around init_chrome_driver from youtube_browser_upload_service.
         """
-        if init_chrome_driver is None:
+        if init_chrome_driver is None or not HAS_SELENIUM:
             self.logger.warning("[YouTubeService] Browser upload service not available")
             return None, None, ""
         
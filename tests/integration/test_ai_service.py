@@ -98,3 +98,61 @@ class TestAIServiceErrorHandling:
         assert error is not None
         assert "API Key" in error
 
+
+
+class TestAIServiceBatchTranslation:
+    """Test context-window batch translation (JSON id/text protocol)"""
+    
+    def test_parse_batch_response(self):
+        """Test JSON (with code fences) and numbered-list answers are accepted"""
+        from services.ai_service import parse_batch_translation_response
+        
+        fenced = '```json\n{"translations": [{"id": 1, "text": "Xin chào"}, {"id": 2, "text": "Tạm biệt"}]}\n```'
+        assert parse_batch_translation_response(fenced, [1, 2]) == {1: "Xin chào", 2: "Tạm biệt"}
+        assert parse_batch_translation_response("1. Xin chào\n2. Tạm biệt", [1, 2]) == {1: "Xin chào", 2: "Tạm biệt"}
+    
+    def test_parse_batch_response_mismatch(self):
+        """Test missing or duplicated IDs are rejected"""
+        from services.ai_service import parse_batch_translation_response
+        
+        with pytest.raises(ValueError):
+            parse_batch_translation_response('{"translations": [{"id": 1, "text": "a"}]}', [1, 2])
+        with pytest.raises(ValueError):
+            parse_batch_translation_response('[{"id": 1, "text": "a"}, {"id": 1, "text": "b"}]', [1, 2])
+    
+    def test_failing_batch_is_bisected(self, mock_logger):
+        """Test a batch whose answer drops lines is split until every line is translated"""
+        import json
+        from types import SimpleNamespace
+        from services.ai_service import AIService
+        from utils.rate_limiter import TokenBucketRateLimiter
+        
+        batch_sizes = []
+        
+        def create(model, messages, temperature, max_tokens):
+            if messages[0]["role"] == "system":
+                items = json.loads(messages[1]["content"])["items"]
+                batch_sizes.append(len(items))
+                # Mô phỏng model gộp dòng khi batch lớn hơn 2
+                if len(items) > 2:
+                    items = items[:-1]
+                content = json.dumps({"translations": [{"id": it["id"], "text": it["text"].upper()} for it in items]})
+            else:
+                content = "SINGLE"
+            return SimpleNamespace(choices=[SimpleNamespace(finish_reason="stop", message=SimpleNamespace(content=content))])
+        
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        service = AIService(logger=mock_logger)
+        text_list = ["a", "b", "c", "d", "e"]
+        translated, newly = [None] * 5, {}
+        
+        service._translate_in_context_batches(
+            client, "gpt-test", text_list, list(range(5)), "English", "vi", "in a neutral style",
+            lambda text: text, batch_size=10, batch_max_chars=1000, max_workers=1,
+            limiter=TokenBucketRateLimiter(), stop_event=None,
+            translated_texts=translated, newly_translated=newly
+        )
+        
+        assert translated == ["A", "B", "SINGLE", "D", "E"]
+        assert batch_sizes[0] == 5
+        assert sorted(newly) == [0, 1, 2, 3, 4]
@@ -0,0 +1,97 @@
+"""
+Integration tests for the decode-once shared audio buffer
+"""
+import pytest
+import sys
+import os
+import shutil
+import subprocess
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+np = pytest.importorskip("numpy")
+
+
+class TestDecodedAudio:
+    """Test the .npy buffer layout and sample slicing"""
+
+    def test_header_rewrite_gives_loadable_npy(self, temp_dir):
+        """Test placeholder header + raw f32le samples load as a float32 array"""
+        from services.audio_decode_service import NPY_HEADER_SIZE, _write_npy_header
+
+        samples = np.arange(1000, dtype=np.float32)
+        npy_path = os.path.join(temp_dir, "audio.npy")
+        with open(npy_path, "wb") as f:
+            f.write(b"\x00" * NPY_HEADER_SIZE)
+            f.write(samples.tobytes())
+            _write_npy_header(f, len(samples))
+
+        loaded = np.load(npy_path, mmap_mode="c")
+        assert loaded.dtype == np.float32
+        assert np.array_equal(loaded, samples)
+
+    def test_slice_seconds_is_a_view(self, temp_dir):
+        """Test slicing by seconds returns the right samples without copying"""
+        from services.audio_decode_service import DecodedAudio, SAMPLE_RATE
+
+        audio = np.zeros(SAMPLE_RATE * 3, dtype=np.float32)
+        decoded = DecodedAudio("in.wav", "in.npy", audio)
+
+        part = decoded.slice_seconds(1.0, 2.5)
+        assert decoded.duration_s == pytest.approx(3.0)
+        assert len(part) == int(SAMPLE_RATE * 1.5)
+        assert np.shares_memory(part, audio)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_decode_audio_once_reuses_buffer(temp_dir):
+    """Test a file is decoded once per cache folder and released with it"""
+    from services.audio_decode_service import decode_audio_once, release_decoded_audio
+
+    media_path = os.path.join(temp_dir, "tone.wav")
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=2",
+         "-ar", "44100", media_path],
+        check=True
+    )
+    cache_dir = os.path.join(temp_dir, "decoded")
+
+    first = decode_audio_once(media_path, cache_dir)
+    second = decode_audio_once(media_path, cache_dir)
+
+    assert first is second
+    assert first.audio.dtype == np.float32
+    assert first.duration_s == pytest.approx(2.0, abs=0.05)
+
+    first = second = None
+    release_decoded_audio(cache_dir)
+    assert not os.path.exists(cache_dir)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="fake ffmpeg is a POSIX script")
+def test_decode_with_chatty_stderr_does_not_deadlock(temp_dir, monkeypatch):
+    """Test ffmpeg writing more than a pipe buffer to stderr still finishes"""
+    import threading
+    import services.audio_decode_service as decode_module
+
+    fake_ffmpeg = os.path.join(temp_dir, "ffmpeg")
+    with open(fake_ffmpeg, "w", encoding="utf-8") as f:
+        f.write(
+            f"#!{sys.executable}\n"
+            "import sys\n"
+            "sys.stderr.write('lỗi giải mã\\n' * 200000)\n"
+            "sys.stderr.flush()\n"
+            "sys.stdout.buffer.write(b'\\x00' * 16000 * 4)\n"
+        )
+    os.chmod(fake_ffmpeg, 0o755)
+    monkeypatch.setattr(decode_module, "find_ffmpeg", lambda: fake_ffmpeg)
+
+    npy_path = os.path.join(temp_dir, "out.npy")
+    worker = threading.Thread(target=decode_module._decode_to_npy, args=("in.wav", npy_path), daemon=True)
+    worker.start()
+    worker.join(10)
+
+    assert not worker.is_alive()
+    assert np.load(npy_path).shape == (16000,)
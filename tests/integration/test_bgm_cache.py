@@ -0,0 +1,85 @@
+"""
+Integration tests for the normalized BGM asset cache and music bed builder
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+np = pytest.importorskip("numpy")
+
+SR = 22050
+
+
+def write_tone(path, seconds, amplitude, freq=440.0, sr=SR):
+    from services.dub_audio_engine import write_wav
+
+    t = np.arange(int(seconds * sr)) / float(sr)
+    write_wav(path, np.repeat((amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)[:, None], 2, axis=1), sr)
+    return path
+
+
+@pytest.fixture
+def bgm_cache(temp_dir, mock_logger):
+    from services.bgm_cache import BGMCache
+
+    return BGMCache(os.path.join(temp_dir, "bgm_cache"), logger=mock_logger)
+
+
+class TestBGMCache:
+    """Test preparation, reuse and bed building"""
+
+    def test_prepare_once_per_source(self, bgm_cache, temp_dir):
+        """Test a library file is normalized on first use and reused afterwards"""
+        source = write_tone(os.path.join(temp_dir, "song.wav"), 4.0, 0.05)
+
+        first = bgm_cache.prepare(source, SR, 2, target_lufs=-20.0)
+        second = bgm_cache.prepare(source, SR, 2, target_lufs=-20.0)
+
+        assert first['path'] == second['path']
+        assert bgm_cache.get_stats()['hits'] == 1 and bgm_cache.get_stats()['misses'] == 1
+        assert first['stats']['integrated_lufs'] < -25.0
+        assert first['gain_db'] > 0
+
+        from services.dub_audio_engine import read_wav
+        from services.loudness_analysis import measure_loudness
+        samples, rate = read_wav(first['path'])
+        assert rate == SR
+        assert measure_loudness(samples, rate)['integrated_lufs'] == pytest.approx(-20.0, abs=0.2)
+
+    def test_key_follows_content_and_format(self, bgm_cache, temp_dir):
+        """Test a changed file or another target format is prepared again"""
+        source = write_tone(os.path.join(temp_dir, "song.wav"), 2.0, 0.05)
+        first = bgm_cache.prepare(source, SR, 2)
+
+        assert bgm_cache.prepare(source, SR, 1)['key'] != first['key']
+        write_tone(source, 2.0, 0.05, freq=330.0)
+        assert bgm_cache.prepare(source, SR, 2)['key'] != first['key']
+        assert bgm_cache.get_stats()['misses'] == 3
+
+    def test_gain_respects_true_peak(self, bgm_cache, temp_dir):
+        """Test a loud target is capped below the true peak limit"""
+        source = write_tone(os.path.join(temp_dir, "song.wav"), 2.0, 0.05)
+
+        prepared = bgm_cache.prepare(source, SR, 2, target_lufs=0.0, true_peak_db=-1.5)
+
+        assert prepared['stats']['true_peak_db'] + prepared['gain_db'] == pytest.approx(-1.5, abs=0.01)
+
+    def test_bed_loops_crossfades_and_fades(self, bgm_cache, temp_dir):
+        """Test the bed has the exact length, loops the tracks and fades in/out"""
+        from services.bgm_cache import build_bgm_bed
+        from services.dub_audio_engine import read_wav
+
+        tracks = [bgm_cache.prepare(write_tone(os.path.join(temp_dir, f"song_{i}.wav"), 3.0, 0.1, freq=f), SR, 2)['path']
+                  for i, f in enumerate((440.0, 660.0))]
+        bed_path = os.path.join(temp_dir, "bed.wav")
+
+        assert build_bgm_bed(tracks, bed_path, 10.0, fade_in_s=0.5, fade_out_s=1.0, crossfade_s=0.5) == pytest.approx(10.0)
+
+        bed, rate = read_wav(bed_path)
+        assert len(bed) == 10 * SR
+        assert np.abs(bed[:10]).max() < 0.01 and np.abs(bed[-10:]).max() < 0.01
+        assert np.abs(bed[int(4.5 * SR):int(5.5 * SR)]).max() > 0.05  # Vòng lặp thứ hai (không im lặng)
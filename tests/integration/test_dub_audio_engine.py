@@ -0,0 +1,132 @@
+"""
+Integration tests for the in-process NumPy dub audio engine
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+np = pytest.importorskip("numpy")
+
+SR = 44100
+
+
+def tone(seconds, freq=220.0, channels=2, sr=SR):
+    t = np.arange(int(seconds * sr)) / float(sr)
+    return np.repeat((0.5 * np.sin(2 * np.pi * freq * t)).astype(np.float32)[:, None], channels, axis=1)
+
+
+def dominant_frequency(samples, sr=SR):
+    spectrum = np.abs(np.fft.rfft(samples[:, 0] * np.hanning(len(samples))))
+    return np.argmax(spectrum) * sr / float(len(samples))
+
+
+class TestDubAudioEngine:
+    """Test time-stretch, fades, WAV I/O and the timeline mixer"""
+
+    @pytest.mark.parametrize("speed", [0.7, 1.25, 2.0])
+    def test_time_stretch_keeps_pitch(self, speed):
+        """Test WSOLA changes the duration but not the pitch or level"""
+        from services.dub_audio_engine import time_stretch
+
+        stretched = time_stretch(tone(2.0), SR, speed)
+
+        assert len(stretched) == int(round(2.0 * SR / speed))
+        assert abs(dominant_frequency(stretched) - 220.0) < 2.0
+        rms = np.sqrt(np.mean(stretched[2000:-2000, 0] ** 2))
+        assert abs(rms - 0.5 / np.sqrt(2)) < 0.02
+
+    def test_fade_rules_match_ffmpeg_step(self):
+        """Test linear fades, and short segments left unchanged"""
+        from services.dub_audio_engine import apply_fade
+
+        ones = np.ones((SR, 2), dtype=np.float32)
+        faded = apply_fade(ones, SR, 0.1, 0.2)
+
+        assert faded[0, 0] == 0.0
+        assert faded[int(0.05 * SR), 0] == pytest.approx(0.5, abs=0.01)
+        assert faded[int(0.5 * SR), 0] == 1.0
+        assert faded[-1, 0] == pytest.approx(0.0, abs=0.001)
+        short = ones[:int(0.2 * SR)]
+        assert apply_fade(short, SR, 0.1, 0.2) is short
+
+    def test_wav_roundtrip_with_resample(self, temp_dir):
+        """Test a mono 22.05 kHz PCM WAV loads as stereo 44.1 kHz without ffmpeg"""
+        from services.dub_audio_engine import write_wav, load_audio
+
+        path = os.path.join(temp_dir, "rawtts_0001.wav")
+        write_wav(path, tone(1.0, channels=1, sr=22050), 22050)
+
+        loaded = load_audio(path, SR, 2)
+
+        assert loaded.shape == (SR, 2)
+        assert abs(dominant_frequency(loaded) - 220.0) < 2.0
+
+    def test_mixer_places_segments_sample_exact(self, temp_dir, mock_logger):
+        """Test segments land at their start frame, gaps are silent and the track is padded"""
+        from services.dub_audio_engine import TimelineMixer, read_wav
+
+        path = os.path.join(temp_dir, "dub_tts_intermediate_all.wav")
+        mixer = TimelineMixer(path, SR, 2, expected_ms=1000, logger=mock_logger)
+        mixer.place(250.5, tone(0.5))
+        start_ms, end_ms = mixer.place(5000, tone(0.5))
+        mixer.close(total_ms=12000)
+        mixer.close()
+
+        samples, rate = read_wav(path)
+        first = int(round(250.5 * SR / 1000.0))
+        assert rate == SR and samples.shape == (12 * SR, 2)
+        assert np.abs(samples[:first]).max() == 0.0
+        assert np.abs(samples[first + 1:first + 100]).max() > 0.0
+        assert np.abs(samples[first + SR // 2:5 * SR]).max() == 0.0
+        assert (start_ms, end_ms) == (5000.0, 5500.0)
+        assert len(mixer) == 2
+
+    @pytest.mark.parametrize("policy,expected_second_start,expected_end", [
+        ("shift", 1000.0, 2000.0), ("mix", 500.0, 1500.0), ("truncate", 500.0, 1500.0),
+    ])
+    def test_mixer_overlap_policies(self, temp_dir, mock_logger, policy, expected_second_start, expected_end):
+        """Test an overlapping segment is shifted, summed or cuts the previous one"""
+        from services.dub_audio_engine import TimelineMixer, read_wav
+
+        path = os.path.join(temp_dir, f"{policy}.wav")
+        mixer = TimelineMixer(path, SR, 1, overlap_policy=policy, logger=mock_logger)
+        mixer.place(0, np.full((SR, 1), 0.25, dtype=np.float32))
+        start_ms, end_ms = mixer.place(500, np.full((SR, 1), 0.5, dtype=np.float32))
+        mixer.close()
+
+        samples, _ = read_wav(path)
+        overlap_value = samples[int(0.75 * SR), 0]
+        assert (start_ms, end_ms) == (expected_second_start, expected_end)
+        assert len(samples) == int(expected_end * SR / 1000.0)
+        assert overlap_value == pytest.approx({"shift": 0.25, "mix": 0.75, "truncate": 0.5}[policy], abs=0.001)
+        assert mixer.overlaps == 1
+
+
+@pytest.mark.parametrize("policy,expected", [
+    ("shift", [(0.0, 1000.0), (1000.0, 1000.0), (3000.0, 500.0)]),
+    ("mix", [(0.0, 1000.0), (500.0, 1000.0), (3000.0, 500.0)]),
+    ("truncate", [(0.0, 500.0), (500.0, 1000.0), (3000.0, 500.0)]),
+])
+def test_resolve_overlaps(policy, expected):
+    """Test the FFmpeg renderer uses the same overlap rules as the mixer"""
+    from services.dub_audio_engine import resolve_overlaps
+
+    assert resolve_overlaps([(0, 1000), (500, 1000), (3000, 500)], policy) == expected
+    with pytest.raises(ValueError):
+        resolve_overlaps([(0, 1000)], "random")
+
+
+def test_mix_filter_script_single_graph():
+    """Test one adelay per input (in samples), one amix and exact output length"""
+    from services.dub_audio_engine import build_mix_filter_script
+
+    script = build_mix_filter_script([(0, 0.0, None), (1, 1500.0, 250.0)], SR, 2, 3000)
+
+    assert "[0:a]aresample=44100,aformat=sample_fmts=fltp:channel_layouts=stereo[p0]" in script
+    assert "atrim=end_sample=11025,adelay=delays=66150S|66150S[p1]" in script
+    assert script.count("amix=") == 1 and "amix=inputs=2" in script
+    assert script.endswith("apad=whole_len=132300,atrim=end_sample=132300[out]")
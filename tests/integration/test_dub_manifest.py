@@ -0,0 +1,91 @@
+"""
+Integration tests for the incremental re-dub segment manifest
+"""
+import pytest
+import sys
+import os
+import time
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+SETTINGS = {'engine': "OpenAI TTS", 'voice': "nova", 'fade': [0.05, 0.03]}
+
+
+def segment_fp(text, target_ms=2000.0, **overrides):
+    from services.dub_manifest import DubManifest
+
+    return DubManifest.fingerprint(dict(SETTINGS, text=text, target_ms=target_ms, **overrides))
+
+
+def write_audio(path, payload=b"RIFF-fake-wav"):
+    with open(path, "wb") as f:
+        f.write(payload)
+    return path
+
+
+@pytest.fixture
+def manifest_root(temp_dir):
+    return os.path.join(temp_dir, "dub_manifests")
+
+
+class TestDubManifest:
+    """Test the per-video segment diff across runs"""
+
+    def test_rerun_reuses_unchanged_segments_only(self, manifest_root, temp_dir, mock_logger):
+        """Test a re-run after editing one line rebuilds only that line"""
+        from services.dub_manifest import DubManifest
+
+        first = DubManifest(manifest_root, "/videos/clip.mp4", logger=mock_logger)
+        for i, text in enumerate(["Xin chào", "Câu hai", "Câu ba"]):
+            first.store(segment_fp(text), write_audio(os.path.join(temp_dir, f"final_seg_{i}.wav"), text.encode("utf-8")),
+                        1800.0, effective_duration_ms=2000.0, overflow_ms=0.0)
+        first.save()
+
+        second = DubManifest(manifest_root, "/videos/clip.mp4", logger=mock_logger)
+        reused = second.lookup(segment_fp("Xin chào"))
+
+        assert reused["duration_ms"] == 1800.0 and reused["effective_duration_ms"] == 2000.0
+        with open(reused["path"], "rb") as f:
+            assert f.read() == "Xin chào".encode("utf-8")
+        assert second.lookup(segment_fp("Câu hai đã sửa")) is None
+        assert second.lookup(segment_fp("Câu ba", target_ms=2500.0)) is None
+        assert second.lookup(segment_fp("Câu ba", voice="alloy")) is None
+
+    def test_prune_drops_unused_segments(self, manifest_root, temp_dir, mock_logger):
+        """Test a complete run drops old segments; an interrupted run keeps them"""
+        from services.dub_manifest import DubManifest
+
+        first = DubManifest(manifest_root, "/videos/clip.mp4", logger=mock_logger)
+        first.store(segment_fp("A"), write_audio(os.path.join(temp_dir, "a.wav")), 1000.0)
+        first.store(segment_fp("B"), write_audio(os.path.join(temp_dir, "b.wav")), 1000.0)
+        first.save()
+
+        interrupted = DubManifest(manifest_root, "/videos/clip.mp4", logger=mock_logger)
+        interrupted.lookup(segment_fp("A"))
+        interrupted.save(prune=False)
+        complete = DubManifest(manifest_root, "/videos/clip.mp4", logger=mock_logger)
+        assert complete.lookup(segment_fp("B")) is not None
+        complete = DubManifest(manifest_root, "/videos/clip.mp4", logger=mock_logger)
+        complete.lookup(segment_fp("A"))
+        complete.save()
+
+        final = DubManifest(manifest_root, "/videos/clip.mp4", logger=mock_logger)
+        assert final.lookup(segment_fp("A")) is not None
+        assert final.lookup(segment_fp("B")) is None
+        assert len([n for n in os.listdir(final.dir) if n.startswith("seg_")]) == 1
+
+    def test_videos_are_separate_and_bounded(self, manifest_root, temp_dir, mock_logger):
+        """Test manifests are per video and only the most recent videos are kept"""
+        from services.dub_manifest import DubManifest
+
+        for i in range(3):
+            manifest = DubManifest(manifest_root, f"/videos/clip_{i}.mp4", max_manifests=2, logger=mock_logger)
+            manifest.store(segment_fp("A"), write_audio(os.path.join(temp_dir, "a.wav")), 1000.0)
+            manifest.save()
+            time.sleep(0.02)
+
+        assert len(os.listdir(manifest_root)) == 2
+        assert DubManifest(manifest_root, "/videos/clip_0.mp4", logger=mock_logger).lookup(segment_fp("A")) is None
+        assert DubManifest(manifest_root, "/videos/clip_2.mp4", logger=mock_logger).lookup(segment_fp("A")) is not None
@@ -0,0 +1,118 @@
+"""
+Integration tests for the concurrent dub task scheduler
+"""
+import pytest
+import sys
+import os
+import threading
+import time
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+def make_ctx(task_id):
+    from models.task_models import DubTaskContext
+
+    return DubTaskContext(task_id=task_id, video_path=f"/videos/{task_id}.mp4")
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("Hết thời gian chờ điều kiện")
+        time.sleep(0.01)
+
+
+class TestDubTaskScheduler:
+    """Test slot limits, stage overlap and stop handling"""
+
+    def test_network_stage_overlaps_cpu_stage(self, mock_logger):
+        """Test task B synthesizes TTS while task A holds the CPU slot"""
+        from services.dub_scheduler import DubTaskScheduler, STAGE_CPU, STAGE_NETWORK
+
+        scheduler = DubTaskScheduler(cpu_slots=1, network_slots=1, logger=mock_logger)
+        release_a = threading.Event()
+        events = []
+
+        def task_a(ctx):
+            scheduler.enter_stage(ctx, STAGE_NETWORK)
+            events.append("a_tts")
+            scheduler.enter_stage(ctx, STAGE_CPU)
+            events.append("a_mux")
+            release_a.wait(5)
+
+        def task_b(ctx):
+            scheduler.enter_stage(ctx, STAGE_NETWORK)
+            events.append("b_tts")
+            scheduler.enter_stage(ctx, STAGE_CPU)
+            events.append("b_mux")
+
+        finished = []
+        scheduler.start(make_ctx("task_a"), task_a, on_finished=lambda c: finished.append(c.task_id))
+        wait_until(lambda: "a_mux" in events)
+        assert scheduler.can_start()
+        scheduler.start(make_ctx("task_b"), task_b, on_finished=lambda c: finished.append(c.task_id))
+
+        wait_until(lambda: "b_tts" in events)
+        assert not scheduler.can_start()  # Mặc định: tối đa cpu_slots + network_slots tác vụ
+        time.sleep(0.1)
+        assert "b_mux" not in events  # Slot CPU vẫn do tác vụ A giữ
+        # B đã trả slot mạng trong lúc chờ slot CPU
+        assert scheduler.get_stats()['slots_in_use'] == {STAGE_NETWORK: 0, STAGE_CPU: 1}
+
+        release_a.set()
+        wait_until(lambda: len(finished) == 2)
+        assert events == ["a_tts", "a_mux", "b_tts", "b_mux"]
+        assert scheduler.active_task_ids() == []
+        assert scheduler.get_stats()['slots_in_use'] == {STAGE_NETWORK: 0, STAGE_CPU: 0}
+        assert scheduler.get_stats()['max_parallel'] == 2
+
+    def test_slot_limit_and_release_on_error(self, mock_logger):
+        """Test no more tasks than slots share a stage and a failing task frees its slot"""
+        from services.dub_scheduler import DubTaskScheduler, STAGE_CPU
+
+        scheduler = DubTaskScheduler(cpu_slots=2, network_slots=1, max_active_tasks=4, logger=mock_logger)
+        lock = threading.Lock()
+        running = {'now': 0, 'max': 0}
+
+        def task(ctx):
+            scheduler.enter_stage(ctx, STAGE_CPU)
+            with lock:
+                running['now'] += 1
+                running['max'] = max(running['max'], running['now'])
+            time.sleep(0.05)
+            with lock:
+                running['now'] -= 1
+            if ctx.task_id == "task_0":
+                raise RuntimeError("FFmpeg lỗi")
+
+        finished = []
+        for i in range(4):
+            scheduler.start(make_ctx(f"task_{i}"), task, on_finished=lambda c: finished.append(c.task_id))
+        wait_until(lambda: len(finished) == 4)
+
+        assert running['max'] == 2
+        assert scheduler.get_stats()['slots_in_use'][STAGE_CPU] == 0
+        assert scheduler.get_stats()['finished'] == 4
+
+    def test_stop_while_waiting_for_slot(self, mock_logger):
+        """Test a task waiting for a busy slot is interrupted by the stop event"""
+        from services.dub_scheduler import DubTaskScheduler, STAGE_CPU
+
+        scheduler = DubTaskScheduler(cpu_slots=1, network_slots=1, logger=mock_logger)
+        stop_event = threading.Event()
+        holder = make_ctx("holder")
+        scheduler.enter_stage(holder, STAGE_CPU)
+
+        waiter = make_ctx("waiter")
+        stop_event.set()
+        with pytest.raises(InterruptedError):
+            scheduler.enter_stage(waiter, STAGE_CPU, stop_event)
+
+        assert waiter.stage is None
+        scheduler.release(holder)
+        scheduler.enter_stage(waiter, STAGE_CPU)
+        assert waiter.stage == STAGE_CPU
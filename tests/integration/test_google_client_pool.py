@@ -0,0 +1,129 @@
+"""
+Integration tests for the shared Google Cloud client pool
+"""
+import pytest
+import sys
+import os
+import datetime
+import threading
+import time
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+class FakeCredentials:
+    """Service-account credentials stub; refresh() sets a one-hour token"""
+
+    def __init__(self, path, refresh_delay_s=0.0):
+        self.path = path
+        self.token = None
+        self.expiry = None
+        self.refresh_delay_s = refresh_delay_s
+        self.refresh_count = 0
+
+    def refresh(self, request):
+        time.sleep(self.refresh_delay_s)
+        self.refresh_count += 1
+        self.token = "token"
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Return the pool module with stubbed credentials and Translate client factories"""
+    import types
+    from services import google_client_pool
+
+    loaded = []
+    refresh_delays = {}
+
+    def from_service_account_file(path, scopes=None):
+        credentials = FakeCredentials(path, refresh_delays.get(os.path.basename(path), 0.0))
+        loaded.append(credentials)
+        return credentials
+
+    service_account = types.SimpleNamespace(
+        Credentials=types.SimpleNamespace(from_service_account_file=from_service_account_file))
+    translate = types.SimpleNamespace(Client=lambda credentials: types.SimpleNamespace(credentials=credentials))
+    monkeypatch.setattr(google_client_pool, "service_account", service_account)
+    monkeypatch.setattr(google_client_pool, "GoogleAuthRequest", lambda: None)
+    monkeypatch.setattr(google_client_pool, "google_translate", translate)
+    monkeypatch.setattr(google_client_pool, "HAS_GOOGLE_AUTH", True)
+    monkeypatch.setattr(google_client_pool, "HAS_GOOGLE_CLOUD_TRANSLATE", True)
+    monkeypatch.setattr(google_client_pool, "loaded", loaded, raising=False)
+    monkeypatch.setattr(google_client_pool, "refresh_delays", refresh_delays, raising=False)
+    google_client_pool.invalidate_google_clients()
+    yield google_client_pool
+    google_client_pool.invalidate_google_clients()
+
+
+def write_key(path, content="{}"):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+class TestGoogleClientPool:
+    """Test client reuse, key-file changes, invalidation and token refresh"""
+
+    def test_one_client_shared_across_threads(self, pool, temp_dir):
+        """Test threads using the same key file get one client and one token refresh"""
+        key_path = write_key(os.path.join(temp_dir, "key.json"))
+        clients = []
+
+        def worker():
+            clients.append(pool.get_google_translate_client(key_path))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(clients) == 8 and all(c is clients[0] for c in clients)
+        assert len(pool.loaded) == 1
+        assert pool.loaded[0].refresh_count == 1
+
+    def test_edited_key_file_builds_new_client(self, pool, temp_dir):
+        """Test a key file with a new mtime gets new credentials and a new client"""
+        key_path = write_key(os.path.join(temp_dir, "key.json"))
+        first = pool.get_google_translate_client(key_path)
+
+        write_key(key_path, '{"edited": true}')
+        stat = os.stat(key_path)
+        os.utime(key_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        second = pool.get_google_translate_client(key_path)
+        assert second is not first
+        assert second.credentials is not first.credentials
+        assert pool.get_google_translate_client(key_path) is second
+
+    def test_invalidate_drops_cached_entry(self, pool, temp_dir):
+        """Test invalidating one key file rebuilds only its client"""
+        key_a = write_key(os.path.join(temp_dir, "a.json"))
+        key_b = write_key(os.path.join(temp_dir, "b.json"))
+        client_a = pool.get_google_translate_client(key_a)
+        client_b = pool.get_google_translate_client(key_b)
+
+        pool.invalidate_google_clients(key_a)
+
+        assert pool.get_google_translate_client(key_a) is not client_a
+        assert pool.get_google_translate_client(key_b) is client_b
+
+    def test_refresh_does_not_block_other_key_files(self, pool, temp_dir):
+        """Test a slow token refresh for one key file does not hold up another"""
+        pool.refresh_delays["slow.json"] = 1.0
+        slow_key = write_key(os.path.join(temp_dir, "slow.json"))
+        fast_key = write_key(os.path.join(temp_dir, "fast.json"))
+
+        slow_thread = threading.Thread(target=pool.get_google_translate_client, args=(slow_key,))
+        slow_thread.start()
+        time.sleep(0.1)
+        started = time.time()
+        pool.get_google_translate_client(fast_key)
+        elapsed = time.time() - started
+        slow_thread.join()
+
+        assert elapsed < 0.5
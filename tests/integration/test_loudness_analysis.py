@@ -0,0 +1,118 @@
+"""
+Integration tests for EBU R128 loudness analysis and the linear loudnorm pass
+"""
+import pytest
+import sys
+import os
+import time
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+np = pytest.importorskip("numpy")
+
+SR = 48000
+
+
+def sine(seconds, level_db, freq=1000.0, sr=SR):
+    t = np.arange(int(seconds * sr)) / float(sr)
+    return np.repeat((10 ** (level_db / 20.0) * np.sin(2 * np.pi * freq * t)).astype(np.float32)[:, None], 2, axis=1)
+
+
+FFMPEG_STDERR = """[Parsed_loudnorm_0 @ 0x55d0] 
+{
+	"input_i" : "-27.61",
+	"input_tp" : "-4.47",
+	"input_lra" : "18.06",
+	"input_thresh" : "-39.20",
+	"output_i" : "-14.05",
+	"output_tp" : "-1.50",
+	"output_lra" : "7.00",
+	"output_thresh" : "-25.41",
+	"normalization_type" : "dynamic",
+	"target_offset" : "0.05"
+}
+"""
+
+
+class TestMeasurement:
+    """Test the in-process measurement"""
+
+    def test_reference_sine(self):
+        """Test a -23 dBFS 1 kHz stereo sine measures -23 LUFS, -23 dBTP, no range"""
+        from services.loudness_analysis import measure_loudness
+
+        stats = measure_loudness(sine(10.0, -23.0), SR)
+
+        assert stats['integrated_lufs'] == pytest.approx(-23.0, abs=0.1)
+        assert stats['threshold_lufs'] == pytest.approx(-33.0, abs=0.1)
+        assert stats['true_peak_db'] == pytest.approx(-23.0, abs=0.1)
+        assert stats['lra'] == pytest.approx(0.0, abs=0.1)
+
+    def test_gating_and_range(self):
+        """Test silence is gated out and a level step shows up in LRA"""
+        from services.loudness_analysis import measure_loudness
+
+        quiet_then_loud = np.concatenate([sine(20.0, -40.0), np.zeros((10 * SR, 2), np.float32), sine(20.0, -20.0)])
+
+        stats = measure_loudness(quiet_then_loud, SR)
+
+        assert -24.0 < stats['integrated_lufs'] < -20.0
+        assert stats['lra'] == pytest.approx(20.0, abs=1.0)
+        assert measure_loudness(np.zeros((SR, 2), np.float32), SR)['integrated_lufs'] == float("-inf")
+
+    def test_intersample_true_peak(self):
+        """Test a quarter-rate sine at 45 degrees peaks 3 dB above its samples"""
+        from services.loudness_analysis import true_peak_db
+
+        t = np.arange(SR) / float(SR)
+        tone = np.repeat((0.5 * np.sin(2 * np.pi * SR / 4 * t + np.pi / 4)).astype(np.float32)[:, None], 2, axis=1)
+
+        assert 20 * np.log10(np.abs(tone).max()) == pytest.approx(-9.03, abs=0.05)
+        assert true_peak_db(tone, SR) == pytest.approx(-6.02, abs=0.1)
+
+
+class TestStatsCacheAndFilter:
+    """Test stats cached with the asset and the apply filter"""
+
+    def test_wav_stats_cached_until_file_changes(self, temp_dir):
+        """Test a WAV is measured from its PCM once and re-measured after a rewrite"""
+        from services.dub_audio_engine import write_wav
+        from services.loudness_analysis import get_cached_or_measured_stats, load_cached_stats
+
+        path = os.path.join(temp_dir, "dub_track.wav")
+        write_wav(path, sine(5.0, -23.0), SR)
+
+        assert load_cached_stats(path) is None
+        assert get_cached_or_measured_stats(path)['integrated_lufs'] == pytest.approx(-23.0, abs=0.1)
+        assert load_cached_stats(path)['integrated_lufs'] == pytest.approx(-23.0, abs=0.1)
+
+        time.sleep(0.01)
+        write_wav(path, sine(5.0, -30.0), SR)
+        assert load_cached_stats(path) is None
+        assert get_cached_or_measured_stats(path)['integrated_lufs'] == pytest.approx(-30.0, abs=0.1)
+
+    def test_non_wav_needs_ffmpeg_pass(self, temp_dir):
+        """Test formats that cannot be memory-mapped are left to the FFmpeg analysis pass"""
+        from services.loudness_analysis import get_cached_or_measured_stats
+
+        path = os.path.join(temp_dir, "external.mp3")
+        with open(path, "wb") as f:
+            f.write(b"\xFF\xFB\x90\x00" * 100)
+
+        assert get_cached_or_measured_stats(path) is None
+
+    def test_parse_ffmpeg_json_and_linear_filter(self):
+        """Test FFmpeg analysis output feeds a linear-mode loudnorm filter"""
+        from services.loudness_analysis import is_linear_possible, loudnorm_apply_filter, parse_loudnorm_json
+
+        stats = parse_loudnorm_json("Input #0, wav...\n" + FFMPEG_STDERR + "size=N/A time=00:01:00")
+        apply_filter = loudnorm_apply_filter(stats, -14.0, -1.5, 7.0)
+
+        assert stats == {'integrated_lufs': -27.61, 'true_peak_db': -4.47, 'lra': 18.06, 'threshold_lufs': -39.2}
+        assert "measured_I=-27.61" in apply_filter and "measured_thresh=-39.20" in apply_filter
+        assert apply_filter.endswith(":linear=true:print_format=summary")
+        assert not is_linear_possible(stats, -14.0, -1.5, 7.0)  # LRA 18 > 7: FFmpeg dùng chế độ động
+        assert loudnorm_apply_filter(dict(stats, integrated_lufs=float("-inf")), -14.0, -1.5, 7.0) is None
+        assert parse_loudnorm_json("no stats here") is None
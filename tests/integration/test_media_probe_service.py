@@ -0,0 +1,141 @@
+"""
+Integration tests for the media probe cache service
+"""
+import pytest
+import sys
+import os
+import json
+import struct
+import subprocess
+import wave
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+def write_pcm_wav(path, seconds, sample_rate=44100, channels=2):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(b"\0\0" * channels * int(seconds * sample_rate))
+    return path
+
+
+def write_mp3_frames(path, header, frame_len, count, first_frame=None, id3=False):
+    with open(path, "wb") as f:
+        if id3:
+            f.write(b"ID3\x04\x00\x00\x00\x00\x00\x20" + b"\0" * 32)
+        if first_frame is not None:
+            f.write(first_frame.ljust(frame_len, b"\0"))
+        for _ in range(count):
+            f.write(header.ljust(frame_len, b"\0"))
+    return path
+
+
+@pytest.fixture
+def probe(mock_logger):
+    """Return a MediaProbeService without ffprobe"""
+    from services.media_probe_service import MediaProbeService
+
+    svc = MediaProbeService(logger=mock_logger)
+    svc._ffprobe_path = ""
+    return svc
+
+
+class TestNativeHeaders:
+    """Test WAV and MP3 durations read without ffprobe"""
+
+    def test_wav_duration_and_format(self, probe, temp_dir):
+        """Test a PCM WAV is read from its RIFF header"""
+        info = probe.probe(write_pcm_wav(os.path.join(temp_dir, "std_0001.wav"), 1.5, 22050, 1))
+
+        assert info.source == "wav"
+        assert info.duration_ms == 1500
+        assert info.has_audio and not info.has_video
+        assert info.audio_streams[0]["sample_rate"] == "22050"
+
+    def test_wav_written_through_pipe(self, probe, temp_dir):
+        """Test a WAV with an unset data size uses the rest of the file"""
+        path = write_pcm_wav(os.path.join(temp_dir, "piped.wav"), 2.0)
+        with open(path, "r+b") as f:
+            f.seek(40)
+            f.write(struct.pack("<I", 0xFFFFFFFF))
+
+        assert probe.probe(path).duration_s == pytest.approx(2.0)
+
+    def test_mp3_constant_bitrate(self, probe, temp_dir):
+        """Test a CBR MP3 (MPEG-1 128 kbps) after an ID3v2 tag"""
+        path = write_mp3_frames(os.path.join(temp_dir, "rawtts_0001.mp3"), b"\xFF\xFB\x90\x00", 417, 100, id3=True)
+
+        info = probe.probe(path)
+
+        assert info.source == "mp3"
+        assert info.duration_s == pytest.approx(100 * 417 * 8 / 128000.0)
+        assert info.audio_streams[0]["channels"] == 2
+
+    def test_mp3_xing_frame_count(self, probe, temp_dir):
+        """Test a VBR MP3 (MPEG-2 24 kHz mono) uses the Xing frame count"""
+        header = b"\xFF\xF3\x44\xC0"
+        xing = header + b"\0" * 9 + b"Xing" + struct.pack(">II", 1, 250)
+        path = write_mp3_frames(os.path.join(temp_dir, "rawtts_0002.mp3"), header, 96, 10, first_frame=xing)
+
+        info = probe.probe(path)
+
+        assert info.duration_s == pytest.approx(250 * 576 / 24000.0)
+        assert info.audio_streams[0]["channels"] == 1
+
+
+class TestProbeCache:
+    """Test cache hits, invalidation and the single ffprobe call"""
+
+    def test_cached_until_file_changes(self, probe, temp_dir):
+        """Test repeated probes are lookups and a rewritten file is probed again"""
+        path = write_pcm_wav(os.path.join(temp_dir, "track.wav"), 1.0)
+        probe.probe(path)
+        probe.probe(path)
+        assert probe.get_stats()['hits'] == 1
+        assert probe.get_stats()['native_reads'] == 1
+
+        write_pcm_wav(path, 3.0)
+
+        assert probe.get_duration_s(path) == pytest.approx(3.0)
+        assert probe.get_stats()['native_reads'] == 2
+
+    def test_single_ffprobe_json_call(self, probe, temp_dir, monkeypatch):
+        """Test one ffprobe call gives duration, audio stream, size and fps"""
+        video = os.path.join(temp_dir, "video.mp4")
+        with open(video, "wb") as f:
+            f.write(b"not really a video")
+        payload = {
+            "streams": [
+                {"codec_type": "video", "width": 1280, "height": 720, "r_frame_rate": "30000/1001"},
+                {"codec_type": "audio", "codec_name": "aac"},
+            ],
+            "format": {"duration": "12.5", "format_name": "mov,mp4"},
+        }
+        calls = []
+
+        def fake_run(cmd, **kwargs):
+            calls.append(cmd)
+            return subprocess.CompletedProcess(cmd, 0, json.dumps(payload).encode("utf-8"), b"")
+
+        probe._ffprobe_path = "ffprobe"
+        monkeypatch.setattr(subprocess, "run", fake_run)
+
+        info = probe.probe(video)
+        assert probe.probe(video) is info
+        assert len(calls) == 1 and "-show_streams" in calls[0] and "json" in calls[0]
+        assert info.duration_s == 12.5 and info.has_audio
+        assert info.video_size == (1280, 720)
+        assert info.frame_rate == pytest.approx(29.97, abs=0.01)
+
+    def test_missing_file_and_no_ffprobe(self, probe, temp_dir):
+        """Test missing files and non-native formats without ffprobe return None"""
+        other = os.path.join(temp_dir, "clip.mkv")
+        with open(other, "wb") as f:
+            f.write(b"data")
+
+        assert probe.probe(os.path.join(temp_dir, "missing.wav")) is None
+        assert probe.probe(other) is None
@@ -0,0 +1,160 @@
+"""
+Integration tests for Model Service (Whisper model residency cache)
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+@pytest.fixture
+def fake_whisper(monkeypatch):
+    """Replace the whisper module with a loader that records each disk load"""
+    from types import SimpleNamespace
+    import services.whisper_backends as backends_module
+
+    loads = []
+
+    def load_model(name, device=None):
+        loads.append(name)
+        return SimpleNamespace(name=name)
+
+    monkeypatch.setattr(backends_module, "whisper", SimpleNamespace(load_model=load_model))
+    monkeypatch.setattr(backends_module, "HAS_WHISPER", True)
+    return loads
+
+
+class TestModelResidencyCache:
+    """Test LRU residency of loaded Whisper models"""
+
+    def test_switching_back_does_not_reload(self, mock_logger, fake_whisper):
+        """Test a model still resident is reused without a disk load"""
+        from services.model_service import ModelService
+
+        service = ModelService(logger=mock_logger, cache_budget_mb=10000)
+        service.load_model("small", device="cpu")
+        service.load_model("medium", device="cpu")
+        model, name, device, error = service.load_model("small", device="cpu")
+
+        assert error is None and name == "small"
+        assert model is service.current_model
+        assert fake_whisper == ["small", "medium"]
+
+    def test_budget_evicts_least_recently_used(self, mock_logger, fake_whisper):
+        """Test the budget evicts the least recently used model first"""
+        from services.model_service import ModelService
+
+        # ~180 MB (tiny) + ~340 MB (base) + ~1120 MB (small) > 1400 MB
+        service = ModelService(logger=mock_logger, cache_budget_mb=1400)
+        service.load_model("tiny", device="cpu")
+        service.load_model("base", device="cpu")
+        service.load_model("tiny", device="cpu")  # base thành model ít dùng gần đây nhất
+        service.load_model("small", device="cpu")
+
+        resident = {m['model_name'] for m in service.get_model_cache_info()['models']}
+        assert resident == {"tiny", "small"}
+        assert service.model_name == "small"
+
+    def test_pinned_model_stays_resident(self, mock_logger, fake_whisper):
+        """Test eviction skips a model pinned by a running job"""
+        from services.model_service import ModelService
+
+        service = ModelService(logger=mock_logger, cache_budget_mb=1400)
+        service.load_model("tiny", device="cpu")
+        service.pin_model("tiny", "cpu")  # Tác vụ transcribe đang dùng tiny
+        service.load_model("base", device="cpu")
+        service.load_model("small", device="cpu")
+
+        models = {m['model_name']: m for m in service.get_model_cache_info()['models']}
+        assert set(models) == {"tiny", "small"}
+        assert models["tiny"]['pinned'] and models["small"]['pinned']
+
+        service.unpin_model("tiny", "cpu")
+        service.load_model("base", device="cpu")
+        assert "tiny" not in {m['model_name'] for m in service.get_model_cache_info()['models']}
+
+    def test_pinned_model_exceeds_budget_with_warning(self, mock_logger, fake_whisper):
+        """Test a pinned model is kept even if the new model then goes over budget"""
+        from services.model_service import ModelService
+
+        # ~1120 MB (small) + ~340 MB (base) > 1400 MB
+        service = ModelService(logger=mock_logger, cache_budget_mb=1400)
+        service.load_model("small", device="cpu")
+        service.pin_model("small", "cpu")
+        service.load_model("base", device="cpu")
+
+        resident = {m['model_name'] for m in service.get_model_cache_info()['models']}
+        assert resident == {"small", "base"}
+        assert mock_logger.warning.called
+
+    def test_unload_model_drops_from_cache(self, mock_logger, fake_whisper):
+        """Test unload_model frees the active model entirely"""
+        from services.model_service import ModelService
+
+        service = ModelService(logger=mock_logger, cache_budget_mb=10000)
+        service.load_model("base", device="cpu")
+        service.unload_model()
+
+        assert service.current_model is None
+        assert service.get_model_cache_info()['models'] == []
+        service.load_model("base", device="cpu")
+        assert fake_whisper == ["base", "base"]
+
+
+def test_vad_gated_transcription_remaps_timestamps(temp_dir, mock_logger):
+    """Test only speech regions reach the model and segments land on the original timeline"""
+    np = pytest.importorskip("numpy")
+    from types import SimpleNamespace
+    from services.model_service import ModelService
+
+    seen_lengths = []
+
+    def transcribe(audio, **options):
+        seen_lengths.append(len(audio))
+        return {'text': " Hi", 'segments': [{'id': 0, 'start': 0.5, 'end': 1.5, 'text': " Hi"}]}
+
+    service = ModelService(logger=mock_logger, cache_budget_mb=1000)
+    service.current_model = SimpleNamespace(transcribe=transcribe)
+    service.model_name = "small"
+    service.device = "cpu"
+
+    audio = np.zeros(16000 * 100, dtype=np.float32)
+    out_path = service.transcribe_and_save(
+        "video.mp4", os.path.join(temp_dir, "out.srt"), "srt",
+        audio=audio, speech_regions=[(60.0, 62.0)]
+    )
+
+    assert seen_lengths[0] < 16000 * 5
+    with open(out_path, encoding="utf-8") as f:
+        assert "00:01:00" in f.read()
+
+
+def test_warm_up_runs_tiny_decode(mock_logger):
+    """Test warm_up decodes a short silent buffer with the job's options and swallows errors"""
+    pytest.importorskip("numpy")
+    from types import SimpleNamespace
+    from services.model_service import ModelService, WARMUP_AUDIO_SECONDS
+
+    calls = []
+
+    def transcribe(audio, **options):
+        calls.append((len(audio), options))
+        return {'text': "", 'segments': [], 'language': "en"}
+
+    service = ModelService(logger=mock_logger, cache_budget_mb=1000)
+    assert service.warm_up() is False
+
+    service.current_model = SimpleNamespace(transcribe=transcribe)
+    service.model_name, service.device = "small", "cpu"
+    assert service.warm_up() is True
+    assert calls[0][0] == int(WARMUP_AUDIO_SECONDS * 16000)
+    assert calls[0][1]['beam_size'] == 5 and calls[0][1]['fp16'] is False
+
+    def failing(audio, **options):
+        raise RuntimeError("CUDA error")
+
+    service.current_model = SimpleNamespace(transcribe=failing)
+    assert service.warm_up() is False
@@ -0,0 +1,67 @@
+"""
+Integration tests for parallel chunked CPU transcription helpers
+"""
+import pytest
+import sys
+import os
+import wave
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+class TestWorkerCount:
+    """Test worker count derivation from cores and RAM"""
+
+    def test_limited_by_cores(self):
+        """Test at least two threads per worker"""
+        from services.parallel_transcription import compute_worker_count
+
+        workers, threads = compute_worker_count("base", cpu_count=16, available_mb=100000)
+
+        assert workers == 8
+        assert threads == 2
+
+    def test_limited_by_ram(self):
+        """Test large models get fewer workers on small RAM"""
+        from services.parallel_transcription import compute_worker_count, estimate_worker_memory_mb
+
+        available = estimate_worker_memory_mb("medium") * 3 / 0.7 + 1
+        workers, threads = compute_worker_count("medium", cpu_count=32, available_mb=available)
+
+        assert workers == 3
+        assert threads == 10
+
+
+class TestChunkOffsets:
+    """Test exact offsets from WAV headers"""
+
+    def test_offsets_are_cumulative_durations(self, temp_dir):
+        """Test each chunk starts where the previous one ended"""
+        from services.parallel_transcription import chunk_offsets_s
+
+        paths = []
+        for i, frames in enumerate([16000 * 3, 16000 * 2 + 8, 16000]):
+            path = os.path.join(temp_dir, f"part_{i}.wav")
+            with wave.open(path, "wb") as wav_file:
+                wav_file.setnchannels(1)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(16000)
+                wav_file.writeframes(b"\x00\x00" * frames)
+            paths.append(path)
+
+        assert chunk_offsets_s(paths) == pytest.approx([0.0, 3.0, 5.0005])
+
+    def test_split_points_fall_on_quiet_points(self):
+        """Test boundaries are chosen inside silences"""
+        np = pytest.importorskip("numpy")
+        from services.parallel_transcription import plan_split_points
+
+        audio = np.ones(16000 * 600, dtype=np.float32)
+        audio[16000 * 140:16000 * 141] = 0.0
+
+        points = plan_split_points(600.0, audio, workers=2)
+
+        assert 140.0 <= points[0] <= 141.0
+        assert points == sorted(points)
@@ -0,0 +1,89 @@
+"""
+Integration tests for the shared SQLite LRU cache base
+"""
+import pytest
+import sys
+import os
+import time
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+def make_cache_class():
+    from services.sqlite_lru_cache import SQLiteLRUCache
+
+    class NotesCache(SQLiteLRUCache):
+        TABLE_NAME = "notes"
+        TABLE_COLUMNS = "body TEXT"
+        LOG_PREFIX = "[NotesCache]"
+        CACHE_NAME = "cache ghi chú"
+
+        def get(self, key):
+            with self._lock:
+                return self._fetch_many_locked([key], "body").get(key)
+
+        def put(self, key, body, size=100):
+            now = time.time()
+            self._store_rows(("key", "body", "size", "created_at", "last_used"), [(key, body, size, now, now)])
+
+    return NotesCache
+
+
+@pytest.fixture
+def cache(temp_dir, mock_logger):
+    """Return a minimal SQLiteLRUCache subclass stored in a temp directory"""
+    c = make_cache_class()(os.path.join(temp_dir, "notes.sqlite3"), max_size_mb=1, logger=mock_logger)
+    yield c
+    c.close()
+
+
+class TestSQLiteLRUCache:
+    """Test the schema hook, quota eviction, clear and the shared instance"""
+
+    def test_subclass_table_store_and_fetch(self, cache):
+        """Test a subclass only declares its columns to get a working table"""
+        cache.put("a", "alpha")
+
+        assert cache.get("a") == "alpha"
+        assert cache.get("missing") is None
+        assert cache.get_stats()['entries'] == 1
+
+    def test_evicts_oldest_beyond_quota(self, cache):
+        """Test the quota drops the least recently used rows first"""
+        cache.put("old", "x", size=400 * 1024)
+        time.sleep(0.01)
+        cache.put("new", "y", size=400 * 1024)
+        time.sleep(0.01)
+        cache.put("newest", "z", size=400 * 1024)
+
+        assert cache.get("old") is None
+        assert cache.get("newest") == "z"
+        assert cache.evictions >= 1
+
+    def test_clear(self, cache):
+        """Test clear() empties the table"""
+        cache.put("a", "alpha")
+        cache.clear()
+
+        assert cache.get_stats()['entries'] == 0
+
+    def test_shared_cache_per_class(self, temp_dir, monkeypatch):
+        """Test get_shared_cache returns one instance per class, stored next to config.json"""
+        from config import settings
+        from services import sqlite_lru_cache
+
+        monkeypatch.setattr(settings, "get_config_path", lambda: os.path.join(temp_dir, "config.json"))
+        monkeypatch.setattr(sqlite_lru_cache, "_shared_caches", {})
+        cache_cls = make_cache_class()
+
+        first = sqlite_lru_cache.get_shared_cache(cache_cls, "notes.sqlite3", {"notes_max_mb": 2},
+                                                  "notes_enabled", "notes_max_mb", 1)
+        second = sqlite_lru_cache.get_shared_cache(cache_cls, "notes.sqlite3", None,
+                                                   "notes_enabled", "notes_max_mb", 1)
+
+        assert first is second
+        assert first.db_path == os.path.join(temp_dir, "notes.sqlite3")
+        assert first.max_size_bytes == 2 * 1024 * 1024
+        first.close()
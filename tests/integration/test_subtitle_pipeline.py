@@ -0,0 +1,156 @@
+"""
+Integration tests for the overlapped transcription/translation pipeline
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+class TestStreamingTranslationWorker:
+    """Test the background translation worker"""
+
+    def test_translates_submitted_segments(self, mock_logger):
+        """Test segments submitted during transcription are translated in micro-batches"""
+        from services.subtitle_pipeline import StreamingTranslationWorker
+
+        calls = []
+
+        def fake_engine(texts):
+            calls.append(list(texts))
+            return [t.upper() for t in texts]
+
+        worker = StreamingTranslationWorker(fake_engine, "google_cloud", logger=mock_logger)
+        worker.start()
+        worker.submit([{'text': ' Hello '}, {'text': 'a --> b'}])
+        worker.submit([{'text': 'Hello'}, {'text': ''}])
+        result = worker.finish()
+
+        assert result == {'Hello': 'HELLO', 'a -> b': 'A -> B'}
+        assert sum(len(c) for c in calls) == 2
+
+    def test_failed_batch_is_left_for_final_pass(self, mock_logger):
+        """Test lines of a failed batch are not reported as translated"""
+        from services.subtitle_pipeline import StreamingTranslationWorker
+
+        worker = StreamingTranslationWorker(lambda texts: None, "openai", logger=mock_logger)
+        worker.start()
+        worker.submit([{'text': 'Hello'}])
+        assert worker.finish() == {}
+        assert worker.failed_lines == 1
+
+
+class TestPretranslatedContent:
+    """Test translate_subtitle_content reuses pre-translated lines"""
+
+    def test_only_missing_lines_are_sent(self):
+        """Test the final pass sends only lines the worker did not translate"""
+        from services.translation_service import translate_subtitle_content
+
+        content = "1\n00:00:01,000 --> 00:00:02,000\nHello\n\n2\n00:00:03,000 --> 00:00:04,000\nBye\n"
+        sent = []
+
+        def fake_engine(texts):
+            sent.append(list(texts))
+            return [t.upper() for t in texts]
+
+        result = translate_subtitle_content(content, fake_engine, engine_key="openai",
+                                            pretranslated={'Hello': 'Xin chào'})
+
+        assert sent == [['Bye']]
+        assert "Xin chào" in result and "BYE" in result
+
+
+class TestWindowedTranscription:
+    """Test ModelService.transcribe_windowed with a fake model"""
+
+    def test_segments_are_offset_and_streamed(self, mock_logger, temp_dir, monkeypatch):
+        """Test each window's segments are shifted to the full timeline and reported"""
+        np = pytest.importorskip("numpy")
+        from types import SimpleNamespace
+        import services.whisper_backends as backends_module
+        from services.model_service import ModelService
+
+        audio = np.ones(16000 * 25, dtype=np.float32)
+        audio[16000 * 9:16000 * 9 + 800] = 0.0  # Điểm lặng trước mốc 10s
+        monkeypatch.setattr(backends_module, "whisper", SimpleNamespace(load_audio=lambda path: audio))
+
+        prompts = []
+
+        def fake_transcribe(chunk, **options):
+            prompts.append(options.get('initial_prompt'))
+            duration = len(chunk) / 16000
+            return {'text': 'xin chao', 'language': 'vi',
+                    'segments': [{'id': 0, 'start': 0.0, 'end': duration, 'text': 'xin chao'}]}
+
+        audio_path = os.path.join(temp_dir, "a.wav")
+        open(audio_path, "wb").close()
+        service = ModelService(logger=mock_logger)
+        service.current_model = SimpleNamespace(transcribe=fake_transcribe)
+        service.device = "cpu"
+        streamed = []
+
+        result = service.transcribe_windowed(audio_path, window_seconds=10, on_segments=streamed.append)
+
+        starts = [seg['start'] for seg in result['segments']]
+        assert starts[0] == 0.0
+        assert 9.0 <= starts[1] < 10.0
+        assert result['segments'][-1]['end'] == pytest.approx(25.0)
+        assert [seg['id'] for seg in result['segments']] == list(range(len(starts)))
+        assert len(streamed) == len(starts)
+        assert prompts[0] is None and prompts[1] == 'xin chao'
+
+
+class TestIncrementalTranscription:
+    """Test incremental SRT writing and resume from a checkpoint"""
+
+    def test_resume_after_interruption(self, mock_logger, temp_dir):
+        """Test a stopped run keeps its progress and the next run only transcribes the rest"""
+        np = pytest.importorskip("numpy")
+        from types import SimpleNamespace
+        from services.model_service import ModelService
+
+        audio = np.ones(16000 * 30, dtype=np.float32)
+        calls = []
+
+        def fake_transcribe(chunk, **options):
+            calls.append(len(chunk))
+            duration = len(chunk) / 16000
+            return {'text': 'xin chao', 'language': 'vi',
+                    'segments': [{'id': 0, 'start': 0.0, 'end': duration, 'text': 'xin chao'}]}
+
+        audio_path = os.path.join(temp_dir, "a.wav")
+        open(audio_path, "wb").close()
+        out_path = os.path.join(temp_dir, "out", "a.srt")
+        checkpoint_dir = os.path.join(temp_dir, "checkpoints")
+        service = ModelService(logger=mock_logger)
+        service.current_model = SimpleNamespace(transcribe=fake_transcribe)
+        service.model_name = "small"
+        service.device = "cpu"
+
+        with pytest.raises(InterruptedError):
+            service.transcribe_and_save(
+                audio_path, out_path, "srt", audio=audio, incremental=True, checkpoint_dir=checkpoint_dir,
+                stop_event=lambda: len(calls) >= 1, window_seconds=10
+            )
+        partial = [name for name in os.listdir(checkpoint_dir) if ".part." in name]
+        with open(os.path.join(checkpoint_dir, partial[0]), encoding="utf-8") as f:
+            assert f.read().count("xin chao") == 1
+
+        streamed = []
+        service.transcribe_and_save(
+            audio_path, out_path, "srt", audio=audio, incremental=True, checkpoint_dir=checkpoint_dir,
+            on_segments=streamed.extend, window_seconds=10
+        )
+
+        # Chỉ phần audio sau checkpoint được transcribe lại
+        assert sum(calls) == len(audio)
+        assert len(streamed) == len(calls)
+        with open(out_path, encoding="utf-8") as f:
+            content = f.read()
+        assert content.count("xin chao") == len(calls)
+        assert content.rstrip().endswith("00:00:30,000\nxin chao")
+        assert os.listdir(checkpoint_dir) == []
@@ -0,0 +1,112 @@
+"""
+Integration tests for the Whisper transcription cache
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+RESULT = {
+    'text': " Hello world. Xin chào.",
+    'language': "en",
+    'segments': [
+        {'id': 0, 'start': 0.0, 'end': 1.234, 'text': " Hello world.", 'tokens': [1, 2, 3]},
+        {'id': 1, 'start': 1.5, 'end': 3.0, 'text': " Xin chào.", 'tokens': [4, 5]},
+    ],
+}
+
+
+@pytest.fixture
+def cache(temp_dir, mock_logger):
+    """Return a TranscriptionCache stored in a temp directory"""
+    from services.transcription_cache import TranscriptionCache
+
+    tc = TranscriptionCache(os.path.join(temp_dir, "tc.sqlite3"), logger=mock_logger)
+    yield tc
+    tc.close()
+
+
+@pytest.fixture
+def media_file(temp_dir):
+    """A fake media file"""
+    path = os.path.join(temp_dir, "video.mp4")
+    with open(path, "wb") as f:
+        f.write(os.urandom(3 * 1024 * 1024))
+    return path
+
+
+class TestTranscriptionCache:
+    """Test keys, compact storage and eviction"""
+
+    def test_roundtrip_keeps_segments(self, cache, media_file):
+        """Test stored segments come back with text and language"""
+        media_hash = cache.fingerprint(media_file)
+        key = cache.make_key(media_hash, "small", "en", {'beam_size': 5})
+        cache.put(key, RESULT)
+
+        result = cache.get(key)
+
+        assert result['text'] == RESULT['text']
+        assert result['language'] == "en"
+        assert [(s['start'], s['end'], s['text']) for s in result['segments']] == [
+            (0.0, 1.234, " Hello world."), (1.5, 3.0, " Xin chào.")
+        ]
+        assert cache.get_stats()['hits'] == 1
+
+    def test_key_parts(self, cache, media_file):
+        """Test model, language and decode options change the key; fp16 does not"""
+        media_hash = cache.fingerprint(media_file)
+        base = cache.make_key(media_hash, "small", "en", {'beam_size': 5, 'fp16': True})
+
+        assert cache.make_key(media_hash, "small", "en", {'beam_size': 5, 'fp16': False}) == base
+        assert cache.make_key(media_hash, "medium", "en", {'beam_size': 5}) != base
+        assert cache.make_key(media_hash, "small", None, {'beam_size': 5}) != base
+        assert cache.make_key(media_hash, "small", "en", {'beam_size': 1}) != base
+
+        with open(media_file, "r+b") as f:
+            f.seek(1024 * 1024)
+            f.write(b"changed!")
+        os.utime(media_file, (1, 1))
+        assert cache.fingerprint(media_file) != media_hash
+
+    def test_evicts_least_recently_used(self, cache):
+        """Test the disk quota evicts the oldest entries"""
+        cache.put("a", RESULT)
+        cache.put("b", RESULT)
+        entry_size = cache.get_stats()['size_bytes'] // 2
+        cache.max_size_bytes = int(entry_size * 2.5)
+        cache.get("a")
+        cache.put("c", RESULT)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get_stats()['evictions'] == 1
+
+
+def test_transcribe_and_save_uses_cache(temp_dir, mock_logger, cache, media_file):
+    """Test a second run with the same settings skips Whisper and rewrites any format"""
+    from types import SimpleNamespace
+    from services.model_service import ModelService
+
+    calls = []
+
+    def transcribe(audio, **options):
+        calls.append(options)
+        return RESULT
+
+    service = ModelService(logger=mock_logger, cache_budget_mb=1000, transcription_cache=cache)
+    service.current_model = SimpleNamespace(transcribe=transcribe)
+    service.model_name = "small"
+    service.device = "cpu"
+
+    service.transcribe_and_save(media_file, os.path.join(temp_dir, "a.srt"), "srt", language="en")
+    vtt_path = service.transcribe_and_save(media_file, os.path.join(temp_dir, "a.vtt"), "vtt", language="en")
+    service.transcribe_and_save(media_file, os.path.join(temp_dir, "b.srt"), "srt", language="en", beam_size=1)
+
+    assert len(calls) == 2
+    with open(vtt_path, encoding="utf-8") as f:
+        assert "Xin chào." in f.read()
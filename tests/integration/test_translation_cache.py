@@ -0,0 +1,93 @@
+"""
+Integration tests for Translation Memory (SQLite translation cache)
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+@pytest.fixture
+def memory(temp_dir, mock_logger):
+    """Return a TranslationMemory stored in a temp directory"""
+    from services.translation_cache import TranslationMemory
+
+    tm = TranslationMemory(os.path.join(temp_dir, "tm.sqlite3"), logger=mock_logger)
+    yield tm
+    tm.close()
+
+
+class TestTranslationMemoryLookup:
+    """Test cache lookups and counters"""
+
+    def test_put_then_get(self, memory):
+        """Test stored translations are returned on lookup"""
+        memory.put_many(["Hello", "World"], ["Xin chào", "Thế giới"], engine="google_cloud", target_lang="vi")
+
+        result = memory.get_many(["Hello", "Missing", "World"], engine="google_cloud", target_lang="vi")
+
+        assert result == ["Xin chào", None, "Thế giới"]
+        stats = memory.get_stats()
+        assert stats['hits'] == 2
+        assert stats['misses'] == 1
+        assert stats['entries'] == 2
+
+    def test_key_includes_engine_language_and_style(self, memory):
+        """Test a different engine/target/style does not hit"""
+        memory.put_many(["Hello"], ["Xin chào"], engine="openai", target_lang="vi", style="neutral")
+
+        assert memory.get_many(["Hello"], engine="google_cloud", target_lang="vi") == [None]
+        assert memory.get_many(["Hello"], engine="openai", target_lang="en", style="neutral") == [None]
+        assert memory.get_many(["Hello"], engine="openai", target_lang="vi", style="historical") == [None]
+        assert memory.get_many(["  Hello "], engine="openai", target_lang="vi", style="neutral") == ["Xin chào"]
+
+    def test_bypass_switch(self, memory):
+        """Test disabled cache never hits nor stores"""
+        memory.enabled = False
+        memory.put_many(["Hello"], ["Xin chào"], engine="google_cloud", target_lang="vi")
+        memory.enabled = True
+
+        assert memory.get_many(["Hello"], engine="google_cloud", target_lang="vi") == [None]
+
+
+class TestTranslationMemoryEviction:
+    """Test size-based eviction"""
+
+    def test_evicts_least_recently_used(self, temp_dir, mock_logger):
+        """Test the quota is enforced by dropping the oldest entries"""
+        from services.translation_cache import TranslationMemory
+
+        tm = TranslationMemory(os.path.join(temp_dir, "tm.sqlite3"), max_size_mb=0.01, logger=mock_logger)
+        texts = [f"line {i} " + "x" * 200 for i in range(100)]
+        for text in texts:
+            tm.put_many([text], ["y" * 200], engine="google_cloud", target_lang="vi")
+
+        stats = tm.get_stats()
+        assert stats['size_bytes'] <= tm.max_size_bytes
+        assert stats['evictions'] > 0
+        assert tm.get_many([texts[-1]], engine="google_cloud", target_lang="vi") != [None]
+        tm.close()
+
+
+class TestTranslateWithMemory:
+    """Test translate_with_memory helper"""
+
+    def test_only_misses_are_sent(self, memory):
+        """Test cached lines are not sent to the engine"""
+        from services.translation_cache import translate_with_memory
+
+        memory.put_many(["Hello"], ["Xin chào"], engine="google_cloud", target_lang="vi")
+        sent = []
+
+        def fake_engine(texts):
+            sent.append(list(texts))
+            return [t.upper() for t in texts]
+
+        result = translate_with_memory(memory, ["Hello", "Bye"], fake_engine, engine="google_cloud", target_lang="vi")
+
+        assert result == ["Xin chào", "BYE"]
+        assert sent == [["Bye"]]
+        assert memory.get_many(["Bye"], engine="google_cloud", target_lang="vi") == ["BYE"]
@@ -0,0 +1,92 @@
+"""
+Integration tests for Translation Service (batched subtitle translation)
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+SAMPLE_SRT = """1
+00:00:01,000 --> 00:00:03,000
+Hello, world!
+
+2
+00:00:04,000 --> 00:00:06,000
+This is a test.
+Second line.
+
+3
+00:00:07,000 --> 00:00:08,000
+Hello, world!
+"""
+
+
+class TestTranslationBatching:
+    """Test batch packing"""
+
+    def test_batches_respect_segment_limit(self):
+        """Test batches never exceed max_segments"""
+        from services.translation_service import build_translation_batches
+
+        batches = build_translation_batches(["a"] * 10, max_chars=1000, max_segments=3)
+
+        assert [len(b) for b in batches] == [3, 3, 3, 1]
+        assert sum(batches, []) == list(range(10))
+
+    def test_batches_respect_char_limit(self):
+        """Test batches never exceed max_chars (except single oversized text)"""
+        from services.translation_service import build_translation_batches
+
+        batches = build_translation_batches(["x" * 6, "y" * 6, "z" * 20], max_chars=12, max_segments=100)
+
+        assert batches == [[0, 1], [2]]
+
+
+class TestTranslateSubtitleContent:
+    """Test whole-file translation"""
+
+    def test_one_call_per_batch_and_dedup(self):
+        """Test the file is translated in a single call with duplicates removed"""
+        from services.translation_service import translate_subtitle_content
+
+        calls = []
+
+        def fake_translate(batch):
+            calls.append(list(batch))
+            return [t.upper() for t in batch]
+
+        result = translate_subtitle_content(SAMPLE_SRT, fake_translate, engine_key="google_cloud")
+
+        assert len(calls) == 1
+        assert calls[0] == ["Hello, world!", "This is a test.", "Second line."]
+        assert "1\n00:00:01,000 --> 00:00:03,000\nHELLO, WORLD!\n\n2\n" in result
+        assert "THIS IS A TEST.\nSECOND LINE." in result
+        assert result.endswith("HELLO, WORLD!\n\n")
+
+    def test_bilingual_output(self):
+        """Test bilingual output keeps original line above translation"""
+        from services.translation_service import translate_subtitle_content
+
+        result = translate_subtitle_content(SAMPLE_SRT, lambda b: [t.upper() for t in b],
+                                            engine_key="openai", bilingual=True)
+
+        assert "Hello, world!\nHELLO, WORLD!" in result
+
+    def test_failed_batch_keeps_original(self):
+        """Test a failed batch falls back to original text"""
+        from services.translation_service import translate_subtitle_content
+
+        result = translate_subtitle_content(SAMPLE_SRT, lambda b: None, engine_key="google_cloud")
+
+        assert "This is a test.\nSecond line." in result
+
+    def test_stop_check_raises(self):
+        """Test stop request interrupts translation"""
+        from services.translation_service import translate_subtitle_content
+
+        with pytest.raises(InterruptedError):
+            translate_subtitle_content(SAMPLE_SRT, lambda b: b, engine_key="openai", stop_check=lambda: True)
@@ -0,0 +1,138 @@
+"""
+Integration tests for the TTS audio cache
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+@pytest.fixture
+def cache(temp_dir, mock_logger):
+    """Return a TTSCache stored in a temp directory"""
+    from services.tts_cache import TTSCache
+
+    tc = TTSCache(os.path.join(temp_dir, "tts.sqlite3"), logger=mock_logger)
+    yield tc
+    tc.close()
+
+
+def write_audio(path, payload):
+    with open(path, "wb") as f:
+        f.write(payload)
+    return path
+
+
+class TestTTSCache:
+    """Test keys, audio roundtrip and eviction"""
+
+    def test_roundtrip_writes_audio(self, cache, temp_dir):
+        """Test a stored line is written back byte for byte on hit"""
+        key = cache.make_key("OpenAI TTS", "nova", "Xin chào các bạn", extra={'model': "tts-1"})
+        cache.put(key, write_audio(os.path.join(temp_dir, "raw.mp3"), b"ID3-fake-mp3"), "OpenAI TTS", "nova")
+
+        out_path = os.path.join(temp_dir, "rawtts_0001.mp3")
+        assert cache.get(key, out_path) is True
+        with open(out_path, "rb") as f:
+            assert f.read() == b"ID3-fake-mp3"
+        assert cache.get("missing", os.path.join(temp_dir, "x.mp3")) is False
+        assert cache.get_stats()['hits'] == 1
+        assert cache.get_stats()['misses'] == 1
+
+    def test_key_parts(self, cache):
+        """Test voice, rate, pitch, SSML and settings change the key; whitespace does not"""
+        base = cache.make_key("Google Cloud TTS", "vi-VN-Neural2-A", "Xin chào  các bạn\n")
+
+        assert cache.make_key("Google Cloud TTS", "vi-VN-Neural2-A", " Xin chào các bạn") == base
+        assert cache.make_key("Google Cloud TTS", "vi-VN-Neural2-D", "Xin chào các bạn") != base
+        assert cache.make_key("Google Cloud TTS", "vi-VN-Neural2-A", "Xin chào các bạn", speaking_rate=1.2) != base
+        assert cache.make_key("Google Cloud TTS", "vi-VN-Neural2-A", "Xin chào các bạn", pitch=2.0) != base
+        assert cache.make_key("Google Cloud TTS", "vi-VN-Neural2-A", "Xin chào các bạn", ssml=True) != base
+        assert cache.make_key("OpenAI TTS", "vi-VN-Neural2-A", "Xin chào các bạn") != base
+        assert cache.make_key("Google Cloud TTS", "vi-VN-Neural2-A", "Xin chào các bạn!") != base
+
+    def test_evicts_least_recently_used(self, cache, temp_dir):
+        """Test the disk quota evicts the oldest lines"""
+        audio = write_audio(os.path.join(temp_dir, "raw.mp3"), os.urandom(4096))
+        cache.put("a", audio)
+        cache.put("b", audio)
+        entry_size = cache.get_stats()['size_bytes'] // 2
+        cache.max_size_bytes = int(entry_size * 2.5)
+        cache.get("a", os.path.join(temp_dir, "a.mp3"))
+        cache.put("c", audio)
+
+        assert cache.get("b", os.path.join(temp_dir, "b.mp3")) is False
+        assert cache.get("a", os.path.join(temp_dir, "a.mp3")) is True
+        assert cache.get_stats()['evictions'] == 1
+
+    def test_disabled_cache_is_bypassed(self, temp_dir, mock_logger):
+        """Test nothing is stored or returned when the cache is disabled"""
+        from services.tts_cache import TTSCache
+
+        tc = TTSCache(os.path.join(temp_dir, "off.sqlite3"), enabled=False, logger=mock_logger)
+        tc.put("a", write_audio(os.path.join(temp_dir, "raw.mp3"), b"data"))
+
+        assert tc.get("a", os.path.join(temp_dir, "a.mp3")) is False
+        assert tc.get_stats()['entries'] == 0
+        tc.close()
+
+
+def load_app_methods(*names):
+    """Compile SubtitleApp methods from Piu.py without importing the app (and its UI dependencies)"""
+    import ast
+    import logging
+
+    with open(os.path.join(project_root, "Piu.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    app_class = next(n for n in tree.body if isinstance(n, ast.ClassDef) and n.name == "SubtitleApp")
+    methods = [n for n in app_class.body if isinstance(n, ast.FunctionDef) and n.name in names]
+    namespace = {'os': os, 'logging': logging, 'messagebox': None, 'PLAYSOUND_AVAILABLE': False, 'playsound': None}
+    exec(compile(ast.Module(body=methods, type_ignores=[]), "Piu.py", "exec"), namespace)
+    return {name: namespace[name] for name in names}
+
+
+class TestGttsBatchCall:
+    """Test the batch gTTS call writes and caches the line on a miss"""
+
+    def test_cache_miss_batch_call(self, cache, temp_dir, monkeypatch):
+        """Test a cache-miss batch call succeeds, stores the raw audio and a repeat is a hit"""
+        import threading
+        import types
+
+        saved = []
+
+        class FakeGTTS:
+            def __init__(self, text, lang, slow):
+                self.text = text
+
+            def save(self, path):
+                saved.append(self.text)
+                write_audio(path, b"ID3-gtts-" + self.text.encode("utf-8"))
+
+        gtts_module = types.ModuleType("gtts")
+        gtts_module.gTTS = FakeGTTS
+        gtts_tts_module = types.ModuleType("gtts.tts")
+        gtts_tts_module.gTTSError = type("gTTSError", (Exception,), {})
+        monkeypatch.setitem(sys.modules, "gtts", gtts_module)
+        monkeypatch.setitem(sys.modules, "gtts.tts", gtts_tts_module)
+
+        methods = load_app_methods("dub_speak_with_gtts", "_dub_tts_cache_key",
+                                   "_dub_tts_cache_restore", "_dub_tts_cache_store")
+        app = types.SimpleNamespace(dub_is_processing=True, dub_stop_event=threading.Event(), tts_cache=cache,
+                                    after=lambda *args: None)
+        for name, fn in methods.items():
+            setattr(app, name, types.MethodType(fn, app))
+
+        first = os.path.join(temp_dir, "rawtts_0001.mp3")
+        assert app.dub_speak_with_gtts("Xin chào", first) is True
+        with open(first, "rb") as f:
+            assert f.read() == "ID3-gtts-Xin chào".encode("utf-8")
+        assert cache.get_stats()['misses'] == 1
+
+        second = os.path.join(temp_dir, "rawtts_0002.mp3")
+        assert app.dub_speak_with_gtts("Xin chào", second) is True
+        assert saved == ["Xin chào"]
+        assert cache.get_stats()['hits'] == 1
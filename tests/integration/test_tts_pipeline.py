@@ -0,0 +1,128 @@
+"""
+Integration tests for the parallel TTS synthesis stage
+"""
+import pytest
+import sys
+import os
+import threading
+import time
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+def make_jobs(count):
+    return [(i, f"Câu số {i}", f"rawtts_{i:04d}.mp3") for i in range(count)]
+
+
+class TestParallelTTSSynthesizer:
+    """Test concurrency, ordering and per-segment retries"""
+
+    def test_results_in_order_with_bounded_concurrency(self, mock_logger):
+        """Test requests overlap up to max_workers and results keep script order"""
+        from services.tts_pipeline import ParallelTTSSynthesizer
+
+        lock = threading.Lock()
+        active = {'now': 0, 'peak': 0}
+
+        def speak(text, output_path):
+            with lock:
+                active['now'] += 1
+                active['peak'] = max(active['peak'], active['now'])
+            # Segment đầu chậm nhất: kết quả vẫn phải ra đúng thứ tự
+            time.sleep(0.05 if output_path.endswith("0000.mp3") else 0.01)
+            with lock:
+                active['now'] -= 1
+            return True
+
+        synthesizer = ParallelTTSSynthesizer(speak, "OpenAI TTS", max_workers=4,
+                                             requests_per_minute=None, logger=mock_logger)
+        results = list(synthesizer.run(make_jobs(20)))
+
+        assert [job_id for job_id, _ in results] == list(range(20))
+        assert all(result is True for _, result in results)
+        assert 1 < active['peak'] <= 4
+
+    def test_failed_segment_retried_alone(self, mock_logger):
+        """Test a failing segment is retried; API error codes are not"""
+        from services.tts_pipeline import ParallelTTSSynthesizer
+
+        calls = {}
+
+        def speak(text, output_path):
+            calls[output_path] = calls.get(output_path, 0) + 1
+            if output_path.endswith("0001.mp3"):
+                return calls[output_path] >= 2
+            if output_path.endswith("0002.mp3"):
+                return "ERROR_OPENAI_API_KEY_MISSING"
+            if output_path.endswith("0003.mp3"):
+                raise ConnectionError("mất mạng")
+            return True
+
+        synthesizer = ParallelTTSSynthesizer(speak, "OpenAI TTS", max_workers=2, max_retries=2,
+                                             retry_delay_s=0.01, logger=mock_logger)
+        results = dict(synthesizer.run(make_jobs(4)))
+
+        assert results[0] is True and results[1] is True
+        assert results[2] == "ERROR_OPENAI_API_KEY_MISSING"
+        assert results[3] is False
+        assert calls["rawtts_0000.mp3"] == 1
+        assert calls["rawtts_0001.mp3"] == 2
+        assert calls["rawtts_0002.mp3"] == 1
+        assert calls["rawtts_0003.mp3"] == 3
+        assert synthesizer.failed_segments == 1
+
+    def test_every_attempt_takes_a_limiter_token(self, mock_logger):
+        """Test retries go through the rate limiter like first attempts"""
+        from services.tts_pipeline import ParallelTTSSynthesizer
+
+        calls = []
+
+        def speak(text, output_path):
+            calls.append(output_path)
+            return len(calls) >= 3
+
+        synthesizer = ParallelTTSSynthesizer(speak, "OpenAI TTS", max_workers=1, max_retries=2,
+                                             retry_delay_s=0.01, logger=mock_logger)
+        acquired = []
+        original_acquire = synthesizer.limiter.acquire
+        synthesizer.limiter.acquire = lambda *args, **kwargs: acquired.append(1) or original_acquire(*args, **kwargs)
+
+        assert dict(synthesizer.run(make_jobs(1))) == {0: True}
+        assert len(calls) == 3
+        assert len(acquired) == len(calls)
+
+    def test_stop_cancels_pending_segments(self, mock_logger):
+        """Test the stop flag ends the stage without sending the remaining segments"""
+        from services.tts_pipeline import ParallelTTSSynthesizer
+
+        stop_event = threading.Event()
+        sent = []
+
+        def speak(text, output_path):
+            sent.append(output_path)
+            return True
+
+        synthesizer = ParallelTTSSynthesizer(speak, "OpenAI TTS", max_workers=2,
+                                             stop_check=stop_event.is_set, logger=mock_logger)
+        received = []
+        for job_id, result in synthesizer.run(make_jobs(100)):
+            received.append(job_id)
+            if job_id == 2:
+                stop_event.set()
+
+        assert received[:3] == [0, 1, 2]
+        assert len(sent) < 100
+
+
+@pytest.mark.parametrize("engine,expected_workers", [
+    ("OpenAI TTS", 8), ("Google Translate (gTTS)", 3), ("Giọng đọc Hệ thống (Offline)", 1),
+])
+def test_engine_limits(engine, expected_workers):
+    """Test per-engine defaults and the config override (never for the system voice)"""
+    from services.tts_pipeline import get_engine_limits
+
+    assert get_engine_limits(engine)[0] == expected_workers
+    overridden = get_engine_limits(engine, {"dub_tts_max_workers": 5})[0]
+    assert overridden == (1 if expected_workers == 1 else 5)
@@ -0,0 +1,66 @@
+"""
+Integration tests for the shared Silero VAD service (with a fake model)
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+np = pytest.importorskip("numpy")
+
+
+def make_service(monkeypatch, calls):
+    """VADService whose get_speech_timestamps reports samples above 0.5 as speech"""
+    from services import vad_service
+
+    monkeypatch.setattr(vad_service, "HAS_TORCH", False)
+
+    def fake_get_speech_timestamps(audio, model, sampling_rate, min_speech_duration_ms, **kwargs):
+        calls.append(len(audio))
+        loud = np.flatnonzero(np.asarray(audio) > 0.5)
+        if len(loud) == 0:
+            return []
+        return [{'start': int(loud[0]), 'end': int(loud[-1]) + 1}]
+
+    service = vad_service.VADService()
+    service._model = object()
+    service._get_speech_timestamps = fake_get_speech_timestamps
+    return service
+
+
+class TestVADService:
+    """Test prefix-first analysis and speech regions"""
+
+    def test_speech_in_prefix_analyses_prefix_only(self, monkeypatch):
+        """Test early speech is found without touching the rest of the file"""
+        calls = []
+        service = make_service(monkeypatch, calls)
+        audio = np.zeros(16000 * 600, dtype=np.float32)
+        audio[16000 * 5:16000 * 6] = 1.0
+
+        assert service.find_first_speech(audio, prefix_seconds=60) == pytest.approx(5.0)
+        assert calls == [16000 * 60]
+
+    def test_widens_until_speech_found(self, monkeypatch):
+        """Test late speech is found by widening the window"""
+        calls = []
+        service = make_service(monkeypatch, calls)
+        audio = np.zeros(16000 * 600, dtype=np.float32)
+        audio[16000 * 200:16000 * 201] = 1.0
+
+        assert service.find_first_speech(audio, prefix_seconds=60) == pytest.approx(200.0)
+        assert calls == [16000 * 60, 16000 * (240 - 59)]
+
+    def test_no_speech_and_regions(self, monkeypatch):
+        """Test silence returns None and regions are reported in seconds"""
+        calls = []
+        service = make_service(monkeypatch, calls)
+        silence = np.zeros(16000 * 10, dtype=np.float32)
+        assert service.find_first_speech(silence, prefix_seconds=2) is None
+
+        audio = silence.copy()
+        audio[16000 * 2:16000 * 3] = 1.0
+        assert service.get_speech_regions(audio) == [(2.0, 3.0)]
@@ -0,0 +1,77 @@
+"""
+Integration tests for the pluggable Whisper backends (faster-whisper adapter)
+"""
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+class FakeCT2Model:
+    """Stand-in for faster_whisper.WhisperModel"""
+
+    def __init__(self):
+        self.options = None
+
+    def transcribe(self, audio, **options):
+        self.options = options
+        words = [SimpleNamespace(word=" Xin", start=0.0, end=0.4, probability=0.9)]
+        segments = (
+            SimpleNamespace(start=0.0, end=1.0, text=" Xin chào.", words=words),
+            SimpleNamespace(start=1.2, end=2.0, text=" Tạm biệt.", words=None),
+        )
+        return iter(segments), SimpleNamespace(language="vi")
+
+
+class TestFasterWhisperBackend:
+    """Test the CTranslate2 adapter keeps the openai-whisper result shape"""
+
+    def test_result_shape_and_option_names(self, mock_logger):
+        """Test segments become whisper dicts and options are renamed/filtered"""
+        from services.whisper_backends import FasterWhisperModel
+
+        fake = FakeCT2Model()
+        model = FasterWhisperModel(fake, "int8", mock_logger)
+
+        result = model.transcribe("a.wav", fp16=False, beam_size=5, logprob_threshold=-0.8, language="vi")
+
+        assert fake.options == {'beam_size': 5, 'log_prob_threshold': -0.8, 'language': 'vi'}
+        assert result['language'] == "vi"
+        assert result['text'] == " Xin chào. Tạm biệt."
+        assert [(s['id'], s['start'], s['end']) for s in result['segments']] == [(0, 0.0, 1.0), (1, 1.2, 2.0)]
+        assert result['segments'][0]['words'][0]['word'] == " Xin"
+        assert 'words' not in result['segments'][1]
+
+    def test_compute_type_and_fallback(self, mock_logger, monkeypatch):
+        """Test CPU compute types and fallback to openai-whisper when missing"""
+        import services.whisper_backends as backends
+
+        backend = backends.FasterWhisperBackend("int8_float16", logger=mock_logger)
+        assert backend.compute_type_for_device("cpu") == "int8"
+        assert backend.compute_type_for_device("cuda") == "int8_float16"
+        assert backend.bytes_per_param == 1
+
+        monkeypatch.setattr(backends, "HAS_FASTER_WHISPER", False)
+        assert backends.create_whisper_backend("faster-whisper", logger=mock_logger).name == "openai-whisper"
+        with pytest.raises(ValueError):
+            backends.FasterWhisperBackend("int4")
+
+    def test_incomplete_backend_fails_on_construction(self):
+        """Test a backend missing an interface method cannot be instantiated"""
+        from services.whisper_backends import WhisperBackend
+
+        class NoAudioBackend(WhisperBackend):
+            name = "no-audio"
+
+            def is_available(self):
+                return True
+
+            def load_model(self, model_name, device):
+                return None
+
+        with pytest.raises(TypeError):
+            NoAudioBackend()
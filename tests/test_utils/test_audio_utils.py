@@ -0,0 +1,65 @@
+"""
+Unit tests for audio window planning
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.mark.unit
+class TestPlanAudioWindows:
+    """Test silence-aligned window planning"""
+
+    def test_short_audio_single_window(self):
+        """Test audio shorter than a window is not split"""
+        from utils.audio_utils import plan_audio_windows
+
+        audio = np.ones(16000 * 5, dtype=np.float32)
+        assert plan_audio_windows(audio, window_seconds=10) == [(0, len(audio))]
+
+    def test_cuts_at_quiet_points(self):
+        """Test windows cover the audio contiguously and cut inside the silence"""
+        from utils.audio_utils import plan_audio_windows
+
+        sr = 16000
+        audio = np.ones(sr * 30, dtype=np.float32)
+        audio[int(sr * 8.5):int(sr * 8.6)] = 0.0
+
+        windows = plan_audio_windows(audio, sample_rate=sr, window_seconds=10, search_seconds=3)
+
+        assert windows[0][0] == 0 and windows[-1][1] == len(audio)
+        assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+        assert int(sr * 8.5) <= windows[0][1] <= int(sr * 8.6)
+
+
+@pytest.mark.unit
+class TestSpeechGating:
+    """Test speech-region gating and timestamp remapping"""
+
+    def test_merge_pads_and_joins_close_regions(self):
+        """Test padding, merging of short gaps and clamping to the audio"""
+        from utils.audio_utils import merge_speech_regions
+
+        regions = [(0.1, 1.0), (1.5, 2.0), (10.0, 12.0), (29.9, 30.0)]
+        merged = merge_speech_regions(regions, total_seconds=30.0, pad_seconds=0.2, merge_gap_seconds=1.0)
+
+        assert merged == [(0.0, 2.2), (9.8, 12.2), (29.7, 30.0)]
+
+    def test_gated_times_map_back_to_original(self):
+        """Test times in the gated audio map to the original timeline"""
+        from utils.audio_utils import build_gated_audio, remap_gated_time
+
+        sr = 16000
+        audio = np.zeros(sr * 60, dtype=np.float32)
+        gated, mapping = build_gated_audio(audio, [(10.0, 15.0), (40.0, 42.0)], sr, separator_seconds=0.5)
+
+        assert len(gated) == sr * (5 + 0.5 + 2)
+        assert remap_gated_time(1.0, mapping, sr) == pytest.approx(11.0)
+        assert remap_gated_time(5.2, mapping, sr) == pytest.approx(15.0)
+        assert remap_gated_time(6.5, mapping, sr) == pytest.approx(41.0)
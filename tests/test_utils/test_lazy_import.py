@@ -0,0 +1,84 @@
+"""
+Unit tests for the lazy import facade and the import-time report
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from utils.lazy_import import (
+    lazy_import, lazy_import_attr, is_module_available, get_lazy_import_timings,
+    parse_import_time_report, format_import_time_report
+)
+
+
+@pytest.fixture
+def fake_module(temp_dir, monkeypatch):
+    """A throwaway module that counts how often it is executed"""
+    with open(os.path.join(temp_dir, "piu_lazy_fake.py"), "w", encoding="utf-8") as f:
+        f.write("import builtins\n"
+                "builtins.piu_lazy_fake_loads = getattr(builtins, 'piu_lazy_fake_loads', 0) + 1\n"
+                "VALUE = 42\n"
+                "class Greeter:\n"
+                "    PREFIX = 'xin chào'\n"
+                "    def __init__(self, name):\n"
+                "        self.text = f'{self.PREFIX} {name}'\n")
+    monkeypatch.syspath_prepend(temp_dir)
+    monkeypatch.delitem(sys.modules, "piu_lazy_fake", raising=False)
+    import builtins
+    monkeypatch.setattr(builtins, "piu_lazy_fake_loads", 0, raising=False)
+    yield builtins
+    sys.modules.pop("piu_lazy_fake", None)
+
+
+@pytest.mark.unit
+class TestLazyImport:
+    """Test modules are imported on first use only"""
+
+    def test_module_imported_on_first_attribute(self, fake_module):
+        """Test the proxy defers the import and then forwards attributes"""
+        module = lazy_import("piu_lazy_fake")
+        assert fake_module.piu_lazy_fake_loads == 0
+        assert "piu_lazy_fake" not in sys.modules
+
+        assert module.VALUE == 42
+        assert module.VALUE == 42
+        assert fake_module.piu_lazy_fake_loads == 1
+        assert "piu_lazy_fake" in get_lazy_import_timings()
+
+    def test_attribute_proxy_call_and_getattr(self, fake_module):
+        """Test a lazy class can be called and its attributes read"""
+        greeter_cls = lazy_import_attr("piu_lazy_fake", "Greeter")
+        assert fake_module.piu_lazy_fake_loads == 0
+
+        assert greeter_cls.PREFIX == "xin chào"
+        assert greeter_cls("Piu").text == "xin chào Piu"
+        assert fake_module.piu_lazy_fake_loads == 1
+
+    def test_is_module_available_does_not_import(self, fake_module):
+        """Test availability checks only look up the package"""
+        assert is_module_available("piu_lazy_fake") is True
+        assert is_module_available("piu_module_that_does_not_exist") is False
+        assert fake_module.piu_lazy_fake_loads == 0
+
+
+@pytest.mark.unit
+def test_import_time_report():
+    """Test -X importtime output is parsed and sorted by cumulative time"""
+    text = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |   typing_extensions\n"
+        "import time:      2000 |       2100 | pysubs2\n"
+        "import time:      3000 |    4500000 | torch\n"
+    )
+    entries = parse_import_time_report(text)
+
+    assert entries[0] == ("typing_extensions", 100, 100, 1)
+    assert entries[2] == ("torch", 3000, 4500000, 0)
+
+    report = format_import_time_report(entries, top=1).splitlines()
+    assert len(report) == 3
+    assert report[2].split()[-1] == "torch"
@@ -0,0 +1,82 @@
+"""
+Unit tests for the token-bucket rate limiter
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+
+class FakeClock:
+    """Manual clock: sleep() advances time instantly"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.mark.unit
+class TestTokenBucketRateLimiter:
+    """Test RPM/TPM limiting and back-off"""
+
+    def test_requests_per_minute(self):
+        """Test burst up to RPM, then one request per 60/RPM seconds"""
+        from utils.rate_limiter import TokenBucketRateLimiter
+
+        clock = FakeClock()
+        limiter = TokenBucketRateLimiter(requests_per_minute=60, clock=clock, sleep=clock.sleep)
+
+        for _ in range(60):
+            assert limiter.acquire()
+        assert clock.now == 0.0
+
+        limiter.acquire()
+        assert clock.now == pytest.approx(1.0, abs=0.01)
+
+    def test_tokens_per_minute(self):
+        """Test token budget throttles large requests"""
+        from utils.rate_limiter import TokenBucketRateLimiter
+
+        clock = FakeClock()
+        limiter = TokenBucketRateLimiter(tokens_per_minute=600, clock=clock, sleep=clock.sleep)
+
+        limiter.acquire(tokens=600)
+        limiter.acquire(tokens=300)
+
+        assert clock.now == pytest.approx(30.0, abs=0.01)
+
+    def test_rate_limited_pauses_and_recovers(self):
+        """Test 429 pauses callers, lowers the rate, and success restores it"""
+        from utils.rate_limiter import TokenBucketRateLimiter
+
+        clock = FakeClock()
+        limiter = TokenBucketRateLimiter(requests_per_minute=600, clock=clock, sleep=clock.sleep)
+
+        backoff = limiter.report_rate_limited(retry_after=5)
+        assert backoff == 5
+        assert limiter.rate_factor == 0.5
+
+        limiter.acquire()
+        assert clock.now >= 5.0
+
+        for _ in range(100):
+            limiter.report_success()
+        assert limiter.rate_factor == 1.0
+
+    def test_stop_check_aborts_wait(self):
+        """Test acquire returns False when stop is requested"""
+        from utils.rate_limiter import TokenBucketRateLimiter
+
+        clock = FakeClock()
+        limiter = TokenBucketRateLimiter(requests_per_minute=1, clock=clock, sleep=clock.sleep)
+        limiter.acquire()
+
+        assert limiter.acquire(stop_check=lambda: clock.now > 10) is False
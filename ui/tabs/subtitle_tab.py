@@ -27,9 +27,15 @@ from utils.helpers import (open_file_with_default_app, get_default_downloads_fol
                           play_sound_async)
 from utils.srt_utils import format_srt_data_to_string, extract_dialogue_from_srt_string
 from utils.ffmpeg_utils import find_ffprobe
-from config.constants import APP_NAME
+from config.constants import (APP_NAME, OPENAI_TRANSLATE_DEFAULT_MAX_WORKERS, OPENAI_TRANSLATE_DEFAULT_RPM,
+                              OPENAI_TRANSLATE_DEFAULT_TPM, OPENAI_TRANSLATE_DEFAULT_BATCH_SIZE,
+                              OPENAI_TRANSLATE_DEFAULT_BATCH_MAX_CHARS)
 from utils.keep_awake import KeepAwakeManager
+from utils.lazy_import import lazy_import, is_module_available
 from services.ffmpeg_service import run_ffmpeg_command as ffmpeg_run_command
+from services.google_client_pool import get_google_translate_client
+from services.translation_cache import translate_with_memory
+from services.translation_service import get_engine_key as get_translation_engine_key, translate_subtitle_content
 
 # Import playsound và định nghĩa PLAYSOUND_AVAILABLE
 try:
@@ -40,13 +46,9 @@ except ImportError:
     PLAYSOUND_AVAILABLE = False
     playsound = None
 
-# Import pysubs2
-try:
-    import pysubs2
-    HAS_PYSUBS2 = True
-except ImportError:
-    HAS_PYSUBS2 = False
-    pysubs2 = None
+# Import pysubs2 (lazy: chỉ import khi hardsub lần đầu)
+HAS_PYSUBS2 = is_module_available("pysubs2")
+pysubs2 = lazy_import("pysubs2") if HAS_PYSUBS2 else None
 
 # Helper để sử dụng keep_awake
 @contextmanager
@@ -83,12 +85,9 @@ except ImportError:
     HAS_UNDERTHESEA = False
     sent_tokenize = None
 
-try:
-    import whisper
-    HAS_WHISPER = True
-except ImportError:
-    HAS_WHISPER = False
-    whisper = None
+# whisper kéo theo torch (vài giây): chỉ kiểm tra có cài đặt, import khi dùng
+HAS_WHISPER = is_module_available("whisper")
+whisper = lazy_import("whisper") if HAS_WHISPER else None
 
 
 class SubtitleTab(ctk.CTkFrame):
@@ -2540,57 +2539,32 @@ class SubtitleTab(ctk.CTkFrame):
         logging.info(f"Bắt đầu đọc và xử lý file '{base_input_name}'...")
         try:
             with open(input_srt, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-            logging.debug(f"Đã đọc {len(lines)} dòng từ file input.")
+                content = f.read()
+            logging.debug(f"Đã đọc {len(content)} ký tự từ file input.")
         except Exception as e:
             logging.error(f"Lỗi đọc file phụ đề để dịch '{input_srt}': {e}", exc_info=True)
             # Ném lại lỗi để luồng cha xử lý
             raise IOError(f"Lỗi đọc file phụ đề để dịch: {e}")
 
-        output_lines = []
-        block = []
-        processed_blocks = 0
-        # Lặp qua các dòng để xử lý từng khối
-        for line in lines:
-            # Kiểm tra dừng giữa các khối
-            if self.master_app.stop_event.is_set():
-                logging.warning("Yêu cầu dừng trong quá trình xử lý khối phụ đề.")
-                raise InterruptedError("Dừng bởi người dùng khi đang dịch file.")
-
-            if line.strip() == "": # Kết thúc một khối
-                if block:
-                    # Gọi _translate_block đã sửa (không cần truyền translator nữa)
-                    translated_block_lines = self._translate_block(block, target_lang, bilingual)
-                    output_lines.extend(translated_block_lines)
-                    processed_blocks += 1
-                    logging.debug(f"Đã xử lý xong khối {processed_blocks}")
-                # output_lines.append("\n") # Không cần thêm dòng trống ở đây vì _translate_block đã xử lý
-                block = [] # Bắt đầu khối mới
-            else:
-                block.append(line.strip() + "\n") # Thêm lại ký tự xuống dòng chuẩn
-
-        # Xử lý khối cuối cùng nếu file không kết thúc bằng dòng trống
-        if block:
-            logging.debug("Đang xử lý khối cuối cùng...")
-            translated_block_lines = self._translate_block(block, target_lang, bilingual)
-            output_lines.extend(translated_block_lines)
-            processed_blocks += 1
-            logging.debug(f"Đã xử lý xong khối cuối cùng (Tổng cộng: {processed_blocks}).")
+        # Dịch cả file theo batch (thay vì gọi API cho từng khối)
+        final_output_content = translate_subtitle_content(
+            content,
+            translate_batch_fn=self.master_app._make_translate_batch_fn(selected_engine, target_lang),
+            engine_key=get_translation_engine_key(selected_engine),
+            bilingual=bilingual,
+            stop_check=lambda: self.master_app.stop_event.is_set(),
+            progress_callback=lambda done, total: logging.debug(f"Đã dịch xong batch {done}/{total}")
+        )
 
         # --- Ghi kết quả ra file output ---
         try:
-            # Đảm bảo file output kết thúc bằng một dòng trống (theo chuẩn SRT/VTT)
-            final_output_content = "".join(output_lines)
-            # Xóa các dòng trống thừa ở cuối và đảm bảo có 1 dòng trống cuối
-            final_output_content = final_output_content.rstrip() + "\n\n"
-
             with open(output_srt, "w", encoding="utf-8") as f:
                 f.write(final_output_content)
             logging.info(f"Đã lưu phụ đề đã dịch thành công vào: {output_srt}")
         except Exception as e:
             logging.error(f"Lỗi ghi file phụ đề đã dịch '{output_srt}': {e}", exc_info=True)
             # Ném lại lỗi để luồng cha xử lý
-            raise IOError(f"Lỗi ghi file phụ đề đã dịch: {e}")                 
+            raise IOError(f"Lỗi ghi file phụ đề đã dịch: {e}")
 
 
 
@@ -2625,37 +2599,43 @@ class SubtitleTab(ctk.CTkFrame):
             return None # Trả về None để hàm gọi biết là lỗi
 
         try:
-            # Load credentials từ file JSON đã cấu hình
-            credentials = service_account.Credentials.from_service_account_file(key_path)
-            # Khởi tạo Google Translate client
-            translate_client = google_translate.Client(credentials=credentials)
-
-            # Ghi log về yêu cầu dịch
-            logging.info(f"Đang gửi {len(text_list)} dòng tới Google Cloud API để dịch sang '{target_lang_code}'...")
-            if source_lang_code:
-                logging.info(f"  (Ngôn ngữ nguồn được chỉ định: '{source_lang_code}')")
-            else:
-                logging.info("  (Ngôn ngữ nguồn: Tự động phát hiện)")
-
-            results = translate_client.translate(
-                values=text_list, # Tham số values thay vì text_list ở một số phiên bản
-                target_language=target_lang_code,
-                source_language=source_lang_code if source_lang_code and source_lang_code != 'auto' else None
-            )
-
-            # Trích xuất kết quả
-            translated_texts = [result['translatedText'] for result in results]
-            logging.info(f"Google Cloud API đã dịch thành công {len(translated_texts)} dòng.")
-            # <-- BẮT ĐẦU THÊM MỚI -->
-            total_chars_translated = sum(len(text) for text in text_list)
-            self._track_api_call(service_name="google_translate_chars", units=total_chars_translated)
+            # Lấy client dùng chung từ pool (không parse lại file key / tạo TLS session mới mỗi lần gọi)
+            translate_client = get_google_translate_client(key_path)
+
+            def _call_google_api(texts_to_send):
+                # Ghi log về yêu cầu dịch
+                logging.info(f"Đang gửi {len(texts_to_send)} dòng tới Google Cloud API để dịch sang '{target_lang_code}'...")
+                if source_lang_code:
+                    logging.info(f"  (Ngôn ngữ nguồn được chỉ định: '{source_lang_code}')")
+                else:
+                    logging.info("  (Ngôn ngữ nguồn: Tự động phát hiện)")
 
-            # Kiểm tra xem số lượng kết quả có khớp không (phòng trường hợp lạ)
-            if len(translated_texts) != len(text_list):
-                 logging.warning(f"Số lượng dòng trả về ({len(translated_texts)}) từ Google Cloud không khớp với số lượng gửi đi ({len(text_list)})!")
-                 return None
+                results = translate_client.translate(
+                    values=texts_to_send, # Tham số values thay vì text_list ở một số phiên bản
+                    target_language=target_lang_code,
+                    source_language=source_lang_code if source_lang_code and source_lang_code != 'auto' else None
+                )
 
-            return translated_texts # Trả về danh sách các dòng đã dịch
+                # Trích xuất kết quả
+                translated_texts = [result['translatedText'] for result in results]
+                logging.info(f"Google Cloud API đã dịch thành công {len(translated_texts)} dòng.")
+                # Chỉ tính phí các ký tự thực sự gửi đi (không tính dòng lấy từ cache)
+                total_chars_translated = sum(len(text) for text in texts_to_send)
+                self._track_api_call(service_name="google_translate_chars", units=total_chars_translated)
+
+                # Kiểm tra xem số lượng kết quả có khớp không (phòng trường hợp lạ)
+                if len(translated_texts) != len(texts_to_send):
+                     logging.warning(f"Số lượng dòng trả về ({len(translated_texts)}) từ Google Cloud không khớp với số lượng gửi đi ({len(texts_to_send)})!")
+                     return None
+                return translated_texts
+
+            # Tra cache dịch (translation memory) trước, chỉ gửi các dòng chưa có lên API
+            return translate_with_memory(
+                self.master_app.translation_memory, text_list, _call_google_api,
+                engine="google_cloud", model="v2",
+                target_lang=target_lang_code,
+                source_lang=source_lang_code if source_lang_code and source_lang_code != 'auto' else None
+            )
 
         except Exception as e:
             # Xử lý các lỗi có thể xảy ra khi gọi API
@@ -2709,7 +2689,7 @@ class SubtitleTab(ctk.CTkFrame):
                           hoặc None nếu có lỗi nghiêm trọng (thiếu key/thư viện).
         """
         # Lấy API key
-        api_key = self.openai_key_var.get()
+        api_key = self.master_app.openai_key_var.get()
         if not api_key:
             logging.error("OpenAI API Key bị thiếu trong cấu hình.")
             self.master_app.after(0, lambda: messagebox.showerror("Thiếu Key OpenAI",
@@ -2720,8 +2700,8 @@ class SubtitleTab(ctk.CTkFrame):
         # Lấy phong cách dịch đã chọn
         selected_style = "Mặc định (trung tính)"
         try:
-            if hasattr(self, 'openai_translation_style_var'):
-                selected_style = self.openai_translation_style_var.get()
+            if hasattr(self.master_app, 'openai_translation_style_var'):
+                selected_style = self.master_app.openai_translation_style_var.get()
                 logging.info(f"Sẽ yêu cầu dịch OpenAI với phong cách: '{selected_style}'")
             else:
                 logging.warning("Không tìm thấy biến openai_translation_style_var. Sử dụng phong cách mặc định.")
@@ -2730,14 +2710,22 @@ class SubtitleTab(ctk.CTkFrame):
 
         # Gọi AI Service để dịch
         try:
-            translated_texts, error_message = self.ai_service.translate_with_openai(
+            cfg = self.master_app.cfg
+            translated_texts, error_message = self.master_app.ai_service.translate_with_openai(
                 text_list=text_list,
                 target_lang=target_lang,
                 api_key=api_key,
                 source_lang=source_lang,
                 translation_style=selected_style,
                 model_name="gpt-3.5-turbo",
-                stop_event=lambda: self.stop_event.is_set()
+                stop_event=lambda: self.master_app.stop_event.is_set(),
+                # Gửi song song, giới hạn theo RPM/TPM của tài khoản (cấu hình trong config.json)
+                max_workers=safe_int(cfg.get("openai_translate_max_workers"), OPENAI_TRANSLATE_DEFAULT_MAX_WORKERS),
+                requests_per_minute=safe_int(cfg.get("openai_translate_rpm"), OPENAI_TRANSLATE_DEFAULT_RPM),
+                tokens_per_minute=safe_int(cfg.get("openai_translate_tpm"), OPENAI_TRANSLATE_DEFAULT_TPM),
+                # Gom nhiều dòng vào một prompt (1 = tắt, mỗi dòng một yêu cầu)
+                batch_size=safe_int(cfg.get("openai_translate_batch_size"), OPENAI_TRANSLATE_DEFAULT_BATCH_SIZE),
+                batch_max_chars=safe_int(cfg.get("openai_translate_batch_max_chars"), OPENAI_TRANSLATE_DEFAULT_BATCH_MAX_CHARS)
             )
             
             if error_message:
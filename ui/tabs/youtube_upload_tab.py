@@ -34,35 +34,11 @@ from utils.keep_awake import KeepAwakeManager
 from utils.system_utils import cleanup_stale_chrome_processes
 from utils.logging_utils import log_failed_task
 
-# Selenium imports (optional)
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.common.keys import Keys
-    from selenium.webdriver.common.action_chains import ActionChains
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from selenium.common.exceptions import (
-        TimeoutException,
-        ElementClickInterceptedException,
-        StaleElementReferenceException,
-        WebDriverException,
-        NoSuchWindowException,
-        NoSuchElementException
-    )
-    from webdriver_manager.chrome import ChromeDriverManager
-    HAS_SELENIUM = True
-except ImportError:
-    webdriver = None
-    Service = None
-    By = None
-    Keys = None
-    ActionChains = None
-    WebDriverWait = None
-    EC = None
-    ChromeDriverManager = None
-    HAS_SELENIUM = False
+# Selenium (lazy): chỉ được import khi bắt đầu upload bằng trình duyệt.
+# Exception trong 'except' dùng selenium_exceptions.<Tên>.
+from services.youtube_browser_upload_service import (
+    HAS_SELENIUM, webdriver, selenium_exceptions, By, Keys, ActionChains, WebDriverWait, EC, Service, ChromeDriverManager
+)
 
 # Google API imports
 try:
@@ -1768,11 +1744,11 @@ class YouTubeUploadTab(ctk.CTkFrame):
                         self._handle_youtube_upload_completion(True, None, "Phát hiện popup upload nhỏ, coi như thành công.", False)
                         return
 
-                    except NoSuchElementException: # Bây giờ Python đã biết NoSuchElementException là gì
+                    except selenium_exceptions.NoSuchElementException: # Bây giờ Python đã biết NoSuchElementException là gì
                         logging.info(f"{worker_log_prefix} ✅ Đã xác nhận giao diện upload đầy đủ. Tiếp tục quy trình...")
                         self._log_youtube_upload("Gặp giao diện upload đầy đủ, tiếp tục điền thông tin.")
 
-                except TimeoutException:
+                except selenium_exceptions.TimeoutException:
                     error_msg_no_ui = "Sau khi gửi file, không có giao diện upload nào của YouTube xuất hiện."
                     logging.error(f"{worker_log_prefix} {error_msg_no_ui}")
                     self._handle_youtube_upload_completion(False, None, error_msg_no_ui, False)
@@ -2463,16 +2439,16 @@ class YouTubeUploadTab(ctk.CTkFrame):
                                 logging.info(f"{worker_log_prefix} ✅ Popup 'Tải lên' đã biến mất. Upload thành công!")
                                 self._handle_youtube_upload_completion(True, uploaded_video_id, None, False)
                                 return
-                            except TimeoutException:
+                            except selenium_exceptions.TimeoutException:
                                 continue
 
-                    except TimeoutException:
+                    except selenium_exceptions.TimeoutException:
                         # 2) Không thấy popup trong 7s → video ngắn/redirect nhanh → coi như OK
                         logging.info(f"{worker_log_prefix} ✅ Không thấy popup 'Tải lên' sau 7s. Giả định upload đã hoàn tất.")
                         self._handle_youtube_upload_completion(True, uploaded_video_id, None, False)
                         return
 
-                except (StaleElementReferenceException, NoSuchWindowException, WebDriverException) as e:
+                except (selenium_exceptions.StaleElementReferenceException, selenium_exceptions.NoSuchWindowException, selenium_exceptions.WebDriverException) as e:
                     logging.info(f"{worker_log_prefix} ✅ UI đổi/đóng trong khi chờ ({type(e).__name__}). Giả định đã hoàn tất.")
                     self._handle_youtube_upload_completion(True, uploaded_video_id, None, False)
                     return        
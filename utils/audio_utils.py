@@ -0,0 +1,174 @@
+"""
+Audio utility functions for Piu application.
+
+Helpers working on decoded audio arrays (16 kHz mono float32, as returned by
+whisper.load_audio): planning transcription windows cut at quiet points, and
+gating audio to its speech regions with a timestamp map back to the original.
+"""
+
+from bisect import bisect_right
+from typing import List, Tuple
+
+# Optional imports with fallback
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    np = None
+
+WHISPER_SAMPLE_RATE = 16000
+# Khung tính năng lượng khi tìm điểm cắt (giây)
+ENERGY_FRAME_SECONDS = 0.03
+
+
+def find_quiet_cut(audio, start: int, end: int, sample_rate: int = WHISPER_SAMPLE_RATE) -> int:
+    """
+    Find the quietest point of audio[start:end].
+
+    Args:
+        audio: 1-D numpy array of samples
+        start: First sample of the search range
+        end: End sample (exclusive) of the search range
+        sample_rate: Sample rate of audio
+
+    Returns:
+        Sample index (center of the lowest-energy frame) inside [start, end).
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("Thư viện numpy chưa được cài đặt.")
+    frame = max(1, int(sample_rate * ENERGY_FRAME_SECONDS))
+    segment = np.asarray(audio[start:end], dtype=np.float32)
+    num_frames = len(segment) // frame
+    if num_frames < 2:
+        return (start + end) // 2
+    frames = segment[:num_frames * frame].reshape(num_frames, frame)
+    energy = np.mean(frames * frames, axis=1)
+    quietest = int(np.argmin(energy))
+    return start + quietest * frame + frame // 2
+
+
+def plan_audio_windows(
+    audio,
+    sample_rate: int = WHISPER_SAMPLE_RATE,
+    window_seconds: float = 120.0,
+    search_seconds: float = 10.0
+) -> List[Tuple[int, int]]:
+    """
+    Split audio into consecutive windows of about window_seconds, each cut at
+    the quietest point of the last search_seconds before the nominal boundary,
+    so that cuts fall between words rather than inside them.
+
+    Args:
+        audio: 1-D numpy array of samples
+        sample_rate: Sample rate of audio
+        window_seconds: Nominal window length
+        search_seconds: How far before the nominal boundary to look for a quiet point
+
+    Returns:
+        List of (start_sample, end_sample) covering the whole array without gaps.
+    """
+    total = len(audio)
+    window = max(1, int(window_seconds * sample_rate))
+    search = min(int(search_seconds * sample_rate), window // 2)
+    if total <= window:
+        return [(0, total)] if total else []
+
+    windows = []
+    start = 0
+    while total - start > window:
+        nominal_end = start + window
+        cut = find_quiet_cut(audio, nominal_end - search, nominal_end, sample_rate) if search > 0 else nominal_end
+        windows.append((start, cut))
+        start = cut
+    windows.append((start, total))
+    return windows
+
+
+def merge_speech_regions(
+    regions: List[Tuple[float, float]],
+    total_seconds: float,
+    pad_seconds: float = 0.4,
+    merge_gap_seconds: float = 1.0
+) -> List[Tuple[float, float]]:
+    """
+    Pad speech regions and merge those separated by short gaps.
+
+    Args:
+        regions: (start_s, end_s) speech regions in order (e.g. VADService.get_speech_regions)
+        total_seconds: Audio duration (regions are clamped to it)
+        pad_seconds: Padding added on both sides of each region
+        merge_gap_seconds: Regions closer than this (after padding) are merged
+
+    Returns:
+        Sorted, non-overlapping (start_s, end_s) list.
+    """
+    merged: List[List[float]] = []
+    for start, end in sorted(regions):
+        start = max(0.0, start - pad_seconds)
+        end = min(total_seconds, end + pad_seconds)
+        if end <= start:
+            continue
+        if merged and start - merged[-1][1] < merge_gap_seconds:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def build_gated_audio(
+    audio,
+    regions: List[Tuple[float, float]],
+    sample_rate: int = WHISPER_SAMPLE_RATE,
+    separator_seconds: float = 0.5
+):
+    """
+    Concatenate the speech regions of audio, separated by short silences.
+
+    Args:
+        audio: 1-D numpy array of samples
+        regions: Merged (start_s, end_s) regions (merge_speech_regions)
+        sample_rate: Sample rate of audio
+        separator_seconds: Silence inserted between regions so words never join across a cut
+
+    Returns:
+        Tuple of (gated_audio, mapping) where mapping is a list of
+        (gated_start_sample, original_start_sample, length) per region.
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("Thư viện numpy chưa được cài đặt.")
+    separator = np.zeros(int(separator_seconds * sample_rate), dtype=np.float32)
+    parts = []
+    mapping = []
+    position = 0
+    for start_s, end_s in regions:
+        start = max(0, int(start_s * sample_rate))
+        end = min(len(audio), int(end_s * sample_rate))
+        if end <= start:
+            continue
+        if parts:
+            parts.append(separator)
+            position += len(separator)
+        parts.append(np.asarray(audio[start:end], dtype=np.float32))
+        mapping.append((position, start, end - start))
+        position += end - start
+    gated = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+    return gated, mapping
+
+
+def remap_gated_time(
+    t: float,
+    mapping: List[Tuple[int, int, int]],
+    sample_rate: int = WHISPER_SAMPLE_RATE
+) -> float:
+    """
+    Map a time on the gated timeline (build_gated_audio) back to the original audio.
+    Times inside a separator snap to the end of the preceding region.
+    """
+    if not mapping:
+        return t
+    position = t * sample_rate
+    index = max(0, bisect_right([m[0] for m in mapping], position) - 1)
+    gated_start, original_start, length = mapping[index]
+    offset = min(max(0.0, position - gated_start), length)
+    return (original_start + offset) / sample_rate
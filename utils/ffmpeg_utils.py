@@ -10,7 +10,6 @@ import shutil
 import logging
 import subprocess
 import threading
-import platform
 from pathlib import Path
 from utils.helpers import create_safe_filename
 
@@ -104,7 +103,7 @@ def create_ffmpeg_concat_file_list(file_paths, output_list_file):
         return False
 
 
-def ffmpeg_split_media(input_path, output_folder, segment_duration_seconds=900):
+def ffmpeg_split_media(input_path, output_folder, segment_duration_seconds=900, split_points=None, audio_only=False):
     """
     Use FFmpeg to split a media file into smaller segments.
     Returns a list of paths to the created segment files.
@@ -113,6 +112,10 @@ def ffmpeg_split_media(input_path, output_folder, segment_duration_seconds=900):
         input_path: Path to input media file
         output_folder: Output directory for segments
         segment_duration_seconds: Duration of each segment in seconds (default: 900 = 15 minutes)
+        split_points: Optional explicit cut times in seconds (overrides segment_duration_seconds)
+        audio_only: If True, write 16 kHz mono PCM WAV segments. Cuts are then
+            sample-exact, so split_points can be used as exact timing offsets
+            (stream copy can only cut at keyframes).
         
     Returns:
         List of created segment file paths, or None if failed
@@ -122,21 +125,33 @@ def ffmpeg_split_media(input_path, output_folder, segment_duration_seconds=900):
     from services.ffmpeg_service import run_ffmpeg_command
 
     base_name, ext = os.path.splitext(os.path.basename(input_path))
+    if audio_only:
+        ext = ".wav"
     safe_base_name = create_safe_filename(base_name, remove_accents=False)
     output_pattern = os.path.join(output_folder, f"{safe_base_name}_part_%03d{ext}")
 
-    cmd_params = [
-        "-y",
-        "-i", os.path.abspath(input_path),
-        "-c", "copy",          # Sao chép codec, không mã hóa lại, rất nhanh
-        "-map", "0",           # Sao chép tất cả các luồng (video, audio, sub...)
-        "-segment_time", str(segment_duration_seconds), # Thời lượng mỗi đoạn (giây)
+    cmd_params = ["-y", "-i", os.path.abspath(input_path)]
+    if audio_only:
+        cmd_params += ["-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1"]
+    else:
+        cmd_params += [
+            "-c", "copy",          # Sao chép codec, không mã hóa lại, rất nhanh
+            "-map", "0",           # Sao chép tất cả các luồng (video, audio, sub...)
+        ]
+    if split_points:
+        cmd_params += ["-segment_times", ",".join(f"{t:.3f}" for t in split_points)]
+    else:
+        cmd_params += ["-segment_time", str(segment_duration_seconds)] # Thời lượng mỗi đoạn (giây)
+    cmd_params += [
         "-f", "segment",       # Chế độ chia file
         "-reset_timestamps", "1", # Reset timestamp cho mỗi file con
         os.path.abspath(output_pattern)
     ]
 
-    logging.info(f"{log_prefix} Bắt đầu chia file '{base_name}' thành các đoạn {segment_duration_seconds}s...")
+    if split_points:
+        logging.info(f"{log_prefix} Bắt đầu chia file '{base_name}' tại {len(split_points)} điểm cắt...")
+    else:
+        logging.info(f"{log_prefix} Bắt đầu chia file '{base_name}' thành các đoạn {segment_duration_seconds}s...")
     try:
         return_code, stdout_data, stderr_data = run_ffmpeg_command(
             cmd_params=cmd_params,
@@ -159,35 +174,3 @@ def ffmpeg_split_media(input_path, output_folder, segment_duration_seconds=900):
     except Exception as e:
         logging.error(f"{log_prefix} Lỗi không mong muốn khi chia file: {e}", exc_info=True)
         return None
-
-
-def get_video_duration_s(video_path_to_probe):
-    """
-    Get video duration in seconds using ffprobe.
-    Returns float duration or 0.0 if error.
-    
-    Args:
-        video_path_to_probe: Path to video file
-        
-    Returns:
-        Duration in seconds (float) or 0.0 if error
-    """
-    ffprobe_exe_path = find_ffprobe()
-    if not ffprobe_exe_path or not os.path.exists(video_path_to_probe):
-        logging.warning(f"[GetDuration] ffprobe không có hoặc file '{os.path.basename(video_path_to_probe)}' không tồn tại.")
-        return 0.0
-    try:
-        command = [ffprobe_exe_path, "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", video_path_to_probe]
-        creation_flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-        result = subprocess.run(command, capture_output=True, text=True, timeout=15, check=False, creationflags=creation_flags)
-        if result.returncode == 0 and result.stdout.strip() and result.stdout.strip().lower() != "n/a":
-            duration = float(result.stdout.strip())
-            logging.debug(f"[GetDuration] Thời lượng của '{os.path.basename(video_path_to_probe)}' là {duration:.3f}s")
-            return duration
-        else:
-            logging.warning(f"[GetDuration] ffprobe lỗi hoặc không trả về duration. Output: '{result.stdout.strip()}'.")
-            return 0.0
-    except Exception as e:
-        logging.error(f"[GetDuration] Exception khi lấy duration: {e}", exc_info=False)
-        return 0.0
-
@@ -0,0 +1,232 @@
+"""
+Lazy Import Utilities for Piu application.
+
+Heavy libraries (torch, whisper, selenium, pysubs2, ...) are imported on
+first use instead of at startup, so the splash screen can draw immediately:
+
+    torch = lazy_import("torch")              # module proxy
+    WebDriverWait = lazy_import_attr("selenium.webdriver.support.ui", "WebDriverWait")
+    HAS_TORCH = is_module_available("torch")  # no import, only a path lookup
+
+The real import happens on the first attribute access (or call) and its
+duration is recorded (see get_lazy_import_timings). Exception classes used
+in `except` clauses must be reached through a module proxy
+(`except selenium_exceptions.TimeoutException:`), never through
+lazy_import_attr.
+
+Run `python -m utils.lazy_import [module]` for a `-X importtime` report of
+the slowest imports at startup.
+"""
+
+import importlib
+import importlib.util
+import logging
+import re
+import subprocess
+import sys
+import threading
+import time
+import types
+from typing import Dict, Iterable, List, Tuple
+
+# Thời gian import thực tế (giây) của các module lazy, theo thứ tự được dùng đến
+_import_timings: Dict[str, float] = {}
+_import_lock = threading.RLock()
+
+
+def is_module_available(module_name: str) -> bool:
+    """
+    Check if a module can be imported, without importing it.
+
+    Only the top-level package is looked up, so no package code runs.
+    """
+    top_level = module_name.split(".", 1)[0]
+    if top_level in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(top_level) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _import_and_time(module_name: str):
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    with _import_lock:
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        elapsed = time.perf_counter() - started
+        if module_name not in _import_timings:
+            _import_timings[module_name] = elapsed
+            logging.debug(f"[LazyImport] Đã import '{module_name}' khi dùng lần đầu ({elapsed:.2f}s).")
+    return module
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports the real module on first attribute access."""
+
+    def __init__(self, module_name: str):
+        super().__init__(module_name)
+        self.__dict__["_lazy_module_name"] = module_name
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = _import_and_time(self.__dict__["_lazy_module_name"])
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__dict__['_lazy_module_name']}' ({state})>"
+
+
+class LazyAttribute:
+    """Proxy for a class or function of a module, imported on first call or attribute access."""
+
+    def __init__(self, module_name: str, attr_name: str):
+        self._module_name = module_name
+        self._attr_name = attr_name
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            self._target = getattr(_import_and_time(self._module_name), self._attr_name)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        return f"<lazy '{self._module_name}.{self._attr_name}'>"
+
+
+def lazy_import(module_name: str) -> LazyModule:
+    """
+    Return a proxy for module_name; the module is imported on first use.
+
+    Args:
+        module_name: Dotted module name, e.g. "torch" or "selenium.common.exceptions"
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    return LazyModule(module_name)
+
+
+def lazy_import_attr(module_name: str, attr_name: str) -> LazyAttribute:
+    """
+    Return a proxy for module_name.attr_name (a class or function), imported on first use.
+
+    Args:
+        module_name: Dotted module name
+        attr_name: Class or function name in that module
+    """
+    return LazyAttribute(module_name, attr_name)
+
+
+def preload_modules(module_names: Iterable[str]) -> None:
+    """
+    Import modules now (meant for a background thread, e.g. before loading a model).
+
+    Modules that are not installed or fail to import are skipped; the error
+    surfaces again where they are used.
+    """
+    for module_name in module_names:
+        if not is_module_available(module_name):
+            continue
+        try:
+            _import_and_time(module_name)
+        except Exception as e:
+            logging.warning(f"[LazyImport] Không thể import trước '{module_name}': {e}")
+
+
+def get_lazy_import_timings() -> Dict[str, float]:
+    """
+    Get import durations of lazily imported modules.
+
+    Returns:
+        Dict of module name -> seconds spent in the first import
+    """
+    with _import_lock:
+        return dict(_import_timings)
+
+
+# ========================================================================
+# IMPORT-TIME PROFILING (python -X importtime)
+# ========================================================================
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)\s*$")
+
+
+def parse_import_time_report(text: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Parse the stderr output of `python -X importtime`.
+
+    Returns:
+        List of (module, self_us, cumulative_us, depth), in import order.
+    """
+    entries = []
+    for line in text.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), max(0, (len(indent) - 1) // 2)))
+    return entries
+
+
+def format_import_time_report(entries: List[Tuple[str, int, int, int]], top: int = 25) -> str:
+    """
+    Format the slowest top-level imports (by cumulative time) as a table.
+
+    Args:
+        entries: Output of parse_import_time_report
+        top: Number of rows
+    """
+    top_level = [e for e in entries if e[3] == 0]
+    total_us = sum(e[2] for e in top_level)
+    lines = [f"Tổng thời gian import: {total_us / 1e6:.2f}s ({len(entries)} module)",
+             f"{'cumulative (ms)':>16} {'self (ms)':>10}  module"]
+    for module, self_us, cumulative_us, _ in sorted(top_level, key=lambda e: e[2], reverse=True)[:top]:
+        lines.append(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>10.1f}  {module}")
+    return "\n".join(lines)
+
+
+def profile_imports(target: str = "Piu", top: int = 25, timeout: float = 300) -> str:
+    """
+    Import target in a fresh interpreter with -X importtime and report the slowest imports.
+
+    Args:
+        target: Module to import (default: the main Piu module)
+        top: Number of rows in the report
+        timeout: Seconds before the child interpreter is killed
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, timeout=timeout
+    )
+    report = format_import_time_report(parse_import_time_report(proc.stderr), top=top)
+    if proc.returncode != 0:
+        last_error = proc.stderr.strip().splitlines()[-1:] or [""]
+        report += f"\n(import {target} lỗi: {last_error[0]})"
+    return report
+
+
+if __name__ == "__main__":
+    print(profile_imports(sys.argv[1] if len(sys.argv) > 1 else "Piu"))
@@ -0,0 +1,139 @@
+"""
+Rate limiting utilities for Piu application.
+
+Token-bucket limiter for API calls bounded by requests-per-minute (RPM) and
+tokens-per-minute (TPM), with adaptive back-off when the server answers 429.
+Thread-safe: one limiter can be shared by all workers of a thread pool.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+
+class TokenBucketRateLimiter:
+    """
+    Dual token bucket (requests + tokens) with adaptive back-off.
+
+    - acquire() blocks until both buckets have capacity.
+    - report_rate_limited() pauses every caller and lowers the effective rate.
+    - report_success() slowly restores the rate after a back-off.
+    """
+
+    # Sau mỗi lần bị 429, tốc độ hiệu dụng giảm theo hệ số này (tối thiểu MIN_RATE_FACTOR)
+    BACKOFF_FACTOR = 0.5
+    MIN_RATE_FACTOR = 0.1
+    # Mỗi lần gọi thành công, tốc độ hồi phục thêm một lượng nhỏ
+    RECOVERY_STEP = 0.02
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            requests_per_minute: Max requests per minute (None = unlimited)
+            tokens_per_minute: Max tokens per minute (None = unlimited)
+            clock: Monotonic clock (injectable for tests)
+            sleep: Sleep function (injectable for tests)
+        """
+        self.requests_per_minute = float(requests_per_minute) if requests_per_minute else None
+        self.tokens_per_minute = float(tokens_per_minute) if tokens_per_minute else None
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+        now = clock()
+        self._request_level = self.requests_per_minute or 0.0
+        self._token_level = self.tokens_per_minute or 0.0
+        self._last_refill = now
+        self._paused_until = 0.0
+        self.rate_factor = 1.0
+        self.consecutive_rate_limits = 0
+        self.total_rate_limits = 0
+
+    def _refill_locked(self, now: float) -> None:
+        elapsed = max(0.0, now - self._last_refill)
+        self._last_refill = now
+        if self.requests_per_minute:
+            rate = self.requests_per_minute * self.rate_factor / 60.0
+            self._request_level = min(self.requests_per_minute, self._request_level + elapsed * rate)
+        if self.tokens_per_minute:
+            rate = self.tokens_per_minute * self.rate_factor / 60.0
+            self._token_level = min(self.tokens_per_minute, self._token_level + elapsed * rate)
+
+    def _wait_time_locked(self, now: float, tokens: float) -> float:
+        wait = max(0.0, self._paused_until - now)
+        if self.requests_per_minute and self._request_level < 1.0:
+            rate = self.requests_per_minute * self.rate_factor / 60.0
+            wait = max(wait, (1.0 - self._request_level) / rate)
+        if self.tokens_per_minute:
+            # Một yêu cầu lớn hơn cả bucket vẫn được đi khi bucket đầy
+            needed = min(tokens, self.tokens_per_minute)
+            if self._token_level < needed:
+                rate = self.tokens_per_minute * self.rate_factor / 60.0
+                wait = max(wait, (needed - self._token_level) / rate)
+        return wait
+
+    def acquire(self, tokens: float = 0, stop_check: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Block until one request carrying `tokens` tokens may be sent.
+
+        Args:
+            tokens: Estimated tokens of the request (prompt + completion)
+            stop_check: Callable returning True to abort waiting
+
+        Returns:
+            True if acquired, False if aborted by stop_check.
+        """
+        while True:
+            if stop_check and stop_check():
+                return False
+            with self._lock:
+                now = self._clock()
+                self._refill_locked(now)
+                wait = self._wait_time_locked(now, tokens)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._request_level -= 1.0
+                    if self.tokens_per_minute:
+                        self._token_level -= min(tokens, self.tokens_per_minute)
+                    return True
+            # Ngủ từng đoạn ngắn để còn phản hồi stop_check
+            self._sleep(min(wait, 0.5))
+
+    def report_rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """
+        Record a 429 response: pause all callers and lower the effective rate.
+
+        Args:
+            retry_after: Server-provided Retry-After seconds, if any
+
+        Returns:
+            The pause duration applied (seconds).
+        """
+        with self._lock:
+            self.consecutive_rate_limits += 1
+            self.total_rate_limits += 1
+            self.rate_factor = max(self.MIN_RATE_FACTOR, self.rate_factor * self.BACKOFF_FACTOR)
+            backoff = retry_after if retry_after and retry_after > 0 else min(60.0, 2.0 ** self.consecutive_rate_limits)
+            self._paused_until = max(self._paused_until, self._clock() + backoff)
+            # Xả bucket để các luồng không dồn dập gửi ngay khi hết thời gian tạm dừng
+            self._request_level = min(self._request_level, 0.0)
+            self._token_level = min(self._token_level, 0.0)
+        logging.warning(
+            f"[RateLimiter] Bị giới hạn tốc độ (429). Tạm dừng {backoff:.1f}s, "
+            f"tốc độ hiệu dụng còn {self.rate_factor * 100:.0f}%."
+        )
+        return backoff
+
+    def report_success(self) -> None:
+        """Record a successful call: gradually restore the effective rate."""
+        with self._lock:
+            self.consecutive_rate_limits = 0
+            if self.rate_factor < 1.0:
+                self.rate_factor = min(1.0, self.rate_factor + self.RECOVERY_STEP)
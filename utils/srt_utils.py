@@ -1,13 +1,15 @@
 """
 SRT parsing utilities for Piu application.
 
-Functions for parsing SRT subtitle files and extracting timing information.
+Functions for parsing SRT subtitle files and extracting timing information,
+and for writing transcription segments as SRT/VTT (in one go or incrementally).
 """
 
 import os
 import re
+import time
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 
 def parse_srt_for_slideshow_timing(srt_file_path: str) -> List[Dict]:
@@ -163,17 +165,18 @@ def extract_dialogue_from_srt_string(text_content):
         return ' '.join(text_content.strip().split())
 
 
-def write_srt(file_handle, segments):
+def write_srt(file_handle, segments, start_index: int = 1):
     """
     Write segments in SRT format to file handle.
     
     Args:
         file_handle: Open file handle to write to
         segments: List of dictionaries with 'start', 'end', 'text' keys
+        start_index: Number of the first block (when appending to an existing file)
     """
     from utils.helpers import format_timestamp
     
-    for i, segment in enumerate(segments):
+    for i, segment in enumerate(segments, start_index - 1):
         start = format_timestamp(segment['start'], separator=',')
         end = format_timestamp(segment['end'], separator=',')
         text = segment['text'].strip().replace('-->', '->')  # Avoid error with '-->' in text
@@ -182,20 +185,83 @@ def write_srt(file_handle, segments):
         file_handle.write(f"{text}\n\n")
 
 
-def write_vtt(file_handle, segments):
+def write_vtt(file_handle, segments, header: bool = True):
     """
     Write segments in WebVTT format to file handle.
     
     Args:
         file_handle: Open file handle to write to
         segments: List of dictionaries with 'start', 'end', 'text' keys
+        header: Write the WEBVTT header (False when appending to an existing file)
     """
     from utils.helpers import format_timestamp
     
-    file_handle.write("WEBVTT\n\n")
+    if header:
+        file_handle.write("WEBVTT\n\n")
     for i, segment in enumerate(segments):
         start = format_timestamp(segment['start'], separator='.')
         end = format_timestamp(segment['end'], separator='.')
         text = segment['text'].strip().replace('-->', '->')
         file_handle.write(f"{start} --> {end}\n")
         file_handle.write(f"{text}\n\n")
+
+
+class SubtitleStreamWriter:
+    """
+    Append transcription segments to an SRT/VTT/TXT file as they arrive.
+
+    The file is flushed after every append and fsync'ed at most every
+    fsync_interval_s seconds (and on close), so a crash leaves a readable
+    subtitle file with everything decoded up to the last sync.
+    """
+
+    def __init__(self, path: str, output_format: str = "srt", fsync_interval_s: float = 5.0,
+                 existing_segments: Optional[List[Dict]] = None):
+        """
+        Args:
+            path: Output file (overwritten)
+            output_format: 'srt', 'vtt' or 'txt'
+            fsync_interval_s: Minimum seconds between two fsync calls
+            existing_segments: Segments already transcribed (resume), written first
+        """
+        self.path = path
+        self.output_format = output_format
+        self.fsync_interval_s = fsync_interval_s
+        self.count = 0
+        self._last_sync = 0.0
+        self._file = open(path, "w", encoding="utf-8")
+        if output_format == 'vtt':
+            self._file.write("WEBVTT\n\n")
+        if existing_segments:
+            self.append(existing_segments)
+        self.sync()
+
+    def append(self, segments: List[Dict]) -> None:
+        """Write new segments and flush (fsync if the interval has elapsed)."""
+        if self.output_format == 'srt':
+            write_srt(self._file, segments, start_index=self.count + 1)
+        elif self.output_format == 'vtt':
+            write_vtt(self._file, segments, header=False)
+        else:
+            for segment in segments:
+                self._file.write(f"{segment['text'].strip()}\n")
+        self.count += len(segments)
+        self._file.flush()
+        if time.monotonic() - self._last_sync >= self.fsync_interval_s:
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush and fsync the file to disk."""
+        self._file.flush()
+        try:
+            os.fsync(self._file.fileno())
+        except OSError:
+            pass
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """Sync and close the file."""
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()